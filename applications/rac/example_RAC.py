@@ -59,13 +59,9 @@ interrow=1 # inter-row spacing
 row=1 # row spacing
 layerVolume = depth / layers * interrow * row  
 N=120*2;
-time=np.linspace(0,119,N); rld = np.zeros(N);
-
-for i in range(N-1,0,-1):
-    ana.filter("creationTime", 0, time[i])
-    rl = ana.distribution("length", 0., -depth, layers, True);
-    rl = np.array(rl);
-    rld[i] = rl[1]/ layerVolume;
+time=np.linspace(0,119,N);
+rl = ana.distributionHistory("length", time, 0., -depth, layers, True)  # (N, layers)
+rld = rl[:, 1] / layerVolume;
 axes.plot(time,rld)
 axes.set_title('RAC')
 
@@ -122,12 +118,9 @@ for i in range(0, round(N)):
 # Make a root length distribution for periodic soil domain
 ana = pb.SegmentAnalyser(rs)
 
-time=np.linspace(0,119,N); rld = np.zeros(N);
-for i in range(N-1,0,-1):
-    ana.filter("creationTime", 0, time[i])
-    rl = ana.distribution("length", 0., -depth, layers, True);
-    rl = np.array(rl);
-    rld[i] = rl[1]/ layerVolume;
+time=np.linspace(0,119,N);
+rl = ana.distributionHistory("length", time, 0., -depth, layers, True)  # (N, layers)
+rld = rl[:, 1] / layerVolume;
 axes.plot(time,rld,'r--')
 axes.legend(["unimpeded", "impeded"])
 
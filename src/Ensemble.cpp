@@ -0,0 +1,185 @@
+// -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
+#include "Ensemble.h"
+
+#include "RootSystem.h"
+#include "Plant.h"
+
+#include <cmath>
+#include <exception>
+#include <sstream>
+#include <stdexcept>
+
+namespace CPlantBox {
+
+/**
+ * @param prototype     a RootSystem or Plant with the parameters of all members (its simulation state is ignored)
+ */
+Ensemble::Ensemble(std::shared_ptr<Organism> prototype): prototype(prototype)
+{
+    if (!std::dynamic_pointer_cast<RootSystem>(prototype) && !std::dynamic_pointer_cast<Plant>(prototype)) {
+        throw std::invalid_argument("Ensemble::Ensemble: prototype must be a RootSystem or a Plant");
+    }
+}
+
+/**
+ * @param filename      parameter file (xml)
+ * @param plant         members are Plants (true), or RootSystems (false, default)
+ */
+Ensemble::Ensemble(std::string filename, bool plant)
+{
+    if (plant) {
+        prototype = std::make_shared<Plant>();
+    } else {
+        prototype = std::make_shared<RootSystem>();
+    }
+    prototype->readParameters(filename);
+}
+
+/**
+ * Sets up the members, call simulate() to create them
+ *
+ * @param seeds         random number generator seed of each member
+ * @param overrides     optionally, parameters (organ type, sub type, name, value) that are changed per member,
+ *                      the list is either empty or contains a (possibly empty) list for each member
+ */
+void Ensemble::setMembers(const std::vector<unsigned int>& seeds, const std::vector<std::vector<Override>>& overrides)
+{
+    if (!overrides.empty() && (overrides.size()!=seeds.size())) {
+        throw std::invalid_argument("Ensemble::setMembers: number of overrides ("+std::to_string(overrides.size())+
+            ") and seeds ("+std::to_string(seeds.size())+") differ");
+    }
+    for (const auto& o : overrides) { // check parameter names before simulating
+        for (const auto& t : o) {
+            auto p = prototype->getOrganRandomParameter(std::get<0>(t), std::get<1>(t));
+            if (std::isnan(p->getParameter(std::get<2>(t)))) {
+                throw std::invalid_argument("Ensemble::setMembers: unknown parameter "+std::get<2>(t)+" of organ type "+
+                    std::to_string(std::get<0>(t))+", sub type "+std::to_string(std::get<1>(t)));
+            }
+        }
+    }
+    this->seeds = seeds;
+    this->overrides = overrides;
+    members.clear();
+}
+
+/**
+ * Creates, initializes, and simulates all members. The members are distributed among the OpenMP threads,
+ * each member uses its own random number generator.
+ *
+ * @param simtime       simulation time [day]
+ * @param steps         number of equal time steps (default = 1)
+ */
+void Ensemble::simulate(double simtime, int steps)
+{
+    int n = seeds.size();
+    members = std::vector<std::shared_ptr<Organism>>(n);
+    std::exception_ptr error = nullptr;
+    #pragma omp parallel for schedule(dynamic, 1)
+    for (int i = 0; i<n; i++) {
+        try {
+            auto m = createMember(i);
+            auto rs = std::dynamic_pointer_cast<RootSystem>(m);
+            if (rs) {
+                rs->initializeLB(basal, shootborne, false);
+            } else {
+                m->initialize(false);
+            }
+            for (int j = 0; j<steps; j++) {
+                m->simulate(simtime/steps, false);
+            }
+            members[i] = m;
+        } catch (...) {
+            #pragma omp critical
+            if (!error) {
+                error = std::current_exception();
+            }
+        }
+    }
+    if (error) {
+        members.clear();
+        std::rethrow_exception(error);
+    }
+}
+
+/**
+ * Copy of the prototype, with its own parameters (overrides applied) and random number generator
+ */
+std::shared_ptr<Organism> Ensemble::createMember(int i) const
+{
+    std::shared_ptr<Organism> m;
+    auto rs = std::dynamic_pointer_cast<RootSystem>(prototype);
+    if (rs) {
+        m = std::make_shared<RootSystem>(*rs); // copy constructor
+    } else {
+        m = std::make_shared<Plant>(*std::dynamic_pointer_cast<Plant>(prototype)); // copy constructor
+    }
+    for (int ot = 0; ot < Organism::ot_leaf+1; ot++) { // copy organ type parameters
+        for (auto& p : prototype->getOrganRandomParameter(ot)) {
+            m->setOrganRandomParameter(p->copy(m));
+        }
+    }
+    if (!overrides.empty()) {
+        for (const auto& t : overrides.at(i)) {
+            m->getOrganRandomParameter(std::get<0>(t), std::get<1>(t))->setParameter(std::get<2>(t), std::get<3>(t));
+        }
+    }
+    m->setSeed(seeds.at(i));
+    return m;
+}
+
+/**
+ * @return the i-th member, call simulate() first
+ */
+std::shared_ptr<Organism> Ensemble::getMember(int i) const
+{
+    if (members.empty()) {
+        throw std::invalid_argument("Ensemble::getMember: call simulate() first");
+    }
+    return members.at(i);
+}
+
+/**
+ * @return the summed up parameter of each member, @see Organism::getSummed
+ */
+std::vector<double> Ensemble::getSummed(std::string name, int ot) const
+{
+    if (members.empty() && !seeds.empty()) {
+        throw std::invalid_argument("Ensemble::getSummed: call simulate() first");
+    }
+    int n = members.size();
+    std::vector<double> v(n);
+    #pragma omp parallel for schedule(dynamic, 1)
+    for (int i = 0; i<n; i++) {
+        v[i] = members[i]->getSummed(name, ot);
+    }
+    return v;
+}
+
+/**
+ * @return a segment analyser for each member
+ */
+std::vector<SegmentAnalyser> Ensemble::getAnalysers() const
+{
+    if (members.empty() && !seeds.empty()) {
+        throw std::invalid_argument("Ensemble::getAnalysers: call simulate() first");
+    }
+    int n = members.size();
+    std::vector<SegmentAnalyser> a(n);
+    #pragma omp parallel for schedule(dynamic, 1)
+    for (int i = 0; i<n; i++) {
+        a[i] = SegmentAnalyser(*members[i]);
+    }
+    return a;
+}
+
+/**
+ * Quick info for debugging
+ */
+std::string Ensemble::toString() const
+{
+    std::stringstream str;
+    str << "Ensemble of " << seeds.size() << " members, " << (members.empty() ? "not simulated" : "simulated");
+    return str.str();
+}
+
+} // namespace
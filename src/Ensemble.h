@@ -0,0 +1,60 @@
+// -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
+#ifndef ENSEMBLE_H_
+#define ENSEMBLE_H_
+
+#include "Organism.h"
+#include "SegmentAnalyser.h"
+
+#include <memory>
+#include <string>
+#include <tuple>
+#include <vector>
+
+namespace CPlantBox {
+
+/**
+ * Many independent simulations (members) of the same parameter set, e.g. for Monte Carlo runs or sensitivity analysis.
+ *
+ * The parameters are read once into a prototype. Each member is a copy of the prototype with its own seed of the
+ * random number generator, and optionally its own parameter overrides. The members are simulated in parallel (OpenMP),
+ * the results are independent of the number of threads.
+ */
+class Ensemble
+{
+public:
+
+    typedef std::tuple<int, int, std::string, double> Override; ///< organ type, sub type, parameter name, value
+
+    Ensemble(std::shared_ptr<Organism> prototype); ///< members are copies of a RootSystem or Plant
+    Ensemble(std::string filename, bool plant = false); ///< reads the parameter file into a RootSystem (or Plant) prototype
+    virtual ~Ensemble() { };
+
+    void setMembers(const std::vector<unsigned int>& seeds,
+        const std::vector<std::vector<Override>>& overrides = std::vector<std::vector<Override>>()); ///< one member per seed
+    void simulate(double simtime, int steps = 1); ///< initializes and simulates all members
+
+    int getNumberOfMembers() const { return seeds.size(); } ///< number of members
+    std::shared_ptr<Organism> getPrototype() const { return prototype; } ///< the prototype, change its parameters before simulate()
+    std::shared_ptr<Organism> getMember(int i) const; ///< the i-th member (after simulate())
+    std::vector<double> getSummed(std::string name, int ot = -1) const; ///< summed up parameter per member @see Organism::getSummed
+    std::vector<SegmentAnalyser> getAnalysers() const; ///< segments of each member
+
+    std::string toString() const; ///< quick info for debugging
+
+    int basal = 4; ///< type of the basal roots, for RootSystem members @see RootSystem::initializeLB
+    int shootborne = 5; ///< type of the shoot borne roots, for RootSystem members @see RootSystem::initializeLB
+
+protected:
+
+    std::shared_ptr<Organism> createMember(int i) const; // copy of the prototype with seed and overrides of member i
+
+    std::shared_ptr<Organism> prototype;
+    std::vector<unsigned int> seeds;
+    std::vector<std::vector<Override>> overrides; // per member, or empty
+    std::vector<std::shared_ptr<Organism>> members;
+
+};
+
+} // namespace
+
+#endif
@@ -39,6 +39,8 @@ public:
     bool calc13 = true; // turns Eqn 13 on and off
     double observationRadius = 5; //  limits computational domain around roots [cm]
 
+    std::function<void(int, int)> progress; // optionally, called after each root with (finished roots, number of roots)
+
     /**
      * Constructors
      *
@@ -76,6 +78,11 @@ public:
 
     /**
      * For each root for each grid point
+     *
+     * The grid points are distributed among the threads (OpenMP), the roots are processed one after another.
+     * Each grid point sums up the contributions of the roots in the same order, i.e. the result does not depend
+     * on the number of threads.
+     *
      * @param tend      final simulation time
      * @param i0        optionally, initial root index (default = 0)
      * @param iend      optionally, final root index (default = roots.size())
@@ -90,8 +97,9 @@ public:
 
         std::fill(grid.data.begin(), grid.data.end(), 0); // set data to zero
         g_.resize(grid.data.size()); // saves last root contribution
+        int n = grid.nx*grid.ny*grid.nz;
 
-        for (size_t ri = i0; ri< iend; ri++) {
+        for (int ri = i0; ri< iend; ri++) {
 
             //
             // per root (passed to integrands)
@@ -107,78 +115,75 @@ public:
                 st_ = stopTime[ri]; // eq 13
                 st_ *= calc13;
 
-                std::cout << "Root #" << ri << "/" << roots.size() << ", age "<< age_ << ", stopped "<< st_ <<
-                    ", res "<< n_ << " \n"; // for debugging
-
                 // EQN 11
-                for (size_t i = 0; i<grid.nx; i++) {
-                    for(size_t j = 0; j<grid.ny; j++) {
-                        for (size_t k = 0; k<grid.nz; k++) {
+                #pragma omp parallel for schedule(dynamic, 64)
+                for (int lind = 0; lind<n; lind++) {
 
-                            x_ = grid.getGridPoint(i,j,k); // integration point
+                    Vector3d x = getGridPoint(lind); // integration point
 
-                            if ((!limitDomain) || (-sdfs[ri].getDist(x_)<observationRadius)) {
+                    if ((!limitDomain) || (-sdfs[ri].getDist(x)<observationRadius)) {
 
-                                size_t lind = i*(grid.ny*grid.nz)+j*grid.nz+k;
+                        // different flavors of Eqn (11)
+                        double c = eqn11(x, 0, age_, 0, l);
+                        grid.data[lind] += c;
+                        g_[lind] = c;
 
-                                // different flavors of Eqn (11)
-                                double c = eqn11(0, age_, 0, l);
-                                grid.data[lind] += c;
-                                g_[lind] = c;
-
-                            } else {
-                                size_t lind = i*(grid.ny*grid.nz)+j*grid.nz+k;
-                                g_[lind] = 0.;
-                            }
-
-                        }
+                    } else {
+                        g_[lind] = 0.;
                     }
+
                 }
 
                 // EQN 13
                 if ((st_>0) && (st_<tend)) { // has stopped growing
-                    std::cout << "13!";
-                    for (size_t i = 0; i<grid.nx; i++) {
-                        std::cout << "*";
-                        for(size_t j = 0; j<grid.ny; j++) {
-                            for (size_t k = 0; k<grid.nz; k++) {
-
-                                size_t lind = i*(grid.ny*grid.nz)+j*grid.nz+k;
-                                if (g_[lind] > thresh13) {
+                    #pragma omp parallel for schedule(dynamic, 16)
+                    for (int lind = 0; lind<n; lind++) {
 
-                                    x_ = grid.getGridPoint(i,j,k);
-                                    if ((!limitDomain) || (-sdfs[ri].getDist(x_)<observationRadius)) {
+                        if (g_[lind] > thresh13) {
 
-                                        // Eqn (13)
-                                        grid.data[lind] += integrate13(tend);
+                            Vector3d x = getGridPoint(lind);
+                            if ((!limitDomain) || (-sdfs[ri].getDist(x)<observationRadius)) {
 
-                                    }
+                                // Eqn (13)
+                                grid.data[lind] += integrate13(x, tend);
 
-                                }
                             }
+
                         }
                     }
-                    std::cout << "13\n";
                 }
 
 
             } // if ages.at(i)>0d
 
+            if (progress) {
+                progress(ri-i0+1, iend-i0);
+            }
+
         }
 
         return grid.data;
     }
 
-    double eqn11(double x0, double xend, double y0, double yend) {
+    // grid point with linear index lind = i*(ny*nz)+j*nz+k
+    Vector3d getGridPoint(size_t lind) {
+        size_t k = lind % grid.nz;
+        size_t j = (lind / grid.nz) % grid.ny;
+        size_t i = lind / (grid.ny*grid.nz);
+        return grid.getGridPoint(i, j, k);
+    }
+
+    double eqn11(const Vector3d& x, double x0, double xend, double y0, double yend) {
+        IntegrationPoint p = { this, x };
         switch (type) {
         case mps_straight: {
-            return gauss_legendre(n_, integrandMPS_straight, this, x0, xend);
+            return gauss_legendre(n_, integrandMPS_straight, &p, x0, xend);
         }
         case mps: {
-            return gauss_legendre(n_, integrandMPS, this, x0, xend);
+            return gauss_legendre(n_, integrandMPS, &p, x0, xend);
         }
         case mls: {
-            return gauss_legendre_2D_cube(n_, integrandMLS, this, x0, xend, y0, yend);
+            return gauss_legendre_2D_cube(n_, integrandMLS, &p, x0, xend, y0, yend);
         }
         }
         std::cout << "Unknown integration type \n";
@@ -186,14 +191,14 @@ public:
     }
 
     // simplistic integration in 3d
-    double integrate13(double t) {
+    double integrate13(const Vector3d& x, double t) {
         double c = 0;
         for (size_t i = 0; i<grid.nx; i++) {
             for(size_t j = 0; j<grid.ny; j++) {
                 for (size_t k = 0; k<grid.nz; k++) {
                     Vector3d y = grid.getGridPoint(i,j,k);
                     size_t lind = i*(grid.ny*grid.nz)+j*grid.nz+k;
-                    c += integrand13(y,lind, t)*dx3;
+                    c += integrand13(x, y, lind, t)*dx3;
                 }
             }
         }
@@ -201,15 +206,15 @@ public:
     }
 
     // integrand Eqn 13
-    double integrand13(Vector3d& y, size_t lind, double t) {
+    double integrand13(const Vector3d& x, const Vector3d& y, size_t lind, double t) const {
         double dt = t-st_;
         double c = to32(R)*g_[lind] / to32(4*Dl*M_PI*dt);
-        Vector3d z = x_.minus(y);
+        Vector3d z = x.minus(y);
         return c*exp(-R/(4*Dl*dt) * z.times(z) - k*dt/R);
     }
 
     // Returns the linearly interpolated position along the root r at age a
-    static Vector3d pointAtAge(std::shared_ptr<Root> r, double a) {
+    static Vector3d pointAtAge(const std::shared_ptr<Root>& r, double a) {
         a = std::max(0.,a);
         double et = r->getNodeCT(0)+a; // age -> emergence time
         size_t i=0;
@@ -235,19 +240,21 @@ public:
 
     // point source, root is represented by a single straight line (substituted)
     static double integrandMPS_straight(double t, void* param) {
-        ExudationModel* p = (ExudationModel*) param;
+        const IntegrationPoint* ip = (const IntegrationPoint*) param;
+        const ExudationModel* p = ip->model;
         double c = -p->R / ( 4*p->Dl*t );
         double d = 8*(p->theta)*ExudationModel::to32(M_PI*p->Dl*t);
 
         Vector3d xtip = p->tip_.plus(p->v_.times(t)); // for t=0 at tip, at t=age at base, as above
-        Vector3d z = p->x_.minus(xtip);
+        Vector3d z = ip->x.minus(xtip);
 
         return ((p->Q)*sqrt(p->R))/d *exp(c*z.times(z) - p->k/p->R * t); // Eqn (11)
     }
 
     // moving line source, root is represented by a straight segments
     static double integrandMLS(double t, double l, void* param) {
-        ExudationModel* p = (ExudationModel*) param;
+        const IntegrationPoint* ip = (const IntegrationPoint*) param;
+        const ExudationModel* p = ip->model;
         double c = -(p->R) / ( 4*(p->Dl)*t );
         double d = 8*(p->theta)*ExudationModel::to32(M_PI*p->Dl*t);
 
@@ -258,19 +265,20 @@ public:
         }
         double agel = p->r_->calcAge(tl-l);
         Vector3d tipLS = p->ExudationModel::pointAtAge(p->r_, agel);
-        Vector3d z = p->x_.minus(tipLS);
+        Vector3d z = ip->x.minus(tipLS);
 
         return ((p->Q)*sqrt(p->R))/d *exp(c*z.times(z) - p->k/p->R * t); // Eqn (11)
     }
 
     // moving point source, root is represented by a straight segments
     static double integrandMPS(double t, void* param) {
-        ExudationModel* p = (ExudationModel*) param;
+        const IntegrationPoint* ip = (const IntegrationPoint*) param;
+        const ExudationModel* p = ip->model;
         double c = -p->R / ( 4*p->Dl*t );
         double d = 8*(p->theta)*ExudationModel::to32(M_PI*p->Dl*t);
 
         Vector3d xtip = ExudationModel::pointAtAge(p->r_, p->age_-t);
-        Vector3d z = p->x_.minus(xtip);
+        Vector3d z = ip->x.minus(xtip);
 
         return ((p->Q)*sqrt(p->R))/d *exp(c*z.times(z) - p->k/p->R * t); // Eqn (11)
     }
@@ -284,8 +292,7 @@ public:
     std::vector<SDF_RootSystem> sdfs; // direction from tip towards root base
     bool limitDomain = (observationRadius>0);
 
-    // Set before integrating
-    Vector3d x_ = Vector3d(); // integration point
+    // Set before integrating (per root)
     int n_ = 0;
     std::shared_ptr<Root> r_ = nullptr; // current root
     double age_ = 0;
@@ -294,6 +301,12 @@ public:
     double st_ = 0; // stop time (eqn 13)
     std::vector<double> g_;  // eqn 13
 
+    // Passed to the integrands (per grid point)
+    struct IntegrationPoint {
+        const ExudationModel* model;
+        Vector3d x; // integration point
+    };
+
 };
 
 
@@ -2,6 +2,7 @@
 #include "Leaf.h"
 #include "Root.h"
 #include "Plant.h"
+#include "binary_io.h"
 
 namespace CPlantBox {
 
@@ -572,4 +573,20 @@ std::string Leaf::toString() const
 	return str+newstring.str();
 }
 
+/**
+ * Writes the data of the leaf that are not part of Organ::writeState
+ */
+void Leaf::writeState_(std::ostream& os) const
+{
+	writeBinary(os, firstCall);
+}
+
+/**
+ * Reads the data written by Leaf::writeState_
+ */
+void Leaf::readState_(std::istream& is)
+{
+	readBinary(is, firstCall);
+}
+
 } // namespace CPlantBox
@@ -55,6 +55,9 @@ public:
 
 protected:
 
+    void writeState_(std::ostream& os) const override; ///< writes the data that are not part of Organ::writeState
+    void readState_(std::istream& is) override; ///< reads the data written by writeState_
+
     void minusPhytomerId(int subtype);
     int getleafphytomerID(int subtype);
     void addleafphytomerID(int subtype);
@@ -1,11 +1,13 @@
 // -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
 #include "MappedOrganism.h"
 
-#include "SegmentAnalyser.h"
+#include "binary_io.h"
 
 #include <algorithm>
 #include <functional>
 #include <cmath>
+#include <limits>
+#include <typeinfo>
 
 namespace CPlantBox {
 
@@ -76,6 +78,7 @@ MappedSegments::MappedSegments(std::vector<Vector3d> nodes, std::vector<Vector2i
  * Sets the radius @param a [cm] for all segments.
  */
 void MappedSegments::setRadius(double a) {
+	views.release(); // numpy arrays keep the current values
 	radii.resize(segments.size());
 	std::fill(radii.begin(), radii.end(), a);
 }
@@ -84,6 +87,7 @@ void MappedSegments::setRadius(double a) {
  * Sets the sub type of all segments to @param t.
  */
 void MappedSegments::setSubTypes(int t) {
+	views.release();
 	subTypes.resize(segments.size());
 	std::fill(subTypes.begin(), subTypes.end(), t);
 }
@@ -109,9 +113,45 @@ void MappedSegments::setSoilGrid(const std::function<int(double,double,double)>&
  * @param s 		the callback function picks a cell with spatial coordinate [cm] and returns the index of the cell [1]
  */
 void MappedSegments::setSoilGrid(const std::function<int(double,double,double)>& s) {
+	views.release();
 	soil_index = s;
 	seg2cell.clear(); // re-map all segments
-	cell2seg.clear();
+	mapSegments(segments);
+}
+
+/**
+ * Sets a native soil index mapper, resets and updates the mappers.
+ * In contrast to a Python call back function, segments are mapped in parallel.
+ *
+ * @param s 		the mapper picks a cell with spatial coordinate [cm] and returns the index of the cell [1]
+ */
+void MappedSegments::setSoilGrid(std::shared_ptr<SoilIndex> s) {
+	this->setSoilGrid(SoilIndexFunction{ s });
+}
+
+/**
+ * Sets a rectilinear grid as native soil index mapper (@see RectilinearSoilIndex), and cuts all segments along the grid cells
+ *
+ * @param x 		sorted face coordinates along the x-axis [cm]
+ * @param y 		sorted face coordinates along the y-axis [cm]
+ * @param z 		sorted face coordinates along the z-axis [cm]
+ * @param cut 		determines if the segments are cut at the grid faces
+ */
+void MappedSegments::setRectilinearGrid(std::vector<double> x, std::vector<double> y, std::vector<double> z, bool cut)
+{
+	views.release();
+	auto s = std::make_shared<RectilinearSoilIndex>(x, y, z);
+	soil_index = SoilIndexFunction{ s };
+	minBound = Vector3d(x.front(), y.front(), z.front());
+	maxBound = Vector3d(x.back(), y.back(), z.back());
+	resolution = Vector3d(x.size()-1, y.size()-1, z.size()-1);
+	gridFaces = { x, y, z };
+	cutAtGrid = cut;
+	if (cutAtGrid) {
+		cutSegments();
+	}
+	sort();
+	seg2cell.clear(); // re-map all segments
 	mapSegments(segments);
 }
 
@@ -125,9 +165,11 @@ void MappedSegments::setSoilGrid(const std::function<int(double,double,double)>&
  */
 void MappedSegments::setRectangularGrid(Vector3d min, Vector3d max, Vector3d res, bool cut)
 {
+	views.release();
 	minBound = min;
 	maxBound = max;
 	resolution = res;
+	gridFaces = std::array<std::vector<double>,3>();
 	cutAtGrid = cut;
 	std::cout << "setRectangularGrid: cutSegments \n" << std::flush;
 	if (cutAtGrid) {
@@ -136,24 +178,26 @@ void MappedSegments::setRectangularGrid(Vector3d min, Vector3d max, Vector3d res
 	std::cout << "setRectangularGrid: sort \n" << std::flush;
 	sort(); // todo should not be necessary, or only in case of cutting?
 	seg2cell.clear(); // re-map all segments
-	cell2seg.clear();
 	std::cout << "setRectangularGrid: map \n" << std::flush;
 	mapSegments(segments);
 }
 
 
 /**
- * Update the mappers root2cell, which maps root segment index to soil cell index, and
- * cell2seg which maps soil cell index to multiple root segments.
+ * Update the mappers seg2cell, which maps root segment index to soil cell index, and
+ * cell2seg (@see getCell2segOffsets, getCell2segIndices) which maps soil cell index to multiple root segments.
  *
  * @param segs      the (new) segments that need to be mapped
  */
 void MappedSegments::mapSegments(const std::vector<Vector2i>& segs) {
+	views.release();
+	std::vector<int> cells = cellIndices(segs);
 	bool firstWarning = true;
-	for (auto& ns : segs) {
-		Vector3d mid = (nodes[ns.x].plus(nodes[ns.y])).times(0.5);
-		int cellIdx = soil_index(mid.x,mid.y,mid.z);
+	for (int i = 0; i<segs.size(); i++) {
+		const auto& ns = segs[i];
+		int cellIdx = cells[i];
 		if ((cellIdx<0) && (firstWarning))  {
+			Vector3d mid = (nodes[ns.x].plus(nodes[ns.y])).times(0.5);
 			std::cout << "MappedSegments::mapSegments: some segments exceed the soil domain, they are mapped to cell index -1 \n";
 			std::cout << ns.toString() << "\n";
 			std::cout << mid.toString() << "\n";
@@ -162,107 +206,298 @@ void MappedSegments::mapSegments(const std::vector<Vector2i>& segs) {
 			firstWarning = false;
 		}
 		int segIdx = ns.y-1; // this is unique in a tree like structured
+		if (segIdx>=seg2cell.size()) {
+			seg2cell.resize(segIdx+1, -1);
+		}
 		seg2cell[segIdx] = cellIdx;
-		if (cell2seg.count(cellIdx)>0) {
-			cell2seg[cellIdx].push_back(segIdx);
-		} else {
-			cell2seg[cellIdx] = std::vector<int>({segIdx});
+	}
+	updateCell2seg();
+}
+
+/**
+ * Maps new segments, and remaps the segments of moved nodes, only these segments are passed to the soil index mapper.
+ * Segments, that were added or changed their cell, are stored in changedSegments,
+ * cells that gained or lost segments are stored in changedCells.
+ * Only the cell buckets of the changed segments are updated, the compressed mapper is rebuilt on its next access.
+ *
+ * @param newSegs       the new segments
+ * @param movedNodes    indices of the moved nodes, i.e. the segments with index movedNodes[i]-1 are checked
+ */
+void MappedSegments::updateMapping(const std::vector<Vector2i>& newSegs, const std::vector<int>& movedNodes) {
+	views.release();
+	std::vector<Vector2i> segs = newSegs;
+	std::vector<int> oldCells(newSegs.size(), -1);
+	segs.reserve(newSegs.size()+movedNodes.size());
+	oldCells.reserve(newSegs.size()+movedNodes.size());
+	for (int i : movedNodes) {
+		int segIdx = i-1;
+		if ((segIdx>=0) && (segIdx<seg2cell.size())) { // otherwise it is a new segment
+			segs.push_back(segments[segIdx]);
+			oldCells.push_back(seg2cell[segIdx]);
 		}
 	}
+	std::vector<int> newCells = cellIndices(segs);
+	changedSegments.clear();
+	changedCells.clear();
+	for (int i = 0; i<segs.size(); i++) {
+		int segIdx = segs[i].y-1;
+		bool isNew = (i<newSegs.size());
+		if (isNew || (newCells[i]!=oldCells[i])) {
+			changedSegments.push_back(segIdx);
+			if (oldCells[i]>=0) {
+				changedCells.push_back(oldCells[i]);
+			}
+			if (newCells[i]>=0) {
+				changedCells.push_back(newCells[i]);
+			}
+		}
+		if (segIdx>=seg2cell.size()) {
+			seg2cell.resize(segIdx+1, -1);
+		}
+		int prevCell = seg2cell[segIdx];
+		seg2cell[segIdx] = newCells[i];
+		if (prevCell!=newCells[i]) { // move the segment to its new bucket
+			if (prevCell>=0) {
+				auto& b = cell2segBuckets[prevCell];
+				auto it = std::lower_bound(b.begin(), b.end(), segIdx);
+				if ((it!=b.end()) && (*it==segIdx)) {
+					b.erase(it);
+				}
+			}
+			if (newCells[i]>=0) {
+				if (newCells[i]>=cell2segBuckets.size()) {
+					cell2segBuckets.resize(newCells[i]+1);
+				}
+				auto& b = cell2segBuckets[newCells[i]];
+				b.insert(std::lower_bound(b.begin(), b.end(), segIdx), segIdx); // new segments are usually appended
+			}
+			cell2segCompressed = false;
+		}
+	}
+	while (!cell2segBuckets.empty() && cell2segBuckets.back().empty()) { // largest mapped cell index + 1
+		cell2segBuckets.pop_back();
+	}
+	std::sort(changedCells.begin(), changedCells.end());
+	changedCells.erase(std::unique(changedCells.begin(), changedCells.end()), changedCells.end());
 }
 
 /**
- * Cuts segments @param segs at a rectangular grid (@see MappedSegments::setSoilGrid)
+ * Soil cell indices of the segment mid points, native mappers are evaluated in parallel
+ *
+ * @param segs      the segments
+ */
+std::vector<int> MappedSegments::cellIndices(const std::vector<Vector2i>& segs) const {
+	int n = segs.size();
+	std::vector<int> cells(n);
+	auto native = soil_index.target<SoilIndexFunction>();
+	if (native!=nullptr) { // native mappers are thread safe
+		auto s = native->soilIndex;
+		#pragma omp parallel for schedule(static)
+		for (int i = 0; i<n; i++) {
+			Vector3d mid = (nodes[segs[i].x].plus(nodes[segs[i].y])).times(0.5);
+			cells[i] = s->getIndex(mid.x,mid.y,mid.z);
+		}
+	} else {
+		for (int i = 0; i<n; i++) {
+			Vector3d mid = (nodes[segs[i].x].plus(nodes[segs[i].y])).times(0.5);
+			cells[i] = soil_index(mid.x,mid.y,mid.z);
+		}
+	}
+	return cells;
+}
+
+/**
+ * Rebuilds the soil cell to root segment mapper (one sorted bucket per cell) from seg2cell,
+ * linear in the number of segments and cells. Segments outside of the soil domain (cell index -1) are not contained.
+ */
+void MappedSegments::updateCell2seg() {
+	int maxCell = -1;
+	for (int c : seg2cell) {
+		maxCell = std::max(maxCell, c);
+	}
+	cell2segBuckets.assign(maxCell+1, std::vector<int>());
+	for (int segIdx = 0; segIdx<seg2cell.size(); segIdx++) {
+		int c = seg2cell[segIdx];
+		if (c>=0) {
+			cell2segBuckets[c].push_back(segIdx);
+		}
+	}
+	cell2segCompressed = false;
+}
+
+/**
+ * Compresses the cell buckets into cell2segOffsets and cell2segIndices, if the buckets have changed since the last call
+ */
+void MappedSegments::compressCell2seg() const {
+	#pragma omp critical(mapped_segments_cell2seg)
+	if (!cell2segCompressed) {
+		views.release(cell2segOffsets); // numpy arrays keep the previous mapping
+		views.release(cell2segIndices);
+		int n = cell2segBuckets.size();
+		cell2segOffsets.assign(n+1, 0);
+		for (int c = 0; c<n; c++) {
+			cell2segOffsets[c+1] = cell2segOffsets[c] + cell2segBuckets[c].size();
+		}
+		cell2segIndices.resize(cell2segOffsets.back());
+		for (int c = 0; c<n; c++) {
+			std::copy(cell2segBuckets[c].begin(), cell2segBuckets[c].end(), cell2segIndices.begin()+cell2segOffsets[c]);
+		}
+		cell2segCompressed = true;
+	}
+}
+
+/**
+ * Soil cell to root segment mapper (compressed), the segments of cell c are
+ * getCell2segIndices()[getCell2segOffsets()[c]] ... getCell2segIndices()[getCell2segOffsets()[c+1]-1].
+ * The reference is valid until the mapping changes (e.g. by simulate).
+ */
+const std::vector<int>& MappedSegments::getCell2segOffsets() const {
+	compressCell2seg();
+	return cell2segOffsets;
+}
+
+/**
+ * Segment indices ordered by cell (compressed), @see getCell2segOffsets
+ */
+const std::vector<int>& MappedSegments::getCell2segIndices() const {
+	compressCell2seg();
+	return cell2segIndices;
+}
+
+/**
+ * Segment indices within the soil cell @param cellIdx (empty, if there are none)
+ */
+std::vector<int> MappedSegments::cellSegments(int cellIdx) const {
+	if ((cellIdx<0) || (cellIdx>=numberOfMappedCells())) {
+		return std::vector<int>();
+	}
+	return cell2segBuckets[cellIdx];
+}
+
+/**
+ * Cuts all segments at the faces of the rectangular grid (@see MappedSegments::setRectangularGrid, MappedSegments::setRectilinearGrid)
  */
 void MappedSegments::cutSegments() {
-	assert(segments.size()==radii.size() && "MappedSegments::addSegments: number of segments and radii disagree!");
-	assert(segments.size()==subTypes.size() && "MappedSegments::addSegments: number of segments and subTypes disagree!");
-	assert(segments.size()==organTypes.size() && "MappedSegments::addSegments: number of segments and organTypes disagree!");
-	int n = segments.size(); // segs.size() will change within the loop (recursive implementation)
+	views.release();
+	assert(segments.size()==radii.size() && "MappedSegments::cutSegments: number of segments and radii disagree!");
+	assert(segments.size()==subTypes.size() && "MappedSegments::cutSegments: number of segments and subTypes disagree!");
+	assert(segments.size()==organTypes.size() && "MappedSegments::cutSegments: number of segments and organTypes disagree!");
+	std::array<std::vector<double>,3> planes = gridFaces; // coordinates of the grid faces along x, y, and z
+	std::array<double,3> min = { minBound.x, minBound.y, minBound.z };
+	std::array<double,3> max = { maxBound.x, maxBound.y, maxBound.z };
+	std::array<int,3> res = { int(resolution.x), int(resolution.y), int(resolution.z) };
+	for (int k=0; k<3; k++) {
+		if (planes[k].empty()) { // equidistant grid
+			planes[k].resize(res[k]+1);
+			for (int i=0; i<=res[k]; i++) {
+				planes[k][i] = min[k] + (max[k]-min[k])*double(i)/double(res[k]);
+			}
+		}
+	}
+	int n = segments.size(); // segments.size() will change within the loop
 	for (int i=0; i<n; i++ ) {
-		addSegment(segments[i], radii[i], subTypes[i], organTypes[i], i);
+		cutSegment(i, planes);
 	}
 }
 
 /**
- * Adds and cuts a single segment at index @param ii. If the segment is cut, appends the remaining segments.
- * Used by cutSegments
- * This approach may run into problems if a segment is located exactly along a face.
+ * Cuts the segment with index @param si at the grid faces @param planes (along x, y, and z). The last part replaces
+ * the segment at index si (keeping its second node), the other parts and the new nodes are appended (keeping the order segment index == y-1).
  *
- * @param ns 		the segment to add and cut
- * @param r 		segment radius [cm]
- * @param st 		segment sub type
- * @param ot 		segment organ type
- * @param ii		index to insert the segment, -1 to append the segment
- */
-void MappedSegments::addSegment(Vector2i ns, double r,  int st, int ot, int ii) {
-	Vector3d n1 = nodes[ns.x];
-	Vector3d n2 = nodes[ns.y];
-	Vector3d mid = (n1.plus(n2)).times(0.5);
-	int im = soil_index(mid.x,mid.y,mid.z); // cell indices
-	int in1 = soil_index(n1.x,n1.y,n1.z);
-	int in2 = soil_index(n2.x,n2.y,n2.z);
-	if ((im!=in1) or (im!=in2)) { // cut
-		// build SDF
-		auto width = maxBound.minus(minBound); // construct sdf
-		Vector3d dx(width.x/resolution.x, width.y/resolution.y, width.z/resolution.z);
-		auto mid0 = mid.minus(minBound);
-		int x = std::floor(mid0.x/dx.x);
-		int y = std::floor(mid0.y/dx.y);
-		int z = std::floor(mid0.z/dx.z);
-		SDF_Cuboid sdf; // create a signed distance function for cutting
-		Vector3d minB(x*dx.x, y*dx.y, z*dx.z);
-		minB = minB.plus(minBound);
-		Vector3d maxB((x+1)*dx.x, (y+1)*dx.y, (z+1)*dx.z);
-		maxB = maxB.plus(minBound);
-		sdf.min = minB;
-		sdf.max = maxB;
-		// std::cout << minB.toString() << ", " << maxB.toString() << ", width " << width.toString() << ", " << sdf.min.toString() << ", " << sdf.max.toString() << "\n";
-
-		im = sdf.getDist(mid)>0; // redo indices, since accuracy of pickking may differ
-		in1 = sdf.getDist(n1)>0;
-		in2 = sdf.getDist(n2)>0;
-		if ((im!=in1) or (im!=in2)) {
-			Vector3d cPoint;
-			if (im==in1) { // is one node at mid (sort accordingly)
-				// std::cout << "n1 " << sdf.getDist(n1) << " mid " << sdf.getDist(mid) << " n2 " << sdf.getDist(n2) << ",indices "<< in1 << ", " << im << ", " << in2 << "\n";
-				if (sdf.getDist(n2)<0) {
-					cPoint = SegmentAnalyser::cut(n2, mid, std::make_shared<SDF_Cuboid>(sdf), eps);
-				} else {
-					cPoint = SegmentAnalyser::cut(mid, n2, std::make_shared<SDF_Cuboid>(sdf), eps);
-				}
-				nodeCTs.push_back(nodeCTs[ns.y]); // todo: we might linearly interpolate
-			} else if (im==in2) {
-				// std::cout << "n2 " << sdf.getDist(n2) << " mid " << sdf.getDist(mid) << " n1 " << sdf.getDist(n1) << ", " << in2 << ", " << im << ", " << in1 << "\n";
-				if (sdf.getDist(n1)<0) {
-					cPoint = SegmentAnalyser::cut(n1, mid, std::make_shared<SDF_Cuboid>(sdf), eps);
-				} else {
-					cPoint = SegmentAnalyser::cut(mid, n1, std::make_shared<SDF_Cuboid>(sdf), eps);
-				}
-				nodeCTs.push_back(nodeCTs[ns.x]); // todo: we might linearly interpolate
-			} else { // otherwise split in mid, use cutSegments on those
-				cPoint = mid;
-				nodeCTs.push_back(0.5*(nodeCTs[ns.x]+nodeCTs[ns.y]));
+ * The grid faces crossed by the segment are found in one pass by a 3D voxel traversal (Amanatides & Woo 1987).
+ * Cuts are only applied where the cell changes, and if both parts are longer than eps.
+ * Creation times of new nodes are linearly interpolated.
+ *
+ * @param si 		segment index
+ * @param planes 	sorted coordinates of the grid faces for each axis
+ */
+void MappedSegments::cutSegment(int si, const std::array<std::vector<double>,3>& planes) {
+	Vector2i s = segments[si];
+	Vector3d n1 = nodes[s.x];
+	Vector3d v = nodes[s.y].minus(n1);
+	double l = v.length();
+	if (l<2*eps) {
+		return;
+	}
+	std::array<double,3> p1 = { n1.x, n1.y, n1.z };
+	std::array<double,3> d = { v.x, v.y, v.z };
+	std::array<int,3> next; // index of the next face along each axis
+	std::array<double,3> tMax; // segment parameter, where the next face along each axis is crossed
+	const double inf = std::numeric_limits<double>::infinity();
+	for (int k=0; k<3; k++) {
+		const auto& g = planes[k];
+		if (d[k]>0) {
+			next[k] = std::upper_bound(g.begin(), g.end(), p1[k]) - g.begin();
+		} else if (d[k]<0) {
+			next[k] = int(std::lower_bound(g.begin(), g.end(), p1[k]) - g.begin()) - 1;
+		} else {
+			next[k] = -1;
+		}
+		tMax[k] = ((next[k]>=0) && (next[k]<g.size())) ? (g[next[k]]-p1[k])/d[k] : inf;
+	}
+	std::vector<double> ts; // face crossings in increasing order
+	while (true) {
+		int k = std::min_element(tMax.begin(), tMax.end()) - tMax.begin();
+		if (tMax[k]>=1.) {
+			break;
+		}
+		ts.push_back(tMax[k]);
+		next[k] += (d[k]>0) ? 1 : -1;
+		tMax[k] = ((next[k]>=0) && (next[k]<planes[k].size())) ? (planes[k][next[k]]-p1[k])/d[k] : inf;
+	}
+	if (ts.empty()) {
+		return;
+	}
+	ts.push_back(1.);
+	std::vector<double> cuts;
+	double t0 = 0.; // last cut
+	int c0 = gridCell(n1.plus(v.times(0.5*ts[0])), planes); // cell of the current part
+	for (int i=0; i<ts.size()-1; i++) {
+		double t = ts[i];
+		int c = gridCell(n1.plus(v.times(0.5*(t+ts[i+1]))), planes);
+		if (c!=c0) {
+			if ((1.-t)*l<eps) { // remaining part is too short
+				break;
 			}
-			// std::cout << "[" << n1.toString() << n2.toString() << "] -> [" << nodes[ns.x].toString() << ", " << nodes.back().toString() << "], ["<< nodes.back().toString() << ", " << n2.toString() << "], " << "\n";
-			nodes.push_back(cPoint);
-			Vector2i s1(ns.x, nodes.size()-1);
-			Vector2i s2(nodes.size()-1, ns.y);
-			if ((length(s1)<eps) ||  (length(s2)<eps)) { // if the cut segments are too small, just give up
-				add(ns, r, st, ot, ii);
-				nodes.pop_back(); // remove cPoint
-			} else {
-				addSegment(s1, r, st , ot, ii); // first segment replaces at index ii
-				addSegment(s2, r, st , ot, -1); // append second segment
+			if ((t-t0)*l<eps) { // the part is too short, and is added to the next one
+				c0 = c;
+				continue;
 			}
-		} else { // im==in1==in2, dont't cut
-			// std::cout << "ok " << ii <<": (" << ns.x <<", " << ns.y << ") [" << n1.toString() <<", "<< n2.toString() <<"\n";
-			add(ns, r, st, ot, ii);
+			cuts.push_back(t);
+			t0 = t;
+			c0 = c;
 		}
-	} else { // im==in1==in2, dont't cut
-		// std::cout << "ok " << ii <<": (" << ns.x <<", " << ns.y << ") [" << n1.toString() <<", "<< n2.toString() <<"\n";
-		add(ns, r, st, ot, ii);
 	}
+	int prev = s.x;
+	for (double t : cuts) {
+		nodes.push_back(n1.plus(v.times(t)));
+		nodeCTs.push_back(nodeCTs[s.x]+t*(nodeCTs[s.y]-nodeCTs[s.x]));
+		int ni = nodes.size()-1;
+		add(Vector2i(prev, ni), radii[si], subTypes[si], organTypes[si], -1);
+		prev = ni;
+	}
+	segments[si] = Vector2i(prev, s.y);
+}
+
+/**
+ * Linear index of the grid cell containing point @param p, or -1 if the point is outside of the grid
+ *
+ * @param p 		point [cm]
+ * @param planes 	sorted coordinates of the grid faces for each axis
+ */
+int MappedSegments::gridCell(const Vector3d& p, const std::array<std::vector<double>,3>& planes) const {
+	std::array<double,3> x = { p.x, p.y, p.z };
+	std::array<int,3> i;
+	for (int k=0; k<3; k++) {
+		const auto& g = planes[k];
+		if ((x[k]<g.front()) || (x[k]>=g.back())) {
+			return -1;
+		}
+		i[k] = int(std::upper_bound(g.begin(), g.end(), x[k]) - g.begin()) - 1;
+	}
+	int nx = planes[0].size()-1;
+	int ny = planes[1].size()-1;
+	return (i[2]*ny + i[1])*nx + i[0];
 }
 
 /**
@@ -299,30 +534,16 @@ double MappedSegments::length(const Vector2i& s) const {
  * Removes segments @param segs from the mappers
  */
 void MappedSegments::unmapSegments(const std::vector<Vector2i>& segs) {
+	views.release();
 	for (auto& ns : segs) {
-		int cellIdx = -1;
 		int segIdx = ns.y-1;
-		if (seg2cell.count(segIdx)>0) { // remove from seg2cell
-			cellIdx = seg2cell[segIdx];
-			auto it = seg2cell.find(segIdx);
-			seg2cell.erase(it);
+		if (segIdx<seg2cell.size()) { // remove from seg2cell
+			seg2cell[segIdx] = -1;
 		} else {
 			throw std::invalid_argument("MappedSegments::removeSegments: warning segment index "+ std::to_string(segIdx)+ " was not found in the seg2cell mapper");
 		}
-		if (cell2seg.count(cellIdx)>0) {
-			auto& csegs= cell2seg[cellIdx];
-			int c = 0;
-			for (int i=0; i<csegs.size(); i++) {
-				if (csegs[i] == segIdx) {
-					csegs.erase(csegs.begin() + c, csegs.begin() + c);
-					break; // inner for
-				}
-				c++;
-			}
-		} else {
-			throw std::invalid_argument("MappedSegments::removeSegments: warning cell index "+ std::to_string(cellIdx)+ " was not found in the cell2seg mapper");
-		}
 	}
+	updateCell2seg();
 }
 
 /**
@@ -346,6 +567,7 @@ int MappedSegments::soil_index_(double x, double y, double z) {
  * Sorts the segments, so that the segment index == second node index -1 (unique mapping in a tree)
  */
 void MappedSegments::sort() {
+	views.release();
 	auto newSegs = segments;
 	auto newRadii = radii;
 	auto newSubTypes = subTypes;
@@ -363,6 +585,124 @@ void MappedSegments::sort() {
 	organTypes = newTypesorgan;
 }
 
+/**
+ * Writes the segments, the grid, and the mappers (binary), @see Organism::serialize.
+ *
+ * Native soil index mappers (@see SoilIndex) are written, call back functions (e.g. set from Python) are not,
+ * they must be set again after reading (@see readMapping).
+ */
+void MappedSegments::writeMapping(std::ostream& os) const
+{
+	writeTag(os, "MappedSegments");
+	writeBinary(os, nodes);
+	writeBinary(os, nodeCTs);
+	writeBinary(os, segments);
+	writeBinary(os, radii);
+	writeBinary(os, subTypes);
+	writeBinary(os, organTypes);
+	writeBinary(os, minBound);
+	writeBinary(os, maxBound);
+	writeBinary(os, resolution);
+	for (const auto& f : gridFaces) {
+		writeBinary(os, f);
+	}
+	writeBinary(os, cutAtGrid);
+	writeBinary(os, seg2cell);
+	writeBinary(os, getCell2segOffsets());
+	writeBinary(os, getCell2segIndices());
+	writeBinary(os, changedSegments);
+	writeBinary(os, changedCells);
+	std::shared_ptr<SoilIndex> si = nullptr;
+	auto f = soil_index.target<SoilIndexFunction>();
+	if (f!=nullptr) {
+		si = f->soilIndex;
+	}
+	if (auto e = std::dynamic_pointer_cast<EquidistantSoilIndex>(si)) {
+		writeBinary(os, 1);
+		writeBinary(os, e->min);
+		writeBinary(os, e->max);
+		writeBinary(os, e->res);
+	} else if (std::dynamic_pointer_cast<RectilinearSoilIndex>(si)) {
+		writeBinary(os, 2); // faces are stored in gridFaces
+	} else if (auto u = std::dynamic_pointer_cast<UnstructuredSoilIndex>(si)) {
+		writeBinary(os, 3);
+		writeBinary(os, u->points);
+		writeBinary(os, u->cells);
+		writeBinary(os, u->eps);
+	} else if (soil_index.target_type()==typeid(std::bind(&MappedSegments::soil_index_, const_cast<MappedSegments*>(this),
+		std::placeholders::_1, std::placeholders::_2, std::placeholders::_3))) {
+		writeBinary(os, 0); // default mapper
+	} else {
+		writeBinary(os, 4); // call back function (not written), or none
+	}
+}
+
+/**
+ * Reads the data written by MappedSegments::writeMapping.
+ *
+ * A call back function was not written, the soil index is unset after reading (and a warning is printed),
+ * set it again with setSoilGrid() before simulating or mapping segments.
+ */
+void MappedSegments::readMapping(std::istream& is)
+{
+	views.release();
+	readTag(is, "MappedSegments");
+	readBinary(is, nodes);
+	readBinary(is, nodeCTs);
+	readBinary(is, segments);
+	readBinary(is, radii);
+	readBinary(is, subTypes);
+	readBinary(is, organTypes);
+	readBinary(is, minBound);
+	readBinary(is, maxBound);
+	readBinary(is, resolution);
+	for (auto& f : gridFaces) {
+		readBinary(is, f);
+	}
+	readBinary(is, cutAtGrid);
+	readBinary(is, seg2cell);
+	readBinary(is, cell2segOffsets);
+	readBinary(is, cell2segIndices);
+	if (cell2segOffsets.empty() || (cell2segOffsets.back()!=cell2segIndices.size())) {
+		throw std::invalid_argument("MappedSegments::readMapping: corrupt cell to segment mapper");
+	}
+	cell2segBuckets.resize(cell2segOffsets.size()-1);
+	for (int c = 0; c<cell2segBuckets.size(); c++) {
+		cell2segBuckets[c].assign(cell2segIndices.begin()+cell2segOffsets[c], cell2segIndices.begin()+cell2segOffsets[c+1]);
+	}
+	cell2segCompressed = true;
+	readBinary(is, changedSegments);
+	readBinary(is, changedCells);
+	int kind = 0;
+	readBinary(is, kind);
+	if (kind==1) {
+		Vector3d min, max, res;
+		readBinary(is, min);
+		readBinary(is, max);
+		readBinary(is, res);
+		soil_index = SoilIndexFunction{ std::make_shared<EquidistantSoilIndex>(min, max, res) };
+	} else if (kind==2) {
+		soil_index = SoilIndexFunction{ std::make_shared<RectilinearSoilIndex>(gridFaces[0], gridFaces[1], gridFaces[2]) };
+	} else if (kind==3) {
+		std::vector<Vector3d> points;
+		std::vector<std::vector<int>> cells;
+		readBinary(is, points);
+		readBinary(is, cells);
+		auto u = std::make_shared<UnstructuredSoilIndex>(points, cells);
+		readBinary(is, u->eps);
+		soil_index = SoilIndexFunction{ u };
+	} else if (kind==0) {
+		soil_index = std::bind(&MappedSegments::soil_index_, this, std::placeholders::_1, std::placeholders::_2, std::placeholders::_3);
+	} else {
+		soil_index = nullptr;
+		std::cout << "MappedSegments::readMapping: warning! the soil index call back function was not stored, "
+			"set it with setSoilGrid() before simulating\n";
+	}
+	if (!is.good()) {
+		throw std::invalid_argument("MappedSegments::readMapping: unexpected end of data");
+	}
+}
+
 
 
 /**
@@ -372,6 +712,7 @@ void MappedSegments::sort() {
  * This can be changed by directly accessing the member variables.
  */
 void MappedRootSystem::initializeLB(int basaltype, int shootbornetype, bool verbose) {
+	views.release();
 	std::cout << "MappedRootSystem::initialize \n" << std::flush;
 	RootSystem::initializeLB(basaltype, shootbornetype, verbose);
 	segments = this->getShootSegments();
@@ -407,6 +748,7 @@ void MappedRootSystem::simulate(double dt, bool verbose)
 	if (soil_index==nullptr) {
 		throw std::invalid_argument("MappedRootSystem::simulate():soil was not set, use MappedRootSystem::simulate::setSoilGrid" );
 	}
+	views.release();
 
 	RootSystem::simulate(dt,verbose);
 
@@ -457,43 +799,34 @@ void MappedRootSystem::simulate(double dt, bool verbose)
 		subTypes[segIdx] = so->getParam()->subType;
 		organTypes[segIdx] = so->organType();
 	}
-	// map new segments
-	this->mapSegments(newsegs);
+	this->updateMapping(newsegs, uni); // map new segments, and remap segments of moved nodes
+}
 
-	// update segments of moved nodes
-	std::vector<Vector2i> rSegs;
-	for (int i : uni) {
-		int segIdx = i -1;
-		int cellIdx = seg2cell[segIdx];
-		auto s = segments[segIdx];
-		Vector3d mid = (nodes[s.x].plus(nodes[s.y])).times(0.5);
-		int newCellIdx = soil_index(mid.x,mid.y,mid.z);
-		// 1. check if mid is still in same cell (otherwise, remove, and add again)
-		// 2. if cut is on, check if end point is in same cell than mid point (otherwise remove and add again)
-		bool remove = false;
-		if (cellIdx==newCellIdx) {
-			if (cutAtGrid) {
-				auto endPoint = nodes[s.y];
-				newCellIdx = soil_index(endPoint.x,endPoint.y,endPoint.z);
-				remove = (newCellIdx!=cellIdx);
-			}
-		} else {
-			remove = true;
-		}
-		if (remove) {
-			rSegs.push_back(s);
-		}
-	}
-	MappedSegments::unmapSegments(rSegs);
-	MappedSegments::mapSegments(rSegs);
+
+/**
+ * Writes the root system and the mappers, @see Organism::serialize
+ */
+void MappedRootSystem::writeState(std::ostream& os) const
+{
+	RootSystem::writeState(os);
+	writeMapping(os);
 }
 
+/**
+ * Reads the data written by MappedRootSystem::writeState
+ */
+void MappedRootSystem::readState(std::istream& is)
+{
+	RootSystem::readState(is);
+	readMapping(is);
+}
 
 /**
  * initialization of mappedplant
  *
  */
 void MappedPlant::initialize(bool verbose) {
+	views.release();
 	reset(); // just in case
 	std::cout << "MappedPlant::initialize \n" << std::flush;
 	Plant::initialize(verbose);
@@ -545,6 +878,7 @@ void MappedPlant::simulate(double dt, bool verbose)
 	if (soil_index==nullptr) {
 		throw std::invalid_argument("MappedPlant::simulate():soil was not set, use MappedPlant::simulate::setSoilGrid" );
 	}
+	views.release();
 	Plant::simulate( dt,  verbose);
 	auto uni = this->getUpdatedNodeIndices(); // move nodes
 	auto unodes = this->getUpdatedNodes();
@@ -598,42 +932,47 @@ void MappedPlant::simulate(double dt, bool verbose)
 		subTypes[segIdx] = st2newst[std::make_tuple(organTypes[segIdx],subTypes[segIdx])];
 	}
 
-	// map new segments
-	this->mapSegments(newsegs);
+	this->updateMapping(newsegs, uni); // map new segments, and remap segments of moved nodes
+}
 
-	// update segments of moved nodes
-	std::vector<Vector2i> rSegs;
-	for (int i : uni) {
-		int segIdx = i -1;
-		int cellIdx = seg2cell[segIdx];
-		auto s = segments[segIdx];
-		Vector3d mid = (nodes[s.x].plus(nodes[s.y])).times(0.5);
-		int newCellIdx = soil_index(mid.x,mid.y,mid.z);
-		// 1. check if mid is still in same cell (otherwise, remove, and add again)
-		// 2. if cut is on, check if end point is in same cell than mid point (otherwise remove and add again)
-		bool remove = false;
-		if (cellIdx==newCellIdx) {
-			if (cutAtGrid) {
-				auto endPoint = nodes[s.y];
-				newCellIdx = soil_index(endPoint.x,endPoint.y,endPoint.z);
-				remove = (newCellIdx!=cellIdx);
-			}
-		} else {
-			remove = true;
-		}
-		if (remove) {
-			rSegs.push_back(s);
-		}
+/**
+ * Writes the plant and the mappers, @see Organism::serialize
+ */
+void MappedPlant::writeState(std::ostream& os) const
+{
+	Plant::writeState(os);
+	writeMapping(os);
+	writeBinary(os, (uint64_t)st2newst.size());
+	for (const auto& st : st2newst) {
+		writeBinary(os, std::get<0>(st.first));
+		writeBinary(os, std::get<1>(st.first));
+		writeBinary(os, st.second);
+	}
+}
+
+/**
+ * Reads the data written by MappedPlant::writeState
+ */
+void MappedPlant::readState(std::istream& is)
+{
+	Plant::readState(is);
+	readMapping(is);
+	uint64_t n = 0;
+	readBinary(is, n);
+	st2newst.clear();
+	for (uint64_t i = 0; (i<n) && is.good(); i++) {
+		int ot, st, newst;
+		readBinary(is, ot);
+		readBinary(is, st);
+		readBinary(is, newst);
+		st2newst[std::make_tuple(ot, st)] = newst;
 	}
-	MappedSegments::unmapSegments(rSegs);
-	MappedSegments::mapSegments(rSegs);
 }
 
 /**
 *Gives an overview of the mappedplant object (for debugging)
 *
 **/
-
 void MappedPlant::printNodes() {
 
 	std::cout << "\n MappedPlant::printnodes \n"<< std::flush;
@@ -4,10 +4,14 @@
 
 #include "RootSystem.h"
 #include "Plant.h"
+#include "soil_index.h"
+#include "vector_views.h"
 
 #include <functional>
 #include <vector>
+#include <algorithm>
 #include <tuple>
+#include <array>
 
 namespace CPlantBox {
 
@@ -23,6 +27,7 @@ class MappedSegments
 public:
 
     MappedSegments() { }
+    ~MappedSegments() { views.release(false); } ///< numpy arrays keep the viewed vectors
 
     MappedSegments(std::vector<Vector3d> nodes, std::vector<double> nodeCTs, std::vector<Vector2i> segs,
         std::vector<double> radii, std::vector<int> subTypes, std::vector<int> organTypes); ///< for kr and kx age and type dependent
@@ -36,20 +41,31 @@ public:
 
     void setSoilGrid(const std::function<int(double,double,double)>& s); ///< sets the soil, resets the mappers, and maps all segments
     void setSoilGrid(const std::function<int(double,double,double)>& s, Vector3d min, Vector3d max, Vector3d res, bool cut = true); ///< sets the soil, resets the mappers, cuts and maps all segments
+    void setSoilGrid(std::shared_ptr<SoilIndex> s); ///< sets a native soil index mapper, resets the mappers, and maps all segments (in parallel)
     void setRectangularGrid(Vector3d min, Vector3d max, Vector3d res, bool cut = true); ///< sets an underlying rectangular grid, and cuts all segments accordingly
+    void setRectilinearGrid(std::vector<double> x, std::vector<double> y, std::vector<double> z, bool cut = true); ///< sets a rectilinear grid as native mapper, and cuts all segments accordingly
 
     void mapSegments(const std::vector<Vector2i>& segs);
-    void cutSegments(); // cut and add segments
+    void cutSegments(); ///< cuts all segments at the faces of the rectangular grid
 
 
-    std::map<int, int> seg2cell; // root segment to soil cell mapper
-    std::map<int, std::vector<int>> cell2seg; // soil cell to root segment mapper
+    mutable VectorViews views; ///< storage of the vectors viewed by numpy arrays (including the mappers), call views.release() before modifying them directly
+    std::vector<int> seg2cell; ///< root segment to soil cell mapper, cell index per segment index (-1 if outside of the soil domain)
+    const std::vector<int>& getCell2segOffsets() const; ///< soil cell to root segment mapper (compressed), segments of cell c are indices[offsets[c]] ... indices[offsets[c+1]-1]
+    const std::vector<int>& getCell2segIndices() const; ///< segment indices ordered by cell (compressed), see getCell2segOffsets
+    std::vector<int> changedSegments; ///< segments that were added or changed their cell during the last simulation step
+    std::vector<int> changedCells; ///< cells that gained or lost segments during the last simulation step (sorted)
+    std::vector<int> cellSegments(int cellIdx) const; ///< segment indices within the soil cell
+    int numberOfMappedCells() const { return cell2segBuckets.size(); } ///< largest mapped cell index + 1
 
     std::function<int(double,double,double)> soil_index =
         std::bind(&MappedSegments::soil_index_, this, std::placeholders::_1, std::placeholders::_2, std::placeholders::_3); ///< soil cell index call back function, (care need all MPI ranks in case of dumux)
 
     void sort(); ///< sorts segments, each segment belongs to position s.y-1
 
+    void writeMapping(std::ostream& os) const; ///< writes segments, grid, and mappers (binary)
+    void readMapping(std::istream& is); ///< reads the data written by MappedSegments::writeMapping
+
     std::vector<Vector3d> nodes; ///< nodes [cm]
     std::vector<double> nodeCTs; ///< creation times [days]
     std::vector<Vector2i> segments; ///< connectivity of the nodes
@@ -60,6 +76,7 @@ public:
     Vector3d minBound;
     Vector3d maxBound;
     Vector3d resolution; // cells
+    std::array<std::vector<double>,3> gridFaces; // face coordinates of a rectilinear grid along each axis (empty for the equidistant grid)
     bool cutAtGrid = false;
 
     const double eps = 1.e-5;
@@ -67,12 +84,22 @@ public:
 	
 protected:
 
-    void addSegment(Vector2i ns, double radius,  int st,int ot, int i); // adds a single segment at index i, appends the rest if cutted
+    void cutSegment(int si, const std::array<std::vector<double>,3>& planes); // cuts a single segment at the grid faces, appends the new segments
+    int gridCell(const Vector3d& p, const std::array<std::vector<double>,3>& planes) const; // linear cell index of a point in the grid, -1 if outside
     void add(Vector2i ns, double radius,  int st, int ot, int i); // adds without cutting, at index i, or appends if i = -1
     double length(const Vector2i& s) const;
 
     int soil_index_(double x, double y, double z); // default mapper to a equidistant rectangular grid
     void unmapSegments(const std::vector<Vector2i>& segs); ///< remove segments from the mappers
+    void updateMapping(const std::vector<Vector2i>& newSegs, const std::vector<int>& movedNodes); ///< maps new segments and remaps segments of moved nodes
+    std::vector<int> cellIndices(const std::vector<Vector2i>& segs) const; ///< soil cell indices of the segment mid points
+    void updateCell2seg(); ///< rebuilds the cell to segment mapper from seg2cell
+    void compressCell2seg() const; ///< compresses the buckets into cell2segOffsets and cell2segIndices, if they have changed
+
+    std::vector<std::vector<int>> cell2segBuckets; // sorted segment indices per cell, updated incrementally
+    mutable std::vector<int> cell2segOffsets; // compressed cell2segBuckets, @see getCell2segOffsets
+    mutable std::vector<int> cell2segIndices; // compressed cell2segBuckets, @see getCell2segIndices
+    mutable bool cell2segCompressed = false;
 
 };
 
@@ -92,6 +119,9 @@ public:
 
     void simulate(double dt, bool verbose = false) override; ///< build nodes and segments sequentially
 
+    void writeState(std::ostream& os) const override; ///< writes root system and mappers (binary) @see Organism::serialize
+    void readState(std::istream& is) override; ///< reads the data written by MappedRootSystem::writeState
+
     /* segments are shoot and root segments */
 
 
@@ -110,6 +140,8 @@ public:
     using Plant::Plant;
     void initialize(bool verbose = true); ///< overridden, to map initial shoot segments,
     void simulate(double dt, bool verbose) override ; ///< build nodes and segments sequentially
+    void writeState(std::ostream& os) const override; ///< writes plant and mappers (binary) @see Organism::serialize
+    void readState(std::istream& is) override; ///< reads the data written by MappedPlant::writeState
     void printNodes(); ///< print information
 	void mapSubTypes();
     std::map<std::tuple<int, int>, int > st2newst; // replace subtypes with other int nummer, so that the N subtypes of one organ type go from 0 to N-1
@@ -3,8 +3,19 @@
 
 #include "Organism.h"
 #include <iostream>
+#include <stdexcept>
 
 #include "organparameter.h"
+#include "rootparameter.h"
+#include "seedparameter.h"
+#include "stemparameter.h"
+#include "leafparameter.h"
+#include "Root.h"
+#include "RootDelay.h"
+#include "Seed.h"
+#include "Stem.h"
+#include "Leaf.h"
+#include "binary_io.h"
 
 namespace CPlantBox {
 
@@ -328,6 +339,193 @@ void Organ::writeRSML(tinyxml2::XMLDocument& doc, tinyxml2::XMLElement* parent)
 	}
 }
 
+/*
+ * Writes the specific parameters of an organ of organ type @param ot
+ */
+static void writeSpecificParameter(std::ostream& os, int ot, const OrganSpecificParameter& p)
+{
+	writeBinary(os, p.subType);
+	writeBinary(os, p.a);
+	switch (ot) {
+	case Organism::ot_seed: {
+		auto& sp = static_cast<const SeedSpecificParameter&>(p);
+		writeBinary(os, sp.seedPos);
+		writeBinary(os, sp.firstB); writeBinary(os, sp.delayB); writeBinary(os, sp.maxB);
+		writeBinary(os, sp.nC); writeBinary(os, sp.firstSB); writeBinary(os, sp.delaySB); writeBinary(os, sp.delayRC);
+		writeBinary(os, sp.nz); writeBinary(os, sp.maxTil); writeBinary(os, sp.simtime);
+		break;
+	}
+	case Organism::ot_root: {
+		auto& rp = static_cast<const RootSpecificParameter&>(p);
+		writeBinary(os, rp.lb); writeBinary(os, rp.la); writeBinary(os, rp.r); writeBinary(os, rp.theta); writeBinary(os, rp.rlt);
+		writeBinary(os, rp.ln);
+		break;
+	}
+	case Organism::ot_stem: {
+		auto& sp = static_cast<const StemSpecificParameter&>(p);
+		writeBinary(os, sp.lb); writeBinary(os, sp.la); writeBinary(os, sp.r); writeBinary(os, sp.theta); writeBinary(os, sp.rlt);
+		writeBinary(os, sp.ln);
+		break;
+	}
+	case Organism::ot_leaf: {
+		auto& lp = static_cast<const LeafSpecificParameter&>(p);
+		writeBinary(os, lp.lb); writeBinary(os, lp.la); writeBinary(os, lp.r); writeBinary(os, lp.theta); writeBinary(os, lp.rlt);
+		writeBinary(os, lp.ln);
+		break;
+	}
+	}
+}
+
+/*
+ * Reads the specific parameters of an organ of organ type @param ot, written by writeSpecificParameter
+ */
+static std::shared_ptr<OrganSpecificParameter> readSpecificParameter(std::istream& is, int ot)
+{
+	int subType;
+	double a;
+	readBinary(is, subType);
+	readBinary(is, a);
+	switch (ot) {
+	case Organism::ot_seed: {
+		auto sp = std::make_shared<SeedSpecificParameter>();
+		sp->subType = subType;
+		sp->a = a;
+		readBinary(is, sp->seedPos);
+		readBinary(is, sp->firstB); readBinary(is, sp->delayB); readBinary(is, sp->maxB);
+		readBinary(is, sp->nC); readBinary(is, sp->firstSB); readBinary(is, sp->delaySB); readBinary(is, sp->delayRC);
+		readBinary(is, sp->nz); readBinary(is, sp->maxTil); readBinary(is, sp->simtime);
+		return sp;
+	}
+	case Organism::ot_root: {
+		auto rp = std::make_shared<RootSpecificParameter>();
+		rp->subType = subType;
+		rp->a = a;
+		readBinary(is, rp->lb); readBinary(is, rp->la); readBinary(is, rp->r); readBinary(is, rp->theta); readBinary(is, rp->rlt);
+		readBinary(is, rp->ln);
+		return rp;
+	}
+	case Organism::ot_stem: {
+		auto sp = std::make_shared<StemSpecificParameter>();
+		sp->subType = subType;
+		sp->a = a;
+		readBinary(is, sp->lb); readBinary(is, sp->la); readBinary(is, sp->r); readBinary(is, sp->theta); readBinary(is, sp->rlt);
+		readBinary(is, sp->ln);
+		return sp;
+	}
+	case Organism::ot_leaf: {
+		auto lp = std::make_shared<LeafSpecificParameter>();
+		lp->subType = subType;
+		lp->a = a;
+		readBinary(is, lp->lb); readBinary(is, lp->la); readBinary(is, lp->r); readBinary(is, lp->theta); readBinary(is, lp->rlt);
+		readBinary(is, lp->ln);
+		return lp;
+	}
+	}
+	return std::make_shared<OrganSpecificParameter>(subType, a);
+}
+
+/**
+ * Writes the organ, and recursively its children, in binary format.
+ * The class (Seed, Root, RootDelay, Stem, Leaf, or Organ) is determined by the organ type.
+ *
+ * @param os        the output stream
+ */
+void Organ::writeState(std::ostream& os) const
+{
+	int ot = organType();
+	bool delay = (dynamic_cast<const RootDelay*>(this)!=nullptr);
+	writeBinary(os, ot);
+	writeBinary(os, delay);
+	writeBinary(os, id);
+	writeSpecificParameter(os, ot, *param_);
+	writeBinary(os, alive);
+	writeBinary(os, active);
+	writeBinary(os, age);
+	writeBinary(os, length);
+	writeBinary(os, iHeading);
+	writeBinary(os, parentBaseLength);
+	writeBinary(os, parentNI);
+	writeBinary(os, insertionAngle);
+	writeBinary(os, moved);
+	writeBinary(os, oldNumberOfNodes);
+	writeBinary(os, nodes);
+	writeBinary(os, nodeIds);
+	writeBinary(os, nodeCTs);
+	writeState_(os);
+	writeBinary(os, (uint64_t)children.size());
+	for (const auto& c : children) {
+		c->writeState(os);
+	}
+}
+
+/**
+ * Reads an organ tree written by Organ::writeState
+ *
+ * @param is        the input stream
+ * @param plant     the plant the organs will be part of
+ * @return          the organ, parent pointer is not set
+ */
+std::shared_ptr<Organ> Organ::readState(std::istream& is, std::shared_ptr<Organism> plant)
+{
+	int ot, id, pni, oldNON;
+	bool delay, alive, active, moved;
+	double age, length, pbl, insertionAngle;
+	Vector3d iheading;
+	readBinary(is, ot);
+	readBinary(is, delay);
+	readBinary(is, id);
+	auto param = readSpecificParameter(is, ot);
+	readBinary(is, alive);
+	readBinary(is, active);
+	readBinary(is, age);
+	readBinary(is, length);
+	readBinary(is, iheading);
+	readBinary(is, pbl);
+	readBinary(is, pni);
+	readBinary(is, insertionAngle);
+	readBinary(is, moved);
+	readBinary(is, oldNON);
+	if (!is.good()) {
+		throw std::invalid_argument("Organ::readState: unexpected end of data");
+	}
+	std::shared_ptr<Organ> o;
+	switch (ot) {
+	case Organism::ot_seed:
+		o = std::make_shared<Seed>(id, param, alive, active, age, length, moved, oldNON);
+		break;
+	case Organism::ot_root:
+		if (delay) {
+			o = std::make_shared<RootDelay>(id, param, alive, active, age, length, iheading, pbl, pni, moved, oldNON);
+		} else {
+			o = std::make_shared<Root>(id, param, alive, active, age, length, iheading, pbl, pni, moved, oldNON);
+		}
+		break;
+	case Organism::ot_stem:
+		o = std::make_shared<Stem>(id, param, alive, active, age, length, iheading, pbl, pni, moved, oldNON);
+		break;
+	case Organism::ot_leaf:
+		o = std::make_shared<Leaf>(id, param, alive, active, age, length, iheading, pbl, pni, moved, oldNON);
+		break;
+	default:
+		o = std::make_shared<Organ>(id, param, alive, active, age, length, iheading, pbl, pni, moved, oldNON);
+	}
+	o->plant = plant;
+	o->insertionAngle = insertionAngle;
+	readBinary(is, o->nodes);
+	readBinary(is, o->nodeIds);
+	readBinary(is, o->nodeCTs);
+	o->readState_(is);
+	uint64_t n = 0;
+	readBinary(is, n);
+	if (!is.good()) {
+		throw std::invalid_argument("Organ::readState: unexpected end of data");
+	}
+	for (uint64_t i = 0; i<n; i++) {
+		o->addChild(readState(is, plant));
+	}
+	return o;
+}
+
 /**
  * @return Quick info about the object for debugging,
  * additionally, use getParam()->toString() and getOrganRandomParameter()->toString() to obtain all information.
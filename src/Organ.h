@@ -10,6 +10,7 @@
 #include <memory>
 #include <functional>
 #include <map>
+#include <iostream>
 
 namespace CPlantBox {
 
@@ -87,6 +88,8 @@ public:
     /* IO */
     virtual std::string toString() const; ///< info for debugging
     void writeRSML(tinyxml2::XMLDocument& doc, tinyxml2::XMLElement* parent) const; ///< writes this organs RSML tag
+    void writeState(std::ostream& os) const; ///< writes the organ tree (binary), @see Organism::serialize
+    static std::shared_ptr<Organ> readState(std::istream& is, std::shared_ptr<Organism> plant); ///< reads an organ tree written by writeState
 
     /* Parameters that are constant over the organ life time*/
     Vector3d iHeading; ///< the initial heading of the root, when it was created
@@ -96,6 +99,9 @@ public:
 
 protected:
 
+    virtual void writeState_(std::ostream& os) const { } ///< writes data of derived classes, @see writeState
+    virtual void readState_(std::istream& is) { } ///< reads data of derived classes, @see readState
+
     /* up and down the organ tree */
     std::weak_ptr<Organism> plant; ///< the plant of which this organ is part of
     std::weak_ptr<Organ> parent; ///< pointer to the parent organ (nullptr if it has no parent)
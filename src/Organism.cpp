@@ -3,11 +3,14 @@
 
 #include "Organ.h"
 #include "organparameter.h"
+#include "binary_io.h"
 
 #include <stdexcept>
 #include <iostream>
 #include <ctime>
 #include <numeric>
+#include <fstream>
+#include <sstream>
 
 namespace CPlantBox {
 
@@ -161,6 +164,41 @@ void Organism::simulate(double dt, bool verbose)
         r->simulate(dt, verbose);
     }
     simtime+=dt;
+    revision++;
+}
+
+/**
+ * Flat sequential representation of the organ tree, the buffers are rebuilt (by a single tree walk)
+ * if the organism was simulated, organs were added, or the id counters have changed.
+ * Derived classes that change the organ tree otherwise must increase Organism::revision.
+ *
+ * @return          the current sequential buffers
+ */
+const Organism::SequentialBuffers& Organism::getBuffers() const
+{
+    std::array<int, 3> key = { { revision, organId, nodeId } };
+    #pragma omp critical(organism_buffers)
+    if (buffers.key!=key) {
+        auto& b = buffers;
+        b.organs.clear();
+        b.organs.reserve(getNumberOfOrgans()); // just for speed up
+        for (const auto& o : this->baseOrgans) {
+            o->getOrgans(-1, b.organs);
+        }
+        b.segments.clear();
+        b.segments.reserve(getNumberOfNodes());
+        b.segmentOffsets.resize(b.organs.size()+1);
+        for (size_t j = 0; j<b.organs.size(); j++) {
+            const auto& o = b.organs[j];
+            b.segmentOffsets[j] = b.segments.size();
+            for (size_t i = 0; i<o->getNumberOfNodes()-1; i++) {
+                b.segments.push_back(Vector2i(o->getNodeId(i), o->getNodeId(i+1)));
+            }
+        }
+        b.segmentOffsets.back() = b.segments.size();
+        b.key = key;
+    }
+    return buffers;
 }
 
 /**
@@ -172,11 +210,15 @@ void Organism::simulate(double dt, bool verbose)
  */
 std::vector<std::shared_ptr<Organ>> Organism::getOrgans(int ot) const
 {
+    const auto& all = getBuffers().organs;
+    if (ot<0) {
+        return all;
+    }
     auto organs = std::vector<std::shared_ptr<Organ>>(0);
-    // std::cout << "Organism::getOrgans: getNumberOfOrgans() " << getNumberOfOrgans() << "\n" << std::flush;
-    organs.reserve(getNumberOfOrgans()); // just for speed up
-    for (const auto& o : this->baseOrgans) {
-        o->getOrgans(ot, organs);
+    for (const auto& o : all) {
+        if (o->organType()==ot) {
+            organs.push_back(o);
+        }
     }
     return organs;
 }
@@ -213,8 +255,13 @@ std::vector<double> Organism::getParameter(std::string name, int ot, std::vector
  */
 double Organism::getSummed(std::string name, int ot) const
 {
-    auto v = getParameter(name, ot);
-    return std::accumulate(v.begin(), v.end(), 0.0);
+    double s = 0.;
+    for (const auto& o : getBuffers().organs) {
+        if ((ot<0) || (o->organType()==ot)) {
+            s += o->getParameter(name);
+        }
+    }
+    return s;
 }
 
 /**
@@ -225,10 +272,15 @@ double Organism::getSummed(std::string name, int ot) const
  */
 int Organism::getNumberOfSegments(int ot) const
 {
+    const auto& b = getBuffers();
+    if (ot<0) {
+        return b.segments.size();
+    }
     int s=0;
-    auto organs = getOrgans(ot);
-    for (const auto& o : organs) {
-        s += o->getNumberOfSegments();
+    for (const auto& o : b.organs) {
+        if (o->organType()==ot) {
+            s += o->getNumberOfSegments();
+        }
     }
     return s;
 }
@@ -281,7 +333,7 @@ std::vector<std::vector<double>> Organism::getPolylineCTs(int ot) const
  */
 std::vector<Vector3d> Organism::getNodes() const
 {
-    auto organs = getOrgans();
+    const auto& organs = getBuffers().organs;
     std::vector<Vector3d> nv = std::vector<Vector3d>(getNumberOfNodes()); // reserve big enough vector
     for (const auto& o : baseOrgans) { // copy initial nodes (even if organs have not developed)
         nv.at(o->getNodeId(0)) = o->getNode(0);
@@ -305,7 +357,7 @@ std::vector<Vector3d> Organism::getNodes() const
  */
 std::vector<double> Organism::getNodeCTs() const
 {
-    auto organs = getOrgans();
+    const auto& organs = getBuffers().organs;
     std::vector<double> cts = std::vector<double>(getNumberOfNodes()); // reserve big enough vector
     for (const auto& o : baseOrgans) { // copy initial nodes (even if organs have not developed)
         cts.at(o->getNodeId(0)) = o->getNodeCT(0);
@@ -329,12 +381,15 @@ std::vector<double> Organism::getNodeCTs() const
  */
 std::vector<Vector2i> Organism::getSegments(int ot) const
 {
-    auto organs = getOrgans(ot);
+    const auto& b = getBuffers();
+    if (ot<0) {
+        return b.segments;
+    }
     std::vector<Vector2i> segs = std::vector<Vector2i>(0);
-    segs.reserve(this->getNumberOfSegments(ot)); // for speed up
-    for (const auto& o : organs) {
-        auto s = o->getSegments();
-        segs.insert(segs.end(), s.begin(), s.end()); // append s; todo check if it works..
+    for (size_t j = 0; j<b.organs.size(); j++) {
+        if (b.organs[j]->organType()==ot) {
+            segs.insert(segs.end(), b.segments.begin()+b.segmentOffsets[j], b.segments.begin()+b.segmentOffsets[j+1]);
+        }
     }
     return segs;
 }
@@ -348,11 +403,15 @@ std::vector<Vector2i> Organism::getSegments(int ot) const
  */
 std::vector<double> Organism::getSegmentCTs(int ot) const
 {
-    auto nodeCT = getNodeCTs(); // of all nodes (otherwise indices are tricky)
-    auto segs = getSegments(ot);
-    std::vector<double> cts = std::vector<double>(segs.size());
-    for (int i=0; i<cts.size(); i++) {
-        cts[i] = nodeCT[segs[i].y]; // segment creation time is the node creation time of the second node
+    const auto& b = getBuffers();
+    std::vector<double> cts = std::vector<double>(0);
+    cts.reserve(ot<0 ? b.segments.size() : 0);
+    for (const auto& o : b.organs) {
+        if ((ot<0) || (o->organType()==ot)) {
+            for (size_t i=1; i<o->getNumberOfNodes(); i++) {
+                cts.push_back(o->getNodeCT(i)); // segment creation time is the node creation time of the second node
+            }
+        }
     }
     return cts;
 }
@@ -365,13 +424,12 @@ std::vector<double> Organism::getSegmentCTs(int ot) const
  */
 std::vector<std::shared_ptr<Organ>> Organism::getSegmentOrigins(int ot) const
 {
-    auto organs = getOrgans(ot);
+    const auto& b = getBuffers();
     auto segs = std::vector<std::shared_ptr<Organ>>(0);
-    segs.reserve(this->getNumberOfSegments(ot)); // for speed up
-    for (const auto& o : organs) {
-        auto s = o->getSegments();
-        for (int i=0; i<s.size(); i++) {
-            segs.push_back(o);
+    segs.reserve(ot<0 ? b.segments.size() : 0);
+    for (size_t j = 0; j<b.organs.size(); j++) {
+        if ((ot<0) || (b.organs[j]->organType()==ot)) {
+            segs.insert(segs.end(), b.segmentOffsets[j+1]-b.segmentOffsets[j], b.organs[j]);
         }
     }
     return segs;
@@ -384,7 +442,7 @@ std::vector<std::shared_ptr<Organ>> Organism::getSegmentOrigins(int ot) const
  */
 std::vector<int> Organism::getUpdatedNodeIndices() const
 {
-    auto organs = this->getOrgans();
+    const auto& organs = getBuffers().organs;
     std::vector<int> ni = std::vector<int>(0);
     for (const auto& o : organs) {
         if (o->hasMoved()) {
@@ -400,7 +458,7 @@ std::vector<int> Organism::getUpdatedNodeIndices() const
  */
 std::vector<Vector3d> Organism::getUpdatedNodes() const
 {
-    auto organs = this->getOrgans();
+    const auto& organs = getBuffers().organs;
     std::vector<Vector3d> nv = std::vector<Vector3d>(0);
     for (const auto& o : organs) {
         if (o->hasMoved()) {
@@ -416,7 +474,7 @@ std::vector<Vector3d> Organism::getUpdatedNodes() const
  */
 std::vector<double> Organism::getUpdatedNodeCTs() const
 {
-    auto organs = this->getOrgans();
+    const auto& organs = getBuffers().organs;
     std::vector<double> nv = std::vector<double>(0);
     for (const auto& o : organs) {
         if (o->hasMoved()) {
@@ -432,7 +490,7 @@ std::vector<double> Organism::getUpdatedNodeCTs() const
  */
 std::vector<Vector3d> Organism::getNewNodes() const
 {
-    auto organs = this->getOrgans();
+    const auto& organs = getBuffers().organs;
     std::vector<Vector3d> nv(this->getNumberOfNewNodes());
     for (const auto& o : organs) {
         int onon = o->getOldNumberOfNodes();
@@ -451,7 +509,7 @@ std::vector<Vector3d> Organism::getNewNodes() const
  */
 std::vector<double> Organism::getNewNodeCTs() const
 {
-    auto organs = this->getOrgans();
+    const auto& organs = getBuffers().organs;
     std::vector<double> nv(this->getNumberOfNewNodes());
     for (const auto& o : organs) {
         int onon = o->getOldNumberOfNodes();
@@ -536,43 +594,7 @@ void Organism::readParameters(std::string name, std::string basetag)
     if(doc.ErrorID() == 0) {
         tinyxml2::XMLElement* base = doc.FirstChildElement(basetag.c_str());
         if(base != nullptr){
-            auto p = base->FirstChildElement();
-            while((p!=nullptr) && (p->Name()!=nullptr)) {
-
-                std::string tagname = p->Name();
-                int ot = Organism::organTypeNumber(tagname);
-                std::shared_ptr<OrganRandomParameter> prototype;
-                if (organParam[ot].count(0)) { // is the prototype defined?
-                    prototype = organParam[ot][0];
-                } else {
-                    prototype = nullptr;
-                }
-
-                if ((ot==0) && (prototype==nullptr)) { // read depricated xml format, in case organ is not used
-                    tagname = p->Attribute("type");
-                    ot = Organism::organTypeNumber(tagname);
-                    if (ot>0) { // tagname known?
-                        if (organParam[ot].count(0)) { // is the prototype defined?
-                            prototype = organParam[ot][0];
-                        } else {
-                            prototype = nullptr;
-                        }
-                    } else {
-                        prototype = nullptr;
-                    }
-                }
-
-                if (prototype!=nullptr) { // read prototype
-                    auto otp = prototype->copy(shared_from_this());
-                    otp->readXML(p);
-                    otp->organType = ot; // in depricated case, readXML will a give wrong value
-                    setOrganRandomParameter(otp);
-                } else { // skip prototype
-                    std::cout << "Organism::readParameters: warning, skipping " << tagname <<
-                        ", no random parameter class defined, use initializeReader()\n" << std::flush;
-                }
-                p = p->NextSiblingElement();
-            } // while
+            readParametersXML(base);
         } else {
             if (basetag.compare("plant") == 0) { // try old spelling
                 std::cout << "Organism::readParameters: plant tag was not found in xml file, retrying with Plant " << std::endl;
@@ -586,6 +608,65 @@ void Organism::readParameters(std::string name, std::string basetag)
     }
 }
 
+/**
+ * Adds all organ parameter types of the XML element @param base (e.g. the plant tag) to the organism's parameters,
+ * @see Organism::readParameters
+ */
+void Organism::readParametersXML(tinyxml2::XMLElement* base)
+{
+    auto p = base->FirstChildElement();
+    while((p!=nullptr) && (p->Name()!=nullptr)) {
+
+        std::string tagname = p->Name();
+        int ot = Organism::organTypeNumber(tagname);
+        std::shared_ptr<OrganRandomParameter> prototype;
+        if (organParam[ot].count(0)) { // is the prototype defined?
+            prototype = organParam[ot][0];
+        } else {
+            prototype = nullptr;
+        }
+
+        if ((ot==0) && (prototype==nullptr)) { // read depricated xml format, in case organ is not used
+            tagname = p->Attribute("type");
+            ot = Organism::organTypeNumber(tagname);
+            if (ot>0) { // tagname known?
+                if (organParam[ot].count(0)) { // is the prototype defined?
+                    prototype = organParam[ot][0];
+                } else {
+                    prototype = nullptr;
+                }
+            } else {
+                prototype = nullptr;
+            }
+        }
+
+        if (prototype!=nullptr) { // read prototype
+            auto otp = prototype->copy(shared_from_this());
+            otp->readXML(p);
+            otp->organType = ot; // in depricated case, readXML will a give wrong value
+            setOrganRandomParameter(otp);
+        } else { // skip prototype
+            std::cout << "Organism::readParameters: warning, skipping " << tagname <<
+                ", no random parameter class defined, use initializeReader()\n" << std::flush;
+        }
+        p = p->NextSiblingElement();
+    } // while
+}
+
+/**
+ * @return a XML element containing all organ parameter types, @see Organism::writeParameters
+ */
+tinyxml2::XMLElement* Organism::writeParametersXML(tinyxml2::XMLDocument& xmlDoc, std::string basetag, bool comments) const
+{
+    tinyxml2:: XMLElement* xmlParams = xmlDoc.NewElement(basetag.c_str());
+    for (int ot = 0; ot < numberOfOrganTypes; ot++) {
+        for (auto& otp : organParam[ot]) {
+            xmlParams->InsertEndChild(otp.second->writeXML(xmlDoc, comments));
+        }
+    }
+    return xmlParams;
+}
+
 /**
  * XML parameter file writer
  * writes all organ parameter types into a XML File
@@ -598,13 +679,7 @@ void Organism::writeParameters(std::string name, std::string basetag, bool comme
 {
     std::setlocale(LC_NUMERIC, "en_US.UTF-8");
     tinyxml2::XMLDocument xmlDoc;
-    tinyxml2:: XMLElement* xmlParams = xmlDoc.NewElement(basetag.c_str()); // RSML
-    for (int ot = 0; ot < numberOfOrganTypes; ot++) {
-        for (auto& otp : organParam[ot]) {
-            xmlParams->InsertEndChild(otp.second->writeXML(xmlDoc, comments));
-        }
-    }
-    xmlDoc.InsertEndChild(xmlParams);
+    xmlDoc.InsertEndChild(writeParametersXML(xmlDoc, basetag, comments));
     xmlDoc.SaveFile(name.c_str());
 }
 
@@ -671,6 +746,154 @@ tinyxml2:: XMLElement* Organism::getRSMLScene(tinyxml2::XMLDocument& xmlDoc) con
     return scene;
 }
 
+/**
+ * Binary representation of the organism, containing the organ type parameters, the organ tree, and the state of the
+ * random number generator. Continuing the simulation of a restored organism yields the same results as continuing
+ * the original simulation.
+ *
+ * Not stored are: the confining geometry, soil look ups, and tropisms or growth functions that were set manually
+ * (the call back functions are recreated from the parameters, as in initialize()).
+ * Set the geometry or soil before calling deserialize().
+ */
+std::string Organism::serialize() const
+{
+    std::ostringstream os(std::ios::binary);
+    writeTag(os, "CPlantBox");
+    int version = serializationVersion; // (passed by reference)
+    writeBinary(os, version);
+    writeState(os);
+    return os.str();
+}
+
+/**
+ * Restores the organism from a string created by Organism::serialize(), the organism must be of the same class
+ */
+void Organism::deserialize(const std::string& data)
+{
+    std::istringstream is(data, std::ios::binary);
+    readTag(is, "CPlantBox");
+    int version = 0;
+    readBinary(is, version);
+    if (version!=serializationVersion) {
+        throw std::invalid_argument("Organism::deserialize: unknown version "+std::to_string(version));
+    }
+    readState(is);
+    if (is.fail()) {
+        throw std::invalid_argument("Organism::deserialize: unexpected end of data");
+    }
+}
+
+/**
+ * Writes the organism into a binary file, @see Organism::serialize
+ */
+void Organism::save(std::string name) const
+{
+    std::ofstream file(name, std::ios::binary);
+    if (!file.good()) {
+        throw std::invalid_argument("Organism::save: could not open file "+name);
+    }
+    std::string data = serialize();
+    file.write(data.data(), data.size());
+}
+
+/**
+ * Restores the organism from a file written by Organism::save
+ */
+void Organism::load(std::string name)
+{
+    std::ifstream file(name, std::ios::binary);
+    if (!file.good()) {
+        throw std::invalid_argument("Organism::load: could not open file "+name);
+    }
+    std::stringstream data;
+    data << file.rdbuf();
+    deserialize(data.str());
+}
+
+/**
+ * Writes the organ type parameters (as xml, and their exact values), the counters, the random number generator state, and the base organs
+ */
+void Organism::writeState(std::ostream& os) const
+{
+    tinyxml2::XMLDocument xmlDoc;
+    xmlDoc.InsertEndChild(writeParametersXML(xmlDoc, "plant", false));
+    tinyxml2::XMLPrinter printer(nullptr, true); // compact
+    xmlDoc.Print(&printer);
+    writeBinary(os, std::string(printer.CStr()));
+    for (const auto& otp : organParam) { // exact values
+        writeBinary(os, (uint64_t)otp.size());
+        for (const auto& p : otp) {
+            writeBinary(os, p.first);
+            p.second->writeState(os);
+        }
+    }
+    writeBinary(os, simtime);
+    writeBinary(os, organId);
+    writeBinary(os, nodeId);
+    writeBinary(os, oldNumberOfNodes);
+    writeBinary(os, oldNumberOfOrgans);
+    writeBinary(os, minDx);
+    writeBinary(os, rsmlSkip);
+    std::ostringstream rng; // the standard defines the textual representation
+    rng.imbue(std::locale::classic());
+    rng << gen << " " << UD << " " << ND;
+    writeBinary(os, rng.str());
+    writeBinary(os, (uint64_t)baseOrgans.size());
+    for (const auto& o : baseOrgans) {
+        o->writeState(os);
+    }
+}
+
+/**
+ * Reads the data written by Organism::writeState, replaces parameters and organs
+ */
+void Organism::readState(std::istream& is)
+{
+    std::string xml;
+    readBinary(is, xml);
+    tinyxml2::XMLDocument doc;
+    doc.Parse(xml.c_str(), xml.size());
+    if ((doc.ErrorID()!=0) || (doc.FirstChildElement("plant")==nullptr)) {
+        throw std::invalid_argument("Organism::readState: could not parse the organ type parameters");
+    }
+    for (auto& op : organParam) {
+        op.clear();
+    }
+    initializeReader();
+    readParametersXML(doc.FirstChildElement("plant"));
+    for (int ot = 0; ot < numberOfOrganTypes; ot++) { // exact values
+        uint64_t n = 0;
+        readBinary(is, n);
+        for (uint64_t i = 0; (i<n) && is.good(); i++) {
+            int subType = 0;
+            readBinary(is, subType);
+            getOrganRandomParameter(ot, subType)->readState(is);
+        }
+    }
+    readBinary(is, simtime);
+    readBinary(is, organId);
+    readBinary(is, nodeId);
+    readBinary(is, oldNumberOfNodes);
+    readBinary(is, oldNumberOfOrgans);
+    readBinary(is, minDx);
+    readBinary(is, rsmlSkip);
+    std::string rng;
+    readBinary(is, rng);
+    std::istringstream rngs(rng);
+    rngs.imbue(std::locale::classic());
+    rngs >> gen >> UD >> ND;
+    uint64_t n = 0;
+    readBinary(is, n);
+    if (!is.good() || rngs.fail()) {
+        throw std::invalid_argument("Organism::readState: unexpected end of data");
+    }
+    baseOrgans.clear();
+    for (uint64_t i = 0; i<n; i++) {
+        baseOrgans.push_back(Organ::readState(is, shared_from_this()));
+    }
+    revision++;
+}
+
 /**
  * Sets the seed of the organisms random number generator.
  * In order to obtain two exact same organisms call before Organism::initialize().
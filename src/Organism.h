@@ -11,6 +11,7 @@
 #include <map>
 #include <array>
 #include <memory>
+#include <iostream>
 
 namespace CPlantBox {
 
@@ -53,10 +54,11 @@ public:
     int getParameterSubType(int organtype, std::string str) const; ///< returns the parameter sub type index of name @param str
 
     /* initialization and simulation */
-    void addOrgan(std::shared_ptr<Organ> o) { baseOrgans.push_back(o); } ///< adds an organ, takes ownership
+    void addOrgan(std::shared_ptr<Organ> o) { baseOrgans.push_back(o); revision++; } ///< adds an organ, takes ownership
     virtual void initialize(bool verbose = true); ///< overwrite for initialization jobs
     virtual void simulate(double dt, bool verbose = false); ///< calls the base organs simulate methods
     double getSimTime() const { return simtime; } ///< returns the current simulation time
+    int getRevision() const { return revision; } ///< changes whenever organs are simulated, added, removed, or restored
 
     /* as sequential list */
     std::vector<std::shared_ptr<Organ>> getOrgans(int ot=-1) const; ///< sequential list of organs
@@ -93,6 +95,12 @@ public:
     virtual void readParameters(std::string name, std::string  basetag = "plant"); ///< reads all organ type parameters from a xml file
     virtual void writeParameters(std::string name, std::string basetag = "plant", bool comments = true) const; ///< write all organ type parameters into a xml file
     virtual void writeRSML(std::string name) const; ///< writes a RSML file
+    std::string serialize() const; ///< binary representation of the parameters, the organ tree, and the random number generator
+    void deserialize(const std::string& data); ///< restores the organism from Organism::serialize
+    void save(std::string name) const; ///< writes Organism::serialize into a file (e.g. a checkpoint)
+    void load(std::string name); ///< restores the organism from a file written by Organism::save
+    virtual void writeState(std::ostream& os) const; ///< writes the organism (binary), overwrite to add data of derived classes
+    virtual void readState(std::istream& is); ///< reads the organism written by Organism::writeState
     int getRSMLSkip() const { return rsmlSkip; } ///< skips points in the RSML output (default = 0)
     void setRSMLSkip(int skip) { assert(rsmlSkip>=0 && "rsmlSkip must be >= 0" ); rsmlSkip = skip;  } ///< skips points in the RSML output (default = 0)
     std::vector<std::string>& getRSMLProperties() { return rsmlProperties; } ///< reference to the vector<string> of RSML property names, default is { "organType", "subType","length", "age"  }
@@ -112,12 +120,37 @@ public:
 
 protected:
 
+    void readParametersXML(tinyxml2::XMLElement* base); ///< reads all organ type parameters from a xml element
+    tinyxml2::XMLElement* writeParametersXML(tinyxml2::XMLDocument& doc, std::string basetag, bool comments) const; ///< all organ type parameters as xml element
+
     virtual tinyxml2:: XMLElement* getRSMLMetadata(tinyxml2::XMLDocument& doc) const;
     virtual tinyxml2:: XMLElement* getRSMLScene(tinyxml2::XMLDocument& doc) const;
 
+    /**
+     * Sequential representation of the organ tree (@see Organism::getOrgans, Organism::getSegments),
+     * rebuilt by Organism::getBuffers when the organism has changed.
+     * The buffers are not copied with the organism, since they point to its organs.
+     */
+    struct SequentialBuffers {
+        SequentialBuffers() { }
+        SequentialBuffers(const SequentialBuffers&) { } // copies are empty (i.e. invalid)
+        SequentialBuffers& operator=(const SequentialBuffers&) { *this = SequentialBuffers(); return *this; }
+        SequentialBuffers& operator=(SequentialBuffers&&) = default;
+
+        std::array<int, 3> key = { { -1, -1, -2 } }; ///< revision, organ id and node id counters of the organism when the buffers were built
+        std::vector<std::shared_ptr<Organ>> organs; ///< all organs with more than one node, @see Organism::getOrgans
+        std::vector<Vector2i> segments; ///< all segments, @see Organism::getSegments
+        std::vector<int> segmentOffsets; ///< index of the first segment of each organ, and total number of segments
+    };
+
+    const SequentialBuffers& getBuffers() const; ///< the sequential buffers, rebuilt if the organism has changed
+
     std::vector<std::shared_ptr<Organ>> baseOrgans;  ///< base organs of the root system
+    int revision = 0; ///< increase if organs are added, removed, or restored (invalidates the buffers)
+    mutable SequentialBuffers buffers;
 
     static const int numberOfOrganTypes = 5;
+    static const int serializationVersion = 1; // increase if the format of writeState changes
     std::array<std::map<int, std::shared_ptr<OrganRandomParameter>>, numberOfOrganTypes> organParam;
 
     double simtime = 0;
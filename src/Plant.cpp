@@ -1,5 +1,7 @@
 #include "Plant.h"
+#include "binary_io.h"
 
+#include <algorithm>
 #include <memory>
 #include <iostream>
 #include <sys/stat.h>
@@ -60,14 +62,17 @@ void Plant::initializeReader()
 }
 
 /**
- * Resets the root system: deletes all roots, sets simulation time to 0.
+ * Resets the root system: deletes all roots, sets simulation time to 0 and the phytomer counters to 0.
  */
 void Plant::reset()
 {
     baseOrgans.clear();
+    std::fill(leafphytomerID.begin(), leafphytomerID.end(), 0);
+    std::fill(stemphytomerID.begin(), stemphytomerID.end(), 0);
     simtime = 0;
     organId = -1;
     nodeId = -1;
+    revision++;
 }
 
 /**
@@ -183,6 +188,31 @@ void Plant::setTropism(std::shared_ptr<Tropism> tf, int organType, int subType)
     Organism::simulate(dt, verbose);	
 }
 
+/**
+ * Writes the plant, i.e. the organism and the phytomer counters (confining geometry and soil are not written),
+ * @see Organism::serialize
+ */
+void Plant::writeState(std::ostream& os) const
+{
+    writeTag(os, "Plant");
+    Organism::writeState(os);
+    writeBinary(os, leafphytomerID);
+    writeBinary(os, stemphytomerID);
+}
+
+/**
+ * Reads the plant written by Plant::writeState, and sets up the call back functions (@see initCallbacks).
+ * Set the geometry before.
+ */
+void Plant::readState(std::istream& is)
+{
+    readTag(is, "Plant");
+    Organism::readState(is);
+    readBinary(is, leafphytomerID);
+    readBinary(is, stemphytomerID);
+    initCallbacks();
+}
+
 /**
  * Simulates plant growth for the time span defined in the root system parameters
  */
@@ -249,7 +279,7 @@ std::string Plant::toString() const
  *
  * @param name      file name e.g. output.vtp
  */
-void Plant::write(std::string name) const
+void Plant::write(std::string name, int format, bool compress) const
 {
     std::string ext = name.substr(name.size()-3,name.size()); // pick the right writer
     if (ext.compare("sml")==0) {
@@ -258,8 +288,8 @@ void Plant::write(std::string name) const
     } else if (ext.compare("vtp")==0) {
         std::cout << "writing VTP... "<< name.c_str() <<"\n";
         std::ofstream fos;
-        fos.open(name.c_str());
-        writeVTP(-1, fos);
+        fos.open(name.c_str(), std::ios::binary);
+        writeVTP(-1, fos, format, compress);
         fos.close();
 //    } else if (ext.compare(".py")==0)  {
 //        std::cout << "writing Geometry ... "<< name.c_str() <<"\n";
@@ -270,88 +300,49 @@ void Plant::write(std::string name) const
 }
 
 /**
-write VTP using tinyXML
-todo move to Organism
- **/
-void Plant::writeVTP(int otype, std::ostream & os) const // Write .VTP file by using TinyXML2 performance slowed by 0.5 seconds but precision increased
+ * Writes current simulation results as VTP (VTK polydata file), where each organ is represented by a polyline
+ *
+ * todo move to Organism
+ *
+ * @param otype     organ type, or -1 for all organs
+ * @param os        typically a file out stream
+ * @param format    encoding of the data arrays (ascii, binary, or appended), @see VTPWriter
+ * @param compress  compresses binary data arrays with zlib
+ */
+void Plant::writeVTP(int otype, std::ostream & os, int format, bool compress) const
 {
-    tinyxml2::XMLPrinter printer( 0, false, 0 );
-
     auto organs = this->getOrgans(otype); // update roots (if necessary)
     auto nodes = getPolylines(otype);
     auto times = getPolylineCTs(otype);
 
-    os << "<?xml version=\"1.0\"?>";
-    printer.OpenElement("VTKFile"); printer.PushAttribute("type", "PolyData"); printer.PushAttribute("version", "0.1"); printer.PushAttribute("byte_order", "LittleEndian");
-    printer.OpenElement("PolyData");
-    int non = 0; // number of nodes
-    for (const auto& r : organs) {
-        non += r->getNumberOfNodes();
+    VTPWriter w(format, compress);
+    w.precision = 17; // lossless ascii output
+    w.pointScalars = "Pointdata";
+    w.cellScalars = "CellData";
+    std::vector<double> t; // POINTDATA
+    for (const auto& r: times) {
+        t.insert(t.end(), r.begin(), r.end());
     }
-    int nol=organs.size(); // number of lines
-    printer.OpenElement("Piece"); printer.PushAttribute("NumberOfLines",  nol); printer.PushAttribute("NumberOfPoints", non);
-
-    // POINTDATA
-    printer.OpenElement("PointData"); printer.PushAttribute("Scalars", "Pointdata");
-    printer.OpenElement("DataArray"); printer.PushAttribute("type", "Float32");  printer.PushAttribute("Name", "time"); printer.PushAttribute("NumberOfComponents", "1"); printer.PushAttribute("format", "ascii" );
-    for (std::vector<double> r: times) {
-        for (double t : r) {
-            printer.PushText(t); printer.PushText(" ");
-        }
-    }
-    printer.CloseElement();
-    printer.CloseElement();
-
-    // CELLDATA (live on the polylines)
-    printer.OpenElement("CellData"); printer.PushAttribute("Scalars", "CellData" );
-    std::vector<std::string> sTypeNames = { "organType", "id", "creationTime", "age", "subType", "order", "radius"}; //  , "order", "radius", "subtype" ,
-    for (size_t i=0; i<sTypeNames.size(); i++) {
-        std::string sType = sTypeNames[i];
-        const char *schar = sType.c_str();
-        printer.OpenElement("DataArray"); printer.PushAttribute("type", "Float32");  printer.PushAttribute("Name", schar); printer.PushAttribute("NumberOfComponents", "1"); printer.PushAttribute("format", "ascii" );
-        std::vector<double> scalars = getParameter(sTypeNames[i], otype);
-        for (double s : scalars) {
-            printer.PushText(s); printer.PushText(" ");
-        }
-        printer.CloseElement();
+    w.addPointData("time", t);
+    std::vector<std::string> sTypeNames = { "organType", "id", "creationTime", "age", "subType", "order", "radius"}; // CELLDATA (live on the polylines)
+    for (const auto& name : sTypeNames) {
+        w.addCellData(name, getParameter(name, otype));
     }
-    printer.CloseElement();
-
-    // POINTS (=nodes)
-    printer.OpenElement("Points");
-    printer.OpenElement("DataArray"); printer.PushAttribute("type", "Float32");  printer.PushAttribute("Name", "Coordinates"); printer.PushAttribute("NumberOfComponents", "3"); printer.PushAttribute("format", "ascii" );
+    std::vector<Vector3d> points; // POINTS (=nodes)
     for (const auto& r : nodes) {
-        for (const auto& n : r) {
-            printer.PushText(n.x); printer.PushText(" "); printer.PushText(n.y); printer.PushText(" "); printer.PushText(n.z); printer.PushText(" ");
-        }
+        points.insert(points.end(), r.begin(), r.end());
     }
-    printer.CloseElement();
-    printer.CloseElement();
-
-    // LINES (polylines)
-    printer.OpenElement("Lines");
-    printer.OpenElement("DataArray"); printer.PushAttribute("type", "Float32");  printer.PushAttribute("Name", "connectivity"); printer.PushAttribute("NumberOfComponents", "1"); printer.PushAttribute("format", "ascii" );
-    int c=0;
-    for (const auto& r : organs) {
-        for (size_t i=0; i<r->getNumberOfNodes(); i++) {
-            printer.PushText(c); printer.PushText(" ");
-            c++;
-        }
-    }
-    printer.CloseElement();
-
-    printer.OpenElement("DataArray"); printer.PushAttribute("type", "Float32");  printer.PushAttribute("Name", "offsets"); printer.PushAttribute("NumberOfComponents", "1"); printer.PushAttribute("format", "ascii" );
-    c = 0;
+    w.setPoints(points);
+    std::vector<int> connectivity(points.size()); // LINES (polylines)
+    std::iota(connectivity.begin(), connectivity.end(), 0);
+    std::vector<int> offsets;
+    int c = 0;
     for (const auto& r : organs) {
         c += r->getNumberOfNodes();
-        printer.PushText(c); printer.PushText(" ");
+        offsets.push_back(c);
     }
-    printer.CloseElement();
-    printer.CloseElement();
-    printer.CloseElement();
-    printer.CloseElement();
-    printer.CloseElement();
-    os << std::string(printer.CStr());
+    w.setLines(connectivity, offsets);
+    w.write(os);
 }
 
 } // namespace CPlantBox
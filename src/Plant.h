@@ -18,6 +18,7 @@
 #include "soil.h"
 #include "tropism.h"
 #include "growth.h"
+#include "vtp_writer.h"
 #include "external/tinyxml2/tinyxml2.h"
 
 namespace CPlantBox {
@@ -63,11 +64,15 @@ public:
   virtual std::shared_ptr<Tropism> createTropismFunction(int tt, double N, double sigma); ///< Creates the tropisms, overwrite or change this method to add more tropisms
   virtual std::shared_ptr<GrowthFunction> createGrowthFunction(int gft); ///< Creates the growth function per root type, overwrite or change this method to add more tropisms
 
-  void write(std::string name) const; /// writes simulation results (type is determined from file extension in name)
+  void writeState(std::ostream& os) const override; ///< writes the plant (binary) @see Organism::serialize
+  void readState(std::istream& is) override; ///< reads the plant written by Plant::writeState
+
+  void write(std::string name, int format = VTPWriter::vtk_ascii, bool compress = false) const; /// writes simulation results (type is determined from file extension in name)
   std::string toString() const override;
-  void writeVTP(int otype, std::ostream & os) const;
+  void writeVTP(int otype, std::ostream & os, int format = VTPWriter::vtk_ascii, bool compress = false) const; ///< writes current simulation results as VTP (VTK polydata file)
 
   std::vector<int> leafphytomerID = { 0, 0, 0, 0, 0, 0, 0, 0, 0, 0 };
+  std::vector<int> stemphytomerID = { 0, 0, 0, 0, 0, 0, 0, 0, 0, 0 }; ///< phytomer counter of the stems per sub type, each plant has its own
 
 protected:
 
@@ -1,7 +1,9 @@
 // -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
 #include "external/pybind11/include/pybind11/pybind11.h"
 #include "external/pybind11/include/pybind11/stl.h"
+#include "external/pybind11/include/pybind11/numpy.h"
 #include <pybind11/functional.h>
+#include <sstream>
 namespace py = pybind11;
 
 /**
@@ -26,8 +28,11 @@ namespace py = pybind11;
 
 #include "RootSystem.h"
 #include "Plant.h"
+#include "time_series_writer.h"
+#include "Ensemble.h"
 
 // sepcialized
+#include "soil_index.h"
 #include "MappedOrganism.h"
 #include "XylemFlux.h"
 #include "ExudationModel.h"
@@ -78,6 +83,87 @@ public:
 
 };
 
+/**
+ * Moves a std::vector into a numpy array (without copying the data)
+ */
+template<typename T>
+py::array_t<T> as_pyarray(std::vector<T>&& v) {
+    auto ptr = new std::vector<T>(std::move(v));
+    py::capsule owner(ptr, [](void* p) { delete reinterpret_cast<std::vector<T>*>(p); });
+    return py::array_t<T>(ptr->size(), ptr->data(), owner);
+}
+
+/**
+ * Moves a std::vector into a numpy array of shape @param shape (row major, without copying the data)
+ */
+template<typename T>
+py::array_t<T> as_pyarray(std::vector<T>&& v, std::vector<ssize_t> shape) {
+    auto ptr = new std::vector<T>(std::move(v));
+    py::capsule owner(ptr, [](void* p) { delete reinterpret_cast<std::vector<T>*>(p); });
+    return py::array_t<T>(shape, ptr->data(), owner);
+}
+
+/**
+ * Read-only numpy view of a std::vector, its storage is kept alive by @param owner (without copying the data), @see VectorViews
+ */
+template<typename T>
+py::array_t<T> as_pyview(const std::vector<T>& v, std::shared_ptr<const void> owner) {
+    py::capsule base(new std::shared_ptr<const void>(owner), [](void* p) { delete reinterpret_cast<std::shared_ptr<const void>*>(p); });
+    py::array_t<T> a(v.size(), v.data(), base);
+    a.attr("flags").attr("writeable") = false;
+    return a;
+}
+
+/**
+ * Read-only (N, 3) numpy view of the coordinates of a std::vector<Vector3d>, @see as_pyview
+ */
+py::array_t<double> as_pyview(const std::vector<Vector3d>& v, std::shared_ptr<const void> owner) {
+    py::capsule base(new std::shared_ptr<const void>(owner), [](void* p) { delete reinterpret_cast<std::shared_ptr<const void>*>(p); });
+    py::array_t<double> a({ (ssize_t)v.size(), (ssize_t)3 }, { sizeof(Vector3d), sizeof(double) }, v.empty() ? nullptr : &v[0].x, base);
+    a.attr("flags").attr("writeable") = false;
+    return a;
+}
+
+/**
+ * Read-only (M, 2) numpy view of the node indices of a std::vector<Vector2i>, @see as_pyview
+ */
+py::array_t<int> as_pyview(const std::vector<Vector2i>& v, std::shared_ptr<const void> owner) {
+    py::capsule base(new std::shared_ptr<const void>(owner), [](void* p) { delete reinterpret_cast<std::shared_ptr<const void>*>(p); });
+    py::array_t<int> a({ (ssize_t)v.size(), (ssize_t)2 }, { sizeof(Vector2i), sizeof(int) }, v.empty() ? nullptr : &v[0].x, base);
+    a.attr("flags").attr("writeable") = false;
+    return a;
+}
+
+/**
+ * Copies the rows of a (N, 3) numpy array into a std::vector<Vector3d>
+ */
+std::vector<Vector3d> as_vector3d(py::array_t<double, py::array::c_style | py::array::forcecast> a) {
+    if ((a.ndim()!=2) || (a.shape(1)!=3)) {
+        throw std::invalid_argument("as_vector3d: expected an array of shape (N, 3)");
+    }
+    auto r = a.unchecked<2>();
+    std::vector<Vector3d> v(r.shape(0));
+    for (ssize_t i=0; i<r.shape(0); i++) {
+        v[i] = Vector3d(r(i, 0), r(i, 1), r(i, 2));
+    }
+    return v;
+}
+
+/**
+ * Pickle support for an organism of class T, @see Organism::serialize
+ */
+template<class T>
+py::bytes getOrganismState(const T& o) {
+    return py::bytes(o.serialize());
+}
+
+template<class T>
+std::shared_ptr<T> setOrganismState(py::bytes state) {
+    auto o = std::make_shared<T>();
+    o->deserialize(std::string(state));
+    return o;
+}
+
 // todo
 // SignedDistanceFunction
 // OrganRandomParameter
@@ -189,8 +275,24 @@ PYBIND11_MODULE(plantbox, m) {
     py::class_<SignedDistanceFunction, std::shared_ptr<SignedDistanceFunction>>(m,"SignedDistanceFunction")
             .def(py::init<>())
             .def("getDist",&SignedDistanceFunction::getDist)
+            .def("getDist", [](const SignedDistanceFunction& self, py::array_t<double, py::array::c_style | py::array::forcecast> points) {
+                    return as_pyarray(self.getDistances(as_vector3d(points))); }) // (N, 3) -> (N,)
             .def("writePVPScript", (std::string (SignedDistanceFunction::*)() const) &SignedDistanceFunction::writePVPScript) // overloads
             .def("getGradient",  &SignedDistanceFunction::getGradient, py::arg("p"), py::arg("eps") = 5.e-4) // defaults
+            .def("getGradient", [](const SignedDistanceFunction& self, py::array_t<double, py::array::c_style | py::array::forcecast> points, double eps) {
+                    std::vector<Vector3d> g = self.getGradients(as_vector3d(points), eps);
+                    std::vector<double> g_(3*g.size());
+                    for (size_t i=0; i<g.size(); i++) {
+                        g_[3*i] = g[i].x; g_[3*i+1] = g[i].y; g_[3*i+2] = g[i].z;
+                    }
+                    return as_pyarray(std::move(g_), { (ssize_t)g.size(), 3 }); },
+                    py::arg("p"), py::arg("eps") = 5.e-4) // (N, 3) -> (N, 3)
+            .def("getBoundingBox", [](const SignedDistanceFunction& self) -> py::object {
+                    Vector3d min, max;
+                    if (self.getBoundingBox(min, max)) {
+                        return py::make_tuple(min, max);
+                    }
+                    return py::none(); }) // None if unbounded
             .def("__str__",&SignedDistanceFunction::toString);
     py::class_<SDF_PlantBox, SignedDistanceFunction, std::shared_ptr<SDF_PlantBox>>(m, "SDF_PlantBox")
             .def(py::init<double,double,double>());
@@ -235,6 +337,7 @@ PYBIND11_MODULE(plantbox, m) {
             .def("copy",&OrganRandomParameter::copy)
             .def("realize",&OrganRandomParameter::realize)
             .def("getParameter",&OrganRandomParameter::getParameter)
+            .def("setParameter",&OrganRandomParameter::setParameter)
             .def("__str__",&OrganRandomParameter::toString, py::arg("verbose") = true) // default
             .def("writeXML",(void (OrganRandomParameter::*)(std::string name) const) &OrganRandomParameter::writeXML) // overloads
             .def("readXML", (void (OrganRandomParameter::*)(std::string name)) &OrganRandomParameter::readXML) // overloads
@@ -306,8 +409,8 @@ PYBIND11_MODULE(plantbox, m) {
             .def("setOrganRandomParameter", &Organism::setOrganRandomParameter)
 
             .def("addOrgan", &Organism::addOrgan)
-            .def("initialize", &Organism::initialize, py::arg("verbose") = true)
-            .def("simulate", &Organism::simulate, py::arg("dt"), py::arg("verbose") = false) //default
+            .def("initialize", &Organism::initialize, py::arg("verbose") = true, py::call_guard<py::gil_scoped_release>())
+            .def("simulate", &Organism::simulate, py::arg("dt"), py::arg("verbose") = false, py::call_guard<py::gil_scoped_release>()) //default
             .def("getSimTime", &Organism::getSimTime)
 
             .def("getOrgans", &Organism::getOrgans, py::arg("ot") = -1) // default
@@ -337,9 +440,13 @@ PYBIND11_MODULE(plantbox, m) {
             .def("getNewSegmentOrigins", &Organism::getNewSegmentOrigins, py::arg("ot") = -1)  // default
 
             .def("initializeReader", &Organism::initializeReader)
-            .def("readParameters", &Organism::readParameters, py::arg("name"), py::arg("basetag") = "plant")  // default
-            .def("writeParameters", &Organism::writeParameters, py::arg("name"), py::arg("basetag") = "plant", py::arg("comments") = true)  // default
-            .def("writeRSML", &Organism::writeRSML)
+            .def("readParameters", &Organism::readParameters, py::arg("name"), py::arg("basetag") = "plant", py::call_guard<py::gil_scoped_release>())  // default
+            .def("writeParameters", &Organism::writeParameters, py::arg("name"), py::arg("basetag") = "plant", py::arg("comments") = true, py::call_guard<py::gil_scoped_release>())  // default
+            .def("writeRSML", &Organism::writeRSML, py::call_guard<py::gil_scoped_release>())
+            .def("serialize", [](const Organism& self) { return py::bytes(self.serialize()); })
+            .def("deserialize", [](Organism& self, py::bytes data) { self.deserialize(std::string(data)); })
+            .def("save", &Organism::save, py::call_guard<py::gil_scoped_release>())
+            .def("load", &Organism::load, py::call_guard<py::gil_scoped_release>())
             .def("getRSMLSkip", &Organism::getRSMLSkip)
             .def("setRSMLSkip", &Organism::setRSMLSkip)
             .def("getRSMLProperties", &Organism::getRSMLProperties) //todo policy
@@ -437,9 +544,29 @@ PYBIND11_MODULE(plantbox, m) {
             .def(py::init<std::shared_ptr<Organism>,double, double>());
     py::class_<Hydrotropism, Tropism, std::shared_ptr<Hydrotropism>>(m, "Hydrotropism")
             .def(py::init<std::shared_ptr<Organism>,double, double, std::shared_ptr<SoilLookUp>>());
-    //    py::class_<CombinedTropism, Tropism>(m, "CombinedTropism") // Todo constructors needs some extra work (?)
-    //        .def(py::init<>());
+    py::class_<CombinedTropism, Tropism, std::shared_ptr<CombinedTropism>>(m, "CombinedTropism")
+            .def(py::init<std::shared_ptr<Organism>, double, double, std::vector<std::shared_ptr<Tropism>>, std::vector<double>>())
+            .def(py::init<std::shared_ptr<Organism>, double, double, std::shared_ptr<Tropism>, double, std::shared_ptr<Tropism>, double>());
+    py::class_<TwistTropism, Tropism, std::shared_ptr<TwistTropism>>(m, "TwistTropism")
+            .def(py::init<std::shared_ptr<Organism>, double, double>());
+    py::class_<AntiGravitropism, Tropism, std::shared_ptr<AntiGravitropism>>(m, "AntiGravitropism")
+            .def(py::init<std::shared_ptr<Organism>, double, double>());
     // todo antigravi, twist ...
+    /*
+     * vtp_writer.h, time_series_writer.h
+     */
+    py::enum_<VTPWriter::VTKFormats>(m, "VTKFormat")
+            .value("ascii", VTPWriter::VTKFormats::vtk_ascii)
+            .value("binary", VTPWriter::VTKFormats::vtk_binary)
+            .value("appended", VTPWriter::VTKFormats::vtk_appended)
+            .export_values();
+    py::class_<TimeSeriesWriter, std::shared_ptr<TimeSeriesWriter>>(m, "TimeSeriesWriter")
+            .def(py::init<std::shared_ptr<Organism>, std::string>())
+            .def("write", &TimeSeriesWriter::write, py::call_guard<py::gil_scoped_release>())
+            .def("getNumberOfSteps", &TimeSeriesWriter::getNumberOfSteps)
+            .def("getNumberOfRecords", &TimeSeriesWriter::getNumberOfRecords)
+            .def("getNumberOfTipRecords", &TimeSeriesWriter::getNumberOfTipRecords)
+            .def("__str__", &TimeSeriesWriter::toString);
     /*
      * analysis.h
      */
@@ -452,30 +579,66 @@ PYBIND11_MODULE(plantbox, m) {
            .def("addSegments",(void (SegmentAnalyser::*)(const Organism&)) &SegmentAnalyser::addSegments) //overloads
            .def("addSegments",(void (SegmentAnalyser::*)(const SegmentAnalyser&)) &SegmentAnalyser::addSegments) //overloads
            .def("addSegment", &SegmentAnalyser::addSegment, py::arg("seg"), py::arg("ct"), py::arg("radius"), py::arg("insert") = false)
-           .def("crop", &SegmentAnalyser::crop)
+           .def("crop", &SegmentAnalyser::crop, py::call_guard<py::gil_scoped_release>())
            .def("cropDomain", &SegmentAnalyser::cropDomain)
            .def("filter", (void (SegmentAnalyser::*)(std::string, double, double)) &SegmentAnalyser::filter) //overloads
            .def("filter", (void (SegmentAnalyser::*)(std::string, double)) &SegmentAnalyser::filter) //overloads
            .def("pack", &SegmentAnalyser::pack)
+           .def("buildTree", &SegmentAnalyser::buildTree, py::call_guard<py::gil_scoped_release>())
+           .def("clearTree", &SegmentAnalyser::clearTree)
+           .def("hasTree", &SegmentAnalyser::hasTree)
+           .def("getSegmentsInBox", [](const SegmentAnalyser& self, Vector3d min, Vector3d max) {
+                   return as_pyarray(self.getSegmentsInBox(min, max)); })
            .def("getParameter", &SegmentAnalyser::getParameter, py::arg("name"), py::arg("def") = std::numeric_limits<double>::quiet_NaN())
            .def("getSegmentLength", &SegmentAnalyser::getSegmentLength)
            .def("getSummed", (double (SegmentAnalyser::*)(std::string) const) &SegmentAnalyser::getSummed) //overloads
-           .def("getSummed", (double (SegmentAnalyser::*)(std::string, std::shared_ptr<SignedDistanceFunction>) const) &SegmentAnalyser::getSummed) //overloads
-           .def("distribution", (std::vector<double> (SegmentAnalyser::*)(std::string, double, double, int, bool) const) &SegmentAnalyser::distribution) //overloads
+           .def("getSummed", (double (SegmentAnalyser::*)(std::string, std::shared_ptr<SignedDistanceFunction>) const) &SegmentAnalyser::getSummed, py::call_guard<py::gil_scoped_release>()) //overloads
+           .def("distribution", [](const SegmentAnalyser& self, std::string name, double top, double bot, int n, bool exact) {
+                   return as_pyarray(self.distribution(name, top, bot, n, exact)); },
+                   py::arg("name"), py::arg("top"), py::arg("bot"), py::arg("n"), py::arg("exact") = false) //overloads
            .def("distribution", (std::vector<SegmentAnalyser> (SegmentAnalyser::*)(double, double, int) const) &SegmentAnalyser::distribution) //overloads
-           .def("distribution2", (std::vector<std::vector<double>> (SegmentAnalyser::*)(std::string, double, double, double, double, int, int, bool) const) &SegmentAnalyser::distribution2) //overloads
+           .def("distribution2", [](const SegmentAnalyser& self, std::string name, double top, double bot, double left, double right, int n, int m, bool exact) {
+                   std::vector<double> d;
+                   d.reserve(n*m);
+                   for (const auto& row : self.distribution2(name, top, bot, left, right, n, m, exact)) {
+                       d.insert(d.end(), row.begin(), row.end());
+                   }
+                   return as_pyarray(std::move(d), { n, m }); },
+                   py::arg("name"), py::arg("top"), py::arg("bot"), py::arg("left"), py::arg("right"), py::arg("n"), py::arg("m"), py::arg("exact") = false) //overloads
            .def("distribution2", (std::vector<std::vector<SegmentAnalyser>> (SegmentAnalyser::*)(double, double, double, double, int, int) const) &SegmentAnalyser::distribution2) //overloads
+           .def("distribution3", [](const SegmentAnalyser& self, std::string name, Vector3d min, Vector3d max, int n, int m, int k, bool exact) {
+                   return as_pyarray(self.distribution3(name, min, max, n, m, k, exact), { n, m, k }); },
+                   py::arg("name"), py::arg("min"), py::arg("max"), py::arg("n"), py::arg("m"), py::arg("k"), py::arg("exact") = false)
+           .def("distributionHistory", [](const SegmentAnalyser& self, std::string name, std::vector<double> times, double top, double bot, int n, bool exact) {
+                   return as_pyarray(self.distributionHistory(name, times, top, bot, n, exact), { (ssize_t)times.size(), n }); },
+                   py::arg("name"), py::arg("times"), py::arg("top"), py::arg("bot"), py::arg("n"), py::arg("exact") = false) //overloads
+           .def("distributionHistory", [](const SegmentAnalyser& self, std::string name, std::vector<double> times, Vector3d min, Vector3d max, int n, int m, int k, bool exact) {
+                   return as_pyarray(self.distributionHistory(name, times, min, max, n, m, k, exact), { (ssize_t)times.size(), n, m, k }); },
+                   py::arg("name"), py::arg("times"), py::arg("min"), py::arg("max"), py::arg("n"), py::arg("m"), py::arg("k"), py::arg("exact") = false) //overloads
            .def("mapPeriodic", &SegmentAnalyser::mapPeriodic)
            .def("map2D", &SegmentAnalyser::map2D)
            .def("getOrgans", &SegmentAnalyser::getOrgans)
            .def("getNumberOfOrgans", &SegmentAnalyser::getNumberOfOrgans)
            .def("cut", (SegmentAnalyser (SegmentAnalyser::*)(const SDF_HalfPlane&) const) &SegmentAnalyser::cut)
            .def("addData", &SegmentAnalyser::addData)
-           .def("write", &SegmentAnalyser::write, py::arg("name"), py::arg("types") = std::vector<std::string>({"radius", "subType", "creationTime", "organType"}))
-           .def_readwrite("nodes", &SegmentAnalyser::nodes)
-           .def_readwrite("segments", &SegmentAnalyser::segments)
-           .def_readwrite("segO", &SegmentAnalyser::segO)
-           .def_readwrite("data", &SegmentAnalyser::data);
+           .def("write", &SegmentAnalyser::write, py::arg("name"), py::arg("types") = std::vector<std::string>({"radius", "subType", "creationTime", "organType"}),
+                   py::arg("format") = int(VTPWriter::vtk_ascii), py::arg("compress") = false)
+           .def_property("nodes", [](const SegmentAnalyser& self) { return self.nodes; },
+                   [](SegmentAnalyser& self, std::vector<Vector3d> nodes) { self.views.release(); self.nodes = nodes; self.clearTree(); })
+           .def_property("segments", [](const SegmentAnalyser& self) { return self.segments; },
+                   [](SegmentAnalyser& self, std::vector<Vector2i> segments) { self.views.release(); self.segments = segments; self.clearTree(); })
+           .def_property("segO", [](const SegmentAnalyser& self) { return self.segO; },
+                   [](SegmentAnalyser& self, std::vector<std::weak_ptr<Organ>> segO) { self.segO = segO; self.clearTree(); })
+           .def_property("data", [](const SegmentAnalyser& self) { return self.data; },
+                   [](SegmentAnalyser& self, std::map<std::string, std::vector<double>> data) { self.views.release(); self.data = data; })
+           .def_property_readonly("nodeArray", [](SegmentAnalyser& self) { return as_pyview(self.nodes, self.views.view(self.nodes)); })
+           .def_property_readonly("segmentArray", [](SegmentAnalyser& self) { return as_pyview(self.segments, self.views.view(self.segments)); })
+           .def("dataArray", [](SegmentAnalyser& self, std::string name) {
+                   if (self.data.count(name)==0) {
+                       throw std::invalid_argument("SegmentAnalyser.dataArray: unknown parameter name "+name);
+                   }
+                   auto& d = self.data.at(name);
+                   return as_pyview(d, self.views.view(d)); });
     /*
      * rootparameter.h
      */
@@ -747,13 +910,13 @@ PYBIND11_MODULE(plantbox, m) {
             .def("setGeometry", &RootSystem::setGeometry)
             .def("setSoil", &RootSystem::setSoil)
             .def("reset", &RootSystem::reset)
-            .def("initialize", (void (RootSystem::*)(bool)) &RootSystem::initialize, py::arg("verbose") = true)
-            .def("initializeLB", (void (RootSystem::*)(int, int, bool)) &RootSystem::initializeLB, py::arg("basal"), py::arg("shootborne"), py::arg("verbose") = true)
-            .def("initializeDB", (void (RootSystem::*)(int, int, bool)) &RootSystem::initializeDB, py::arg("basal"), py::arg("shootborne"), py::arg("verbose") = true)
+            .def("initialize", (void (RootSystem::*)(bool)) &RootSystem::initialize, py::arg("verbose") = true, py::call_guard<py::gil_scoped_release>())
+            .def("initializeLB", (void (RootSystem::*)(int, int, bool)) &RootSystem::initializeLB, py::arg("basal"), py::arg("shootborne"), py::arg("verbose") = true, py::call_guard<py::gil_scoped_release>())
+            .def("initializeDB", (void (RootSystem::*)(int, int, bool)) &RootSystem::initializeDB, py::arg("basal"), py::arg("shootborne"), py::arg("verbose") = true, py::call_guard<py::gil_scoped_release>())
 			.def("setTropism", &RootSystem::setTropism)
-            .def("simulate",(void (RootSystem::*)(double,bool)) &RootSystem::simulate, py::arg("dt"), py::arg("verbose") = false)
-            .def("simulate",(void (RootSystem::*)()) &RootSystem::simulate)
-            .def("simulate",(void (RootSystem::*)(double, double, ProportionalElongation*, bool)) &RootSystem::simulate)
+            .def("simulate",(void (RootSystem::*)(double,bool)) &RootSystem::simulate, py::arg("dt"), py::arg("verbose") = false, py::call_guard<py::gil_scoped_release>())
+            .def("simulate",(void (RootSystem::*)()) &RootSystem::simulate, py::call_guard<py::gil_scoped_release>())
+            .def("simulate",(void (RootSystem::*)(double, double, ProportionalElongation*, bool)) &RootSystem::simulate, py::call_guard<py::gil_scoped_release>())
             .def("getRoots", &RootSystem::getRoots)
             .def("initCallbacks", &RootSystem::initCallbacks)
             .def("createTropismFunction", &RootSystem::createTropismFunction)
@@ -765,7 +928,29 @@ PYBIND11_MODULE(plantbox, m) {
             .def("getRootBases", &RootSystem::getRootBases)
             .def("push",&RootSystem::push)
             .def("pop",&RootSystem::pop)
-            .def("write", &RootSystem::write);
+            .def(py::pickle(&getOrganismState<RootSystem>, &setOrganismState<RootSystem>))
+            .def("write", &RootSystem::write, py::arg("name"), py::arg("format") = int(VTPWriter::vtk_ascii), py::arg("compress") = false, py::call_guard<py::gil_scoped_release>());
+    /*
+     * soil_index.h
+     */
+    py::class_<SoilIndex, std::shared_ptr<SoilIndex>>(m, "SoilIndex")
+        .def("getIndex", &SoilIndex::getIndex)
+        .def("__str__",&SoilIndex::toString);
+    py::class_<EquidistantSoilIndex, SoilIndex, std::shared_ptr<EquidistantSoilIndex>>(m, "EquidistantSoilIndex")
+        .def(py::init<Vector3d, Vector3d, Vector3d>(), py::arg("min"), py::arg("max"), py::arg("res"))
+        .def_readwrite("min", &EquidistantSoilIndex::min)
+        .def_readwrite("max", &EquidistantSoilIndex::max)
+        .def_readwrite("res", &EquidistantSoilIndex::res);
+    py::class_<RectilinearSoilIndex, SoilIndex, std::shared_ptr<RectilinearSoilIndex>>(m, "RectilinearSoilIndex")
+        .def(py::init<std::vector<double>, std::vector<double>, std::vector<double>>(), py::arg("x"), py::arg("y"), py::arg("z"))
+        .def_readonly("xgrid", &RectilinearSoilIndex::xgrid)
+        .def_readonly("ygrid", &RectilinearSoilIndex::ygrid)
+        .def_readonly("zgrid", &RectilinearSoilIndex::zgrid);
+    py::class_<UnstructuredSoilIndex, SoilIndex, std::shared_ptr<UnstructuredSoilIndex>>(m, "UnstructuredSoilIndex")
+        .def(py::init<std::vector<Vector3d>, std::vector<std::vector<int>>>(), py::arg("points"), py::arg("cells"))
+        .def_readonly("points", &UnstructuredSoilIndex::points)
+        .def_readonly("cells", &UnstructuredSoilIndex::cells)
+        .def_readwrite("eps", &UnstructuredSoilIndex::eps);
     /*
      * MappedOrganism.h
      */
@@ -777,25 +962,78 @@ PYBIND11_MODULE(plantbox, m) {
         .def("setRadius", &MappedSegments::setRadius)
         .def("setTypes", &MappedSegments::setSubTypes) //kept for backward compatibility
         .def("setSubTypes", &MappedSegments::setSubTypes)
+        .def("setSoilGrid", (void (MappedSegments::*)(std::shared_ptr<SoilIndex>)) &MappedSegments::setSoilGrid) // before the call back version, to avoid wrapping into a Python callable
         .def("setSoilGrid", (void (MappedSegments::*)(const std::function<int(double,double,double)>&)) &MappedSegments::setSoilGrid)
         .def("setSoilGrid", (void (MappedSegments::*)(const std::function<int(double,double,double)>&, Vector3d, Vector3d, Vector3d, bool)) &MappedSegments::setSoilGrid,
         		py::arg("s"), py::arg("min"), py::arg("max"), py::arg("res"), py::arg("cut") = true)
         .def("setRectangularGrid", &MappedSegments::setRectangularGrid, py::arg("min"), py::arg("max"), py::arg("res"), py::arg("cut") = true)
+        .def("setRectilinearGrid", &MappedSegments::setRectilinearGrid, py::arg("x"), py::arg("y"), py::arg("z"), py::arg("cut") = true)
         .def("mapSegments",  &MappedSegments::mapSegments)
         .def("cutSegments", &MappedSegments::cutSegments)
         .def_readwrite("soil_index", &MappedSegments::soil_index)
         .def("sort",&MappedSegments::sort)
-        .def_readwrite("nodes", &MappedSegments::nodes)
-        .def_readwrite("nodeCTs", &MappedSegments::nodeCTs)
-        .def_readwrite("segments", &MappedSegments::segments)
-        .def_readwrite("radii", &MappedSegments::radii)
-        .def_readwrite("organTypes", &MappedSegments::organTypes)
-        .def_readwrite("Types", &MappedSegments::subTypes) //kept for backward compatibility
-        .def_readwrite("subTypes", &MappedSegments::subTypes)
-        .def_readwrite("seg2cell", &MappedSegments::seg2cell)
-        .def_readwrite("cell2seg", &MappedSegments::cell2seg);
+        .def_property("nodes", [](const MappedSegments& self) { return self.nodes; },
+                [](MappedSegments& self, std::vector<Vector3d> nodes) { self.views.release(); self.nodes = nodes; })
+        .def_property("nodeCTs", [](const MappedSegments& self) { return self.nodeCTs; },
+                [](MappedSegments& self, std::vector<double> nodeCTs) { self.views.release(); self.nodeCTs = nodeCTs; })
+        .def_property("segments", [](const MappedSegments& self) { return self.segments; },
+                [](MappedSegments& self, std::vector<Vector2i> segments) { self.views.release(); self.segments = segments; })
+        .def_property("radii", [](const MappedSegments& self) { return self.radii; },
+                [](MappedSegments& self, std::vector<double> radii) { self.views.release(); self.radii = radii; })
+        .def_property("organTypes", [](const MappedSegments& self) { return self.organTypes; },
+                [](MappedSegments& self, std::vector<int> organTypes) { self.views.release(); self.organTypes = organTypes; })
+        .def_property("Types", [](const MappedSegments& self) { return self.subTypes; },
+                [](MappedSegments& self, std::vector<int> subTypes) { self.views.release(); self.subTypes = subTypes; }) //kept for backward compatibility
+        .def_property("subTypes", [](const MappedSegments& self) { return self.subTypes; },
+                [](MappedSegments& self, std::vector<int> subTypes) { self.views.release(); self.subTypes = subTypes; })
+        .def_property_readonly("seg2cell", [](MappedSegments& self) { return as_pyview(self.seg2cell, self.views.view(self.seg2cell)); })
+        .def_property_readonly("cell2segOffsets", [](MappedSegments& self) {
+                const auto& offsets = self.getCell2segOffsets();
+                return as_pyview(offsets, self.views.view(offsets)); })
+        .def_property_readonly("cell2segIndices", [](MappedSegments& self) {
+                const auto& indices = self.getCell2segIndices();
+                return as_pyview(indices, self.views.view(indices)); })
+        .def_property_readonly("changedSegments", [](MappedSegments& self) { return as_pyview(self.changedSegments, self.views.view(self.changedSegments)); })
+        .def_property_readonly("changedCells", [](MappedSegments& self) { return as_pyview(self.changedCells, self.views.view(self.changedCells)); })
+        .def_property_readonly("cell2seg", [](const MappedSegments& self) { // kept for backward compatibility
+                if (PyErr_WarnEx(PyExc_DeprecationWarning, "MappedSegments.cell2seg is deprecated, use cell2segOffsets and cell2segIndices, or cellSegments", 1)<0) {
+                    throw py::error_already_set();
+                }
+                std::map<int, std::vector<int>> cell2seg; // segments per cell, cell -1 holds the segments outside of the soil domain
+                const auto& offsets = self.getCell2segOffsets();
+                const auto& indices = self.getCell2segIndices();
+                for (int c = 0; c<(int)offsets.size()-1; c++) {
+                    if (offsets[c+1]>offsets[c]) {
+                        cell2seg[c] = std::vector<int>(indices.begin()+offsets[c], indices.begin()+offsets[c+1]);
+                    }
+                }
+                for (int si = 0; si<(int)self.seg2cell.size(); si++) {
+                    if (self.seg2cell[si]<0) {
+                        cell2seg[-1].push_back(si);
+                    }
+                }
+                return cell2seg; })
+        .def_property_readonly("nodeArray", [](MappedSegments& self) { return as_pyview(self.nodes, self.views.view(self.nodes)); })
+        .def_property_readonly("segmentArray", [](MappedSegments& self) { return as_pyview(self.segments, self.views.view(self.segments)); })
+        .def_property_readonly("nodeCTArray", [](MappedSegments& self) { return as_pyview(self.nodeCTs, self.views.view(self.nodeCTs)); })
+        .def_property_readonly("radiusArray", [](MappedSegments& self) { return as_pyview(self.radii, self.views.view(self.radii)); })
+        .def_property_readonly("subTypeArray", [](MappedSegments& self) { return as_pyview(self.subTypes, self.views.view(self.subTypes)); })
+        .def_property_readonly("organTypeArray", [](MappedSegments& self) { return as_pyview(self.organTypes, self.views.view(self.organTypes)); })
+        .def("cellSegments", [](MappedSegments& self, int cellIdx) { return as_pyarray(self.cellSegments(cellIdx)); })
+        .def("numberOfMappedCells", &MappedSegments::numberOfMappedCells)
+        .def(py::pickle(
+            [](const MappedSegments& self) {
+                std::ostringstream os(std::ios::binary);
+                self.writeMapping(os);
+                return py::bytes(os.str()); },
+            [](py::bytes state) {
+                auto ms = std::make_shared<MappedSegments>();
+                std::istringstream is(std::string(state), std::ios::binary);
+                ms->readMapping(is);
+                return ms; }));
     py::class_<MappedRootSystem, RootSystem, MappedSegments,  std::shared_ptr<MappedRootSystem>>(m, "MappedRootSystem")
         .def(py::init<>())
+        .def(py::pickle(&getOrganismState<MappedRootSystem>, &setOrganismState<MappedRootSystem>))
         .def("mappedSegments",  &MappedRootSystem::mappedSegments)
         .def("addSegments", &MappedRootSystem::rootSystem);
     /*
@@ -817,12 +1055,60 @@ PYBIND11_MODULE(plantbox, m) {
 
             .def("linearSystem",&XylemFlux::linearSystem, py::arg("simTime") , py::arg("sx") , py::arg("cells") = true,
             		py::arg("soil_k") = std::vector<double>())
-            .def("soilFluxes",&XylemFlux::soilFluxes, py::arg("simTime"), py::arg("rx"), py::arg("sx"), py::arg("approx") = false,
-            		py::arg("soil_k") = std::vector<double>())
-            .def("segFluxes",&XylemFlux::segFluxes, py::arg("simTime"), py::arg("rx"), py::arg("sx"), py::arg("approx") = false,
+            .def("solve", [](XylemFlux& self, double simTime, const std::vector<double>& sx, int bcType, const std::vector<int>& bcNodes,
+                const std::vector<double>& bcValues, bool cells, const std::vector<double> soil_k) {
+                    return as_pyarray(self.solve(simTime, sx, bcType, bcNodes, bcValues, cells, soil_k));
+                }, py::arg("simTime"), py::arg("sx"), py::arg("bcType"), py::arg("bcNodes"), py::arg("bcValues"), py::arg("cells") = true,
+                py::arg("soil_k") = std::vector<double>())
+            .def("solveLinearSystem", [](XylemFlux& self, int bcType, const std::vector<int>& bcNodes, const std::vector<double>& bcValues) {
+                    return as_pyarray(self.solveLinearSystem(bcType, bcNodes, bcValues));
+                }, py::arg("bcType"), py::arg("bcNodes"), py::arg("bcValues"))
+            .def("solveBatch", [](XylemFlux& self, double simTime, py::array_t<double, py::array::c_style | py::array::forcecast> sx, int bcType,
+                const std::vector<int>& bcNodes, const std::vector<double>& bcValues, bool cells, const std::vector<double> soil_k) {
+                    if (sx.ndim()!=2) {
+                        throw std::invalid_argument("XylemFlux.solveBatch: sx must be a 2d array (scenarios x cells)");
+                    }
+                    std::vector<std::vector<double>> sx_(sx.shape(0));
+                    for (size_t s = 0; s<sx_.size(); s++) {
+                        sx_[s].assign(sx.data(s, 0), sx.data(s, 0) + sx.shape(1));
+                    }
+                    auto x = self.solveBatch(simTime, sx_, bcType, bcNodes, bcValues, cells, soil_k);
+                    size_t n = (x.size()>0) ? x[0].size() : 0;
+                    py::array_t<double> r({ x.size(), n });
+                    for (size_t s = 0; s<x.size(); s++) {
+                        std::copy(x[s].begin(), x[s].end(), r.mutable_data(s, 0));
+                    }
+                    return r;
+                }, py::arg("simTime"), py::arg("sx"), py::arg("bcType"), py::arg("bcNodes"), py::arg("bcValues"), py::arg("cells") = true,
+                py::arg("soil_k") = std::vector<double>())
+            .def("resetPattern", &XylemFlux::resetPattern)
+            .def("soilFluxes",py::overload_cast<double, const std::vector<double>&, const std::vector<double>&, bool, const std::vector<double>>(&XylemFlux::soilFluxes),
+                    py::arg("simTime"), py::arg("rx"), py::arg("sx"), py::arg("approx") = false, py::arg("soil_k") = std::vector<double>())
+            .def("soilFluxesInto", [](XylemFlux& self, double simTime, const std::vector<double>& rx, const std::vector<double>& sx,
+                py::array_t<double, py::array::c_style> out, bool approx, const std::vector<double>& soil_k) {
+                    self.soilFluxes(simTime, rx, sx, out.mutable_data(), out.size(), approx, soil_k);
+                }, py::arg("simTime"), py::arg("rx"), py::arg("sx"), py::arg("out"), py::arg("approx") = false,
+                py::arg("soil_k") = std::vector<double>())
+            .def("segFluxes",py::overload_cast<double, const std::vector<double>&, const std::vector<double>&, bool, bool, const std::vector<double>>(&XylemFlux::segFluxes),
+                    py::arg("simTime"), py::arg("rx"), py::arg("sx"), py::arg("approx") = false,
             		py::arg("cells") = false, py::arg("soil_k") = std::vector<double>())
+            .def("segFluxesInto", [](XylemFlux& self, double simTime, const std::vector<double>& rx, const std::vector<double>& sx,
+                py::array_t<double, py::array::c_style> out, bool approx, bool cells, const std::vector<double>& soil_k) {
+                    if (out.size()!=self.rs->segments.size()) {
+                        throw std::invalid_argument("XylemFlux.segFluxesInto: out must have the length of the number of segments");
+                    }
+                    self.segFluxes(simTime, rx, sx, out.mutable_data(), approx, cells, soil_k);
+                }, py::arg("simTime"), py::arg("rx"), py::arg("sx"), py::arg("out"), py::arg("approx") = false,
+                py::arg("cells") = false, py::arg("soil_k") = std::vector<double>())
 
-            .def("sumSoilFluxes",&XylemFlux::sumSegFluxes)
+            .def("sumSoilFluxes",py::overload_cast<const std::vector<double>&>(&XylemFlux::sumSegFluxes))
+            .def("sumSoilFluxesInto", [](XylemFlux& self, py::array_t<double, py::array::c_style | py::array::forcecast> segFluxes,
+                py::array_t<double, py::array::c_style> out) {
+                    if (segFluxes.size()!=self.rs->segments.size()) {
+                        throw std::invalid_argument("XylemFlux.sumSoilFluxesInto: segFluxes must have the length of the number of segments");
+                    }
+                    self.sumSegFluxes(segFluxes.data(), out.mutable_data(), out.size());
+                }, py::arg("segFluxes"), py::arg("out"))
 			.def("splitSoilFluxes",&XylemFlux::splitSoilFluxes, py::arg("soilFluxes"), py::arg("type") = 0)
             .def("segOuterRadii",&XylemFlux::segOuterRadii, py::arg("type") = 0, py::arg("vols") = std::vector<double>(0))
 			.def("segLength",&XylemFlux::segLength)
@@ -841,7 +1127,20 @@ PYBIND11_MODULE(plantbox, m) {
             .def_readwrite("kx", &XylemFlux::kx)
             .def_readwrite("rs", &XylemFlux::rs)
 			.def_readwrite("airPressure", &XylemFlux::airPressure)
-			.def_readwrite("gs", &XylemFlux::gs);
+			.def_readwrite("gs", &XylemFlux::gs)
+            .def_readwrite("solver", &XylemFlux::solver)
+            .def_readwrite("solverTol", &XylemFlux::solverTol)
+            .def_readwrite("solverMaxIter", &XylemFlux::solverMaxIter)
+            .def_readonly("solverIterations", &XylemFlux::solverIterations);
+    py::enum_<XylemFlux::BoundaryTypes>(m, "BoundaryType")
+            .value("neumann", XylemFlux::BoundaryTypes::bc_neumann)
+            .value("dirichlet", XylemFlux::BoundaryTypes::bc_dirichlet)
+            .export_values();
+    py::enum_<XylemFlux::SolverTypes>(m, "SolverType")
+            .value("pcg", XylemFlux::SolverTypes::st_pcg)
+            .value("ldlt", XylemFlux::SolverTypes::st_ldlt)
+            .value("tree", XylemFlux::SolverTypes::st_tree)
+            .export_values();
 
     /*
      * Plant.h
@@ -853,18 +1152,20 @@ PYBIND11_MODULE(plantbox, m) {
             .def("reset", &Plant::reset)
             .def("openXML", &Plant::openXML)
             .def("setTropism", &Plant::setTropism)
-            .def("simulate",(void (Plant::*)(double,bool)) &Plant::simulate, py::arg("dt"), py::arg("verbose") = false) 
-            .def("simulate",(void (Plant::*)()) &Plant::simulate)
+            .def("simulate",(void (Plant::*)(double,bool)) &Plant::simulate, py::arg("dt"), py::arg("verbose") = false, py::call_guard<py::gil_scoped_release>())
+            .def("simulate",(void (Plant::*)()) &Plant::simulate, py::call_guard<py::gil_scoped_release>())
             .def("initCallbacks", &Plant::initCallbacks)
             .def("createTropismFunction", &Plant::createTropismFunction)
             .def("createGrowthFunction", &Plant::createGrowthFunction)
-            .def("write", &Plant::write);
+            .def(py::pickle(&getOrganismState<Plant>, &setOrganismState<Plant>))
+            .def("write", &Plant::write, py::arg("name"), py::arg("format") = int(VTPWriter::vtk_ascii), py::arg("compress") = false, py::call_guard<py::gil_scoped_release>());
 			
 	py::class_<MappedPlant, Plant, MappedSegments,  std::shared_ptr<MappedPlant>>(m, "MappedPlant")	
 			.def(py::init<>())	
 			.def("mappedSegments", (void (MappedPlant::*)(bool)) &MappedPlant::mappedSegments)	
-            .def("initialize", &MappedPlant::initialize, py::arg("verbose") = true)
+            .def("initialize", &MappedPlant::initialize, py::arg("verbose") = true, py::call_guard<py::gil_scoped_release>())
 			.def("printNodes",  &MappedPlant::printNodes)
+			.def(py::pickle(&getOrganismState<MappedPlant>, &setOrganismState<MappedPlant>))
 			.def("addSegments", &MappedPlant::plant);	
 
     py::enum_<Plant::TropismTypes>(m, "TropismType")
@@ -880,6 +1181,30 @@ PYBIND11_MODULE(plantbox, m) {
              .value("linear", Plant::GrowthFunctionTypes::gft_linear)
              .export_values();
 
+    /*
+     * Ensemble.h
+     */
+    py::class_<Ensemble, std::shared_ptr<Ensemble>>(m, "Ensemble")
+            .def(py::init<std::shared_ptr<Organism>>())
+            .def(py::init<std::string, bool>(), py::arg("filename"), py::arg("plant") = false)
+            .def("setMembers", &Ensemble::setMembers, py::arg("seeds"), py::arg("overrides") = std::vector<std::vector<Ensemble::Override>>())
+            .def("simulate", &Ensemble::simulate, py::arg("simtime"), py::arg("steps") = 1, py::call_guard<py::gil_scoped_release>())
+            .def("getNumberOfMembers", &Ensemble::getNumberOfMembers)
+            .def("getPrototype", &Ensemble::getPrototype)
+            .def("getMember", &Ensemble::getMember)
+            .def("getSummed", [](const Ensemble& self, std::string name, int ot) {
+                std::vector<double> v;
+                {
+                    py::gil_scoped_release release;
+                    v = self.getSummed(name, ot);
+                }
+                return as_pyarray(std::move(v));
+            }, py::arg("name"), py::arg("ot") = -1)
+            .def("getAnalysers", &Ensemble::getAnalysers, py::call_guard<py::gil_scoped_release>())
+            .def_readwrite("basal", &Ensemble::basal)
+            .def_readwrite("shootborne", &Ensemble::shootborne)
+            .def("__str__", &Ensemble::toString);
+
     py::class_<ExudationModel, std::shared_ptr<ExudationModel>>(m, "ExudationModel")
             .def(py::init<double, double, int, std::shared_ptr<RootSystem>>())
             .def(py::init<double, double, double, int, int, int, std::shared_ptr<RootSystem>>())
@@ -894,20 +1219,23 @@ PYBIND11_MODULE(plantbox, m) {
             .def_readwrite("thresh13", &ExudationModel::thresh13)
             .def_readwrite("calc13", &ExudationModel::calc13)
             .def_readwrite("observationRadius", &ExudationModel::observationRadius)
-            .def("calculate",  &ExudationModel::calculate, py::arg("tend"), py::arg("i0") = 0, py::arg("iend")=-1);
+            .def_readwrite("progress", &ExudationModel::progress)
+            .def("calculate",  &ExudationModel::calculate, py::arg("tend"), py::arg("i0") = 0, py::arg("iend")=-1, py::call_guard<py::gil_scoped_release>());
     py::enum_<ExudationModel::IntegrationType>(m, "IntegrationType")
             .value("mps_straight", ExudationModel::IntegrationType::mps_straight )
             .value("mps", ExudationModel::IntegrationType::mps )
             .value("mls", ExudationModel::IntegrationType::mls )
             .export_values();
 
-    //   /*
-    //    * sdf_rs.h todo revise
-    //    */
-    //   py::class_<SDF_RootSystem, SignedDistanceFunction>(m, "SDF_RootSystem")
-    //       .def(py::init<std::vector<Vector3d>, std::vector<Vector2i>, std::vector<double>, double>())
-    //       .def(py::init<Root&, double>())
-    //       .def(py::init<Organism&, double>());
+    /*
+     * sdf_rs.h
+     */
+    py::class_<SDF_RootSystem, SignedDistanceFunction, std::shared_ptr<SDF_RootSystem>>(m, "SDF_RootSystem")
+            .def(py::init<std::vector<Vector3d>, std::vector<Vector2i>, std::vector<double>, double>(),
+                py::arg("nodes"), py::arg("segments"), py::arg("radii"), py::arg("dx") = 0.5)
+            .def(py::init<Root&, double>(), py::arg("root"), py::arg("dx") = 0.5)
+            .def(py::init<Organism&, double>(), py::arg("plant"), py::arg("dx") = 0.5)
+            .def("update", &SDF_RootSystem::update);
 }
 
 }
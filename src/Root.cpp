@@ -1,5 +1,6 @@
 // -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
 #include "Root.h"
+#include "binary_io.h"
 
 namespace CPlantBox {
 
@@ -445,4 +446,20 @@ std::string Root::toString() const
     return str+newstring.str();
 }
 
+/**
+ * Writes the data of the root that are not part of Organ::writeState
+ */
+void Root::writeState_(std::ostream& os) const
+{
+    writeBinary(os, firstCall);
+}
+
+/**
+ * Reads the data written by Root::writeState_
+ */
+void Root::readState_(std::istream& is)
+{
+    readBinary(is, firstCall);
+}
+
 } // end namespace CPlantBox
@@ -53,6 +53,9 @@ public:
 
 protected:
 
+    void writeState_(std::ostream& os) const override; ///< writes the data that are not part of Organ::writeState
+    void readState_(std::istream& is) override; ///< reads the data written by writeState_
+
     virtual void createLateral(double dt, bool silence); ///< creates a new lateral, called by Root::simulate()
 
     Vector3d heading() const; ///< current growth direction of the root
@@ -4,6 +4,9 @@
 #include "organparameter.h"
 #include "Organism.h"
 #include "RootDelay.h"
+#include "binary_io.h"
+
+#include <numeric>
 
 namespace CPlantBox {
 
@@ -21,6 +24,7 @@ std::shared_ptr<Organism> RootSystem::copy()
     roots.clear(); // clear buffer
     auto nrs = std::make_shared<RootSystem>(*this); // copy constructor
     nrs->seed = std::static_pointer_cast<Seed>(seed->copy(nrs));
+    nrs->stateStack = std::stack<RootSystemState>(); // the states refer to the roots of this root system
     baseOrgans = nrs->seed->copyBaseOrgans();
     for (int ot = 0; ot < numberOfOrganTypes; ot++) { // copy organ type parameters
         for (auto& otp : nrs->organParam[ot]) {
@@ -74,9 +78,11 @@ void RootSystem::reset()
 {
     roots.clear(); // clear buffer
     baseOrgans.clear();
+    stateStack = std::stack<RootSystemState>();
     simtime = 0;
     organId = -1;
     nodeId = -1;
+    revision++;
 }
 
 /**
@@ -292,6 +298,9 @@ void RootSystem::simulate()
  * Simulates root system growth for a time span, elongates a maximum of @param maxinc total length [cm/day]
  * using the proportional elongation @param se to impede overall growth.
  *
+ * The scale is found by the Illinois (regula falsi) method, starting with the linear estimate maxinc/increase.
+ * Each trial is reverted with a snapshot of the changing roots (@see RootSystemState), the last trial is kept.
+ *
  * @param dt        time step [day]
  * @param maxinc_   maximal total length [cm/day] the root system is allowed to grow in this time step
  * @param se        The class ProportionalElongation is used to scale overall root growth
@@ -302,47 +311,55 @@ void RootSystem::simulate(double dt, double maxinc_, ProportionalElongation* se,
     const double accuracy = 1.e-3;
     const int maxiter = 20;
     double maxinc = dt*maxinc_; // [cm]
-    double ol = getSummed("length");
     int i = 0;
 
     push();
     se->setScale(1.);
     simulate(dt, verbose);
-    double l = getSummed("length");
-    double inc_ = l - ol;
+    double inc_ = stateStack.top().elongation();
     if (verbose) {
         std::cout << "expected increase is " << inc_ << " maximum is " << maxinc
             << "\n";
     }
-    pop();
 
-    if ((inc_>maxinc) && (std::abs(inc_-maxinc)>accuracy)) { // check if we have to perform a binary search
+    if ((inc_>maxinc) && (std::abs(inc_-maxinc)>accuracy)) { // check if we have to search the scale
 
-        double sl = 0.; // left
+        double sl = 0.; // left (no elongation for scale 0)
+        double fl = -maxinc;
         double sr = 1.; // right
+        double fr = inc_-maxinc;
+        int side = 0; // side of the last update
 
-        while ( ((std::abs(inc_-maxinc)) > accuracy) && (i<maxiter) )  { // binary search
+        while ( ((std::abs(inc_-maxinc)) > accuracy) && (i<maxiter) )  { // regula falsi
 
-            double m = (sl+sr)/2.; // mid
-            push();
+            double m = (sl*fr-sr*fl)/(fr-fl); // secant
+            stateStack.top().restore(*this);
             se->setScale(m);
             simulate(dt, verbose);
-            l = getSummed("length");
-            inc_ = l - ol;
-            pop();
+            inc_ = stateStack.top().elongation();
             if (verbose) {
-                std::cout << "\t(sl, mid, sr) = (" << sl << ", " <<  m << ", " <<  sr << "), inc " <<  inc_ << ", err: " << std::abs(inc_-maxinc) << " > " << accuracy << "\n";
+                std::cout << "\t(sl, m, sr) = (" << sl << ", " <<  m << ", " <<  sr << "), inc " <<  inc_ << ", err: " << std::abs(inc_-maxinc) << " > " << accuracy << "\n";
             }
-            if (inc_>maxinc) { // concatenate
+            if (inc_>maxinc) {
                 sr = m;
+                fr = inc_-maxinc;
+                if (side==1) { // Illinois modification, the left point is kept twice
+                    fl /= 2.;
+                }
+                side = 1;
             } else {
                 sl = m;
+                fl = inc_-maxinc;
+                if (side==-1) {
+                    fr /= 2.;
+                }
+                side = -1;
             }
             i++;
 
         }
     }
-    this->simulate(dt, verbose);
+    stateStack.pop(); // keep the last trial
 }
 
 /**
@@ -488,6 +505,43 @@ void RootSystem::pop()
     stateStack.pop();
 }
 
+/**
+ * Writes the root system, i.e. the organism and the seed (confining geometry and soil are not written),
+ * @see Organism::serialize
+ */
+void RootSystem::writeState(std::ostream& os) const
+{
+    writeTag(os, "RootSystem");
+    Organism::writeState(os);
+    writeBinary(os, numberOfCrowns);
+    writeBinary(os, (bool)seed);
+    if (seed) {
+        seed->writeState(os);
+    }
+}
+
+/**
+ * Reads the root system written by RootSystem::writeState, and sets up the call back functions (@see initCallbacks).
+ * Set geometry and soil before.
+ */
+void RootSystem::readState(std::istream& is)
+{
+    readTag(is, "RootSystem");
+    roots.clear(); // clear buffer
+    stateStack = std::stack<RootSystemState>();
+    Organism::readState(is);
+    readBinary(is, numberOfCrowns);
+    bool hasSeed = false;
+    readBinary(is, hasSeed);
+    if (hasSeed) {
+        seed = std::static_pointer_cast<Seed>(Organ::readState(is, shared_from_this()));
+        seedParam = SeedSpecificParameter(*seed->param());
+    } else {
+        seed = nullptr;
+    }
+    initCallbacks();
+}
+
 /**
  * @return quick info about the root system for debugging
  */
@@ -507,7 +561,7 @@ std::string RootSystem::toString() const
  *
  * @param name      file name e.g. output.vtp
  */
-void RootSystem::write(std::string name) const
+void RootSystem::write(std::string name, int format, bool compress) const
 {
     std::string ext = name.substr(name.size()-3,name.size()); // pick the right writer
     if (ext.compare("sml")==0) {
@@ -516,8 +570,8 @@ void RootSystem::write(std::string name) const
     } else if (ext.compare("vtp")==0) {
         std::cout << "writing VTP... "<< name.c_str() <<"\n";
         std::ofstream fos;
-        fos.open(name.c_str());
-        writeVTP(fos);
+        fos.open(name.c_str(), std::ios::binary);
+        writeVTP(fos, format, compress);
         fos.close();
     } else if (ext.compare(".py")==0)  {
         std::cout << "writing Geometry ... "<< name.c_str() <<"\n";
@@ -537,74 +591,44 @@ void RootSystem::write(std::string name) const
  * Use SegmentAnalyser::writeVTP() for a representation based on segments,
  * e.g. for creating a movie (and run the animate.py script), or mapping values to segments
  *
- * todo use tinyxml2, move to Organism
+ * todo move to Organism
  *
- * @param os      typically a file out stream
+ * @param os        typically a file out stream
+ * @param format    encoding of the data arrays (ascii, binary, or appended), @see VTPWriter
+ * @param compress  compresses binary data arrays with zlib
  */
-void RootSystem::writeVTP(std::ostream & os) const
+void RootSystem::writeVTP(std::ostream & os, int format, bool compress) const
 {
     this->getRoots(); // update roots (if necessary)
     const auto& nodes = getPolylines();
     const auto& times = getPolylineCTs();
 
-    os << "<?xml version=\"1.0\"?>";
-    os << "<VTKFile type=\"PolyData\" version=\"0.1\" byte_order=\"LittleEndian\">\n";
-    os << "<PolyData>\n";
-    int non = 0; // number of nodes
-    for (const auto& r : roots) {
-        non += r->getNumberOfNodes();
-    }
-    int nol=roots.size(); // number of lines
-    os << "<Piece NumberOfLines=\""<< nol << "\" NumberOfPoints=\""<<non<<"\">\n";
-    // POINTDATA
-    os << "<PointData Scalars=\" PointData\">\n" << "<DataArray type=\"Float32\" Name=\"time\" NumberOfComponents=\"1\" format=\"ascii\" >\n";
+    VTPWriter w(format, compress);
+    w.cellScalars = "CellData";
+    std::vector<double> t; // POINTDATA
     for (const auto& r: times) {
-        for (const auto& t : r) {
-            os << t << " ";
-        }
+        t.insert(t.end(), r.begin(), r.end());
     }
-    os << "\n</DataArray>\n" << "\n</PointData>\n";
-    // CELLDATA (live on the polylines)
-    os << "<CellData Scalars=\"CellData\">\n";
-    const size_t N = 3; // SCALARS
-    std::string scalarTypeNames[N] = { "radius", "subType", "creationTime" };
-    for (size_t i=0; i<N; i++) {
-        os << "<DataArray type=\"Float32\" Name=\"" << scalarTypeNames[i] <<"\" NumberOfComponents=\"1\" format=\"ascii\" >\n";
-        auto scalars = getParameter(scalarTypeNames[i]);
-        for (auto s : scalars) {
-            os << s<< " ";
-        }
-        os << "\n</DataArray>\n";
+    w.addPointData("time", t);
+    std::vector<std::string> scalarTypeNames = { "radius", "subType", "creationTime" }; // CELLDATA (live on the polylines)
+    for (const auto& name : scalarTypeNames) {
+        w.addCellData(name, getParameter(name));
     }
-    os << "\n</CellData>\n";
-    // POINTS (=nodes)
-    os << "<Points>\n"<<"<DataArray type=\"Float32\" Name=\"Coordinates\" NumberOfComponents=\"3\" format=\"ascii\" >\n";
+    std::vector<Vector3d> points; // POINTS (=nodes)
     for (const auto& r : nodes) {
-        for (const auto& n : r) {
-            os << n.x << " "<< n.y <<" "<< n.z<< " ";
-        }
+        points.insert(points.end(), r.begin(), r.end());
     }
-    os << "\n</DataArray>\n"<< "</Points>\n";
-    // LINES (polylines)
-    os << "<Lines>\n"<<"<DataArray type=\"Int32\" Name=\"connectivity\" NumberOfComponents=\"1\" format=\"ascii\" >\n";
-    int c=0;
-    for (const auto& r : roots) {
-        for (size_t i=0; i<r->getNumberOfNodes(); i++) {
-            os << c << " ";
-            c++;
-        }
-    }
-    os << "\n</DataArray>\n"<<"<DataArray type=\"Int32\" Name=\"offsets\" NumberOfComponents=\"1\" format=\"ascii\" >\n";
-    c = 0;
+    w.setPoints(points);
+    std::vector<int> connectivity(points.size()); // LINES (polylines)
+    std::iota(connectivity.begin(), connectivity.end(), 0);
+    std::vector<int> offsets;
+    int c = 0;
     for (const auto& r : roots) {
         c += r->getNumberOfNodes();
-        os << c << " ";
+        offsets.push_back(c);
     }
-    os << "\n</DataArray>\n";
-    os << "\n</Lines>\n";
-
-    os << "</Piece>\n";
-    os << "</PolyData>\n" << "</VTKFile>\n";
+    w.setLines(connectivity, offsets);
+    w.write(os);
 }
 
 /**
@@ -626,16 +650,33 @@ void RootSystem::writeGeometry(std::ostream & os) const
 
 
 /**
- * Create a root system state object from a rootsystem, use RootSystemState::restore to go back to that state.
+ * Creates a root system state object from a root system, use RootSystemState::restore to go back to that state.
+ *
+ * Only the roots that can change are stored, i.e. alive roots with their laterals, and dead roots without.
  *
- * @param rs        the root system to be stored
+ * @param rs    the root system to be stored
+ */
+RootSystemState::RootSystemState(const RootSystem& rs) : simtime(rs.simtime), rid(rs.organId), nid(rs.nodeId), old_non(rs.oldNumberOfNodes),
+    old_nor(rs.oldNumberOfOrgans), numberOfCrowns(rs.numberOfCrowns), gen(rs.gen), UD(rs.UD), ND(rs.ND)
+{
+    rootStates.reserve(rs.organId+1);
+    for (const auto& r : rs.baseOrgans) {
+        add(r);
+    }
+}
+
+/**
+ * Adds the state of the root @param o, and the states of its laterals if the root is alive
+ * (laterals of dead roots are not simulated)
  */
-RootSystemState::RootSystemState(const RootSystem& rs) : simtime(rs.simtime), rid(rs.organId), old_non(rs.oldNumberOfNodes), old_nor(rs.oldNumberOfOrgans),
-    numberOfCrowns(rs.numberOfCrowns), gen(rs.gen), UD(rs.UD), ND(rs.ND)
+void RootSystemState::add(const std::shared_ptr<Organ>& o)
 {
-    baseRoots = std::vector<RootState>(rs.baseOrgans.size()); // store base roots
-    for (size_t i=0; i<baseRoots.size(); i++) {
-        baseRoots[i] = RootState(*(std::static_pointer_cast<Root>(rs.baseOrgans[i])));
+    auto r = std::static_pointer_cast<Root>(o);
+    rootStates.push_back(RootState(*r));
+    if (r->isAlive()) {
+        for (int i = 0; i<r->getNumberOfChildren(); i++) {
+            add(r->getChild(i));
+        }
     }
 }
 
@@ -650,15 +691,28 @@ void RootSystemState::restore(RootSystem& rs)
     rs.simtime = simtime; // copy back everything
     rs.organId = rid;
     rs.nodeId = nid;
+    rs.revision++;
     rs.oldNumberOfNodes = old_non;
     rs.oldNumberOfOrgans = old_nor;
     rs.numberOfCrowns = numberOfCrowns;
     rs.gen = gen;
     rs.UD = UD;
     rs.ND = ND;
-    for (size_t i=0; i<baseRoots.size(); i++) { // restore base roots
-        baseRoots[i].restore(*(std::static_pointer_cast<Root>(rs.baseOrgans[i])));
+    for (auto& r : rootStates) { // restore roots
+        r.restore();
+    }
+}
+
+/**
+ * Total length increase of the root system since the state was stored, without traversing unchanged roots [cm]
+ */
+double RootSystemState::elongation() const
+{
+    double l = 0.;
+    for (const auto& r : rootStates) {
+        l += r.elongation();
     }
+    return l;
 }
 
 /**
@@ -666,27 +720,25 @@ void RootSystemState::restore(RootSystem& rs)
  *
  * @param r        the root to be stored
  */
-RootState::RootState(const Root& r): alive(r.alive), active(r.active), age(r.age), length(r.length), old_non(r.oldNumberOfNodes)
+RootState::RootState(Root& r): root(&r), alive(r.alive), active(r.active), moved(r.moved), firstCall(r.firstCall), age(r.age),
+    length(r.length), old_non(r.oldNumberOfNodes), noc(r.children.size())
 {
     lNode = r.nodes.back();
     lNodeId = r.nodeIds.back();
     lneTime = r.nodeCTs.back();
     non = r.nodes.size();
-    laterals = std::vector<RootState>(r.children.size());
-    for (size_t i=0; i<laterals.size(); i++) {
-        laterals[i] = RootState(*(std::static_pointer_cast<Root>(r.children[i])));
-    }
 }
 
 /**
- * Restore evolved root back to its previous state
- *
- * @param r    the root to be restored
+ * Restore evolved root back to its previous state, removes new laterals
  */
-void RootState::restore(Root& r)
+void RootState::restore()
 {
+    Root& r = *root;
     r.alive = alive; // copy things that changed
     r.active = active;
+    r.moved = moved;
+    r.firstCall = firstCall;
     r.age = age;
     r.length = length;
     r.oldNumberOfNodes = old_non;
@@ -696,10 +748,31 @@ void RootState::restore(Root& r)
     r.nodes.back() = lNode; // restore last value
     r.nodeIds.back() = lNodeId;
     r.nodeCTs.back() = lneTime;
-    r.children.resize(laterals.size()); // shrink and restore laterals
-    for (size_t i=0; i<laterals.size(); i++) {
-        laterals[i].restore(*(std::static_pointer_cast<Root>(r.children[i])));
+    r.children.resize(noc); // remove new laterals
+}
+
+/**
+ * Summed length of an organ and all its successors [cm]
+ */
+static double summedLength(const std::shared_ptr<Organ>& o)
+{
+    double l = o->getLength();
+    for (int i = 0; i<o->getNumberOfChildren(); i++) {
+        l += summedLength(o->getChild(i));
+    }
+    return l;
+}
+
+/**
+ * Length increase of the root and its new laterals since the state was stored (laterals that already existed have their own state) [cm]
+ */
+double RootState::elongation() const
+{
+    double l = root->length - length;
+    for (size_t i = noc; i<root->children.size(); i++) {
+        l += summedLength(root->children[i]);
     }
+    return l;
 }
 
 } // end namespace CPlantBox
@@ -11,6 +11,7 @@
 #include "Root.h"
 #include "seedparameter.h"
 #include "Seed.h"
+#include "vtp_writer.h"
 
 namespace CPlantBox {
 
@@ -91,10 +92,12 @@ public:
     /* dynamics */
     void push(); ///< push current state to a stack
     void pop(); ///< retrieve previous state from stack
+    void writeState(std::ostream& os) const override; ///< writes the root system (binary) @see Organism::serialize
+    void readState(std::istream& is) override; ///< reads the root system written by RootSystem::writeState
 
     /* Output */
-    void write(std::string name) const; /// writes simulation results (type is determined from file extension in name)
-    void writeVTP(std::ostream & os) const; ///< writes current simulation results as VTP (VTK polydata file)
+    void write(std::string name, int format = VTPWriter::vtk_ascii, bool compress = false) const; /// writes simulation results (type is determined from file extension in name)
+    void writeVTP(std::ostream & os, int format = VTPWriter::vtk_ascii, bool compress = false) const; ///< writes current simulation results as VTP (VTK polydata file)
     void writeGeometry(std::ostream & os) const; ///< writes the current confining geometry (e.g. a plant container) as paraview Python script
 
     std::string toString() const override; ///< infos about current root system state (for debugging)
@@ -118,9 +121,49 @@ private:
 
 
 /**
- * Sores a state of the RootSystem,
+ * Stores a state of the root that can be restored at a later point
+ * (for RootSystem::push and RootSystem::pop)
+ */
+class RootState {
+
+public:
+
+    RootState(Root& r); ///< create the root state from a root (without its laterals)
+
+    void restore(); ///< restore evolved root back to its previous state
+    double elongation() const; ///< length increase of the root and its new laterals since the state was stored [cm]
+
+private:
+
+    Root* root; ///< the root (owned by the root system)
+
+    /* parameters that are given per root that may change with time */
+    bool alive = 1; ///< true: alive, false: dead
+    bool active = 1; ///< true: active, false: root stopped growing
+    bool moved = false; ///< nodes moved during last time step
+    bool firstCall = true; ///< first call of createSegments
+    double age = 0; ///< current age [days]
+    double length = 0; ///< actual length [cm] of the root. might differ from getLength(age) in case of impeded root growth
+    int old_non = 1; ///< number of nodes at the end of previous time step
+    size_t noc = 0; ///< number of laterals
+
+    /* last node */
+    Vector3d lNode = Vector3d(0.,0.,0.); ///< last node
+    int lNodeId = 0; ///< last node id
+    double lneTime = 0.;  ///< last creation time
+    size_t non = 0; ///< number of nodes
+
+};
+
+
+
+/**
+ * Stores a state of the RootSystem,
  * i.e. all data that changes over time (*), i.e. excluding node data that cannot change
  *
+ * The states of the roots are stored in a flat list. Laterals of dead roots do not change and are not stored,
+ * new roots are removed when restoring.
+ *
  * (*) excluding changes regarding RootSystemParameter, any RootTypeParameter, confining geometry, and soil
  */
 class RootSystemState
@@ -133,10 +176,13 @@ public:
     RootSystemState(const RootSystem& rs); ///< create root system state from a rootsystem
 
     void restore(RootSystem& rs); ///< restore evolved rootsystem back to its previous state
+    double elongation() const; ///< total length increase of the root system since the state was stored [cm]
 
 private:
 
-    std::vector<RootState> baseRoots;  ///< Base roots of the root system
+    void add(const std::shared_ptr<Organ>& o); // adds the state of the root, and its laterals if the root is alive
+
+    std::vector<RootState> rootStates;  ///< States of the roots, in depth first order
 
     double simtime = 0; ///< simulation time
     int rid = -1; ///< unique root id counter
@@ -151,42 +197,6 @@ private:
 
 };
 
-
-
-/**
- * Stores a state of the root that can be restored at a later point
- * (for RootSystem::push and RootSystem::pop)
- */
-class RootState {
-
-public:
-
-    RootState() { };
-
-    RootState(const Root& r); ///< create the root state from a root
-
-    void restore(Root& r); ///< restore evolved root back to its previous state
-
-private:
-
-    /* parameters that are given per root that may change with time */
-    bool alive = 1; ///< true: alive, false: dead
-    bool active = 1; ///< true: active, false: root stopped growing
-    double age = 0; ///< current age [days]
-    double length = 0; ///< actual length [cm] of the root. might differ from getLength(age) in case of impeded root growth
-    int old_non = 1; ///< number of old nodes, the sign is positive if the last node was updated, otherwise its negative
-
-    /* down the root branch*/
-    std::vector<RootState> laterals = std::vector<RootState>(0); ///< the lateral roots of this root
-
-    /* last node */
-    Vector3d lNode = Vector3d(0.,0.,0.); ///< last node
-    int lNodeId = 0; ///< last node id
-    double lneTime = 0.;  ///< last creation time
-    size_t non = 0; ///< number of nodes
-
-};
-
 } // end namespace CPlantBox
 
 #endif /* ROOTSYSTEM_H_ */
@@ -3,6 +3,7 @@
 
 #include "Root.h"
 #include "Stem.h"
+#include "binary_io.h"
 
 namespace CPlantBox {
 
@@ -228,4 +229,30 @@ std::shared_ptr<Organ> Seed::createStem(std::shared_ptr<Organism> plant, int typ
 	return std::make_shared<Stem>(plant, type, heading, delay, shared_from_this(), 0, 0);
 }
 
+/**
+ * Writes the data of the seed that are not part of Organ::writeState
+ */
+void Seed::writeState_(std::ostream& os) const
+{
+	writeBinary(os, tapType);
+	writeBinary(os, basalType);
+	writeBinary(os, shootborneType);
+	writeBinary(os, mainStemType);
+	writeBinary(os, tillerType);
+	writeBinary(os, numberOfRootCrowns);
+}
+
+/**
+ * Reads the data written by Seed::writeState_
+ */
+void Seed::readState_(std::istream& is)
+{
+	readBinary(is, tapType);
+	readBinary(is, basalType);
+	readBinary(is, shootborneType);
+	readBinary(is, mainStemType);
+	readBinary(is, tillerType);
+	readBinary(is, numberOfRootCrowns);
+}
+
 } // namespace CPlantBox
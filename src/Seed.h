@@ -50,6 +50,9 @@ public:
 
 protected:
 
+    void writeState_(std::ostream& os) const override; ///< writes the data that are not part of Organ::writeState
+    void readState_(std::istream& is) override; ///< reads the data written by writeState_
+
     int numberOfRootCrowns = 0;
     int getParamSubType(int organtype, std::string str);
 
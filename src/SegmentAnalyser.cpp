@@ -5,10 +5,15 @@
 #include "Organism.h"
 #include "MappedOrganism.h"
 
+#include "external/aabbcc/AABB.h"
+
 #include <iomanip>
 #include <istream>
 #include <fstream>
 #include <set>
+#include <array>
+#include <algorithm>
+#include <numeric>
 #include <math.h>
 
 namespace CPlantBox {
@@ -101,6 +106,7 @@ void SegmentAnalyser::addSegments(const Organism& plant)
  */
 void SegmentAnalyser::addSegments(const SegmentAnalyser& a)
 {
+    views.release(); // numpy arrays keep the current values
     int offset = nodes.size();
     nodes.insert(nodes.end(),a.nodes.begin(),a.nodes.end()); // copy nodes
     auto ns = a.segments;
@@ -120,6 +126,7 @@ void SegmentAnalyser::addSegments(const SegmentAnalyser& a)
             data.erase(key);
         }
     }
+    clearTree();
 }
 
 /**
@@ -133,6 +140,7 @@ void SegmentAnalyser::addSegments(const SegmentAnalyser& a)
  */
 void SegmentAnalyser::addSegment(Vector2i seg, double ct, double radius, bool insert)
 {
+    views.release();
     if (insert) {
         segments.insert(segments.begin(),seg);
         data["creationTime"].insert(data["creationTime"].begin(),ct);
@@ -156,6 +164,7 @@ void SegmentAnalyser::addSegment(Vector2i seg, double ct, double radius, bool in
             data["organType"].insert(data["organType"].begin(), -1.);
         }
     }
+    clearTree();
 }
 
 /**
@@ -165,6 +174,8 @@ void SegmentAnalyser::addSegment(Vector2i seg, double ct, double radius, bool in
  *
  * Other parameters are retrieved from the segment's organ.
  * If the pointer of the organ is expired the default value is returned, or if default is nan an exception is thrown.
+ * These values are cached per parameter name, until the segments change (@see clearTree),
+ * or one of the organisms of the segment origins changes (e.g. by simulate, @see Organism::getRevision).
  *
  * @param name  parameter name
  * @param def	default parameter, if organ's origin is expired. If nan an exception is thrown.
@@ -195,9 +206,40 @@ std::vector<double> SegmentAnalyser::getParameter(std::string name, double def)
         }
         return d;
     }
+    bool cached = false;
+    #pragma omp critical(segment_analyser_columns)
+    {
+        auto it = columns.find(name);
+        if (it!=columns.end()) { // valid, if no organism has changed since
+            const Column& c = it->second;
+            cached = (c.def==def) || (std::isnan(c.def) && std::isnan(def));
+            for (const auto& r : c.revisions) {
+                auto plant = r.first.lock();
+                cached = cached && plant && (plant->getRevision()==r.second);
+            }
+            if (cached) {
+                d = c.values;
+            }
+        }
+    }
+    if (cached) {
+        return d;
+    }
+    Column c;
+    c.def = def;
     for (size_t i=0; i<segO.size(); i++) { // else pass to Organs
-        if (!segO.at(i).expired()) {
-            d.at(i) = segO.at(i).lock()->getParameter(name);
+        if ((i>0) && !segO[i].owner_before(segO[i-1]) && !segO[i-1].owner_before(segO[i])) {
+            d.at(i) = d.at(i-1); // same organ as the previous segment (segments of an organ are consecutive)
+            continue;
+        }
+        auto o = segO.at(i).lock();
+        if (o) {
+            d.at(i) = o->getParameter(name);
+            auto plant = o->getOrganism();
+            if (plant && std::none_of(c.revisions.begin(), c.revisions.end(),
+                [&plant](const std::pair<std::weak_ptr<Organism>, int>& r) { return r.first.lock()==plant; })) {
+                c.revisions.push_back(std::make_pair(std::weak_ptr<Organism>(plant), plant->getRevision()));
+            }
         } else { // in case the segment has no origin
             if (std::isnan(def)) {
                 throw std::invalid_argument("SegmentAnalyser::getParameter: segment origin expired (segment has no owner), "
@@ -207,6 +249,9 @@ std::vector<double> SegmentAnalyser::getParameter(std::string name, double def)
             }
         }
     }
+    c.values = d;
+    #pragma omp critical(segment_analyser_columns)
+    columns[name] = std::move(c);
     return d;
 }
 
@@ -227,19 +272,32 @@ double SegmentAnalyser::getSegmentLength(int i) const
  * This is done exact, i.e. segments are cut in two at the geometry border.
  *
  * All nodes are kept, use pack() to remove unused nodes.
+ * If a tree was built (see buildTree) and the geometry is bounded, only segments within its bounding box are tested.
  *
  * @param geometry      signed distance function of the geometry
  */
 void SegmentAnalyser::crop(std::shared_ptr<SignedDistanceFunction> geometry)
 {
+    views.release();
     //std::cout << "cropping " << segments.size() << " segments...";
     std::vector<Vector2i> seg;
     std::vector<std::weak_ptr<Organ>> sO;
     std::map<std::string, std::vector<double>> ndata;
-    for (size_t i=0; i<segments.size(); i++) {
+    std::vector<int> idx;
+    bool candidates = getCandidates(geometry, idx); // otherwise test all segments
+    size_t n = candidates ? idx.size() : segments.size();
+    std::vector<Vector3d> p(2*n); // segment end points
+    for (size_t j=0; j<n; j++) {
+        const Vector2i& s = segments.at(candidates ? idx[j] : j);
+        p[2*j] = nodes.at(s.x);
+        p[2*j+1] = nodes.at(s.y);
+    }
+    std::vector<double> dist = geometry->getDistances(p); // one batch
+    for (size_t j=0; j<n; j++) {
+        size_t i = candidates ? idx[j] : j;
         auto s = segments.at(i);
-        bool x_ = geometry->getDist(nodes.at(s.x))<=0; // in?
-        bool y_ = geometry->getDist(nodes.at(s.y))<=0; // in?
+        bool x_ = dist[2*j]<=0; // in?
+        bool y_ = dist[2*j+1]<=0; // in?
         if (x_ && y_) { //segment is inside
             seg.push_back(s);
             if (segO.size()>0) {
@@ -272,6 +330,7 @@ void SegmentAnalyser::crop(std::shared_ptr<SignedDistanceFunction> geometry)
     segments = seg;
     segO  = sO;
     data = ndata;
+    clearTree();
     //std::cout << " cropped to " << segments.size() << " segments " << "\n";
 }
 
@@ -293,6 +352,7 @@ void SegmentAnalyser::cropDomain(double xx, double yy, double zz)
  */
 void SegmentAnalyser::filter(std::string name, double min, double max)
 {
+    views.release();
     std::vector<double> d_ = getParameter(name);
     std::vector<Vector2i> seg;
     std::vector<std::weak_ptr<Organ>> sO;
@@ -312,6 +372,7 @@ void SegmentAnalyser::filter(std::string name, double min, double max)
     segments = seg;
     segO  = sO;
     data = ndata;
+    clearTree();
 }
 
 /**
@@ -323,6 +384,7 @@ void SegmentAnalyser::filter(std::string name, double min, double max)
  */
 void SegmentAnalyser::filter(std::string name, double value)
 {
+    views.release();
     std::vector<double> d_ = getParameter(name);
     std::vector<Vector2i> seg;
     std::vector<std::weak_ptr<Organ>> sO;
@@ -340,6 +402,7 @@ void SegmentAnalyser::filter(std::string name, double value)
     segments = seg;
     segO  = sO;
     data = ndata;
+    clearTree();
 }
 
 /**
@@ -349,6 +412,7 @@ void SegmentAnalyser::filter(std::string name, double value)
  * only delete segments, not unused nodes
  */
 void SegmentAnalyser::pack() {
+    views.release();
     std::vector<double> ni(nodes.size());
     std::fill(ni.begin(),ni.end(), -1.);
     std::vector<Vector3d> newnodes;
@@ -365,7 +429,7 @@ void SegmentAnalyser::pack() {
         s.y = ni.at(s.y);
     }
     // std::cout << "pack(): nodes: " << nodes.size() << " -> " << newnodes.size() << ", " << double(newnodes.size())/double(nodes.size()) << " \n";
-    nodes = newnodes; // kabum!
+    nodes = newnodes; // kabum! (the segment bounding boxes, i.e. the tree, are unchanged)
 }
 
 /**
@@ -408,22 +472,124 @@ double SegmentAnalyser::getSummed(std::string name) const {
  * on the segment mid point (i.e. not exact).
  *
  * To sum up exactly, crop to the geometry, and then run SegmentAnalyser::getSummed(name).
+ * If a tree was built (see buildTree) and the geometry is bounded, only segments within its bounding box are tested.
  *
  * @return Approximated sum of parameter @param name within the geometry @param g
  */
 double SegmentAnalyser::getSummed(std::string name, std::shared_ptr<SignedDistanceFunction> g) const {
-    std::vector<double> data = getParameter(name);
+    std::vector<int> idx;
+    if (!getCandidates(g, idx)) { // all segments
+        idx.resize(segments.size());
+        std::iota(idx.begin(), idx.end(), 0);
+    }
+    auto d = data.find(name);
+    bool geometric = (name=="length") || (name=="surface") || (name=="volume"); // computed per segment
+    std::vector<double> values;
+    if ((d==data.end()) && !geometric) { // organ parameter
+        values = getParameter(name);
+    }
+    std::vector<Vector3d> mid(idx.size()); // segment mid points
+    for (size_t j=0; j<idx.size(); j++) {
+        Vector2i s = segments.at(idx[j]);
+        mid[j] = nodes.at(s.x).plus(nodes.at(s.y)).times(0.5);
+    }
+    std::vector<double> dist = g->getDistances(mid); // one batch
     double v = 0;
-    for (size_t i=0; i<segments.size(); i++) {
-        Vector2i s = segments.at(i);
-        Vector3d mid = nodes.at(s.x).plus(nodes.at(s.y)).times(0.5);
-        if (g->getDist(mid)<0) {
-            v += data.at(i);
+    for (size_t j=0; j<idx.size(); j++) {
+        int i = idx[j];
+        if (dist[j]<0) {
+            if (d!=data.end()) {
+                v += d->second.at(i);
+            } else if (geometric) {
+                double l = getSegmentLength(i);
+                double a = (name=="length") ? 0. : data.at("radius").at(i);
+                v += (name=="length") ? l : ((name=="surface") ? 2*a*M_PI*l : a*a*M_PI*l);
+            } else {
+                v += values.at(i);
+            }
         }
     }
     return v;
 }
 
+/**
+ * Builds a bounding volume hierarchy (aabb tree) of the segment bounding boxes.
+ *
+ * The tree is used by crop, getSummed(name, geometry), and getSegmentsInBox to test only the segments
+ * near a bounded geometry, e.g. when sampling many soil cores. It is shared by copies of the analyser, and deleted by
+ * methods that change the segments (crop, filter, addSegments, mapPeriodic, map2D).
+ * Call clearTree() (or buildTree() again) after modifying nodes or segments directly.
+ */
+void SegmentAnalyser::buildTree()
+{
+    tree = std::make_shared<aabb::Tree>(3, 0., std::max(segments.size(), size_t(1)));
+    for (size_t i=0; i<segments.size(); i++) {
+        const Vector3d& a = nodes.at(segments[i].x);
+        const Vector3d& b = nodes.at(segments[i].y);
+        std::vector<double> lower = { std::min(a.x, b.x), std::min(a.y, b.y), std::min(a.z, b.z) };
+        std::vector<double> upper = { std::max(a.x, b.x), std::max(a.y, b.y), std::max(a.z, b.z) };
+        tree->insertParticle(i, lower, upper);
+    }
+    treeSize = segments.size();
+}
+
+/**
+ * @return true, if buildTree was called, and the segments did not change since
+ */
+bool SegmentAnalyser::hasTree() const
+{
+    return tree && (treeSize==segments.size());
+}
+
+/**
+ * Returns the indices of all segments, whose bounding boxes overlap with the box [min, max] (in ascending order).
+ * Uses the tree if available (see buildTree), otherwise all segments are tested.
+ *
+ * @param min   lower corner of the box [cm]
+ * @param max   upper corner of the box [cm]
+ */
+std::vector<int> SegmentAnalyser::getSegmentsInBox(Vector3d min, Vector3d max) const
+{
+    std::vector<int> idx;
+    if ((min.x>max.x) || (min.y>max.y) || (min.z>max.z)) { // empty box
+        return idx;
+    }
+    if (hasTree()) {
+        std::vector<double> lower = { min.x, min.y, min.z };
+        std::vector<double> upper = { max.x, max.y, max.z };
+        for (unsigned int i : tree->query(aabb::AABB(lower, upper))) {
+            idx.push_back(i);
+        }
+        std::sort(idx.begin(), idx.end());
+    } else {
+        for (size_t i=0; i<segments.size(); i++) {
+            const Vector3d& a = nodes.at(segments[i].x);
+            const Vector3d& b = nodes.at(segments[i].y);
+            if ((std::max(a.x, b.x)>=min.x) && (std::min(a.x, b.x)<=max.x) && (std::max(a.y, b.y)>=min.y) &&
+                (std::min(a.y, b.y)<=max.y) && (std::max(a.z, b.z)>=min.z) && (std::min(a.z, b.z)<=max.z)) {
+                idx.push_back(i);
+            }
+        }
+    }
+    return idx;
+}
+
+/**
+ * Candidate segments for a query with the geometry @param geometry, i.e. the segments within its bounding box
+ *
+ * @param idx       candidate segment indices (in ascending order)
+ * @return          false, if there is no tree, or the geometry is unbounded (i.e. all segments are candidates)
+ */
+bool SegmentAnalyser::getCandidates(const std::shared_ptr<SignedDistanceFunction>& geometry, std::vector<int>& idx) const
+{
+    Vector3d min, max;
+    if (!hasTree() || !geometry->getBoundingBox(min, max)) {
+        return false;
+    }
+    idx = getSegmentsInBox(min, max);
+    return true;
+}
+
 /**
  * A unconfined rootsystem is mapped into a periodic domain with period xx.
  *
@@ -447,6 +613,7 @@ void SegmentAnalyser::mapPeriodic(double xx, double yy) {
  * @param eps   accuracy at boundary
  */
 void SegmentAnalyser::mapPeriodic_(double xx, Vector3d axis, double eps) {
+    views.release();
     /* 1. split segments at the boundaries */
     std::vector<Vector2i> seg;
     std::vector<std::weak_ptr<Organ>> sO;
@@ -514,12 +681,14 @@ void SegmentAnalyser::mapPeriodic_(double xx, Vector3d axis, double eps) {
     for (auto& n : nodes) {
         n = n.minus(axis.times(floor((n.times(axis)+xx/2.)/xx)*xx));
     }
+    clearTree();
 }
 
 /**
  * Maps the 3d coordinates to the x-z plan (sqrt(x2+y2), 0., z)
  */
 void SegmentAnalyser::map2D() {
+    views.release();
 
     for (size_t i=0; i<segments.size(); i++) {
         if (nodes[segments[i].x].y!=0) { // not mapped before (initial segment of base root)
@@ -547,6 +716,7 @@ void SegmentAnalyser::map2D() {
             nodes[segments[i].y].y = 0.;
         }
     }
+    clearTree();
 }
 
 /**
@@ -588,6 +758,7 @@ SegmentAnalyser SegmentAnalyser::foto(const Vector3d& pos, const Matrix3d& ons,
     for (auto& n : f.nodes) {
         n = m.times(n);
     }
+    f.clearTree();
     //	// crop to objects in front of the camera
     Vector3d o(0.,0.,0.);
     Vector3d plane(0.,0., -1);
@@ -643,22 +814,10 @@ SegmentAnalyser SegmentAnalyser::cut(const SDF_HalfPlane& plane) const
  */
 std::vector<double> SegmentAnalyser::distribution(std::string name, double top, double bot, int n, bool exact) const
 {
-    std::vector<double> d(n);
     double dz = (top-bot)/double(n);
     assert(dz > 0 && "SegmentAnalyser::distribution: top must be larger than bot" );
-    std::shared_ptr<SignedDistanceFunction> layer = std::make_shared<SDF_PlantBox>(1e100,1e100,dz);
-    for (int i=0; i<n; i++) {
-        Vector3d t(0,0,top-i*dz);
-        auto g = std::make_shared<SDF_RotateTranslate>(layer,t);
-        if (exact) {
-            SegmentAnalyser a(*this); // copy everything
-            a.crop(g); // crop exactly
-            d.at(i) = a.getSummed(name);
-        } else {
-            d.at(i) = this->getSummed(name, g);
-        }
-    }
-    return d;
+    double inf = std::numeric_limits<double>::infinity();
+    return binned(name, Vector3d(-inf, -inf, bot), Vector3d(inf, inf, top), n, 1, 1, exact);
 }
 
 /**
@@ -699,30 +858,39 @@ std::vector<SegmentAnalyser> SegmentAnalyser::distribution(double top, double bo
  */
 std::vector<std::vector<double>> SegmentAnalyser::distribution2(std::string name, double top, double bot, double left, double right, int n, int m, bool exact) const
 {
-    std::vector<std::vector<double>> d(n);
     double dz = (top-bot)/double(n);
     assert(dz > 0 && "SegmentAnalyser::distribution2: top must be larger than bot" );
     double dx = (right-left)/double(m);
     assert(dx > 0 && "SegmentAnalyser::distribution2: right must be larger than left" );
-    std::shared_ptr<SignedDistanceFunction> layer = std::make_shared<SDF_PlantBox>(dx, 1.e9, dz);
+    double inf = std::numeric_limits<double>::infinity();
+    std::vector<double> v = binned(name, Vector3d(left, -inf, bot), Vector3d(right, inf, top), n, m, 1, exact);
+    std::vector<std::vector<double>> d(n);
     for (int i=0; i<n; i++) {
-        std::vector<double> row(m); // m columns
-        for (int j=0; j<m; j++) {
-            Vector3d t(left+(j+0.5)*dx,0.,top-i*dz); // box is [-x/2,-y/2,0] - [x/2,y/2,-z]
-            auto g = std::make_shared<SDF_RotateTranslate>(layer,t);
-            if (exact) {
-                SegmentAnalyser a(*this); // copy everything
-                a.crop(g); // crop exactly
-                row.at(j) = a.getSummed(name);
-            } else {
-                row.at(j) = this->getSummed(name, g);
-            }
-        }
-        d.at(i)=row; // store the row (n rows)
+        d.at(i) = std::vector<double>(v.begin()+i*m, v.begin()+(i+1)*m); // store the row (n rows)
     }
     return d;
 }
 
+/**
+ *  Creates a three-dimensional distribution of the parameter @param name.
+ *
+ * @param name      parameter name
+ * @param min       minimum of the box (cm)
+ * @param max       maximum of the box (cm)
+ * @param n         number of layers, each with a height of (max.z-min.z)/n, starting at the top
+ * @param m         number of grid elements along the x-axis
+ * @param k         number of grid elements along the y-axis
+ * @param exact     calculates the intersection with the grid boundaries (true), only based on segment midpoints (false)
+ * @return          vector of size n*m*k containing the summed parameter, the value of layer i, x-index j, and y-index l is at (i*m+j)*k+l
+ */
+std::vector<double> SegmentAnalyser::distribution3(std::string name, Vector3d min, Vector3d max, int n, int m, int k, bool exact) const
+{
+    assert((max.z>min.z) && "SegmentAnalyser::distribution3: max.z must be larger than min.z" );
+    assert((max.x>min.x) && "SegmentAnalyser::distribution3: max.x must be larger than min.x" );
+    assert((max.y>min.y) && "SegmentAnalyser::distribution3: max.y must be larger than min.y" );
+    return binned(name, min, max, n, m, k, exact);
+}
+
 /**
  *  Creates a vertical distribution
  *
@@ -753,6 +921,172 @@ std::vector<std::vector<SegmentAnalyser>> SegmentAnalyser::distribution2(double
     return d;
 }
 
+/**
+ * Creates a time resolved three-dimensional distribution of the parameter @param name, in a single pass over the segments.
+ *
+ * The distribution at time times[t] equals the distribution after filtering the segments to creationTime <= times[t],
+ * i.e. segments are binned into their first time slot and the slots are summed up cumulatively.
+ * Divide by the cell volume to obtain densities (e.g. root length density).
+ *
+ * @param name      parameter name
+ * @param times     ascending output times (day)
+ * @param min       minimum of the box (cm)
+ * @param max       maximum of the box (cm)
+ * @param n         number of layers, each with a height of (max.z-min.z)/n, starting at the top
+ * @param m         number of grid elements along the x-axis
+ * @param k         number of grid elements along the y-axis
+ * @param exact     calculates the intersection with the grid boundaries (true), only based on segment midpoints (false)
+ * @return          vector of size times.size()*n*m*k, the value of time t, layer i, x-index j, and y-index l is at ((t*n+i)*m+j)*k+l
+ */
+std::vector<double> SegmentAnalyser::distributionHistory(std::string name, std::vector<double> times, Vector3d min, Vector3d max,
+    int n, int m, int k, bool exact) const
+{
+    if (!std::is_sorted(times.begin(), times.end())) {
+        throw std::invalid_argument("SegmentAnalyser::distributionHistory: times must be in ascending order");
+    }
+    std::vector<double> ct = getParameter("creationTime");
+    std::vector<int> slots(segments.size());
+    for (size_t i=0; i<segments.size(); i++) { // first output time, the segment exists
+        int t = std::lower_bound(times.begin(), times.end(), ct[i]) - times.begin();
+        slots[i] = (t<times.size()) ? t : -1;
+    }
+    std::vector<double> d = binned(name, min, max, n, m, k, exact, slots, times.size());
+    int nc = n*m*k;
+    for (size_t i=nc; i<d.size(); i++) { // cumulative sum over time
+        d[i] += d[i-nc];
+    }
+    return d;
+}
+
+/**
+ * Creates a time resolved vertical distribution of the parameter @param name, @see SegmentAnalyser::distributionHistory
+ *
+ * @param name      parameter name
+ * @param times     ascending output times (day)
+ * @param top       vertical top position (cm) (normally = 0)
+ * @param bot       vertical bot position (cm) (e.g. = -100 cm)
+ * @param n         number of layers, each with a height of (top-bot)/n
+ * @param exact     calculates the intersection with the layer boundaries (true), only based on segment midpoints (false)
+ * @return          vector of size times.size()*n, the value of time t and layer i is at t*n+i
+ */
+std::vector<double> SegmentAnalyser::distributionHistory(std::string name, std::vector<double> times, double top, double bot, int n, bool exact) const
+{
+    double dz = (top-bot)/double(n);
+    assert(dz > 0 && "SegmentAnalyser::distributionHistory: top must be larger than bot" );
+    double inf = std::numeric_limits<double>::infinity();
+    return distributionHistory(name, times, Vector3d(-inf, -inf, bot), Vector3d(inf, inf, top), n, 1, 1, exact);
+}
+
+/**
+ * Sums up the parameter @param name in the cells of a rectangular grid, visiting each segment once.
+ *
+ * In exact mode the segments are clipped at the grid planes, the parameters "length", "surface", and "volume" are
+ * scaled by the clipped length, all other parameters are summed up in each cell the segment passes through
+ * (like SegmentAnalyser::crop followed by SegmentAnalyser::getSummed). Otherwise, the segment mid points are used.
+ * Bounds can be infinite, if the number of grid elements along this axis is 1.
+ *
+ * @param name      parameter name
+ * @param min       minimum of the box (cm)
+ * @param max       maximum of the box (cm)
+ * @param n         number of layers along the z-axis, starting at the top
+ * @param m         number of grid elements along the x-axis
+ * @param k         number of grid elements along the y-axis
+ * @param exact     clips the segments at the grid planes (true), only based on segment midpoints (false)
+ * @param slots     optional slot index per segment (-1 to skip the segment), e.g. to separate segments by their creation time
+ * @param nslots    number of slots
+ * @return          vector of size nslots*n*m*k, the value of slot s, layer i, x-index j, and y-index l is at ((s*n+i)*m+j)*k+l
+ */
+std::vector<double> SegmentAnalyser::binned(std::string name, Vector3d min, Vector3d max, int n, int m, int k, bool exact,
+    const std::vector<int>& slots, int nslots) const
+{
+    const double eps = 1.e-9; // [cm] minimal length of a clipped part
+    std::vector<double> d(nslots*n*m*k);
+    std::vector<double> v = getParameter(name);
+    bool scaled = exact && (data.count(name)==0) && ((name=="length") || (name=="surface") || (name=="volume"));
+    std::array<double,3> lo = { min.x, min.y, min.z };
+    std::array<double,3> hi = { max.x, max.y, max.z };
+    std::array<int,3> res = { m, k, n };
+    std::array<double,3> h;
+    for (int a=0; a<3; a++) {
+        h[a] = (hi[a]-lo[a])/double(res[a]);
+    }
+    auto cell = [&](const std::array<double,3>& p) { // linear index of the grid cell containing p, -1 if outside
+        std::array<int,3> i;
+        for (int a=0; a<3; a++) {
+            if ((p[a]<lo[a]) || (p[a]>hi[a])) {
+                return -1;
+            }
+            i[a] = (res[a]==1) ? 0 : std::min(std::max(int(std::floor((p[a]-lo[a])/h[a])), 0), res[a]-1);
+        }
+        return ((n-1-i[2])*m + i[0])*k + i[1]; // layers from top to bottom
+    };
+    std::vector<double> ts;
+    for (size_t si=0; si<segments.size(); si++) {
+        int offset = 0;
+        if (!slots.empty()) {
+            if (slots[si]<0) {
+                continue;
+            }
+            offset = slots[si]*n*m*k;
+        }
+        const Vector3d& n1 = nodes[segments[si].x];
+        const Vector3d& n2 = nodes[segments[si].y];
+        std::array<double,3> p0 = { n1.x, n1.y, n1.z };
+        std::array<double,3> dp = { n2.x-n1.x, n2.y-n1.y, n2.z-n1.z };
+        double l = std::sqrt(dp[0]*dp[0]+dp[1]*dp[1]+dp[2]*dp[2]);
+        if (!exact || (l==0.)) {
+            int c = cell({ p0[0]+0.5*dp[0], p0[1]+0.5*dp[1], p0[2]+0.5*dp[2] });
+            if (c>=0) {
+                d[offset+c] += v[si];
+            }
+            continue;
+        }
+        double t0 = 0., t1 = 1.; // clip to the box
+        for (int a=0; a<3; a++) {
+            if (dp[a]==0.) {
+                if ((p0[a]<lo[a]) || (p0[a]>hi[a])) {
+                    t1 = -1.;
+                }
+            } else {
+                double ta = (lo[a]-p0[a])/dp[a];
+                double tb = (hi[a]-p0[a])/dp[a];
+                t0 = std::max(t0, std::min(ta, tb));
+                t1 = std::min(t1, std::max(ta, tb));
+            }
+        }
+        if ((t1-t0)*l<eps) { // segment is outside
+            continue;
+        }
+        ts.clear(); // parameters of the intersections with the grid planes
+        ts.push_back(t0);
+        for (int a=0; a<3; a++) {
+            if ((res[a]>1) && (dp[a]!=0.)) {
+                double x0 = (p0[a]+t0*dp[a]-lo[a])/h[a];
+                double x1 = (p0[a]+t1*dp[a]-lo[a])/h[a];
+                int q0 = std::max(int(std::floor(std::min(x0, x1)))+1, 1);
+                int q1 = std::min(int(std::ceil(std::max(x0, x1)))-1, res[a]-1);
+                for (int q=q0; q<=q1; q++) {
+                    ts.push_back((lo[a]+q*h[a]-p0[a])/dp[a]);
+                }
+            }
+        }
+        ts.push_back(t1);
+        std::sort(ts.begin(), ts.end());
+        for (size_t i=0; i<ts.size()-1; i++) {
+            double dt = ts[i+1]-ts[i];
+            if (dt*l<eps) { // too short
+                continue;
+            }
+            double t = 0.5*(ts[i]+ts[i+1]);
+            int c = cell({ p0[0]+t*dp[0], p0[1]+t*dp[1], p0[2]+t*dp[2] });
+            if (c>=0) {
+                d[offset+c] += scaled ? dt*v[si] : v[si];
+            }
+        }
+    }
+    return d;
+}
+
 /**
  * Adds user data that can be accessed by SegmentAnalyser::getParameter, and that can be written to the VTP file
  * (e.g. used to add simulation results like xylem pressure to the output).
@@ -762,6 +1096,7 @@ std::vector<std::vector<SegmentAnalyser>> SegmentAnalyser::distribution2(double
  */
 void SegmentAnalyser::addData(std::string name, std::vector<double> values)
 {
+    views.release();
     if (values.size()== segments.size()) {
         data[name] = values;
     } else if (values.size()==nodes.size()) { // convert node to segment data
@@ -785,16 +1120,18 @@ void SegmentAnalyser::addData(std::string name, std::vector<double> values)
  * @param name      file name e.g. output.vtp
  * @param types 	Optionally, for vtp we can determine the cell data by a vector of parameter names
  *                  (default = { "radius", "subType", "creationTime", "organType" })
+ * @param format    encoding of the vtp data arrays (ascii, binary, or appended), @see VTPWriter
+ * @param compress  compresses binary vtp data arrays with zlib
  */
-void SegmentAnalyser::write(std::string name, std::vector<std::string> types)
+void SegmentAnalyser::write(std::string name, std::vector<std::string> types, int format, bool compress)
 {
     this->pack(); // a good idea before writing any file
     std::ofstream fos;
-    fos.open(name.c_str());
+    fos.open(name.c_str(), std::ios::binary);
     std::string ext = name.substr(name.size()-3,name.size()); // pick the right writer
     if (ext.compare("vtp")==0) {
         std::cout << "writing VTP: " << name << "\n" << std::flush;
-        this->writeVTP(fos, types);
+        this->writeVTP(fos, types, format, compress);
     } else if (ext.compare("txt")==0)  {
         std::cout << "writing text file for Matlab import: "<< name << "\n"<< std::flush;
         writeRBSegments(fos);
@@ -812,44 +1149,25 @@ void SegmentAnalyser::write(std::string name, std::vector<std::string> types)
  *
  * @param os        a file out stream
  * @param types     parameter names of the cell data  (default = { "radius", "subType", "creationTime", "organType" })
+ * @param format    encoding of the data arrays (ascii, binary, or appended), @see VTPWriter
+ * @param compress  compresses binary data arrays with zlib
  */
-void SegmentAnalyser::writeVTP(std::ostream & os, std::vector<std::string> types) const
+void SegmentAnalyser::writeVTP(std::ostream & os, std::vector<std::string> types, int format, bool compress) const
 {
-    os << "<?xml version=\"1.0\"?>";
-    os << "<VTKFile type=\"PolyData\" version=\"0.1\" byte_order=\"LittleEndian\">\n";
-    os << "<PolyData>\n";
-    os << "<Piece NumberOfLines=\""<< segments.size() << "\" NumberOfPoints=\""<< nodes.size()<< "\">\n";
-    // data (CellData)
-    os << "<CellData Scalars=\" CellData\">\n";
+    VTPWriter w(format, compress);
     for (auto name : types) {
-        std::vector<double> data = getParameter(name, -1.);
-        os << "<DataArray type=\"Float32\" Name=\"" << name << "\" NumberOfComponents=\"1\" format=\"ascii\" >\n";
-        for (const auto& t : data) {
-            os << t << " ";
-        }
-        os << "\n</DataArray>\n";
-    }
-    os << "\n</CellData>\n";
-    // nodes (Points)
-    os << "<Points>\n"<<"<DataArray type=\"Float32\" Name=\"Coordinates\" NumberOfComponents=\"3\" format=\"ascii\" >\n";
-    for (const auto& n : nodes) {
-        os << n.x << " "<< n.y <<" "<< n.z<< " ";
-    }
-    os << "\n</DataArray>\n"<< "</Points>\n";
-    // segments (Lines)
-    os << "<Lines>\n"<<"<DataArray type=\"Int32\" Name=\"connectivity\" NumberOfComponents=\"1\" format=\"ascii\" >\n";
-    for (const auto& s : segments) {
-        os << s.x << " " << s.y << " ";
+        w.addCellData(name, getParameter(name, -1.));
     }
-    os << "\n</DataArray>\n"<<"<DataArray type=\"Int32\" Name=\"offsets\" NumberOfComponents=\"1\" format=\"ascii\" >\n";
+    w.setPoints(nodes);
+    std::vector<int> connectivity(2*segments.size());
+    std::vector<int> offsets(segments.size());
     for (size_t i=0; i<segments.size(); i++) {
-        os << 2*i+2 << " ";
+        connectivity[2*i] = segments[i].x;
+        connectivity[2*i+1] = segments[i].y;
+        offsets[i] = 2*i+2;
     }
-    os << "\n</DataArray>\n";
-    os << "\n</Lines>\n";
-    //
-    os << "</Piece>\n";
-    os << "</PolyData>\n" << "</VTKFile>\n";
+    w.setLines(connectivity, offsets);
+    w.write(os);
 }
 
 /**
@@ -5,11 +5,15 @@
 #include "sdf.h"
 #include "Organ.h"
 #include "organparameter.h"
+#include "vtp_writer.h"
+#include "vector_views.h"
 
 #include <memory>
 #include <limits>
 #include <tuple>
 
+namespace aabb { class Tree; }
+
 namespace CPlantBox {
 
 class Organism;
@@ -17,6 +21,8 @@ class MappedSegments;
 
 /**
  * Meshfree analysis of the root system based on signed distance functions.
+ *
+ * Repeated spatial queries (crop, getSummed within a geometry) can be accelerated by a bounding volume hierarchy, see buildTree.
  */
 class SegmentAnalyser
 {
@@ -28,7 +34,7 @@ public:
     		const std::vector<double>& segCTs, const std::vector<double>& radii); ///< everything from scratch
     SegmentAnalyser(const Organism& plant); ///< creates an analyser object containing the segments from the organism @param plant
     SegmentAnalyser(const MappedSegments& plant); ///< creates an analyser object containing the segments from @param plant
-    virtual ~SegmentAnalyser() { }; ///< nothing to do here
+    virtual ~SegmentAnalyser() { views.release(false); }; ///< numpy arrays keep the nodes, segments, and data
 
     // merge segments
     void addSegments(const Organism& plant); ///< adds the segments
@@ -42,6 +48,12 @@ public:
     void filter(std::string name, double value); ///< filters the segments to the data @see AnalysisSDF::getParameter
     void pack(); ///< sorts the nodes and deletes unused nodes
 
+    // spatial index
+    void buildTree(); ///< builds a bounding volume hierarchy of the segments, speeds up repeated crop, getSummed, and getSegmentsInBox
+    void clearTree() { tree.reset(); columns.clear(); } ///< deletes the bounding volume hierarchy and the cached parameters (call after modifying nodes, segments, or segO directly)
+    bool hasTree() const; ///< true, if there is an up to date bounding volume hierarchy
+    std::vector<int> getSegmentsInBox(Vector3d min, Vector3d max) const; ///< indices of the segments with a bounding box overlapping [min, max]
+
     // some things we might want to know
     std::vector<double> getParameter(std::string name, double def = std::numeric_limits<double>::quiet_NaN()) const; ///< Returns a specific parameter per segment @see RootSystem::ScalarType
     double getSegmentLength(int i) const; ///< returns the length of a segment
@@ -51,7 +63,9 @@ public:
     std::vector<SegmentAnalyser> distribution(double top, double bot, int n) const; ///< vertical distribution
     std::vector<std::vector<double>> distribution2(std::string name, double top, double bot, double left, double right, int n, int m, bool exact=false) const; ///< 2d distribution (x,z) of a parameter
     std::vector<std::vector<SegmentAnalyser>> distribution2(double top, double bot, double left, double right, int n, int m) const; ///< 2d distribution (x,z)
-    // todo distribution3
+    std::vector<double> distribution3(std::string name, Vector3d min, Vector3d max, int n, int m, int k, bool exact=false) const; ///< 3d distribution of a parameter
+    std::vector<double> distributionHistory(std::string name, std::vector<double> times, double top, double bot, int n, bool exact=false) const; ///< time resolved vertical distribution
+    std::vector<double> distributionHistory(std::string name, std::vector<double> times, Vector3d min, Vector3d max, int n, int m, int k, bool exact=false) const; ///< time resolved 3d distribution
 
     // rather specialized things we want to know
     void mapPeriodic(double xx, double yy); /// maps into a periodic domain, splits up intersecting segments
@@ -66,14 +80,17 @@ public:
     void addData(std::string name, std::vector<double> data); ///< adds user data that are written into the VTP file, @see SegmentAnalyser::writeVTP
 
     // some exports
-    void write(std::string name, std::vector<std::string>  types = { "radius", "subType", "creationTime", "organType" }); ///< writes simulation results (type is determined from file extension in name)
-    void writeVTP(std::ostream & os, std::vector<std::string>  types = { "radius", "subType", "creationTime", "organType"  }) const; ///< writes a VTP file
+    void write(std::string name, std::vector<std::string>  types = { "radius", "subType", "creationTime", "organType" },
+        int format = VTPWriter::vtk_ascii, bool compress = false); ///< writes simulation results (type is determined from file extension in name)
+    void writeVTP(std::ostream & os, std::vector<std::string>  types = { "radius", "subType", "creationTime", "organType"  },
+        int format = VTPWriter::vtk_ascii, bool compress = false) const; ///< writes a VTP file
     void writeRBSegments(std::ostream & os) const; ///< Writes the segments of the root system, mimics the Matlab script getSegments()
     void writeDGF(std::ostream & os) const; ///< Writes the segments of the root system in DGF format used by DuMux
 
     // auxiliary
     static Vector3d cut(Vector3d in, Vector3d out, const std::shared_ptr<SignedDistanceFunction>& geometry, double eps = 1.e-6); ///< intersects a line with  the geometry
 
+    VectorViews views; ///< storage of nodes, segments, and data viewed by numpy arrays, call views.release() before modifying them directly
     std::vector<Vector3d> nodes; ///< nodes
     std::vector<Vector2i> segments; ///< connectivity of the nodes
     std::vector<std::weak_ptr<Organ>> segO; ///< to look up things
@@ -82,6 +99,19 @@ public:
 protected:
 
     void mapPeriodic_(double xx, Vector3d axis, double eps);
+    bool getCandidates(const std::shared_ptr<SignedDistanceFunction>& geometry, std::vector<int>& idx) const; ///< segments that might intersect the geometry
+    std::vector<double> binned(std::string name, Vector3d min, Vector3d max, int n, int m, int k, bool exact,
+        const std::vector<int>& slots = std::vector<int>(), int nslots = 1) const; ///< sums up a parameter on a rectangular grid (single pass)
+
+    std::shared_ptr<aabb::Tree> tree; // bounding boxes of the segments (optional, see buildTree), shared by copies
+    size_t treeSize = 0; // number of segments in the tree
+
+    struct Column {
+        std::vector<double> values; // parameter value per segment
+        double def; // default value used for expired origins
+        std::vector<std::pair<std::weak_ptr<Organism>, int>> revisions; // organisms of the origins and their revisions (@see Organism::getRevision)
+    };
+    mutable std::map<std::string, Column> columns; // organ parameters per segment, cached by getParameter, cleared by clearTree
 
 };
 
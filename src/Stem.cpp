@@ -3,11 +3,10 @@
 #include "Leaf.h"
 #include "Root.h"
 #include "Plant.h"
+#include "binary_io.h"
 
 namespace CPlantBox {
 
-std::vector<int> Stem::phytomerId = {0, 0, 0, 0, 0, 0, 0, 0, 0, 0};
-
 /**
  * Constructs a root from given data.
  * The organ tree must be created, @see Organ::setPlant, Organ::setParent, Organ::addChild
@@ -659,6 +658,38 @@ std::shared_ptr<Plant> Stem::getPlant() {
 	return std::static_pointer_cast<Plant>(plant.lock());
 }
 
+/**
+ * The phytomer counters are part of the plant, i.e. each plant counts its own phytomers.
+ * Stems of an organism that is not a Plant have no counter (always 0).
+ */
+void Stem::minusPhytomerId(int subtype)
+{
+	auto p = std::dynamic_pointer_cast<Plant>(plant.lock());
+	if (p) {
+		p->stemphytomerID[subtype]--;
+	}
+}
+
+/**
+ *
+ */
+int Stem::getphytomerId(int subtype)
+{
+	auto p = std::dynamic_pointer_cast<Plant>(plant.lock());
+	return p ? p->stemphytomerID[subtype] : 0;
+}
+
+/**
+ *
+ */
+void Stem::addPhytomerId(int subtype)
+{
+	auto p = std::dynamic_pointer_cast<Plant>(plant.lock());
+	if (p) {
+		p->stemphytomerID[subtype]++;
+	}
+}
+
 
 /**
  *
@@ -700,4 +731,22 @@ std::string Stem::toString() const
 
 
 
+/**
+ * Writes the data of the stem that are not part of Organ::writeState
+ */
+void Stem::writeState_(std::ostream& os) const
+{
+	writeBinary(os, firstCall);
+	writeBinary(os, shootborneType);
+}
+
+/**
+ * Reads the data written by Stem::writeState_
+ */
+void Stem::readState_(std::istream& is)
+{
+	readBinary(is, firstCall);
+	readBinary(is, shootborneType);
+}
+
 } // namespace CPlantBox
@@ -23,8 +23,6 @@ class Stem : public Organ
 {
 public:
 
-    static std::vector<int> phytomerId;
-
     Stem(int id,  std::shared_ptr<const OrganSpecificParameter> param, bool alive, bool active, double age, double length,
         Vector3d iheading, double pbl, int pni, bool moved = false, int oldNON = 0);
     Stem(std::shared_ptr<Organism> plant, int type, Vector3d iheading, double delay, std::shared_ptr<Organ> parent, double pbl, int pni); ///< used within simulation
@@ -55,9 +53,12 @@ public:
 
 protected:
 
-    void minusPhytomerId(int subtype) { phytomerId[subtype]--;  }
-    int getphytomerId(int subtype) { return phytomerId[subtype]; }
-    void addPhytomerId(int subtype) { phytomerId[subtype]++;  }
+    void writeState_(std::ostream& os) const override; ///< writes the data that are not part of Organ::writeState
+    void readState_(std::istream& is) override; ///< reads the data written by writeState_
+
+    void minusPhytomerId(int subtype);
+    int getphytomerId(int subtype);
+    void addPhytomerId(int subtype);
 
     void createLateral(bool silence); ///< creates a new lateral, called by Stem::simulate()
     void leafGrow(bool silence, Vector3d bud);
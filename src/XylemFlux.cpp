@@ -3,6 +3,12 @@
 
 #include <algorithm>
 #include <set>
+#ifdef _OPENMP
+#include <omp.h>
+#else
+inline int omp_get_num_threads() { return 1; }
+inline int omp_get_thread_num() { return 0; }
+#endif
 
 namespace CPlantBox {
 	
@@ -31,91 +37,757 @@ void XylemFlux::linearSystem(double simTime, const std::vector<double>& sx, bool
 {
 	
 	int Ns = rs->segments.size(); // number of segments
-	aI.resize(4*Ns);
-	aJ.resize(4*Ns);
+	if (aI.size()!=4*Ns) { // the sparsity pattern aI, aJ is only rewritten if the segments change
+		aI.resize(4*Ns);
+		aJ.resize(4*Ns);
+		std::fill(aI.begin(), aI.end(), -1);
+		std::fill(aJ.begin(), aJ.end(), -1);
+		resetPattern();
+	}
 	aV.resize(4*Ns);
 	int N = rs->nodes.size(); // number of nodes
-	aB.resize(N);
+	if (aB.size()!=N) {
+		aB.resize(N);
+		resetPattern();
+	}
 	std::fill(aB.begin(), aB.end(), 0.);
-	std::fill(aV.begin(), aV.end(), 0.);
-	std::fill(aI.begin(), aI.end(), 0);
-	std::fill(aJ.begin(), aJ.end(), 0);
+	updateCoefficients(simTime, soil_k);
 	size_t k=0;
-	size_t numleaf = 0;
 	for (int si = 0; si<Ns; si++) {
 
 		int i = rs->segments[si].x;
 		int j = rs->segments[si].y;
 
-		double psi_s;
-		int organType = rs->organTypes[si];
-		if (cells) { // soil matric potential given per cell
-			int cellIndex = rs->seg2cell[j-1];
-			if (cellIndex>=0) {
-				if(sx.size()>1){psi_s = sx.at(cellIndex);}
-				else{psi_s = sx.at(0);}
-			} else {
-				psi_s = airPressure;
-			}
-		} else {
-			psi_s = sx.at(j-1); // j-1 = segIdx = s.y-1
+		double psi_s = soilMatricPotential(si, sx, cells);
+		double cii = segCii[si]; // Eqn (16)
+		double cij = segCij[si]; // Eqn (17)
+		double bi = segKx[si] * segVz[si]; //  # Eqn 18
+
+		if ((aI[k]!=i) || (aJ[k+1]!=j)) { // pattern changed
+			aI[k] = i; aJ[k] = i;
+			aI[k+1] = i; aJ[k+1] = j;
+			aI[k+2] = j; aJ[k+2] = j;
+			aI[k+3] = j; aJ[k+3] = i;
+			resetPattern();
 		}
+
+		aB[i] += ( bi + cii * psi_s +cij * psi_s) ;
+		aV[k] = cii;
+		k += 1;
+		aV[k] = cij;
+		k += 1;
+
+		aB[j] += ( -bi + cii * psi_s +cij * psi_s) ; // edge ji, (-bi) Eqn (14) with changed sign
+		aV[k] = cii;
+		k += 1;
+		aV[k] = cij;
+		k += 1;
+	}
+}
+
+/**
+ * Updates the per segment coefficients of the hybrid solver (segKx, segKr, segL, segVz, segCii, segCij, segCf).
+ *
+ * Conductivities and segment lengths are evaluated for each segment, the exponential terms are only
+ * recomputed if one of them (or the radius) changed since the last call, i.e. for new segments,
+ * growing segments, and segments with age dependent conductivities that changed.
+ *
+ * @param simTime[day]  	current simulation time, needed for age dependent conductivities
+ * @param soil_k [day-1]    optionally, soil conductivities per segment, limiting kr
+ */
+void XylemFlux::updateCoefficients(double simTime, const std::vector<double>& soil_k)
+{
+	int Ns = rs->segments.size(); // number of segments
+	if (segKx.size()!=Ns) {
+		segKx.resize(Ns, -1.); // invalid key, i.e. new segments are always computed
+		segKr.resize(Ns, -1.);
+		segA.resize(Ns, -1.);
+		segL.resize(Ns, -1.);
+		segVz.resize(Ns);
+		segCii.resize(Ns);
+		segCij.resize(Ns);
+		segCf.resize(Ns);
+	}
+	size_t numleaf = 0;
+	int shortSegs = 0; // number of newly clamped segment lengths
+	for (int si = 0; si<Ns; si++) {
+
+		int i = rs->segments[si].x;
+		int j = rs->segments[si].y;
+		int organType = rs->organTypes[si];
 		double a = rs->radii[si]; // si is correct, with ordered and unordered segmetns
 		double age = simTime - rs->nodeCTs[j];
 		int subType = rs->subTypes[si];
 		double kx = 0.;
 		double  kr = 0.;
-
-		
 		try {
 			kx = kx_f(age, subType, organType);
 			kr = kr_f(age, subType, organType, numleaf);
 		} catch(...) {
-			std::cout << "\n XylemFlux::linearSystem: conductivities failed" << std::flush;
+			std::cout << "\n XylemFlux::updateCoefficients: conductivities failed" << std::flush;
 			std::cout  << "\n organ type "<<organType<< " subtype " << subType <<std::flush;
 		}
 		if(organType == 4){numleaf +=1;}
-		//        if (age<=0) {
-		//            std::cout << si << ", " << j <<" age leq 0 " << age << ", " << kx <<  ", " << kr << ", time "<< simTime << ", " << rs->nodeCTs[j] << "\n";
-		//        }
 		if (soil_k.size()>0) {
 			kr = std::min(kr, soil_k[si]);
 		}
 
-		auto n1 = rs->nodes[i];
-		auto n2 = rs->nodes[j];
-		auto v = n2.minus(n1);
+		auto v = rs->nodes[j].minus(rs->nodes[i]);
 		double l = v.length();
-		if (l<1.e-5) {
-			std::cout << "segment length smaller 1.e-5 \n"; // quick fix?
+		if (l<1.e-5) { // quick fix?
+			if (segL[si]!=1.e-5) { // only report segments that were not clamped before
+				shortSegs++;
+			}
 			l = 1.e-5;
 		}
-		double vz = v.z / l; // normed direction
+		segVz[si] = v.z / l; // normed direction
 
-		double tau = std::sqrt(2.*a * M_PI * kr / kx); // Eqn (2)
-		double delta = std::exp(-tau * l) - std::exp(tau * l); // Eqn (5)
-		double idelta = 1. / delta;
+		if ((kx!=segKx[si]) || (kr!=segKr[si]) || (a!=segA[si]) || (l!=segL[si])) { // recompute coefficients
+			segKx[si] = kx;
+			segKr[si] = kr;
+			segA[si] = a;
+			segL[si] = l;
+			double tau = std::sqrt(2.*a * M_PI * kr / kx); // Eqn (2)
+			double ep = std::exp(tau * l);
+			double em = std::exp(-tau * l);
+			double delta = em - ep; // Eqn (5)
+			double idelta = 1. / delta;
+			segCii[si] = -kx * idelta * tau * (em + ep); // Eqn (16)
+			segCij[si] = 2 * kx * idelta * tau;  // Eqn 17
+			segCf[si] = 2*a*M_PI*kr*(1./(tau*delta))*(2.-em-ep); // exact radial flux per pressure difference
+		}
+	}
+	if (shortSegs>0) {
+		std::cout << "XylemFlux::updateCoefficients: " << shortSegs << " segment length(s) smaller 1.e-5, set to 1.e-5 \n";
+	}
+}
 
-		double cii = -kx * idelta * tau * (std::exp(-tau * l) + std::exp(tau * l)); // Eqn (16)
-		double cij = 2 * kx * idelta * tau;  // Eqn 17
-		double bi = kx * vz; //  # Eqn 18
+/**
+ * Soil matric potential around segment @param si
+ *
+ * @param sx [cm]			soil matric potential in the cells or around the segments, given per cell or per segment
+ * @param cells 			sx per cell (true), or segments (false)
+ */
+double XylemFlux::soilMatricPotential(int si, const std::vector<double>& sx, bool cells) const
+{
+	int j = rs->segments[si].y;
+	if (cells) { // soil matric potential given per cell
+		int cellIndex = rs->seg2cell.at(j-1);
+		if (cellIndex>=0) {
+			if(sx.size()>1) {
+				return sx.at(cellIndex);
+			} else {
+				return sx.at(0);
+			}
+		} else {
+			return airPressure;
+		}
+	} else {
+		return sx.at(j-1); // j-1 = segIdx = s.y-1
+	}
+}
 
-		aB[i] += ( bi + cii * psi_s +cij * psi_s) ;
-		aI[k] = i; aJ[k]= i; aV[k] = cii;
-		k += 1;
-		aI[k] = i; aJ[k] = j;  aV[k] = cij;
-		k += 1;
+/**
+ * Assembles and solves the linear system in C++, avoiding the conversion of aI, aJ, aV, and aB to Python,
+ * see also XylemFluxPython.solve_neumann, and XylemFluxPython.solve_dirichlet
+ *
+ * @param simTime[day]  	current simulation time, needed for age dependent conductivities
+ * @param sx [cm]			soil matric potential in the cells or around the segments, given per cell or per segment
+ * @param bcType 			boundary condition type (bc_neumann, or bc_dirichlet)
+ * @param bcNodes 			node indices where the boundary conditions are applied
+ * @param bcValues 			Neumann values [cm3 day-1], or Dirichlet values [cm], per boundary node
+ * @param cells 			sx per cell (true), or segments (false)
+ * @param soil_k [day-1]    optionally, soil conductivities can be prescribed per segment, @see XylemFlux::linearSystem
+ *
+ * @return root xylem pressure per root system node [cm]
+ */
+std::vector<double> XylemFlux::solve(double simTime, const std::vector<double>& sx, int bcType, const std::vector<int>& bcNodes,
+		const std::vector<double>& bcValues, bool cells, const std::vector<double> soil_k)
+{
+	linearSystem(simTime, sx, cells, soil_k);
+	return solveLinearSystem(bcType, bcNodes, bcValues);
+}
 
-		int ii = i;
-		i = j;  j = ii; // edge ji
-		aB[i] += ( -bi + cii * psi_s +cij * psi_s) ; // (-bi) Eqn (14) with changed sign
-		aI[k] = i; aJ[k]= i; aV[k] = cii;
-		k += 1;
-		aI[k] = i; aJ[k] = j;  aV[k] = cij;
-		k += 1;
+/**
+ * Solves the linear system that was assembled by the last call of XylemFlux::linearSystem,
+ * e.g. to switch from Neumann to Dirichlet boundary conditions without assembling the system again.
+ *
+ * The sparsity pattern, and the fill reducing ordering and symbolic factorization are cached,
+ * and are only recalculated if the segments change, otherwise only the numeric factorization is done.
+ *
+ * @param bcType 			boundary condition type (bc_neumann, or bc_dirichlet)
+ * @param bcNodes 			node indices where the boundary conditions are applied
+ * @param bcValues 			Neumann values [cm3 day-1], or Dirichlet values [cm], per boundary node
+ *
+ * @return root xylem pressure per root system node [cm]
+ */
+std::vector<double> XylemFlux::solveLinearSystem(int bcType, const std::vector<int>& bcNodes, const std::vector<double>& bcValues)
+{
+	if (bcNodes.size()!=bcValues.size()) {
+		throw std::invalid_argument("XylemFlux::solveLinearSystem: number of boundary nodes and boundary values must be equal");
+	}
+	if (solver==st_tree) {
+		return treeSolve(bcType, bcNodes, bcValues);
+	}
+	assembleCSR();
+	std::vector<double> b = aB;
+	applyBC(bcType, bcNodes, bcValues, b);
+	if (solver==st_ldlt) {
+		if (!symbolicValid) {
+			analyse();
+		}
+		factorize();
+		ldltSolve(b);
+		return b;
+	} else {
+		return pcg(b);
 	}
 }
 
+/**
+ * Solves the linear system for many scenarios of soil matric potentials and boundary values at once.
+ * The system matrix does not depend on the soil matric potential, it is assembled and factorized once (LDL^T),
+ * and all right hand sides are solved together.
+ *
+ * @param simTime[day]  	current simulation time, needed for age dependent conductivities
+ * @param sx [cm]			soil matric potentials per scenario, given per cell or per segment
+ * @param bcType 			boundary condition type (bc_neumann, or bc_dirichlet)
+ * @param bcNodes 			node indices where the boundary conditions are applied
+ * @param bcValues 			boundary value per scenario, Neumann values [cm3 day-1] are split equally over the bcNodes
+ * 							(like XylemFluxPython.solve_neumann), Dirichlet values [cm] are prescribed at all bcNodes
+ * @param cells 			sx per cell (true), or segments (false)
+ * @param soil_k [day-1]    optionally, soil conductivities can be prescribed per segment, @see XylemFlux::linearSystem
+ *
+ * @return root xylem pressure per scenario and root system node [cm]
+ */
+std::vector<std::vector<double>> XylemFlux::solveBatch(double simTime, const std::vector<std::vector<double>>& sx, int bcType,
+		const std::vector<int>& bcNodes, const std::vector<double>& bcValues, bool cells, const std::vector<double> soil_k)
+{
+	int m = sx.size();
+	if (bcValues.size()!=m) {
+		throw std::invalid_argument("XylemFlux::solveBatch: number of scenarios and boundary values must be equal");
+	}
+	if (m==0) {
+		return std::vector<std::vector<double>>(0);
+	}
+	linearSystem(simTime, sx[0], cells, soil_k);
+	assembleCSR();
+	int N = aB.size();
+	int Ns = rs->segments.size();
+	std::vector<int> sxIdx(Ns); // index into sx per segment (-1 for air)
+	std::vector<double> psi0(Ns); // matric potentials of the assembled scenario
+	for (int si = 0; si<Ns; si++) {
+		if (cells) {
+			int cellIndex = rs->seg2cell.at(rs->segments[si].y-1);
+			sxIdx[si] = (cellIndex>=0) ? ((sx[0].size()>1) ? cellIndex : 0) : -1;
+		} else {
+			sxIdx[si] = rs->segments[si].y-1;
+		}
+		psi0[si] = soilMatricPotential(si, sx[0], cells);
+	}
+	std::vector<double> X(N*m); // all right hand sides, node major
+	std::vector<double> b(N);
+	std::vector<double> nodeValues(bcNodes.size());
+	for (int s = 0; s<m; s++) {
+		b = aB;
+		if (s>0) { // load depends linearly on the matric potential
+			const auto& sx_ = sx[s];
+			for (int si = 0; si<Ns; si++) {
+				double psi_s = (sxIdx[si]>=0) ? sx_.at(sxIdx[si]) : airPressure;
+				double dpsi = psi_s - psi0[si];
+				if (dpsi!=0.) {
+					int k = 4*si;
+					b[aI[k]] += (aV[k]+aV[k+1])*dpsi;
+					b[aI[k+2]] += (aV[k+2]+aV[k+3])*dpsi;
+				}
+			}
+		}
+		double v = (bcType==bc_neumann) ? bcValues[s]/bcNodes.size() : bcValues[s];
+		std::fill(nodeValues.begin(), nodeValues.end(), v);
+		applyBC(bcType, bcNodes, nodeValues, b, false); // load only
+		for (int i=0; i<N; i++) {
+			X[i*m+s] = b[i];
+		}
+	}
+	applyBC(bcType, bcNodes, nodeValues, b, true); // matrix
+	if (!symbolicValid) {
+		analyse();
+	}
+	factorize();
+	ldltSolve(X, m);
+	std::vector<std::vector<double>> x(m, std::vector<double>(N));
+	for (int i=0; i<N; i++) {
+		for (int s = 0; s<m; s++) {
+			x[s][i] = X[i*m+s];
+		}
+	}
+	return x;
+}
+
+/**
+ * Converts the sparse matrix given in coordinate format (aI, aJ, aV) into the compressed sparse row format (csrPtr, csrCol, csrVal),
+ * duplicate entries are summed up (like scipy.sparse.csr_matrix).
+ *
+ * The pattern (csrPtr, csrCol, csrMap) is only rebuilt if aI or aJ changed, otherwise only the values are summed up.
+ */
+void XylemFlux::assembleCSR()
+{
+	if (!csrValid) {
+		int N = rs->nodes.size();
+		csrPtr.assign(N+1, 0);
+		for (int i : aI) { // count entries per row
+			csrPtr[i+1]++;
+		}
+		for (int i=0; i<N; i++) {
+			csrPtr[i+1] += csrPtr[i];
+		}
+		std::vector<int> next(csrPtr.begin(), csrPtr.end()-1);
+		std::vector<int> entry(aI.size()); // coordinate entry k at each position
+		csrCol.resize(aI.size());
+		for (size_t k=0; k<aI.size(); k++) {
+			int c = next[aI[k]]++;
+			csrCol[c] = aJ[k];
+			entry[c] = k;
+		}
+		csrMap.resize(aI.size());
+		int c = 0; // sort each row by column, and merge duplicates
+		int start = 0;
+		for (int i=0; i<N; i++) {
+			int end = csrPtr[i+1];
+			for (int k = start+1; k<end; k++) { // insertion sort (rows are short)
+				int col = csrCol[k];
+				int e = entry[k];
+				int l = k-1;
+				while ((l>=start) && (csrCol[l]>col)) {
+					csrCol[l+1] = csrCol[l];
+					entry[l+1] = entry[l];
+					l--;
+				}
+				csrCol[l+1] = col;
+				entry[l+1] = e;
+			}
+			csrPtr[i] = c;
+			for (int k = start; k<end; k++) {
+				if ((c>csrPtr[i]) && (csrCol[c-1]==csrCol[k])) {
+					csrMap[entry[k]] = c-1;
+				} else {
+					csrCol[c] = csrCol[k];
+					csrMap[entry[k]] = c;
+					c++;
+				}
+			}
+			start = end;
+		}
+		csrPtr[N] = c;
+		csrCol.resize(c);
+		csrValid = true;
+		symbolicValid = false;
+	}
+	csrVal.assign(csrCol.size(), 0.);
+	for (size_t k=0; k<aV.size(); k++) {
+		csrVal[csrMap[k]] += aV[k];
+	}
+}
+
+/**
+ * Applies boundary conditions to the CSR matrix and to the load @param b.
+ * Dirichlet nodes are eliminated symmetrically, so that the matrix stays symmetric.
+ *
+ * @param bcType 			boundary condition type (bc_neumann, or bc_dirichlet)
+ * @param bcNodes 			node indices where the boundary conditions are applied
+ * @param bcValues 			Neumann values [cm3 day-1], or Dirichlet values [cm], per boundary node
+ * @param b 				load vector, is changed accordingly
+ * @param matrix 			changes the matrix (true), or only the load (false), the load must be changed before the matrix
+ */
+void XylemFlux::applyBC(int bcType, const std::vector<int>& bcNodes, const std::vector<double>& bcValues, std::vector<double>& b, bool matrix)
+{
+	if (bcType==bc_neumann) {
+		for (size_t c=0; c<bcNodes.size(); c++) {
+			b.at(bcNodes[c]) += bcValues[c];
+		}
+	} else if (bcType==bc_dirichlet) {
+		int N = b.size();
+		std::vector<bool> isDirichlet(N, false);
+		std::vector<double> d(N, 0.);
+		for (size_t c=0; c<bcNodes.size(); c++) {
+			isDirichlet.at(bcNodes[c]) = true;
+			d[bcNodes[c]] = bcValues[c];
+		}
+		for (int i=0; i<N; i++) {
+			for (int k=csrPtr[i]; k<csrPtr[i+1]; k++) {
+				int j = csrCol[k];
+				if (isDirichlet[i]) { // identity row
+					if (matrix) {
+						csrVal[k] = (i==j) ? 1. : 0.;
+					}
+				} else if (isDirichlet[j]) { // move column to the right hand side
+					b[i] -= csrVal[k]*d[j];
+					if (matrix) {
+						csrVal[k] = 0.;
+					}
+				}
+			}
+			if (isDirichlet[i]) {
+				b[i] = d[i];
+			}
+		}
+	} else {
+		throw std::invalid_argument("XylemFlux::applyBC: unknown boundary condition type "+std::to_string(bcType));
+	}
+}
+
+/**
+ * Solves the symmetric CSR system with the load @param b by Jacobi preconditioned conjugate gradients,
+ * throws a std::runtime_error if the relative residual does not reach solverTol within solverMaxIter iterations
+ *
+ * @return solution vector
+ */
+std::vector<double> XylemFlux::pcg(const std::vector<double>& b)
+{
+	int N = b.size();
+	int maxIter = (solverMaxIter>0) ? solverMaxIter : 10*N;
+	std::vector<double> idiag(N, 1.);
+	for (int i=0; i<N; i++) {
+		for (int k=csrPtr[i]; k<csrPtr[i+1]; k++) {
+			if ((csrCol[k]==i) && (csrVal[k]!=0.)) {
+				idiag[i] = 1./csrVal[k];
+			}
+		}
+	}
+	std::vector<double> x(N, 0.), r = b, z(N), p(N), q(N);
+	double bnorm = 0.;
+	for (int i=0; i<N; i++) {
+		bnorm += b[i]*b[i];
+	}
+	bnorm = std::sqrt(bnorm);
+	solverIterations = 0;
+	if (bnorm==0.) {
+		return x;
+	}
+	double rz = 0.;
+	for (int i=0; i<N; i++) {
+		z[i] = idiag[i]*r[i];
+		p[i] = z[i];
+		rz += r[i]*z[i];
+	}
+	double rnorm = bnorm;
+	while ((rnorm>solverTol*bnorm) && (solverIterations<maxIter)) {
+		double pq = 0.;
+		for (int i=0; i<N; i++) { // q = A*p
+			double s = 0.;
+			for (int k=csrPtr[i]; k<csrPtr[i+1]; k++) {
+				s += csrVal[k]*p[csrCol[k]];
+			}
+			q[i] = s;
+			pq += p[i]*s;
+		}
+		double alpha = rz/pq;
+		double rz_new = 0.;
+		rnorm = 0.;
+		for (int i=0; i<N; i++) {
+			x[i] += alpha*p[i];
+			r[i] -= alpha*q[i];
+			z[i] = idiag[i]*r[i];
+			rz_new += r[i]*z[i];
+			rnorm += r[i]*r[i];
+		}
+		rnorm = std::sqrt(rnorm);
+		double beta = rz_new/rz;
+		rz = rz_new;
+		for (int i=0; i<N; i++) {
+			p[i] = z[i] + beta*p[i];
+		}
+		solverIterations++;
+	}
+	if (!(rnorm<=solverTol*bnorm)) { // including NaN
+		throw std::runtime_error("XylemFlux::pcg: did not converge after "+std::to_string(solverIterations)+
+			" iterations, relative residual "+std::to_string(rnorm/bnorm));
+	}
+	return x;
+}
+
+/**
+ * Fill reducing ordering and symbolic LDL^T factorization of the CSR pattern (following Davis' LDL package).
+ *
+ * The nodes are ordered in reverse breadth first order starting at node 0, i.e. children are eliminated before their parents,
+ * which produces no fill in for the tree like root system.
+ */
+void XylemFlux::analyse()
+{
+	int N = csrPtr.size()-1;
+	std::vector<int> order; // breadth first search
+	order.reserve(N);
+	std::vector<bool> visited(N, false);
+	for (int s = 0; s<N; s++) { // all connected components
+		if (!visited[s]) {
+			size_t head = order.size();
+			order.push_back(s);
+			visited[s] = true;
+			while (head<order.size()) {
+				int i = order[head++];
+				for (int k=csrPtr[i]; k<csrPtr[i+1]; k++) {
+					int j = csrCol[k];
+					if (!visited[j]) {
+						visited[j] = true;
+						order.push_back(j);
+					}
+				}
+			}
+		}
+	}
+	perm.resize(N);
+	pinv.resize(N);
+	for (int k=0; k<N; k++) {
+		perm[k] = order[N-1-k];
+		pinv[perm[k]] = k;
+	}
+	etree.assign(N, -1);
+	std::vector<int> flag(N), lnz(N, 0);
+	for (int k=0; k<N; k++) { // elimination tree and column counts
+		flag[k] = k;
+		int row = perm[k];
+		for (int p=csrPtr[row]; p<csrPtr[row+1]; p++) {
+			int i = pinv[csrCol[p]];
+			if (i<k) {
+				for (; flag[i]!=k; i = etree[i]) {
+					if (etree[i]==-1) {
+						etree[i] = k;
+					}
+					lnz[i]++;
+					flag[i] = k;
+				}
+			}
+		}
+	}
+	Lp.assign(N+1, 0);
+	for (int k=0; k<N; k++) {
+		Lp[k+1] = Lp[k]+lnz[k];
+	}
+	Li.resize(Lp[N]);
+	Lx.resize(Lp[N]);
+	D.resize(N);
+	symbolicValid = true;
+}
+
+/**
+ * Numeric LDL^T factorization of the CSR matrix, using the symbolic factorization (@see XylemFlux::analyse)
+ */
+void XylemFlux::factorize()
+{
+	int N = csrPtr.size()-1;
+	std::vector<double> y(N, 0.);
+	std::vector<int> pattern(N), flag(N), lnz(N, 0);
+	for (int k=0; k<N; k++) {
+		int top = N;
+		flag[k] = k;
+		int row = perm[k];
+		for (int p=csrPtr[row]; p<csrPtr[row+1]; p++) { // scatter column k into y
+			int i = pinv[csrCol[p]];
+			if (i<=k) {
+				y[i] += csrVal[p];
+				int len = 0;
+				for (; flag[i]!=k; i = etree[i]) {
+					pattern[len++] = i;
+					flag[i] = k;
+				}
+				while (len>0) {
+					pattern[--top] = pattern[--len];
+				}
+			}
+		}
+		D[k] = y[k];
+		y[k] = 0.;
+		for (; top<N; top++) { // sparse triangular solve
+			int i = pattern[top];
+			double yi = y[i];
+			y[i] = 0.;
+			int p2 = Lp[i]+lnz[i];
+			for (int p=Lp[i]; p<p2; p++) {
+				y[Li[p]] -= Lx[p]*yi;
+			}
+			double l_ki = yi/D[i];
+			D[k] -= l_ki*yi;
+			Li[p2] = k;
+			Lx[p2] = l_ki;
+			lnz[i]++;
+		}
+		if (D[k]==0.) {
+			throw std::runtime_error("XylemFlux::factorize: matrix is singular, zero pivot at node "+std::to_string(perm[k]));
+		}
+	}
+}
+
+/**
+ * Solves L D L^T x = b, where @param x is b on input, and the solution on output
+ */
+void XylemFlux::ldltSolve(std::vector<double>& x) const
+{
+	ldltSolve(x, 1);
+}
+
+/**
+ * Solves L D L^T X = B for @param m right hand sides at once,
+ * where @param X is B on input, and the solution on output, stored node major (X[i*m+s])
+ */
+void XylemFlux::ldltSolve(std::vector<double>& X, int m) const
+{
+	int N = perm.size();
+	std::vector<double> Y(N*m);
+	for (int k=0; k<N; k++) {
+		std::copy(X.begin()+perm[k]*m, X.begin()+(perm[k]+1)*m, Y.begin()+k*m);
+	}
+	for (int j=0; j<N; j++) { // L Y = B
+		const double* yj = &Y[j*m];
+		for (int p=Lp[j]; p<Lp[j+1]; p++) {
+			double* yi = &Y[Li[p]*m];
+			double l = Lx[p];
+			for (int s=0; s<m; s++) {
+				yi[s] -= l*yj[s];
+			}
+		}
+	}
+	for (int j=0; j<N; j++) { // D Y = Y
+		double id = 1./D[j];
+		for (int s=0; s<m; s++) {
+			Y[j*m+s] *= id;
+		}
+	}
+	for (int j=N-1; j>=0; j--) { // L^T Y = Y
+		double* yj = &Y[j*m];
+		for (int p=Lp[j]; p<Lp[j+1]; p++) {
+			const double* yi = &Y[Li[p]*m];
+			double l = Lx[p];
+			for (int s=0; s<m; s++) {
+				yj[s] -= l*yi[s];
+			}
+		}
+	}
+	for (int k=0; k<N; k++) {
+		std::copy(Y.begin()+k*m, Y.begin()+(k+1)*m, X.begin()+perm[k]*m);
+	}
+}
+
+/**
+ * Determines the parent of each node, and the breadth first order of the nodes, starting at the nodes without parent (i.e. node 0).
+ * Needs sorted segments, i.e. segment index == second node index - 1 (@see MappedSegments::sort), then the root system is a tree.
+ */
+void XylemFlux::analyseTree()
+{
+	int N = rs->nodes.size();
+	int Ns = rs->segments.size();
+	if (Ns!=N-1) {
+		throw std::invalid_argument("XylemFlux::analyseTree: tree solver needs one segment per node (except node 0), got "
+			+ std::to_string(Ns)+" segments and "+std::to_string(N)+" nodes");
+	}
+	treeParent.assign(N, -1);
+	std::vector<int> childPtr(N+1, 0); // children of each node (compressed)
+	for (int si = 0; si<Ns; si++) {
+		const auto& s = rs->segments[si];
+		if (s.y!=si+1) {
+			throw std::invalid_argument("XylemFlux::analyseTree: segments are not sorted (segment index == second node index - 1), see MappedSegments::sort");
+		}
+		treeParent[s.y] = s.x;
+		childPtr[s.x+1]++;
+	}
+	for (int i=0; i<N; i++) {
+		childPtr[i+1] += childPtr[i];
+	}
+	std::vector<int> children(Ns);
+	std::vector<int> next(childPtr.begin(), childPtr.end()-1);
+	for (int si = 0; si<Ns; si++) {
+		children[next[rs->segments[si].x]++] = rs->segments[si].y;
+	}
+	treeOrder.clear();
+	treeOrder.reserve(N);
+	for (int i=0; i<N; i++) {
+		if (treeParent[i]<0) {
+			treeOrder.push_back(i);
+		}
+	}
+	for (size_t head = 0; head<treeOrder.size(); head++) {
+		int i = treeOrder[head];
+		for (int k=childPtr[i]; k<childPtr[i+1]; k++) {
+			treeOrder.push_back(children[k]);
+		}
+	}
+	if (treeOrder.size()!=N) {
+		throw std::invalid_argument("XylemFlux::analyseTree: segments contain a cycle");
+	}
+	treeValid = true;
+}
+
+/**
+ * Solves the linear system (assembled by XylemFlux::linearSystem) in linear time by one leaf to root elimination sweep,
+ * and one root to leaf back substitution sweep. Uses the segment wise entries of aV (no sparse matrix is built).
+ *
+ * @param bcType 			boundary condition type (bc_neumann, or bc_dirichlet)
+ * @param bcNodes 			node indices where the boundary conditions are applied (e.g. root collar, or organ tips)
+ * @param bcValues 			Neumann values [cm3 day-1], or Dirichlet values [cm], per boundary node
+ *
+ * @return root xylem pressure per root system node [cm]
+ */
+std::vector<double> XylemFlux::treeSolve(int bcType, const std::vector<int>& bcNodes, const std::vector<double>& bcValues)
+{
+	if (!treeValid) {
+		analyseTree();
+	}
+	int N = rs->nodes.size();
+	std::vector<double> d(N, 0.), c(N, 0.), x = aB; // diagonal, coupling of node j to its parent, load
+	for (int j = 1; j<N; j++) { // segment j-1 connects node j with its parent
+		int k = 4*(j-1);
+		d[treeParent[j]] += aV[k];
+		c[j] = aV[k+1];
+		d[j] += aV[k+2];
+	}
+	if (bcType==bc_neumann) {
+		for (size_t i=0; i<bcNodes.size(); i++) {
+			x.at(bcNodes[i]) += bcValues[i];
+		}
+	} else if (bcType==bc_dirichlet) {
+		std::vector<bool> isDirichlet(N, false);
+		for (size_t i=0; i<bcNodes.size(); i++) {
+			isDirichlet.at(bcNodes[i]) = true;
+		}
+		for (size_t i=0; i<bcNodes.size(); i++) { // move couplings to the right hand side
+			int n = bcNodes[i];
+			double v = bcValues[i];
+			if ((treeParent[n]>=0) && (!isDirichlet[treeParent[n]])) {
+				x[treeParent[n]] -= c[n]*v;
+			}
+			c[n] = 0.;
+			d[n] = 1.;
+			x[n] = v;
+		}
+		for (int j = 1; j<N; j++) {
+			if (isDirichlet[treeParent[j]] && (c[j]!=0.)) {
+				x[j] -= c[j]*x[treeParent[j]];
+				c[j] = 0.;
+			}
+		}
+	} else {
+		throw std::invalid_argument("XylemFlux::treeSolve: unknown boundary condition type "+std::to_string(bcType));
+	}
+	for (int k = N-1; k>=0; k--) { // eliminate leafs to root
+		int j = treeOrder[k];
+		int p = treeParent[j];
+		if ((p>=0) && (c[j]!=0.)) {
+			double f = c[j]/d[j];
+			d[p] -= f*c[j];
+			x[p] -= f*x[j];
+		}
+	}
+	for (int k = 0; k<N; k++) { // back substitution root to leafs
+		int j = treeOrder[k];
+		int p = treeParent[j];
+		if (p>=0) {
+			x[j] = (x[j]-c[j]*x[p])/d[j];
+		} else {
+			x[j] = x[j]/d[j];
+		}
+	}
+	return x;
+}
+
 /**
  * Fluxes from root segments into soil cells
  *
@@ -148,60 +820,139 @@ std::vector<double> XylemFlux::segFluxes(double simTime, const std::vector<doubl
 		bool approx, bool cells, const std::vector<double> soil_k)
 {
 	std::vector<double> fluxes = std::vector<double>(rs->segments.size());
-	size_t numleaf = 0;
-	for (int si = 0; si<rs->segments.size(); si++) {
+	segFluxes(simTime, rx, sx, fluxes.data(), approx, cells, soil_k);
+	return fluxes;
+}
+
+/**
+ * Volumetric fluxes for each segment, written into @param fluxes (length must be the number of segments),
+ * the segment loop is parallelized with OpenMP (if available)
+ *
+ * @param simTime   [days] current simulation time is needed for age dependent conductivities,
+ *                  to calculate the age from the creation times (age = sim_time - segment creation time).
+ * @param rx        [cm] root xylem matric potential
+ * @param sx        [cm] soil matric potential per cell or per segment
+ * @param fluxes    [cm3/day] volumetric fluxes for each segment (output)
+ * @param approx    approximate or exact (default = false, i.e. exact)
+ * @param cells     sx per cell (true), or segments (false)
+ */
+void XylemFlux::segFluxes(double simTime, const std::vector<double>& rx, const std::vector<double>& sx, double* fluxes,
+		bool approx, bool cells, const std::vector<double>& soil_k)
+{
+	updateCoefficients(simTime, soil_k);
+	int Ns = rs->segments.size();
+	if (rx.size()<rs->nodes.size()) {
+		throw std::invalid_argument("XylemFlux::segFluxes: rx must be given for each node");
+	}
+	std::vector<int> cellIdx;
+	if (cells) {
+		cellIdx = segCellIndices();
+		int maxCell = cellIdx.empty() ? -1 : *std::max_element(cellIdx.begin(), cellIdx.end());
+		if ((sx.size()!=1) && (maxCell >= (int)sx.size())) {
+			throw std::invalid_argument("XylemFlux::segFluxes: sx must be given for each cell");
+		}
+	} else if (sx.size()<Ns) {
+		throw std::invalid_argument("XylemFlux::segFluxes: sx must be given for each segment");
+	}
+	bool uniform = (sx.size()==1);
+	#pragma omp parallel for schedule(static)
+	for (int si = 0; si<Ns; si++) {
 
 		int i = rs->segments[si].x;
 		int j = rs->segments[si].y;
 
 		double psi_s;
-		if (cells) { // soil matric potential given per cell
-			int cellIndex = rs->seg2cell[j-1];
-			if (cellIndex>=0) {
-				if(sx.size()>1){psi_s = sx.at(cellIndex);}
-				else{psi_s = sx.at(0);}
-			} else {
-				psi_s = airPressure;
-			}
+		if (cells) {
+			int c = cellIdx[si];
+			psi_s = (c>=0) ? (uniform ? sx[0] : sx[c]) : airPressure;
 		} else {
-			psi_s = sx.at(j-1); // j-1 = segIdx = s.y-1
+			psi_s = sx[j-1]; // j-1 = segIdx = s.y-1
 		}
 
-		double a = rs->radii[si]; // si is correct, with ordered and unordered segments
-		double age = simTime - rs->nodeCTs[j];
-		int organType = rs->organTypes[si];
-		int subType = rs->subTypes[si];
-		double kx = 0.;
-		double  kr = 0.;
+		double f = -2*rs->radii[si]*M_PI*segKr[si]; // flux is proportional to f // *rho*g
+		double fApprox = f*segL[si]*(psi_s - rx[j]); // cm3 / day
+		double fExact = segCf[si]*(rx[i]-psi_s+rx[j]-psi_s);
 
-		try {
-			kx = kx_f(age, subType, organType);
-			kr = kr_f(age, subType, organType, numleaf);
-		} catch(...) {
-			std::cout << "\n XylemFlux::segFluxes: conductivities failed" << std::flush;
-			std::cout  << "\n organ type "<<organType<< " subtype " << subType <<std::flush;
-		}
-		if (soil_k.size()>0) {
-			kr = std::min(kr, soil_k[si]);
-		}
-		if(organType == 4){numleaf +=1;}
-
-		Vector3d n1 = rs->nodes[i];
-		Vector3d n2 = rs->nodes[j];
-		double l = (n2.minus(n1)).length();
-
-		double f = -2*a*M_PI*kr; // flux is proportional to f // *rho*g
-		double fApprox = f*l*(psi_s - rx[j]); // cm3 / day
+		fluxes[si] = approx ? fApprox : fExact;
+	}
+}
 
-		double tau = std::sqrt(2*a*M_PI*kr/kx); // sqrt(c) [cm-1]
-		double d = std::exp(-tau*l)-std::exp(tau*l); // det
-		double fExact = -f*(1./(tau*d))*(rx[i]-psi_s+rx[j]-psi_s)*(2.-std::exp(-tau*l)-std::exp(tau*l));
+/**
+ * Volumetric fluxes summed up per soil cell, written into @param cellFluxes,
+ * cells without segments are set to zero
+ *
+ * @param simTime   	[days] current simulation time is needed for age dependent conductivities
+ * @param rx        	[cm] root xylem matric potential
+ * @param sx        	[cm] soil matric potential per cell
+ * @param cellFluxes 	[cm3/day] volumetric fluxes for each cell (output)
+ * @param n 			number of cells, i.e. length of @param cellFluxes
+ * @param approx    	approximate or exact (default = false, i.e. exact)
+ */
+void XylemFlux::soilFluxes(double simTime, const std::vector<double>& rx, const std::vector<double>& sx, double* cellFluxes, int n,
+		bool approx, const std::vector<double>& soil_k)
+{
+	std::vector<double> fluxes = std::vector<double>(rs->segments.size());
+	segFluxes(simTime, rx, sx, fluxes.data(), approx, true, soil_k);
+	sumSegFluxes(fluxes.data(), cellFluxes, n);
+}
 
-		double flux = fExact*(!approx)+approx*fApprox;
-		fluxes[si] = flux;
+/**
+ * Sums segment fluxes over each cell, written into @param cellFluxes, cells without segments are set to zero.
+ *
+ * Each thread sums its share of segments into a local array, the local arrays are then added up in a
+ * fixed order, i.e. results are reproducible for a fixed number of threads.
+ *
+ * @param segFluxes 	segment fluxes given per segment index [cm3/day]
+ * @param cellFluxes 	fluxes given per cell index (output) [cm3/day]
+ * @param n 			number of cells, i.e. length of @param cellFluxes
+ */
+void XylemFlux::sumSegFluxes(const double* segFluxes, double* cellFluxes, int n) const
+{
+	int Ns = rs->segments.size();
+	std::vector<int> cellIdx = segCellIndices();
+	for (int c : cellIdx) {
+		if (c>=n) {
+			throw std::invalid_argument("XylemFlux::sumSegFluxes: cell index exceeds the number of cells");
+		}
+	}
+	std::vector<std::vector<double>> local;
+	#pragma omp parallel
+	{
+		#pragma omp single
+		local.resize(omp_get_num_threads());
+		std::vector<double>& l = local[omp_get_thread_num()];
+		l.resize(n, 0.);
+		#pragma omp for schedule(static)
+		for (int si = 0; si<Ns; si++) {
+			if (cellIdx[si]>=0) {
+				l[cellIdx[si]] += segFluxes[si];
+			}
+		}
+		#pragma omp for schedule(static)
+		for (int c = 0; c<n; c++) {
+			double sum = 0.;
+			for (const auto& l_ : local) {
+				sum += l_[c];
+			}
+			cellFluxes[c] = sum;
+		}
+	}
+}
 
+/**
+ * Soil cell index for each segment, -1 if the segment is not within the soil domain
+ */
+std::vector<int> XylemFlux::segCellIndices() const
+{
+	int Ns = rs->segments.size();
+	std::vector<int> cellIdx(Ns, -1);
+	for (int si = 0; si<Ns; si++) {
+		int segIdx = rs->segments[si].y-1;
+		if (segIdx<rs->seg2cell.size()) {
+			cellIdx[si] = rs->seg2cell[segIdx];
+		}
 	}
-	return fluxes;
+	return cellIdx;
 }
 
 /**
@@ -216,7 +967,7 @@ std::map<int,double> XylemFlux::sumSegFluxes(const std::vector<double>& segFluxe
 	for (int si = 0; si<rs->segments.size(); si++) {
 		int j = rs->segments[si].y;
 		int segIdx = j-1;
-		if (rs->seg2cell.count(segIdx)>0) {
+		if (segIdx<rs->seg2cell.size()) {
 			int cellIdx = rs->seg2cell[segIdx];
 			if (cellIdx>=0) {
 				if (fluxes.count(cellIdx)==0) {
@@ -331,17 +1082,32 @@ std::vector<double> XylemFlux::segOuterRadii(int type, const std::vector<double>
 	auto width = rs->maxBound.minus(rs->minBound);
 	std::vector<double> radii = std::vector<double>(rs->segments.size());
 	std::fill(radii.begin(), radii.end(), 0.);
-	auto& map = rs->cell2seg;
-	for(auto iter = map.begin(); iter != map.end(); ++iter) {
-		int cellId =  iter->first;
+	std::vector<int> airSegs; // segments outside of the soil domain
+	for (int i = 0; i<rs->seg2cell.size(); i++) {
+		if (rs->seg2cell[i]<0) {
+			airSegs.push_back(i);
+		}
+	}
+	int nc = rs->numberOfMappedCells();
+	const auto& offsets = rs->getCell2segOffsets();
+	const auto& indices = rs->getCell2segIndices();
+	for (int cellId = -1; cellId<nc; cellId++) {
+		if ((cellId<0) && (vols.size()>0)) { // no volume for segments outside the domain
+			continue;
+		}
+		const int* segsBegin = (cellId<0) ? airSegs.data() : indices.data() + offsets[cellId];
+		const int* segsEnd = (cellId<0) ? airSegs.data() + airSegs.size() : indices.data() + offsets[cellId+1];
+		if (segsBegin==segsEnd) {
+			continue;
+		}
 		if (vols.size()==0) {
 			cellVolume = width.x*width.y*width.z/rs->resolution.x/rs->resolution.y/rs->resolution.z;
 		} else {
 			cellVolume = vols.at(cellId);
 		}
-		auto segs = map.at(cellId);
 		double v = 0.;  // calculate sum of root volumes or surfaces over cell
-		for (int i : segs) {
+		for (auto it = segsBegin; it!=segsEnd; ++it) {
+			int i = *it;
 			if (type==0) { // volume
 				v += M_PI*(rs->radii[i]*rs->radii[i])*lengths[i];
 			} else if (type==1) { // surface
@@ -350,7 +1116,8 @@ std::vector<double> XylemFlux::segOuterRadii(int type, const std::vector<double>
 				v += lengths[i];
 			}
 		}
-		for (int i : segs) { // calculate outer radius
+		for (auto it = segsBegin; it!=segsEnd; ++it) { // calculate outer radius
+			int i = *it;
 			double l = lengths[i];
 			double t =0.; // proportionality factor (must sum up to == 1 over cell)
 			if (type==0) { // volume
@@ -379,12 +1146,15 @@ std::vector<double> XylemFlux::splitSoilFluxes(const std::vector<double>& soilFl
 	auto lengths =  this->segLength();
 	std::vector<double> fluxes = std::vector<double>(rs->segments.size());
 	std::fill(fluxes.begin(), fluxes.end(), 0.);
-	auto map = rs->cell2seg;
-	for(auto iter = map.begin(); iter != map.end(); ++iter) {
-		int cellId =  iter->first;
-		auto segs = map.at(cellId);
+	int nc = rs->numberOfMappedCells();
+	const auto& offsets = rs->getCell2segOffsets();
+	const auto& indices = rs->getCell2segIndices();
+	for (int cellId = 0; cellId<nc; cellId++) {
+		auto segsBegin = indices.begin() + offsets[cellId];
+		auto segsEnd = indices.begin() + offsets[cellId+1];
 		double v = 0.;  // calculate sum over cell
-		for (int i : segs) {
+		for (auto it = segsBegin; it!=segsEnd; ++it) {
+			int i = *it;
 			if (type==0) { // volume
 				v += M_PI*(rs->radii[i]*rs->radii[i])*lengths[i];
 			} else if (type==1) { // surface
@@ -393,7 +1163,8 @@ std::vector<double> XylemFlux::splitSoilFluxes(const std::vector<double>& soilFl
 				v += lengths[i];
 			}
 		}
-		for (int i : segs) { // calculate outer radius
+		for (auto it = segsBegin; it!=segsEnd; ++it) { // calculate outer radius
+			int i = *it;
 			double t =0.; // proportionality factor (must sum up to == 1 over cell)
 			if (type==0) { // volume
 				t = M_PI*(rs->radii[i]*rs->radii[i])*lengths[i]/v;
@@ -595,7 +1366,7 @@ void XylemFlux::setKxTables(std::vector<std::vector<std::vector<double>>> values
 /**
  * Linear interpolation
  */
-double XylemFlux::interp1(double ip, std::vector<double> x, std::vector<double> y) {
+double XylemFlux::interp1(double ip, const std::vector<double>& x, const std::vector<double>& y) {
 	if (ip > x.back()) return y.back(); // check bounds
 	if (ip < x[0]) return y[0];
 
@@ -18,17 +18,31 @@ class XylemFlux
 {
 public:
 
+    enum BoundaryTypes { bc_neumann = 0, bc_dirichlet = 1 }; ///< boundary condition types for XylemFlux::solve
+    enum SolverTypes { st_pcg = 0, st_ldlt = 1, st_tree = 2 }; ///< linear solvers for XylemFlux::solve
+
     XylemFlux(std::shared_ptr<CPlantBox::MappedSegments> rs);
 
     virtual ~XylemFlux() { }
 
     void linearSystem(double simTime, const std::vector<double>& sx, bool cells = true,
         const std::vector<double> soil_k = std::vector<double>()); ///< builds linear system (simTime is needed for age dependent conductivities)
+    std::vector<double> solve(double simTime, const std::vector<double>& sx, int bcType, const std::vector<int>& bcNodes,
+        const std::vector<double>& bcValues, bool cells = true, const std::vector<double> soil_k = std::vector<double>()); ///< assembles and solves the linear system, returns xylem pressures [cm]
+    std::vector<double> solveLinearSystem(int bcType, const std::vector<int>& bcNodes, const std::vector<double>& bcValues); ///< solves the last assembled linear system, returns xylem pressures [cm]
+    std::vector<std::vector<double>> solveBatch(double simTime, const std::vector<std::vector<double>>& sx, int bcType, const std::vector<int>& bcNodes,
+        const std::vector<double>& bcValues, bool cells = true, const std::vector<double> soil_k = std::vector<double>()); ///< solves for many scenarios at once, returns xylem pressures [cm] per scenario
+    void resetPattern() { csrValid = false; symbolicValid = false; treeValid = false; } ///< forces a rebuild of the cached sparsity pattern and symbolic factorization
     std::map<int,double> soilFluxes(double simTime, const std::vector<double>& rx, const std::vector<double>& sx,
     		bool approx = false, const std::vector<double> soil_k = std::vector<double>()); // [cm3/day]
     std::vector<double> segFluxes(double simTime, const std::vector<double>& rx, const std::vector<double>& sx,
     		bool approx = false, bool cells = false, const std::vector<double> soil_k = std::vector<double>()); // for each segment in [cm3/day]
     std::map<int,double> sumSegFluxes(const std::vector<double>& segFluxes); ///< sums segment fluxes over soil cells,  soilFluxes = sumSegFluxes(segFluxes), [cm3/day]
+    void segFluxes(double simTime, const std::vector<double>& rx, const std::vector<double>& sx, double* fluxes,
+        bool approx = false, bool cells = false, const std::vector<double>& soil_k = std::vector<double>()); ///< segment fluxes written into a buffer [cm3/day]
+    void soilFluxes(double simTime, const std::vector<double>& rx, const std::vector<double>& sx, double* cellFluxes, int n,
+        bool approx = false, const std::vector<double>& soil_k = std::vector<double>()); ///< fluxes per cell written into a buffer of length n [cm3/day]
+    void sumSegFluxes(const double* segFluxes, double* cellFluxes, int n) const; ///< sums segment fluxes over soil cells into a buffer of length n [cm3/day]
 
     std::vector<double> segSRA(double simTime, const std::vector<double>& rx, const std::vector<double>& sx, double wilting_point,
         std::function<double(double)> mfp, std::function<double(double)> imfp);
@@ -67,8 +81,43 @@ public:
     double airPressure = -1000; // static air pressure
 	std::vector<double> gs;
 
+    int solver = st_ldlt; ///< linear solver used by XylemFlux::solve (st_pcg, st_ldlt, or st_tree)
+    double solverTol = 1.e-12; ///< relative residual tolerance of the iterative solver
+    int solverMaxIter = 0; ///< maximal number of iterations of the iterative solver (0 = 10 times the number of nodes)
+    int solverIterations = 0; ///< number of iterations needed by the last call of XylemFlux::solve
+
 protected:
 
+    void updateCoefficients(double simTime, const std::vector<double>& soil_k); ///< updates the per segment coefficients, if conductivities or geometry changed
+    std::vector<int> segCellIndices() const; ///< soil cell index per segment (-1 for air)
+    void assembleCSR(); ///< converts aI, aJ, aV into the compressed sparse row matrix (csrPtr, csrCol, csrVal)
+    double soilMatricPotential(int si, const std::vector<double>& sx, bool cells) const; ///< soil matric potential around a segment [cm]
+    void applyBC(int bcType, const std::vector<int>& bcNodes, const std::vector<double>& bcValues, std::vector<double>& b, bool matrix = true); ///< applies the boundary conditions to the CSR matrix
+    std::vector<double> pcg(const std::vector<double>& b); ///< Jacobi preconditioned conjugate gradients for the CSR matrix
+    void analyse(); ///< fill reducing ordering and symbolic LDL^T factorization of the CSR pattern
+    void factorize(); ///< numeric LDL^T factorization of the CSR matrix
+    void ldltSolve(std::vector<double>& x) const; ///< solves the factorized system in place
+    void ldltSolve(std::vector<double>& X, int m) const; ///< solves the factorized system for m right hand sides in place
+    void analyseTree(); ///< parent nodes, and breadth first order of the root system tree
+    std::vector<double> treeSolve(int bcType, const std::vector<int>& bcNodes, const std::vector<double>& bcValues); ///< solves the system by tree elimination
+
+    std::vector<double> segKx, segKr, segA, segL; // per segment conductivities, radius, and length the coefficients were computed for
+    std::vector<double> segVz, segCii, segCij, segCf; // per segment normed z-direction, matrix entries, and radial flux coefficient
+
+    std::vector<int> csrPtr; // compressed sparse row matrix (used by XylemFlux::solve)
+    std::vector<int> csrCol;
+    std::vector<double> csrVal;
+    std::vector<int> csrMap; // position of the entry aV[k] within csrVal
+    bool csrValid = false; // sparsity pattern is up to date with aI and aJ
+
+    std::vector<int> perm, pinv; // fill reducing ordering (new to old, old to new)
+    std::vector<int> etree, Lp, Li; // elimination tree, and pattern of L (column wise)
+    std::vector<double> Lx, D; // values of the factorization
+    bool symbolicValid = false; // symbolic factorization is up to date with the sparsity pattern
+
+    std::vector<int> treeParent, treeOrder; // parent node of each node (-1 for roots), nodes in breadth first order
+    bool treeValid = false; // tree is up to date with the segments
+
 	//type correspond to subtype or to the leaf segment number
     double kr_const(double age, int type, int orgtype, int numleaf) { if (orgtype == 4 && gs.size() > 0 ){return gs.at(numleaf);} else {return kr.at(0).at(0); } }//k constant
     double kr_perOrgType(double age, int type, int orgtype, int numleaf) { if (orgtype == 4&& gs.size() > 0 ) {return gs.at(numleaf);} else { return kr.at(orgtype - 2).at(0); }} //per organ type (goes from 2 (root) to 4 (leaf))
@@ -84,7 +133,7 @@ protected:
     double kx_tablePerOrgType(double age, int type, int orgtype) { return interp1(age, kxs_t.at(orgtype-2).at(0), kxs.at(orgtype-2).at(0)); } //constant for all subtype but type and age dependant
     double kx_tablePerType(double age, int type, int orgtype) { return interp1(age, kxs_t.at(orgtype-2).at(type), kxs.at(orgtype-2).at(type)); } //subtype, type and age dependant
 
-    static double interp1(double ip, std::vector<double> x, std::vector<double> y);
+    static double interp1(double ip, const std::vector<double>& x, const std::vector<double>& y);
 
     static double schroederStress(double r, double p, double q_out, double r_in, double r_out, std::function<double(double)> mfp, std::function<double(double)> imfp);
 
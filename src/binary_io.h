@@ -0,0 +1,120 @@
+// -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
+#ifndef BINARY_IO_H
+#define BINARY_IO_H
+
+#include "mymath.h"
+
+#include <cstdint>
+#include <istream>
+#include <ostream>
+#include <stdexcept>
+#include <string>
+#include <type_traits>
+#include <vector>
+
+namespace CPlantBox {
+
+/*
+ * Helpers for the binary serialization (@see Organism::serialize, MappedSegments::writeMapping),
+ * values are written in native byte order.
+ */
+
+template<class T>
+void writeBinary(std::ostream& os, const T& v)
+{
+    static_assert(std::is_arithmetic<T>::value, "writeBinary: use the overloads for non arithmetic types");
+    os.write(reinterpret_cast<const char*>(&v), sizeof(T));
+}
+
+template<class T>
+void readBinary(std::istream& is, T& v)
+{
+    static_assert(std::is_arithmetic<T>::value, "readBinary: use the overloads for non arithmetic types");
+    is.read(reinterpret_cast<char*>(&v), sizeof(T));
+}
+
+inline void writeBinary(std::ostream& os, const Vector3d& v)
+{
+    writeBinary(os, v.x); writeBinary(os, v.y); writeBinary(os, v.z);
+}
+
+inline void readBinary(std::istream& is, Vector3d& v)
+{
+    readBinary(is, v.x); readBinary(is, v.y); readBinary(is, v.z);
+}
+
+inline void writeBinary(std::ostream& os, const Vector2i& v)
+{
+    writeBinary(os, v.x); writeBinary(os, v.y);
+}
+
+inline void readBinary(std::istream& is, Vector2i& v)
+{
+    readBinary(is, v.x); readBinary(is, v.y);
+}
+
+inline void writeBinary(std::ostream& os, const std::string& s)
+{
+    writeBinary(os, (uint64_t)s.size());
+    os.write(s.data(), s.size());
+}
+
+inline void readBinary(std::istream& is, std::string& s)
+{
+    uint64_t n = 0;
+    readBinary(is, n);
+    if (!is.good()) {
+        throw std::invalid_argument("readBinary: unexpected end of data");
+    }
+    s.resize(n);
+    is.read(&s[0], n);
+}
+
+template<class T>
+void writeBinary(std::ostream& os, const std::vector<T>& v)
+{
+    writeBinary(os, (uint64_t)v.size());
+    for (const auto& x : v) {
+        writeBinary(os, x);
+    }
+}
+
+template<class T>
+void readBinary(std::istream& is, std::vector<T>& v)
+{
+    uint64_t n = 0;
+    readBinary(is, n);
+    if (!is.good()) {
+        throw std::invalid_argument("readBinary: unexpected end of data");
+    }
+    v.clear();
+    for (uint64_t i = 0; (i<n) && is.good(); i++) { // stops early on corrupt data
+        T x;
+        readBinary(is, x);
+        v.push_back(x);
+    }
+}
+
+/**
+ * Writes a tag identifying the following data
+ */
+inline void writeTag(std::ostream& os, const std::string& tag)
+{
+    writeBinary(os, tag);
+}
+
+/**
+ * Reads a tag and checks it, throws if the data are not of the expected kind
+ */
+inline void readTag(std::istream& is, const std::string& tag)
+{
+    std::string t;
+    readBinary(is, t);
+    if (!is.good() || (t!=tag)) {
+        throw std::invalid_argument("readTag: expected "+tag+" data");
+    }
+}
+
+} // namespace
+
+#endif
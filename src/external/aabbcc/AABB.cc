@@ -606,24 +606,44 @@ namespace aabb
 
     std::vector<unsigned int> Tree::query(unsigned int particle, const AABB& aabb)
     {
+        std::vector<unsigned int> particles;
         std::vector<unsigned int> stack;
         stack.reserve(256);
-        stack.push_back(root);
 
-        std::vector<unsigned int> particles;
+        query(particle, aabb, particles, stack);
+
+        return particles;
+    }
+
+    void Tree::query(const AABB& aabb, std::vector<unsigned int>& particles, std::vector<unsigned int>& stack)
+    {
+        particles.clear();
+
+        // Make sure the tree isn't empty.
+        if (particleMap.size() == 0) return;
+
+        query(std::numeric_limits<unsigned int>::max(), aabb, particles, stack);
+    }
+
+    void Tree::query(unsigned int particle, const AABB& aabb, std::vector<unsigned int>& particles, std::vector<unsigned int>& stack)
+    {
+        particles.clear();
+        stack.clear();
+        stack.push_back(root);
 
         while (stack.size() > 0)
         {
             unsigned int node = stack.back();
             stack.pop_back();
 
-            // Copy the AABB.
-            AABB nodeAABB = nodes[node].aabb;
-
             if (node == NULL_NODE) continue;
 
+            bool overlaps;
             if (isPeriodic)
             {
+                // Copy the AABB.
+                AABB nodeAABB = nodes[node].aabb;
+
                 std::vector<double> separation(dimension);
                 std::vector<double> shift(dimension);
                 for (unsigned int i=0;i<dimension;i++)
@@ -640,10 +660,16 @@ namespace aabb
                         nodeAABB.upperBound[i] += shift[i];
                     }
                 }
+                overlaps = aabb.overlaps(nodeAABB, touchIsOverlap);
+            }
+            else
+            {
+                // No copy needed (avoids three allocations per visited node).
+                overlaps = aabb.overlaps(nodes[node].aabb, touchIsOverlap);
             }
 
             // Test for overlap between the AABBs.
-            if (aabb.overlaps(nodeAABB, touchIsOverlap))
+            if (overlaps)
             {
                 // Check that we're at a leaf node.
                 if (nodes[node].isLeaf())
@@ -661,8 +687,6 @@ namespace aabb
                 }
             }
         }
-
-        return particles;
     }
 
     std::vector<unsigned int> Tree::query(const AABB& aabb)
@@ -340,6 +340,33 @@ namespace aabb
          */
         std::vector<unsigned int> query(const AABB&);
 
+        //! Query the tree to find candidate interactions for an AABB, using buffers of the caller.
+        /*! \param aabb
+                The AABB.
+
+            \param particles
+                The particle indices (cleared and filled).
+
+            \param stack
+                Work space for the traversal (reused, no allocations once it is large enough).
+         */
+        void query(const AABB&, std::vector<unsigned int>&, std::vector<unsigned int>&);
+
+        //! Query the tree to find candidate interactions for a particle and an AABB, using buffers of the caller.
+        /*! \param particle
+                The particle index (excluded from the result).
+
+            \param aabb
+                The AABB.
+
+            \param particles
+                The particle indices (cleared and filled).
+
+            \param stack
+                Work space for the traversal (reused, no allocations once it is large enough).
+         */
+        void query(unsigned int, const AABB&, std::vector<unsigned int>&, std::vector<unsigned int>&);
+
         //! Get a particle AABB.
         /*! \param particle
                 The particle index.
@@ -2,6 +2,7 @@
 #include "leafparameter.h"
 
 #include "Organism.h"
+#include "binary_io.h"
 
 #include <cmath>
 #include <iostream>
@@ -268,6 +269,26 @@ tinyxml2::XMLElement* LeafRandomParameter::writeXML(tinyxml2::XMLDocument& doc,
 	return element;
 }
 
+/**
+ * @copydoc OrganRandomParameter::writeState()
+ *
+ * Additionally writes the probabilities of the successors
+ */
+void LeafRandomParameter::writeState(std::ostream& os) const
+{
+	OrganRandomParameter::writeState(os);
+	writeBinary(os, successorP);
+}
+
+/**
+ * @copydoc OrganRandomParameter::readState()
+ */
+void LeafRandomParameter::readState(std::istream& is)
+{
+	OrganRandomParameter::readState(is);
+	readBinary(is, successorP);
+}
+
 /**
  * Sets up class introspection by linking parameter names to their class members,
  * additionally adds a description for each parameter, for toString and writeXML
@@ -2,10 +2,13 @@
 #include "organparameter.h"
 
 #include "Organism.h"
+#include "binary_io.h"
 
 #include <limits>
 #include <iostream>
 #include <exception>
+#include <stdexcept>
+#include <cmath>
 
 namespace CPlantBox {
 
@@ -90,6 +93,68 @@ double OrganRandomParameter::getParameter(std::string name) const
     return std::numeric_limits<double>::quiet_NaN(); // default if name is unknown
 }
 
+/**
+ * Sets a single scalar parameter (int or double), e.g. for parameter studies.
+ *
+ * @param name      name of the parameter, add "_dev" to set the parameter's deviation (usually standard deviation),
+ *                  optionally, add "_mean" to set the mean value (to avoid naming conflicts with the specific parameters).
+ * @param value     the new value (rounded for int parameters)
+ */
+void OrganRandomParameter::setParameter(std::string name, double value)
+{
+    if ((name.length()>4) && (name.substr(name.length()-4)=="_dev")) {// setting standard deviation?
+        std::string n = name.substr(0,name.length()-4);
+        if (param_sd.count(n)) {
+            *param_sd.at(n) = value;
+            return;
+        }
+    }
+    if ((name.length()>5) && (name.substr(name.length()-5)=="_mean")) {// setting the mean value?
+        name = name.substr(0,name.length()-5);
+    }
+    if (iparam.count(name)) { // setting an int parameter
+        *iparam.at(name) = (int)std::round(value);
+        return;
+    }
+    if (dparam.count(name)) { // setting a double parameter
+        *dparam.at(name) = value;
+        return;
+    }
+    throw std::invalid_argument("OrganRandomParameter::setParameter: unknown parameter "+name);
+}
+
+/**
+ * Writes the values of all double parameters and deviations (binary), the xml representation (@see writeXML) is not exact
+ */
+void OrganRandomParameter::writeState(std::ostream& os) const
+{
+    writeBinary(os, (uint64_t)(dparam.size()+param_sd.size()));
+    for (auto& dp : dparam) {
+        writeBinary(os, *dp.second);
+    }
+    for (auto& sd : param_sd) {
+        writeBinary(os, *sd.second);
+    }
+}
+
+/**
+ * Reads the parameter values written by OrganRandomParameter::writeState (into the same class of parameters)
+ */
+void OrganRandomParameter::readState(std::istream& is)
+{
+    uint64_t n = 0;
+    readBinary(is, n);
+    if (n!=dparam.size()+param_sd.size()) {
+        throw std::invalid_argument("OrganRandomParameter::readState: parameters of "+name+" do not match");
+    }
+    for (auto& dp : dparam) {
+        readBinary(is, *dp.second);
+    }
+    for (auto& sd : param_sd) {
+        readBinary(is, *sd.second);
+    }
+}
+
 /**
  * Quick info about the object for debugging
  *
@@ -57,6 +57,7 @@ public:
     virtual std::shared_ptr<OrganSpecificParameter> realize(); ///< creates a specific organ from the root parameter set
 
     virtual double getParameter(std::string name) const; // get a scalar parameter
+    virtual void setParameter(std::string name, double value); // set a scalar parameter
 
     virtual std::string toString(bool verbose = true) const; ///< info for debugging
 
@@ -64,6 +65,8 @@ public:
     void readXML(std::string name); ///< reads a single sub type organ parameter set
     virtual tinyxml2::XMLElement* writeXML(tinyxml2::XMLDocument& doc, bool comments = true) const; ///< writes a organ root parameter set
     void writeXML(std::string name) const; ///< writes a organ root parameter set
+    virtual void writeState(std::ostream& os) const; ///< writes the parameter values (binary, exact) @see Organism::serialize
+    virtual void readState(std::istream& is); ///< reads the parameter values written by OrganRandomParameter::writeState
 
     virtual void bindParameters(); ///<sets up class introspection
 
@@ -2,8 +2,6 @@ import timeit
 import math
 
 import numpy as np
-from scipy import sparse
-import scipy.sparse.linalg as LA
 
 import plantbox as pb
 from plantbox import XylemFlux
@@ -57,11 +55,7 @@ class StomataModel(XylemFluxPython):
         x_old = np.full(len(self.rs.nodes), 0)
         while(stop != True):    
             self.calcGs(PAR, VPD, Tair,  p_l) 
-            self.linearSystem(sim_time, sxx, cells, soil_k) # C++ (see XylemFlux.cpp)
-            Q = sparse.coo_matrix((np.array(self.aV), (np.array(self.aI), np.array(self.aJ))))
-            Q = sparse.csr_matrix(Q)
-            Q, b = self.bc_neumann(Q, self.aB, Indx, value)  # cm3 day-1
-            x = LA.spsolve(Q, b, use_umfpack = True)  # direct
+            x = XylemFlux.solve(self, sim_time, sxx, pb.neumann, Indx, value, cells, soil_k)  # C++ (see XylemFlux.cpp)
             p_l = x[leaf_nodes]
             diff = sum(np.sqrt((x-x_old)**2))
             x_old = x
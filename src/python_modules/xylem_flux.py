@@ -42,22 +42,38 @@ class XylemFluxPython(XylemFlux):
                                         conductivity at the root surface will be limited by the value, i.e. kr = min(kr_root, k_soil)  
             @return [cm] root xylem pressure per root system node         
          """
-        # start = timeit.default_timer()
         if isinstance(value, (float, int)):
             n = len(self.seg_ind)
             value = [value / n] * n
-            
-        if len(soil_k) > 0:
-            self.linearSystem(sim_time, sxx, cells, soil_k)  # C++ (see XylemFlux.cpp)
-        else:
-            self.linearSystem(sim_time, sxx, cells)  # C++ (see XylemFlux.cpp)
+        return XylemFlux.solve(self, sim_time, sxx, pb.neumann, self.seg_ind, value, cells, soil_k)  # C++ (see XylemFlux.cpp)
+
+    def solve_neumann_scipy(self, sim_time :float, value, sxx, cells :bool, soil_k=[]) :
+        """ solves the flux equations, with a neumann boundary condtion, using scipy.sparse (same arguments as solve_neumann)
+            the linear system is converted to Python and solved by spsolve, see solve_neumann for the native C++ solver
+         """
+        if isinstance(value, (float, int)):
+            n = len(self.seg_ind)
+            value = [value / n] * n
+        self.linearSystem(sim_time, sxx, cells, soil_k)  # C++ (see XylemFlux.cpp)
         Q = sparse.coo_matrix((np.array(self.aV), (np.array(self.aI), np.array(self.aJ))))
         Q = sparse.csr_matrix(Q)
         Q, b = self.bc_neumann(Q, self.aB, self.seg_ind, value)  # cm3 day-1
         x = LA.spsolve(Q, b, use_umfpack=True)  # direct
-        # print ("linear system assembled and solved in", timeit.default_timer() - start, " s")
         return x
 
+    def solve_neumann_batch(self, sim_time :float, values, sxx, cells :bool, soil_k=[]):
+        """ solves the flux equations for many scenarios at once, with a neumann boundary condtion, see solve_neumann()
+            the system is factorized once, and all scenarios are solved together (C++, see XylemFlux::solveBatch)
+            @param sim_time [day]       needed for age dependent conductivities (age = sim_time - segment creation time)
+            @param values [cm3 day-1]   tranpirational flux per scenario (negative)
+            @param sxx [cm]             soil matric potentials per scenario (2d array), given per segment or per soil cell
+            @param cells                indicates if the matric potentials are given per cell (True) or by segments (False)
+            @param soil_k [day-1]       optionally, soil conductivities can be prescribed per segment, 
+                                        conductivity at the root surface will be limited by the value, i.e. kr = min(kr_root, k_soil)  
+            @return [cm] root xylem pressure per scenario and root system node (2d array)
+         """
+        return self.solveBatch(sim_time, np.asarray(sxx, dtype=np.float64), pb.neumann, self.seg_ind, values, cells, soil_k)
+
     def solve_dirichlet(self, sim_time :float, value :list, sxc :float, sxx, cells :bool, soil_k=[]):
         """ solves the flux equations, with a dirichlet boundary condtion, see solve()
             @param sim_time [day]     needed for age dependent conductivities (age = sim_time - segment creation time)
@@ -71,18 +87,8 @@ class XylemFluxPython(XylemFlux):
          """
         if isinstance(value, (float, int)):
             n = len(self.node_ind)
-            value = [value] * n       
-         
-        if len(soil_k) > 0:
-            self.linearSystem(sim_time, sxx, cells, soil_k)  # C++ (see XylemFlux.cpp)
-        else:
-            self.linearSystem(sim_time, sxx, cells)
-        self.linearSystem(sim_time, sxx, cells)  # C++ (see XylemFlux.cpp)
-        Q = sparse.coo_matrix((np.array(self.aV), (np.array(self.aI), np.array(self.aJ))))
-        Q = sparse.csr_matrix(Q)
-        Q, b = self.bc_dirichlet(Q, self.aB, self.node_ind, value)
-        x = LA.spsolve(Q, b, use_umfpack=True)
-        return x
+            value = [value] * n
+        return XylemFlux.solve(self, sim_time, sxx, pb.dirichlet, self.node_ind, value, cells, soil_k)  # C++ (see XylemFlux.cpp)
 
     def solve(self, sim_time :float, trans :list, sx :float, sxx, cells :bool, wilting_point :float, soil_k=[]):
         """ solves the flux equations using Neumann and switching to dirichlet in case wilting point is reached in root collar 
@@ -104,16 +110,7 @@ class XylemFluxPython(XylemFlux):
             x = self.solve_neumann(sim_time, trans, sxx, cells, soil_k)  # try neumann, if below wilting point, switch to Dirichlet
 
             if x[0] <= wilting_point:
-                Q = sparse.coo_matrix((np.array(self.aV), (np.array(self.aI), np.array(self.aJ))))
-                Q = sparse.csr_matrix(Q)
-                Q, b = self.bc_dirichlet(Q, self.aB, [0], [float(wilting_point)])
-                try:
-                    x = LA.spsolve(Q, b, use_umfpack=True)
-                except:
-                    print("XylemFluxPython.solve: Exeption solving Dirichlet")
-                    print("Dirichlet at ", trans - sx, "cm")
-                    print("b", b)
-                    raise
+                x = self.solveLinearSystem(pb.dirichlet, [0], [float(wilting_point)])  # system is already assembled
         else:
             print("XylemFluxPython.solve: used Dirichlet because collar cell soil matric potential is below wilting point", sx)
             x = self.solve_dirichlet(sim_time, wilting_point, sx, sxx, cells, soil_k)
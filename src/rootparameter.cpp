@@ -2,6 +2,7 @@
 #include "rootparameter.h"
 
 #include "Organism.h"
+#include "binary_io.h"
 
 #include <cmath>
 #include <iostream>
@@ -246,6 +247,26 @@ tinyxml2::XMLElement* RootRandomParameter::writeXML(tinyxml2::XMLDocument& doc,
     return element;
 }
 
+/**
+ * @copydoc OrganRandomParameter::writeState()
+ *
+ * Additionally writes the probabilities of the successors
+ */
+void RootRandomParameter::writeState(std::ostream& os) const
+{
+    OrganRandomParameter::writeState(os);
+    writeBinary(os, successorP);
+}
+
+/**
+ * @copydoc OrganRandomParameter::readState()
+ */
+void RootRandomParameter::readState(std::istream& is)
+{
+    OrganRandomParameter::readState(is);
+    readBinary(is, successorP);
+}
+
 /**
  * CPlantBox parameter reader (DEPRICATED)
  */
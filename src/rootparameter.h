@@ -71,6 +71,8 @@ public:
 
     void readXML(tinyxml2::XMLElement* element) override; ///< reads a single sub type organ parameter set
     tinyxml2::XMLElement* writeXML(tinyxml2::XMLDocument& doc, bool comments = true) const override; ///< writes a organ root parameter set RootSpecificParameter::nob()
+    void writeState(std::ostream& os) const override; ///< writes the parameter values (binary, exact)
+    void readState(std::istream& is) override; ///< reads the parameter values written by writeState
 
     // DEPRICATED
     void read(std::istream & cin); ///< reads a single root parameter set
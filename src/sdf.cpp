@@ -3,6 +3,19 @@
 
 namespace CPlantBox {
 
+/**
+ * Evaluates the distance function of @param sdf for all points by non-virtual calls, that the compiler can inline into the loop
+ */
+template<class SDF>
+static std::vector<double> distances(const SDF& sdf, const std::vector<Vector3d>& points)
+{
+    std::vector<double> d(points.size());
+    for (size_t i=0; i<points.size(); i++) {
+        d[i] = sdf.SDF::getDist(points[i]);
+    }
+    return d;
+}
+
 std::string SignedDistanceFunction::writePVPScript() const
 {
     std::stringstream str;
@@ -10,6 +23,54 @@ std::string SignedDistanceFunction::writePVPScript() const
     return str.str();
 }
 
+/**
+ * Default implementation, calls getDist for each point
+ *
+ * @param points    spatial positions [cm]
+ * \return          signed distances [cm], a minus sign means inside, plus outside
+ */
+std::vector<double> SignedDistanceFunction::getDistances(const std::vector<Vector3d>& points) const
+{
+    std::vector<double> d(points.size());
+    for (size_t i=0; i<points.size(); i++) {
+        d[i] = getDist(points[i]);
+    }
+    return d;
+}
+
+/**
+ * Central differences of getDistances (same values as getGradient for each point)
+ *
+ * @param points    spatial positions [cm]
+ * @param eps       central differences epsilon
+ */
+std::vector<Vector3d> SignedDistanceFunction::getGradients(const std::vector<Vector3d>& points, double eps) const
+{
+    std::vector<Vector3d> p(points.size());
+    auto diff = [&](const Vector3d& e) { // central difference in direction e
+        for (size_t i=0; i<points.size(); i++) {
+            p[i] = points[i].plus(e);
+        }
+        std::vector<double> d = getDistances(p);
+        for (size_t i=0; i<points.size(); i++) {
+            p[i] = points[i].minus(e);
+        }
+        std::vector<double> d2 = getDistances(p);
+        for (size_t i=0; i<points.size(); i++) {
+            d[i] = (d[i] - d2[i])/(2.*eps);
+        }
+        return d;
+    };
+    std::vector<double> dx = diff(Vector3d(eps, 0, 0));
+    std::vector<double> dy = diff(Vector3d(0, eps, 0));
+    std::vector<double> dz = diff(Vector3d(0, 0, eps));
+    std::vector<Vector3d> g(points.size());
+    for (size_t i=0; i<points.size(); i++) {
+        g[i] = Vector3d(dx[i], dy[i], dz[i]);
+    }
+    return g;
+}
+
 
 
 /**
@@ -24,6 +85,14 @@ double SDF_PlantBox::getDist(const Vector3d& v) const
     return -std::min(std::min(std::min(std::min(std::min(dim.z+z,dim.z-z),dim.y+v.y),dim.y-v.y),dim.x+v.x),dim.x-v.x);
 }
 
+/**
+ * @see SignedDistanceFunction::getDistances
+ */
+std::vector<double> SDF_PlantBox::getDistances(const std::vector<Vector3d>& points) const
+{
+    return distances(*this, points);
+}
+
 /**
  * Writes a ParaView Phython script explicitly representing the implicit geometry
  *
@@ -62,6 +131,14 @@ double SDF_Cuboid::getDist(const Vector3d& v) const
     return -d;
 }
 
+/**
+ * @see SignedDistanceFunction::getDistances
+ */
+std::vector<double> SDF_Cuboid::getDistances(const std::vector<Vector3d>& points) const
+{
+    return distances(*this, points);
+}
+
 
 
 /**
@@ -94,6 +171,14 @@ double SDF_PlantContainer::getDist(const Vector3d& v) const
     return std::max(d,-std::min(h+v.z,0.-v.z));
 }
 
+/**
+ * @see SignedDistanceFunction::getDistances
+ */
+std::vector<double> SDF_PlantContainer::getDistances(const std::vector<Vector3d>& points) const
+{
+    return distances(*this, points);
+}
+
 /**
  * Writes a ParaView Phython script explicitly representing the implicit geometry
  *
@@ -179,6 +264,46 @@ double SDF_RotateTranslate::getDist(const Vector3d& v) const
     return sdf->getDist(p);
 }
 
+/**
+ * Transforms all points, and evaluates the base geometry in one batch
+ *
+ * @see SignedDistanceFunction::getDistances
+ */
+std::vector<double> SDF_RotateTranslate::getDistances(const std::vector<Vector3d>& points) const
+{
+    std::vector<Vector3d> p(points.size());
+    for (size_t i=0; i<points.size(); i++) {
+        p[i] = A.times(points[i].minus(pos));
+    }
+    return sdf->getDistances(p);
+}
+
+/**
+ * Bounding box of the rotated and translated bounding box of the base geometry
+ *
+ * @param min   lower corner of the box [cm]
+ * @param max   upper corner of the box [cm]
+ * \return      false if the base geometry is unbounded
+ */
+bool SDF_RotateTranslate::getBoundingBox(Vector3d& min, Vector3d& max) const
+{
+    Vector3d bmin, bmax;
+    if (!sdf->getBoundingBox(bmin, bmax)) {
+        return false;
+    }
+    Matrix3d Ai = A.inverse();
+    const double eps = 1.e-9; // rounding of the rotation [cm]
+    min = Vector3d(1.e100, 1.e100, 1.e100);
+    max = Vector3d(-1.e100, -1.e100, -1.e100);
+    for (int i=0; i<8; i++) { // corners of the base box
+        Vector3d c((i & 1) ? bmax.x : bmin.x, (i & 2) ? bmax.y : bmin.y, (i & 4) ? bmax.z : bmin.z);
+        Vector3d p = Ai.times(c).plus(pos);
+        min = Vector3d(std::min(min.x, p.x-eps), std::min(min.y, p.y-eps), std::min(min.z, p.z-eps));
+        max = Vector3d(std::max(max.x, p.x+eps), std::max(max.y, p.y+eps), std::max(max.z, p.z+eps));
+    }
+    return true;
+}
+
 /**
  * Writes a ParaView Phython script explicitly representing the implicit geometry
  *
@@ -230,6 +355,43 @@ double SDF_Intersection::getDist(const Vector3d& v) const {
     return d;
 }
 
+/**
+ * @see SignedDistanceFunction::getDistances
+ */
+std::vector<double> SDF_Intersection::getDistances(const std::vector<Vector3d>& points) const
+{
+    std::vector<double> d = sdfs[0]->getDistances(points);
+    for (size_t j=1; j<sdfs.size(); j++) {
+        std::vector<double> dj = sdfs[j]->getDistances(points);
+        for (size_t i=0; i<d.size(); i++) {
+            d[i] = std::max(d[i], dj[i]);
+        }
+    }
+    return d;
+}
+
+/**
+ * Intersection of the bounding boxes of the bounded geometries, false if all geometries are unbounded
+ */
+bool SDF_Intersection::getBoundingBox(Vector3d& min, Vector3d& max) const
+{
+    bool bounded = false;
+    for (const auto& sdf : sdfs) {
+        Vector3d a, b;
+        if (sdf->getBoundingBox(a, b)) {
+            if (bounded) {
+                min = Vector3d(std::max(min.x, a.x), std::max(min.y, a.y), std::max(min.z, a.z));
+                max = Vector3d(std::min(max.x, b.x), std::min(max.y, b.y), std::min(max.z, b.z));
+            } else {
+                min = a;
+                max = b;
+                bounded = true;
+            }
+        }
+    }
+    return bounded;
+}
+
 /**
  * Writes a ParaView Phython script explicitly representing the implicit geometry
  *
@@ -289,6 +451,42 @@ double SDF_Union::getDist(const Vector3d& v) const
     return d;
 }
 
+/**
+ * @see SignedDistanceFunction::getDistances
+ */
+std::vector<double> SDF_Union::getDistances(const std::vector<Vector3d>& points) const
+{
+    std::vector<double> d = sdfs[0]->getDistances(points);
+    for (size_t j=1; j<sdfs.size(); j++) {
+        std::vector<double> dj = sdfs[j]->getDistances(points);
+        for (size_t i=0; i<d.size(); i++) {
+            d[i] = std::min(d[i], dj[i]);
+        }
+    }
+    return d;
+}
+
+/**
+ * Union of the bounding boxes, false if any geometry is unbounded
+ */
+bool SDF_Union::getBoundingBox(Vector3d& min, Vector3d& max) const
+{
+    for (size_t i=0; i<sdfs.size(); i++) {
+        Vector3d a, b;
+        if (!sdfs[i]->getBoundingBox(a, b)) {
+            return false;
+        }
+        if (i==0) {
+            min = a;
+            max = b;
+        } else {
+            min = Vector3d(std::min(min.x, a.x), std::min(min.y, a.y), std::min(min.z, a.z));
+            max = Vector3d(std::max(max.x, b.x), std::max(max.y, b.y), std::max(max.z, b.z));
+        }
+    }
+    return true;
+}
+
 
 
 /**
@@ -306,6 +504,21 @@ double SDF_Difference::getDist(const Vector3d& v) const
     return d;
 }
 
+/**
+ * @see SignedDistanceFunction::getDistances
+ */
+std::vector<double> SDF_Difference::getDistances(const std::vector<Vector3d>& points) const
+{
+    std::vector<double> d = sdfs[0]->getDistances(points);
+    for (size_t j=1; j<sdfs.size(); j++) {
+        std::vector<double> dj = sdfs[j]->getDistances(points);
+        for (size_t i=0; i<d.size(); i++) {
+            d[i] = std::max(d[i], -dj[i]);
+        }
+    }
+    return d;
+}
+
 
 
 /**
@@ -331,6 +544,14 @@ SDF_HalfPlane::SDF_HalfPlane(const Vector3d& o, const Vector3d& p1, const Vector
     //	std::cout << "SDF_HalfPlane normal:"<< n.toString() << "\n" ;
 };
 
+/**
+ * @see SignedDistanceFunction::getDistances
+ */
+std::vector<double> SDF_HalfPlane::getDistances(const std::vector<Vector3d>& points) const
+{
+    return distances(*this, points);
+}
+
 /**
  * Writes a ParaView Phython script explicitly representing the half plane,
  * the plane is given only by its normal, two orthogonal vectors are randomly chosen
@@ -8,6 +8,7 @@
 #include <vector>
 #include <stdexcept>
 #include <memory>
+#include <algorithm>
 
 namespace CPlantBox {
 
@@ -32,6 +33,15 @@ public:
      */
     virtual double getDist(const Vector3d& v) const { return -1e100; } ///< Returns the signed distance to the next boundary
 
+    /**
+     * Returns the signed distances of many points (batch version of getDist), overwrite for geometries
+     * that can evaluate the points in a tight loop (one virtual call per batch instead of per point)
+     *
+     * @param points    spatial positions [cm]
+     * \return          signed distances [cm], a minus sign means inside, plus outside
+     */
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const;
+
     /**
      * Returns a string representation of the object (for debugging)
      */
@@ -49,6 +59,16 @@ public:
 
     virtual std::string writePVPScript() const; ///< Writes the ParaView Python script into a string
 
+    /**
+     * Returns the axis aligned bounding box of the geometry (i.e. of all points with getDist(v)<=0),
+     * used to restrict spatial queries to candidate segments (e.g. SegmentAnalyser::crop)
+     *
+     * @param min   lower corner of the box [cm]
+     * @param max   upper corner of the box [cm]
+     * \return      false if the geometry is unbounded (default)
+     */
+    virtual bool getBoundingBox(Vector3d& min, Vector3d& max) const { return false; }
+
     /**
      * Returns the (numerical) gradient of the sdf, overwrite with an analytical gradient (where appropriate).
      * Denotes direction of greatest ascent, e.g the outside normal of a boundary point
@@ -64,6 +84,15 @@ public:
             (getDist(p.plus(epsZ)) - getDist(p.minus(epsZ)))/(2.*eps));
     }
 
+    /**
+     * Returns the (numerical) gradients of many points (batch version of getGradient, using six calls of getDistances),
+     * overwrite together with getGradient
+     *
+     * @param points    spatial positions [cm]
+     * @param eps       central differences epsilon
+     */
+    virtual std::vector<Vector3d> getGradients(const std::vector<Vector3d>& points, double eps = 5.e-4) const;
+
 };
 
 
@@ -85,9 +114,16 @@ public:
     SDF_PlantBox(double x, double y, double z) :dim(x/2.,y/2.,z/2.) { } ///< creates a rectangular box
 
     virtual double getDist(const Vector3d& v) const override; ///< @see SignedDistanceFunction::getDist
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const override; ///< @see SignedDistanceFunction::getDistances
 
     virtual std::string toString() const override { return "SDF_PlantBox"; } ///< @see SignedDistanceFunction::toString
 
+    virtual bool getBoundingBox(Vector3d& min, Vector3d& max) const override {
+        min = Vector3d(-dim.x, -dim.y, -2.*dim.z);
+        max = Vector3d(dim.x, dim.y, 0.);
+        return true;
+    } ///< @see SignedDistanceFunction::getBoundingBox
+
     virtual int writePVPScript(std::ostream & cout, int c=1) const override;  ///< @see SignedDistanceFunction::writePVPScript
 
 private:
@@ -106,9 +142,16 @@ public:
     SDF_Cuboid(Vector3d min, Vector3d max) : min(min), max(max) { };
 
     virtual double getDist(const Vector3d& v) const override;  ///< @see SignedDistanceFunction::getDist
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const override; ///< @see SignedDistanceFunction::getDistances
 
     virtual std::string toString() const override { return "SDF_Cuboid ["+min.toString()+" - "+max.toString()+"]"; } ///< @see SignedDistanceFunction::toString
 
+    virtual bool getBoundingBox(Vector3d& min_, Vector3d& max_) const override {
+        min_ = min;
+        max_ = max;
+        return true;
+    } ///< @see SignedDistanceFunction::getBoundingBox
+
     Vector3d min;
     Vector3d max;
 };
@@ -126,9 +169,17 @@ public:
     SDF_PlantContainer(double r1_, double r2_, double h_, double sq=false); ///< Creates a cylindrical or square container
 
     virtual double getDist(const Vector3d& v) const override; ///< @see SignedDistanceFunction::getDist
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const override; ///< @see SignedDistanceFunction::getDistances
 
     virtual std::string toString() const override { return "SDF_PlantContainer"; } ///< @see SignedDistanceFunction::toString
 
+    virtual bool getBoundingBox(Vector3d& min, Vector3d& max) const override {
+        double r = std::max(r1, r2);
+        min = Vector3d(-r, -r, -h);
+        max = Vector3d(r, r, 0.);
+        return true;
+    } ///< @see SignedDistanceFunction::getBoundingBox
+
     virtual int writePVPScript(std::ostream & cout, int c=1) const override; ///< @see SignedDistanceFunction::writePVPScript
 
 private:
@@ -153,9 +204,12 @@ public:
     SDF_RotateTranslate(std::shared_ptr<SignedDistanceFunction> sdf, Vector3d pos): SDF_RotateTranslate(sdf, 0., xaxis, pos) { } ///< Translate only
 
     virtual double getDist(const Vector3d& v) const override; ///< @see SignedDistanceFunction::getDist
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const override; ///< @see SignedDistanceFunction::getDistances
 
     virtual std::string toString() const override { return "SDF_RotateTranslate"; } ///< @see SignedDistanceFunction::toString
 
+    virtual bool getBoundingBox(Vector3d& min, Vector3d& max) const override; ///< @see SignedDistanceFunction::getBoundingBox
+
     virtual int writePVPScript(std::ostream & cout, int c=1)  const override; ///< @see SignedDistanceFunction::writePVPScript
 
 private:
@@ -181,9 +235,12 @@ public:
     ///< Constructs (sdf1 ∩ sdf2)
 
     virtual double getDist(const Vector3d& v) const override;  ///< @see SignedDistanceFunction::getDist
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const override; ///< @see SignedDistanceFunction::getDistances
 
     virtual std::string toString() const override { return "SDF_Intersection"; } ///< @see SignedDistanceFunction::toString
 
+    virtual bool getBoundingBox(Vector3d& min, Vector3d& max) const override; ///< @see SignedDistanceFunction::getBoundingBox
+
     virtual int writePVPScript(std::ostream & cout, int c=1) const override; ///< @see SignedDistanceFunction::writePVPScript
 
 protected:
@@ -203,8 +260,11 @@ public:
     SDF_Union(std::shared_ptr<SignedDistanceFunction> sdf1, std::shared_ptr<SignedDistanceFunction> sdf2): SDF_Intersection(sdf1,sdf2) { } ///< Constructs sdf1 U sdf2
 
     virtual double getDist(const Vector3d& v) const override;  ///< @see SignedDistanceFunction::getDist
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const override; ///< @see SignedDistanceFunction::getDistances
 
     virtual std::string toString() const override { return "SDF_Union"; } ///< @see SignedDistanceFunction::toString
+
+    virtual bool getBoundingBox(Vector3d& min, Vector3d& max) const override; ///< @see SignedDistanceFunction::getBoundingBox
 };
 
 
@@ -219,8 +279,13 @@ public:
     SDF_Difference(std::shared_ptr<SignedDistanceFunction> sdf1, std::shared_ptr<SignedDistanceFunction> sdf2) :SDF_Intersection(sdf1,sdf2) { } ///< Constructs sdf1 \ sdf2
 
     virtual double getDist(const Vector3d& v) const override;  ///< @see SignedDistanceFunction::getDist
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const override; ///< @see SignedDistanceFunction::getDistances
 
     virtual std::string toString() const override { return "SDF_Difference"; } ///< @see SignedDistanceFunction::toString
+
+    virtual bool getBoundingBox(Vector3d& min, Vector3d& max) const override {
+        return sdfs[0]->getBoundingBox(min, max);
+    } ///< @see SignedDistanceFunction::getBoundingBox
 };
 
 
@@ -235,6 +300,13 @@ public:
     SDF_Complement(std::shared_ptr<SignedDistanceFunction> sdf_) { sdf=sdf_; } ///< Constructs the complement (sdf_)^c
 
     virtual double getDist(const Vector3d& v) const override { return -sdf->getDist(v); } ///< @see SignedDistanceFunction::getDist
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const override {
+        std::vector<double> d = sdf->getDistances(points);
+        for (auto& d_ : d) {
+            d_ = -d_;
+        }
+        return d;
+    } ///< @see SignedDistanceFunction::getDistances
 
     virtual int writePVPScript(std::ostream & cout, int c=1) const override { return sdf->writePVPScript(cout,c); } ///< same as original geometry
 
@@ -256,6 +328,7 @@ public:
     SDF_HalfPlane(const Vector3d& o, const Vector3d& p1, const Vector3d& p2);  ///< half plane by origin and two linear independent vectors
 
     virtual double getDist(const Vector3d& v) const override { return n.times(v.minus(o)); } ///< @see SignedDistanceFunction::getDist
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const override; ///< @see SignedDistanceFunction::getDistances
 
     virtual int writePVPScript(std::ostream & cout, int c=1) const override; ///< @see SignedDistanceFunction::writePVPScript
 
@@ -23,6 +23,9 @@ namespace CPlantBox {
  * segment centers are put into a aabb tree, for fast distance lookup
  *
  * dx is the rectangular observation radius
+ *
+ * Queries reuse thread local buffers (no allocations per point), use getDistances for many points.
+ * The tree of a growing root system can be updated with SDF_RootSystem::update (instead of rebuilding it)
  */
 class SDF_RootSystem : public SignedDistanceFunction
 {
@@ -36,6 +39,10 @@ public:
 
     virtual double getDist(const Vector3d& p) const override;
 
+    virtual std::vector<double> getDistances(const std::vector<Vector3d>& points) const override; ///< @see SignedDistanceFunction::getDistances
+
+    void update(const Organism& plant); ///< inserts the new segments of the last time step, and moves the segments of moved nodes
+
     virtual std::string toString() const override { return "SDF_RootSystem"; }
 
     std::vector<Vector3d> nodes_;
@@ -45,9 +52,18 @@ public:
 
 protected:
 
+    struct QueryBuffer {
+        aabb::AABB box = aabb::AABB(3); // observation box
+        std::vector<unsigned int> indices; // segments in range
+        std::vector<unsigned int> stack; // tree traversal
+    };
+
     void buildTree();
+    void insertSegment(size_t i); // inserts or moves the segment centre in the tree
+    double getDist(const Vector3d& p, QueryBuffer& buffer) const;
 
     mutable aabb::Tree tree = aabb::Tree();
+    std::vector<int> nodeSeg_; // index of the segment ending in a node, or -1
 
 };
 
@@ -85,25 +101,83 @@ SDF_RootSystem::SDF_RootSystem(std::vector<Vector3d> nodes, const std::vector<Ve
 }
 
 void SDF_RootSystem::buildTree() {
-    size_t c = 0;
-    for (const auto& s : segments_) { // fill the tree
-        Vector3d mid = nodes_[s.x].plus(nodes_[s.y]).times(0.5);
-        std::vector<double> d = { mid.x, mid.y, mid.z };
-        tree.insertParticle(c, d, radii_[c]);
-        c++;
+    for (size_t i=0; i<segments_.size(); i++) { // fill the tree
+        insertSegment(i);
+    }
+}
+
+/**
+ * Puts the centre of segment @param i into the tree, or moves it, if it is already there
+ */
+void SDF_RootSystem::insertSegment(size_t i) {
+    const Vector2i& s = segments_[i];
+    Vector3d mid = nodes_[s.x].plus(nodes_[s.y]).times(0.5);
+    std::vector<double> d = { mid.x, mid.y, mid.z };
+    if (s.y>=int(nodeSeg_.size())) {
+        nodeSeg_.resize(s.y+1, -1);
+    }
+    if (nodeSeg_[s.y]==int(i)) { // already in the tree
+        tree.updateParticle(i, d, radii_[i], true); // always reinsert, to obtain the same tree boxes as buildTree
+    } else {
+        tree.insertParticle(i, d, radii_[i]);
+        nodeSeg_[s.y] = i;
     }
 }
 
+/**
+ * Updates the tree after a simulation step of the organism @param plant, which must be
+ * the organism this object was constructed from (no full rebuild of the tree).
+ *
+ * New segments are inserted, segments ending in moved nodes are moved.
+ */
+void SDF_RootSystem::update(const Organism& plant) {
+    nodes_ = plant.getNodes();
+    auto newSegs = plant.getNewSegments();
+    auto newOrigins = plant.getNewSegmentOrigins();
+    for (size_t i=0; i<newSegs.size(); i++) {
+        segments_.push_back(newSegs[i]);
+        radii_.push_back(newOrigins[i]->getParameter("radius"));
+        insertSegment(segments_.size()-1);
+    }
+    for (int ni : plant.getUpdatedNodeIndices()) {
+        if ((ni<int(nodeSeg_.size())) && (nodeSeg_[ni]>=0)) {
+            insertSegment(nodeSeg_[ni]);
+        }
+    }
+}
 
+/**
+ * Signed distance (minus inside), using thread local query buffers
+ */
 double SDF_RootSystem::getDist(const Vector3d& p) const {
+    thread_local QueryBuffer buffer; // reused by all queries of the thread
+    return getDist(p, buffer);
+}
+
+/**
+ * Signed distances of many points
+ */
+std::vector<double> SDF_RootSystem::getDistances(const std::vector<Vector3d>& points) const {
+    QueryBuffer buffer;
+    std::vector<double> d(points.size());
+    for (size_t i=0; i<points.size(); i++) {
+        d[i] = getDist(points[i], buffer);
+    }
+    return d;
+}
+
+/**
+ * Signed distance of the point @param p, using the query buffer @param buffer (no allocations)
+ */
+double SDF_RootSystem::getDist(const Vector3d& p, QueryBuffer& buffer) const {
 
-    std::vector<double> a = { p.x-dx_, p.y-dx_, p.z-dx_ };
-    std::vector<double> b = { p.x+dx_, p.y+dx_, p.z+dx_ };
-    aabb::AABB box = aabb::AABB(a,b);
+    auto& box = buffer.box;
+    box.lowerBound[0] = p.x-dx_; box.lowerBound[1] = p.y-dx_; box.lowerBound[2] = p.z-dx_;
+    box.upperBound[0] = p.x+dx_; box.upperBound[1] = p.y+dx_; box.upperBound[2] = p.z+dx_;
     double mdist = 1e100; // far far away
-    auto indices = tree.query(box);
-    // std::cout << indices.size() << " segments in range\n";
-    for (int i : indices) {
+    tree.query(box, buffer.indices, buffer.stack);
+    // std::cout << buffer.indices.size() << " segments in range\n";
+    for (int i : buffer.indices) {
 
         Vector3d x1 = nodes_[segments_[i].x];
         Vector3d x2 = nodes_[segments_[i].y];
@@ -0,0 +1,134 @@
+// -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
+#include "soil_index.h"
+
+#include <cmath>
+#include <stdexcept>
+
+namespace CPlantBox {
+
+/**
+ * Maps a point into a cell and returns the cells linear index, -1 if the point is out of the domain
+ */
+int EquidistantSoilIndex::getIndex(double x, double y, double z) const {
+    double w[3] = { max.x-min.x, max.y-min.y, max.z-min.z };
+    double r[3] = { res.x, res.y, res.z };
+    double i[3] = { (x-min.x)/w[0]*r[0], (y-min.y)/w[1]*r[1], (z-min.z)/w[2]*r[2] };
+    for (int k=0; k<3; k++) {
+        if ((i[k] < 0) or (i[k] >= r[k])) {
+            return -1; // point is out of domain
+        }
+    }
+    return std::floor(i[2]) * r[0] * r[1] + std::floor(i[1]) * r[0] + std::floor(i[0]); // a linear index not periodic
+}
+
+/**
+ * A rectilinear grid given by the sorted coordinates of the cell faces
+ *
+ * @param x     face coordinates along the x-axis [cm]
+ * @param y     face coordinates along the y-axis [cm]
+ * @param z     face coordinates along the z-axis [cm]
+ */
+RectilinearSoilIndex::RectilinearSoilIndex(std::vector<double> x, std::vector<double> y, std::vector<double> z)
+:xgrid(x.size(), x, std::vector<double>(x.size())), ygrid(y.size(), y, std::vector<double>(y.size())), zgrid(z.size(), z, std::vector<double>(z.size()))
+{
+    if ((x.size()<2) || (y.size()<2) || (z.size()<2)) {
+        throw std::invalid_argument("RectilinearSoilIndex::RectilinearSoilIndex: at least two face coordinates are needed along each axis");
+    }
+}
+
+/**
+ * Maps a point into a cell (by bisection along each axis) and returns the cells linear index, -1 if the point is out of the domain
+ */
+int RectilinearSoilIndex::getIndex(double x, double y, double z) const {
+    if ((x<xgrid.grid.front()) || (x>=xgrid.grid.back()) || (y<ygrid.grid.front()) || (y>=ygrid.grid.back()) ||
+        (z<zgrid.grid.front()) || (z>=zgrid.grid.back())) {
+        return -1; // point is out of domain
+    }
+    int nx = xgrid.n-1;
+    int ny = ygrid.n-1;
+    return (zgrid.map(z)*ny + ygrid.map(y))*nx + xgrid.map(x);
+}
+
+/**
+ * An unstructured mesh, builds the aabb tree of the cell bounding boxes
+ *
+ * @param points    mesh vertices [cm]
+ * @param cells     vertex indices of each cell, tetrahedra (4 vertices) or hexahedra (8 vertices, DUNE reference element ordering)
+ */
+UnstructuredSoilIndex::UnstructuredSoilIndex(std::vector<Vector3d> points, std::vector<std::vector<int>> cells)
+:points(points), cells(cells), tree(3, 0., cells.size())
+{
+    for (int c = 0; c<cells.size(); c++) {
+        if ((cells[c].size()!=4) && (cells[c].size()!=8)) {
+            throw std::invalid_argument("UnstructuredSoilIndex::UnstructuredSoilIndex: cell "+std::to_string(c)+" is neither a tetrahedron nor a hexahedron");
+        }
+        Vector3d p = points.at(cells[c][0]);
+        std::vector<double> lower = { p.x, p.y, p.z };
+        std::vector<double> upper = lower;
+        for (int i : cells[c]) {
+            Vector3d q = points.at(i);
+            lower[0] = std::min(lower[0], q.x);
+            lower[1] = std::min(lower[1], q.y);
+            lower[2] = std::min(lower[2], q.z);
+            upper[0] = std::max(upper[0], q.x);
+            upper[1] = std::max(upper[1], q.y);
+            upper[2] = std::max(upper[2], q.z);
+        }
+        tree.insertParticle(c, lower, upper);
+    }
+}
+
+/**
+ * Picks the cell containing the point from the cells with overlapping bounding boxes, returns the cell index,
+ * -1 if the point is out of the domain
+ */
+int UnstructuredSoilIndex::getIndex(double x, double y, double z) const {
+    std::vector<double> p_ = { x, y, z };
+    aabb::AABB box = aabb::AABB(p_, p_);
+    Vector3d p(x, y, z);
+    int cellIdx = -1;
+    for (unsigned int c : tree.query(box)) {
+        if (inCell(p, c)) {
+            if ((cellIdx<0) || (c<cellIdx)) { // points on faces are mapped to the cell with smaller index
+                cellIdx = c;
+            }
+        }
+    }
+    return cellIdx;
+}
+
+/**
+ * Point in cell test, hexahedra are split into 6 tetrahedra along the diagonal from vertex 0 to vertex 7
+ */
+bool UnstructuredSoilIndex::inCell(const Vector3d& p, int cellIdx) const {
+    const auto& v = cells[cellIdx];
+    if (v.size()==4) {
+        return inTetrahedron(p, v[0], v[1], v[2], v[3]);
+    } else {
+        return inTetrahedron(p, v[0], v[1], v[3], v[7]) || inTetrahedron(p, v[0], v[1], v[5], v[7]) ||
+            inTetrahedron(p, v[0], v[2], v[3], v[7]) || inTetrahedron(p, v[0], v[2], v[6], v[7]) ||
+            inTetrahedron(p, v[0], v[4], v[5], v[7]) || inTetrahedron(p, v[0], v[4], v[6], v[7]);
+    }
+}
+
+/**
+ * Point in tetrahedron test using barycentric coordinates
+ */
+bool UnstructuredSoilIndex::inTetrahedron(const Vector3d& p, int a, int b, int c, int d) const {
+    Vector3d x0 = points[a];
+    Vector3d e1 = points[b].minus(x0);
+    Vector3d e2 = points[c].minus(x0);
+    Vector3d e3 = points[d].minus(x0);
+    Vector3d w = p.minus(x0);
+    double vol = e1.times(e2.cross(e3));
+    if (std::fabs(vol)==0.) { // degenerated
+        return false;
+    }
+    double l1 = w.times(e2.cross(e3))/vol;
+    double l2 = e1.times(w.cross(e3))/vol;
+    double l3 = e1.times(e2.cross(w))/vol;
+    double l0 = 1.-l1-l2-l3;
+    return (l0>=-eps) && (l1>=-eps) && (l2>=-eps) && (l3>=-eps);
+}
+
+} // namespace
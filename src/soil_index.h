@@ -0,0 +1,111 @@
+// -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
+#ifndef SOIL_INDEX_H
+#define SOIL_INDEX_H
+
+#include "mymath.h"
+#include "soil.h"
+
+#include "external/aabbcc/AABB.h"
+
+#include <memory>
+#include <vector>
+#include <string>
+
+namespace CPlantBox {
+
+/**
+ * Base class of the native soil index mappers, maps a point to the linear index of the soil cell containing it
+ * (or -1 if the point is outside of the soil domain).
+ *
+ * In contrast to Python call back functions, the mappers can be called in parallel (@see MappedSegments::setSoilGrid)
+ */
+class SoilIndex
+{
+public:
+
+    virtual ~SoilIndex() { }
+
+    virtual int getIndex(double x, double y, double z) const = 0; ///< soil cell index of the point, -1 if outside of the domain
+
+    virtual std::string toString() const { return "SoilIndex"; } ///< Quick info about the object for debugging
+
+};
+
+/**
+ * Wraps a native soil index mapper as call back function, @see MappedSegments::soil_index
+ */
+struct SoilIndexFunction
+{
+    std::shared_ptr<SoilIndex> soilIndex;
+
+    int operator()(double x, double y, double z) const { return soilIndex->getIndex(x, y, z); }
+};
+
+/**
+ * Equidistant rectangular grid (same cell numbering as MappedSegments::soil_index_)
+ */
+class EquidistantSoilIndex : public SoilIndex
+{
+public:
+
+    EquidistantSoilIndex(Vector3d min, Vector3d max, Vector3d res): min(min), max(max), res(res) { }
+
+    int getIndex(double x, double y, double z) const override;
+
+    std::string toString() const override { return "EquidistantSoilIndex"; } ///< Quick info about the object for debugging
+
+    Vector3d min; ///< minimum of the soil domain [cm]
+    Vector3d max; ///< maximum of the soil domain [cm]
+    Vector3d res; ///< number of cells in each dimension [1]
+
+};
+
+/**
+ * Rectilinear grid (tensor product grid), given by the coordinates of the cell faces along each axis,
+ * cells are numbered x fastest, then y, then z.
+ */
+class RectilinearSoilIndex : public SoilIndex
+{
+public:
+
+    RectilinearSoilIndex(std::vector<double> x, std::vector<double> y, std::vector<double> z);
+
+    int getIndex(double x, double y, double z) const override;
+
+    std::string toString() const override { return "RectilinearSoilIndex"; } ///< Quick info about the object for debugging
+
+    Grid1D xgrid, ygrid, zgrid; ///< sorted face coordinates along each axis [cm]
+
+};
+
+/**
+ * Unstructured mesh of tetrahedra (4 vertices) and hexahedra (8 vertices, DUNE reference element ordering),
+ * the cell index is the index within the list of cells. Cell bounding boxes are stored in an aabb tree.
+ */
+class UnstructuredSoilIndex : public SoilIndex
+{
+public:
+
+    UnstructuredSoilIndex(std::vector<Vector3d> points, std::vector<std::vector<int>> cells);
+
+    int getIndex(double x, double y, double z) const override;
+
+    std::string toString() const override { return "UnstructuredSoilIndex"; } ///< Quick info about the object for debugging
+
+    std::vector<Vector3d> points; ///< mesh vertices [cm]
+    std::vector<std::vector<int>> cells; ///< vertex indices of each cell
+
+    double eps = 1.e-10; ///< relative tolerance of the point in cell test
+
+protected:
+
+    bool inTetrahedron(const Vector3d& p, int a, int b, int c, int d) const; ///< point in tetrahedron test (barycentric coordinates)
+    bool inCell(const Vector3d& p, int cellIdx) const; ///< point in cell test
+
+    mutable aabb::Tree tree = aabb::Tree(3, 0.); // bounding boxes of the cells
+
+};
+
+} // namespace
+
+#endif
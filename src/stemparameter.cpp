@@ -2,6 +2,7 @@
 #include "stemparameter.h"
 
 #include "Organism.h"
+#include "binary_io.h"
 
 #include <cmath>
 #include <iostream>
@@ -263,6 +264,26 @@ tinyxml2::XMLElement* StemRandomParameter::writeXML(tinyxml2::XMLDocument& doc,
     return element;
 }
 
+/**
+ * @copydoc OrganRandomParameter::writeState()
+ *
+ * Additionally writes the probabilities of the successors
+ */
+void StemRandomParameter::writeState(std::ostream& os) const
+{
+    OrganRandomParameter::writeState(os);
+    writeBinary(os, successorP);
+}
+
+/**
+ * @copydoc OrganRandomParameter::readState()
+ */
+void StemRandomParameter::readState(std::istream& is)
+{
+    OrganRandomParameter::readState(is);
+    readBinary(is, successorP);
+}
+
 /**
  * Sets up class introspection by linking parameter names to their class members,
  * additionally adds a description for each parameter, for toString and writeXML
@@ -0,0 +1,195 @@
+// -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
+#include "time_series_writer.h"
+
+#include "Organism.h"
+#include "Organ.h"
+
+#include <fstream>
+#include <sstream>
+#include <stdexcept>
+
+namespace CPlantBox {
+
+/**
+ * Creates the (empty) files name.xmf, name.bin, and name_tips.bin
+ *
+ * @param plant     the organism
+ * @param name      file name without extension
+ */
+TimeSeriesWriter::TimeSeriesWriter(std::shared_ptr<Organism> plant, std::string name): plant(plant), name(name)
+{
+    std::ofstream xmf(name+".xmf");
+    if (!xmf.good()) {
+        throw std::invalid_argument("TimeSeriesWriter::TimeSeriesWriter: could not open file "+name+".xmf");
+    }
+    xmf << "<?xml version=\"1.0\" ?>\n<Xdmf Version=\"2.0\">\n<Domain>\n";
+    xmf << "<Grid Name=\"TimeSeries\" GridType=\"Collection\" CollectionType=\"Temporal\">\n";
+    xmfEnd = xmf.tellp();
+    xmf << "</Grid>\n</Domain>\n</Xdmf>\n";
+    std::ofstream(name+".bin", std::ios::binary);
+    std::ofstream(name+"_tips.bin", std::ios::binary);
+}
+
+/**
+ * Appends the current state of the organism.
+ *
+ * Nodes with an outgoing segment, and nodes that did not move since the last step are final, they are written once
+ * into name.bin. Other nodes (growing tips) are written into name_tips.bin for this time step only.
+ */
+void TimeSeriesWriter::write()
+{
+    auto p = plant.lock();
+    if (!p) {
+        throw std::invalid_argument("TimeSeriesWriter::write: organism expired");
+    }
+    std::vector<Vector3d> newNodes = p->getNodes();
+    std::vector<double> nodeCTs = p->getNodeCTs();
+    std::vector<Vector2i> segs = p->getSegments();
+    std::vector<std::shared_ptr<Organ>> segO = p->getSegmentOrigins();
+    int n = newNodes.size();
+    std::vector<int> incoming(n, -1); // segment index ending in the node
+    std::vector<bool> hasChild(n, false);
+    for (size_t i=0; i<segs.size(); i++) {
+        incoming.at(segs[i].y) = i;
+        hasChild.at(segs[i].x) = true;
+    }
+    bool newEpoch = (n<int(nodes.size()));
+    for (size_t i=0; (i<recordIdx.size()) && !newEpoch; i++) { // a written node moved
+        if ((recordIdx[i]>=0) && ((newNodes[i].x!=nodes[i].x) || (newNodes[i].y!=nodes[i].y) || (newNodes[i].z!=nodes[i].z))) {
+            newEpoch = true;
+        }
+    }
+    int stable = rows-epochStart; // records in the current epoch
+    if (newEpoch) {
+        recordIdx.clear();
+        epochStart = rows;
+        stable = 0;
+    }
+    int oldN = nodes.size();
+    if (newEpoch) {
+        oldN = 0;
+    }
+    recordIdx.resize(n, -1);
+    std::vector<int> newStable, tips;
+    for (int i=0; i<n; i++) {
+        if (recordIdx[i]<0) {
+            bool unmoved = (i<oldN) && (newNodes[i].x==nodes[i].x) && (newNodes[i].y==nodes[i].y) && (newNodes[i].z==nodes[i].z);
+            if (hasChild[i] || unmoved) {
+                recordIdx[i] = stable + newStable.size();
+                newStable.push_back(i);
+            } else {
+                tips.push_back(i);
+            }
+        }
+    }
+    std::vector<int> idx = recordIdx; // index of the node in this time step
+    for (size_t j=0; j<tips.size(); j++) {
+        idx[tips[j]] = stable + newStable.size() + j;
+    }
+    auto record = [&](int i) {
+        std::vector<double> r(recordSize);
+        r[0] = newNodes[i].x; r[1] = newNodes[i].y; r[2] = newNodes[i].z;
+        int si = incoming[i];
+        if (si>=0) {
+            r[3] = idx[segs[si].x]; r[4] = idx[i];
+            r[5] = nodeCTs[i];
+            r[6] = segO[si]->getParameter("radius");
+            r[7] = segO[si]->getParameter("subType");
+            r[8] = segO[si]->organType();
+        } else { // node without segment (e.g. seed node)
+            r[3] = idx[i]; r[4] = idx[i];
+            r[5] = nodeCTs[i];
+            r[6] = 0.; r[7] = -1.; r[8] = -1.;
+        }
+        return r;
+    };
+    std::ofstream bin(name+".bin", std::ios::binary | std::ios::app);
+    for (int i : newStable) {
+        auto r = record(i);
+        bin.write(reinterpret_cast<const char*>(r.data()), recordSize*sizeof(double));
+    }
+    bin.close();
+    std::ofstream tipsBin(name+"_tips.bin", std::ios::binary | std::ios::app);
+    for (int i : tips) {
+        auto r = record(i);
+        tipsBin.write(reinterpret_cast<const char*>(r.data()), recordSize*sizeof(double));
+    }
+    tipsBin.close();
+    rows += newStable.size();
+    int tipStart = tipRows;
+    tipRows += tips.size();
+    nodes = newNodes;
+
+    int s = rows-epochStart; // number of records in name.bin used by this step
+    int t = tips.size();
+    std::ostringstream grid;
+    grid << "<Grid Name=\"step" << steps << "\" GridType=\"Uniform\">\n";
+    grid << "<Time Value=\"" << p->getSimTime() << "\"/>\n";
+    grid << "<Topology TopologyType=\"Polyline\" NodesPerElement=\"2\" NumberOfElements=\"" << s+t << "\">\n";
+    grid << joined(epochStart, s, tipStart, t, 3, 2);
+    grid << "</Topology>\n";
+    grid << "<Geometry GeometryType=\"XYZ\">\n";
+    grid << joined(epochStart, s, tipStart, t, 0, 3);
+    grid << "</Geometry>\n";
+    std::vector<std::string> names = { "creationTime", "radius", "subType", "organType" };
+    for (int k=0; k<4; k++) {
+        grid << "<Attribute Name=\"" << names[k] << "\" AttributeType=\"Scalar\" Center=\"Cell\">\n";
+        grid << joined(epochStart, s, tipStart, t, 5+k, 1);
+        grid << "</Attribute>\n";
+    }
+    grid << "</Grid>\n";
+    std::fstream xmf(name+".xmf", std::ios::in | std::ios::out);
+    xmf.seekp(xmfEnd);
+    xmf << grid.str();
+    xmfEnd = xmf.tellp();
+    xmf << "</Grid>\n</Domain>\n</Xdmf>\n";
+    xmf.close();
+    steps++;
+}
+
+/**
+ * Data item of the columns [col, col+cols) of the stable records [start, start+count) joined with the
+ * tip records [tipStart, tipStart+tipCount)
+ */
+std::string TimeSeriesWriter::joined(int start, int count, int tipStart, int tipCount, int col, int cols) const
+{
+    std::string file = name.substr(name.find_last_of("/\\")+1); // relative to the xmf file
+    if (tipCount==0) {
+        return dataItem(file+".bin", rows, start, count, col, cols);
+    }
+    if (count==0) {
+        return dataItem(file+"_tips.bin", tipRows, tipStart, tipCount, col, cols);
+    }
+    std::ostringstream os;
+    os << "<DataItem ItemType=\"Function\" Function=\"JOIN($0, $1)\" Dimensions=\"" << count+tipCount << " " << cols << "\">\n";
+    os << dataItem(file+".bin", rows, start, count, col, cols);
+    os << dataItem(file+"_tips.bin", tipRows, tipStart, tipCount, col, cols);
+    os << "</DataItem>\n";
+    return os.str();
+}
+
+/**
+ * Hyperslab of the columns [col, col+cols) of the records [start, start+count) in the binary file
+ */
+std::string TimeSeriesWriter::dataItem(std::string file, int totalRows, int start, int count, int col, int cols) const
+{
+    std::ostringstream os;
+    os << "<DataItem ItemType=\"HyperSlab\" Dimensions=\"" << count << " " << cols << "\" Type=\"HyperSlab\">\n";
+    os << "<DataItem Dimensions=\"3 2\" Format=\"XML\">" << start << " " << col << " 1 1 " << count << " " << cols << "</DataItem>\n";
+    os << "<DataItem Dimensions=\"" << totalRows << " " << recordSize << "\" NumberType=\"Float\" Precision=\"8\" Format=\"Binary\" Endian=\"Little\">"
+        << file << "</DataItem>\n";
+    os << "</DataItem>\n";
+    return os.str();
+}
+
+/**
+ * Quick info for debugging
+ */
+std::string TimeSeriesWriter::toString() const
+{
+    std::stringstream str;
+    str << "TimeSeriesWriter " << name << ".xmf: " << steps << " steps, " << rows << " records, " << tipRows << " tip records";
+    return str.str();
+}
+
+} // namespace
@@ -0,0 +1,61 @@
+// -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
+#ifndef TIME_SERIES_WRITER_H
+#define TIME_SERIES_WRITER_H
+
+#include "mymath.h"
+
+#include <memory>
+#include <string>
+#include <vector>
+
+namespace CPlantBox {
+
+class Organism;
+
+/**
+ * Writes the growth of an organism as a time series, that can be opened in ParaView (XDMF temporal collection).
+ *
+ * Each node is stored once, together with its incoming segment, as a record
+ * (x, y, z, segment start, segment end, creation time, radius, sub type, organ type) in the binary file name.bin.
+ * Only nodes that can still move (organ tips) are written per time step into name_tips.bin, so the output grows with the
+ * number of nodes, and not with the number of nodes times the number of time steps. The index name.xmf points into both files.
+ *
+ * If a node moves after it was written, all nodes are written again (new epoch).
+ */
+class TimeSeriesWriter
+{
+public:
+
+    TimeSeriesWriter(std::shared_ptr<Organism> plant, std::string name);
+
+    void write(); ///< appends the current state of the organism (call after each simulation step)
+
+    int getNumberOfSteps() const { return steps; } ///< number of written time steps
+    int getNumberOfRecords() const { return rows; } ///< number of records in name.bin
+    int getNumberOfTipRecords() const { return tipRows; } ///< number of records in name_tips.bin
+
+    std::string toString() const; ///< quick info for debugging
+
+    static const int recordSize = 9; ///< number of values per record
+
+protected:
+
+    std::string dataItem(std::string file, int totalRows, int start, int count, int col, int cols) const; // hyperslab of the records
+    std::string joined(int start, int count, int tipStart, int tipCount, int col, int cols) const; // stable and tip records
+
+    std::weak_ptr<Organism> plant;
+    std::string name; // file name without extension
+
+    std::vector<Vector3d> nodes; // node coordinates of the last step [cm]
+    std::vector<int> recordIdx; // record index (within the current epoch) of nodes that are already written, or -1
+    int epochStart = 0; // first record of the current epoch
+    int rows = 0; // records in name.bin
+    int tipRows = 0; // records in name_tips.bin
+    int steps = 0; // number of written time steps
+    long xmfEnd = 0; // position of the closing tags in name.xmf
+
+};
+
+} // namespace
+
+#endif
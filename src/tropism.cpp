@@ -36,7 +36,31 @@ Vector3d Tropism::getPosition(const Vector3d& pos, const Matrix3d& old, double a
 }
 
 /**
- * Dices N times picking angles alpha and beta, takes the optimal direction according to the objective function
+ * Evaluates the objective function for a batch of candidate angles, the default implementation calls
+ * Tropism::tropismObjective for each candidate. Derived classes overwrite this method to avoid the per candidate
+ * virtual call and rotation matrix product.
+ *
+ * @param pos          root tip position
+ * @param old          rotation matrix, heading is old(:,1)
+ * @param a            candidate angles alpha
+ * @param b            candidate angles beta (same size as a)
+ * @param dx           distance to look ahead
+ * @param o            points to the organ that called getHeading(...)
+ * @param v            the objective function value of each candidate (resized to the size of a)
+ */
+void Tropism::tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+    const std::shared_ptr<Organ> o, std::vector<double>& v)
+{
+    v.resize(a.size());
+    for (size_t i = 0; i<a.size(); i++) {
+        v[i] = this->tropismObjective(pos, old, a[i], b[i], dx, o);
+    }
+}
+
+/**
+ * Dices N times picking angles alpha and beta, takes the optimal direction according to the objective function.
+ * All candidates are diced first (in the same order as drawn one at a time), and evaluated as a batch by
+ * Tropism::tropismObjectives
  *
  * @param pos          root tip position
  * @param old          rotation matrix, heading is old(:,1)
@@ -50,7 +74,6 @@ Vector2d Tropism::getUCHeading(const Vector3d& pos, const Matrix3d& old, double
     auto p = plant.lock();
     double a = sigma*p->randn()*sqrt(dx);
     double b = p->rand()*2*M_PI;
-    double v;
 
     double n_=n*sqrt(dx);
     if (n_>0) {
@@ -60,21 +83,23 @@ Vector2d Tropism::getUCHeading(const Vector3d& pos, const Matrix3d& old, double
         } else {
             n_ = floor(n_);
         }
-        double bestA = a;
-        double bestB = b;
-        double bestV = this->tropismObjective(pos,old,a,b,dx,o);
-        for (int i=0; i<n_; i++) {
-            b = p->rand()*2*M_PI;
-            a = sigma*p->randn()*sqrt(dx);
-            v = this->tropismObjective(pos,old,a,b,dx,o);
-            if (v<bestV) {
-                bestV=v;
-                bestA=a;
-                bestB=b;
+        size_t m = 1+size_t(n_);
+        std::vector<double> as(m), bs(m), v(m);
+        as[0] = a;
+        bs[0] = b;
+        for (size_t i=1; i<m; i++) { // dice
+            bs[i] = p->rand()*2*M_PI;
+            as[i] = sigma*p->randn()*sqrt(dx);
+        }
+        this->tropismObjectives(pos, old, as, bs, dx, o, v);
+        size_t best = 0;
+        for (size_t i=1; i<m; i++) { // first minimum
+            if (v[i]<v[best]) {
+                best = i;
             }
         }
-        a = bestA;
-        b = bestB;
+        a = as[best];
+        b = bs[best];
     }
 
     return Vector2d(a,b);
@@ -140,6 +165,36 @@ Vector2d Tropism::getHeading(const Vector3d& pos, const Matrix3d& old, double dx
 
 
 
+/**
+ * Batch version of Gravitropism::tropismObjective, only the z-component of the new heading is needed
+ */
+void Gravitropism::tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+    const std::shared_ptr<Organ> o, std::vector<double>& v)
+{
+    v.resize(a.size());
+    const Vector3d& r2 = old.r2;
+    for (size_t i = 0; i<a.size(); i++) {
+        v[i] = 0.5*(r2.times(Vector3d::rotAB(a[i],b[i]))+1.);
+    }
+}
+
+
+
+/**
+ * Batch version of Plagiotropism::tropismObjective, only the z-component of the new heading is needed
+ */
+void Plagiotropism::tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+    const std::shared_ptr<Organ> o, std::vector<double>& v)
+{
+    v.resize(a.size());
+    const Vector3d& r2 = old.r2;
+    for (size_t i = 0; i<a.size(); i++) {
+        v[i] = std::abs(r2.times(Vector3d::rotAB(a[i],b[i])));
+    }
+}
+
+
+
 /**
  * getHeading() minimizes this function, @see TropismFunction::tropismObjective
  */
@@ -152,6 +207,24 @@ double Exotropism::tropismObjective(const Vector3d& pos, const Matrix3d& old, do
     return acos(s)/M_PI; // 0..1
 }
 
+/**
+ * Batch version of Exotropism::tropismObjective, the norms are computed once per batch
+ */
+void Exotropism::tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+    const std::shared_ptr<Organ> o, std::vector<double>& v)
+{
+    v.resize(a.size());
+    Vector3d iheading =o->iHeading;
+    double il = 1./iheading.length();
+    double ol = 1./old.column(0).length();
+    for (size_t i = 0; i<a.size(); i++) {
+        double s = iheading.times(old.times(Vector3d::rotAB(a[i],b[i])));
+        s*=il;
+        s*=ol;
+        v[i] = acos(s)/M_PI;
+    }
+}
+
 
 
 /**
@@ -166,6 +239,20 @@ double Hydrotropism::tropismObjective(const Vector3d& pos, const Matrix3d& old,
     return -v; ///< (-1) because we want to maximize the soil property
 }
 
+/**
+ * Batch version of Hydrotropism::tropismObjective, locks the soil once per batch
+ */
+void Hydrotropism::tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+    const std::shared_ptr<Organ> o, std::vector<double>& v)
+{
+    assert(!soil.expired());
+    v.resize(a.size());
+    auto s = soil.lock();
+    for (size_t i = 0; i<a.size(); i++) {
+        v[i] = -s->getValue(this->getPosition(pos,old,a[i],b[i],dx),o);
+    }
+}
+
 
 
 /**
@@ -201,4 +288,36 @@ double CombinedTropism::tropismObjective(const Vector3d& pos, const Matrix3d& ol
     return v;
 }
 
+/**
+ * Batch version of CombinedTropism::tropismObjective, each tropism evaluates the whole batch
+ */
+void CombinedTropism::tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+    const std::shared_ptr<Organ> o, std::vector<double>& v)
+{
+    tropisms[0]->tropismObjectives(pos,old,a,b,dx,o,v);
+    for (auto& x : v) {
+        x *= weights[0];
+    }
+    std::vector<double> vi;
+    for (size_t i = 1; i< tropisms.size(); i++) {
+        tropisms[i]->tropismObjectives(pos,old,a,b,dx,o,vi);
+        for (size_t j = 0; j<v.size(); j++) {
+            v[j] += vi[j]*weights[i];
+        }
+    }
+}
+
+/**
+ * Batch version of AntiGravitropism::tropismObjective, only the z-component of the new heading is needed
+ */
+void AntiGravitropism::tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+    const std::shared_ptr<Organ> o, std::vector<double>& v)
+{
+    v.resize(a.size());
+    const Vector3d& r2 = old.r2;
+    for (size_t i = 0; i<a.size(); i++) {
+        v[i] = -0.5*(r2.times(Vector3d::rotAB(a[i],b[i]))+1.);
+    }
+}
+
 } // end namespace CPlantBox
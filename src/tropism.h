@@ -63,6 +63,10 @@ public:
 	virtual double tropismObjective(const Vector3d& pos, const Matrix3d& old, double a, double b, double dx, const std::shared_ptr<Organ> o = nullptr)
 	    { std::cout << "TropismFunction::tropismObjective() not overwritten\n"; return 0; } ///< The objective function of the random optimization of getHeading().
 
+	virtual void tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+	    const std::shared_ptr<Organ> o, std::vector<double>& v);
+	///< Evaluates the objective function for all candidates (a[i], b[i]) at once, overwrite for speed
+
 	static Vector3d getPosition(const Vector3d& pos, const Matrix3d& old, double a, double b, double dx);
 	///< Auxiliary function: Applies angles a and b and goes dx [cm] into the new direction
 
@@ -100,6 +104,9 @@ public:
 		return 0.5*(old.times(Vector3d::rotAB(a,b)).z+1.); // negative values point downwards, transformed to 0..1
 	} ///< TropismFunction::getHeading minimizes this function, @see TropismFunction::getHeading and @see TropismFunction::tropismObjective
 
+	void tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+	    const std::shared_ptr<Organ> o, std::vector<double>& v) override; ///< @see Tropism::tropismObjectives
+
 };
 
 
@@ -123,6 +130,9 @@ public:
 		return std::abs(old.times(Vector3d::rotAB(a,b)).z); // 0..1
 	} ///< getHeading() minimizes this function, @see TropismFunction
 
+	void tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+	    const std::shared_ptr<Organ> o, std::vector<double>& v) override; ///< @see Tropism::tropismObjectives
+
 };
 
 
@@ -144,6 +154,8 @@ public:
 
 	double tropismObjective(const Vector3d& pos, const Matrix3d& old, double a, double b, double dx, const std::shared_ptr<Organ> o = nullptr) override;
 	///< getHeading() minimizes this function, @see TropismFunction
+	void tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+	    const std::shared_ptr<Organ> o, std::vector<double>& v) override; ///< @see Tropism::tropismObjectives
 
 };
 
@@ -166,6 +178,8 @@ public:
 
 	double tropismObjective(const Vector3d& pos, const Matrix3d& old, double a, double b, double dx, const std::shared_ptr<Organ> o = nullptr) override;
 	///< getHeading() minimizes this function, @see TropismFunction
+	void tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+	    const std::shared_ptr<Organ> o, std::vector<double>& v) override; ///< @see Tropism::tropismObjectives
 
 private:
 
@@ -203,6 +217,8 @@ public:
 
 	double tropismObjective(const Vector3d& pos, const Matrix3d& old, double a, double b, double dx, const std::shared_ptr<Organ> o = nullptr) override;
 	///< getHeading() minimizes this function, @see TropismFunction
+	void tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+	    const std::shared_ptr<Organ> o, std::vector<double>& v) override; ///< @see Tropism::tropismObjectives
 
 private:
 
@@ -260,6 +276,9 @@ public:
 	}
 	///< TropismFunction::getHeading minimizes this function, @see TropismFunction::getHeading and @see TropismFunction::tropismObjective
 
+	void tropismObjectives(const Vector3d& pos, const Matrix3d& old, const std::vector<double>& a, const std::vector<double>& b, double dx,
+	    const std::shared_ptr<Organ> o, std::vector<double>& v) override; ///< @see Tropism::tropismObjectives
+
 };
 
 } // end namespace CPlantBox
@@ -0,0 +1,98 @@
+// -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
+#ifndef VECTOR_VIEWS_H
+#define VECTOR_VIEWS_H
+
+#include <algorithm>
+#include <functional>
+#include <memory>
+#include <vector>
+
+namespace CPlantBox {
+
+/**
+ * Keeps the storage of std::vectors alive that are viewed without copying (e.g. by read-only numpy arrays).
+ *
+ * view() returns an owner for the current storage of a vector, the view is valid as long as the owner exists.
+ * Call release() before a viewed vector is changed: the storage is moved to the owner, and the vector continues
+ * with a copy. Therefore, a view never changes and never dangles, and vectors are only copied if they are changed
+ * while they are viewed.
+ *
+ * Declare the VectorViews before the viewed vectors, and call release(false) in the destructor of the class.
+ * Copies of an object have no views.
+ */
+class VectorViews
+{
+public:
+
+    VectorViews() { }
+    VectorViews(const VectorViews&) { } ///< the views belong to the original
+    VectorViews& operator=(const VectorViews&) { release(false); return *this; } ///< the viewed vectors are overwritten next
+
+    /**
+     * Returns the owner of the current storage of @param v (the same owner as long as v is not released),
+     * v must not be a const object, since release() moves its storage
+     */
+    template<class T>
+    std::shared_ptr<const void> view(const std::vector<T>& cv)
+    {
+        auto& v = const_cast<std::vector<T>&>(cv);
+        for (auto& e : entries) {
+            if (e.vector==&v) {
+                if (auto o = e.owner.lock()) {
+                    return o;
+                }
+            }
+        }
+        entries.erase(std::remove_if(entries.begin(), entries.end(), [](const Entry& e) { return e.owner.expired(); }), entries.end());
+        auto o = std::make_shared<std::vector<T>>();
+        std::weak_ptr<std::vector<T>> w = o;
+        entries.push_back({ &v, o, [&v, w](bool keep) {
+            if (auto owner = w.lock()) {
+                *owner = std::move(v);
+                if (keep) {
+                    v = *owner;
+                }
+            }
+        } });
+        return o;
+    }
+
+    /**
+     * Moves the storage of all viewed vectors to their owners, the vectors keep a copy of their values (@param keep = true),
+     * or are left empty (@param keep = false, e.g. before destruction)
+     */
+    void release(bool keep = true)
+    {
+        for (auto& e : entries) {
+            e.release(keep);
+        }
+        entries.clear();
+    }
+
+    /**
+     * Moves the storage of @param v to its owner, if v is viewed, @see release
+     */
+    template<class T>
+    void release(const std::vector<T>& v, bool keep = true)
+    {
+        auto viewed = std::stable_partition(entries.begin(), entries.end(), [&v](const Entry& e) { return e.vector!=&v; });
+        for (auto it = viewed; it!=entries.end(); it++) {
+            it->release(keep);
+        }
+        entries.erase(viewed, entries.end());
+    }
+
+protected:
+
+    struct Entry {
+        const void* vector;
+        std::weak_ptr<const void> owner;
+        std::function<void(bool)> release;
+    };
+    std::vector<Entry> entries;
+
+};
+
+} // namespace CPlantBox
+
+#endif
@@ -0,0 +1,224 @@
+// -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
+#include "vtp_writer.h"
+
+#include <cstdint>
+#include <algorithm>
+#include <stdexcept>
+
+#ifdef USE_ZLIB
+#include <zlib.h>
+#endif
+
+namespace CPlantBox {
+
+/**
+ * @param format    encoding of the data arrays: ascii, inline binary (base64), or appended raw binary (see VTKFormats)
+ * @param compress  compresses the binary data arrays with zlib
+ */
+VTPWriter::VTPWriter(int format, bool compress): format(format), compress(compress)
+{
+    if ((format<vtk_ascii) || (format>vtk_appended)) {
+        throw std::invalid_argument("VTPWriter::VTPWriter: unknown format "+std::to_string(format));
+    }
+#ifndef USE_ZLIB
+    if (compress) {
+        throw std::invalid_argument("VTPWriter::VTPWriter: compression is not available, CPlantBox was compiled without zlib");
+    }
+#endif
+}
+
+/**
+ * Adds a scalar value per point
+ */
+void VTPWriter::addPointData(std::string name, const std::vector<double>& data)
+{
+    pointData.push_back({ name, 1, data, {} });
+}
+
+/**
+ * Adds a scalar value per line
+ */
+void VTPWriter::addCellData(std::string name, const std::vector<double>& data)
+{
+    cellData.push_back({ name, 1, data, {} });
+}
+
+/**
+ * Sets the point coordinates
+ */
+void VTPWriter::setPoints(const std::vector<Vector3d>& p)
+{
+    points.values.resize(3*p.size());
+    for (size_t i=0; i<p.size(); i++) {
+        points.values[3*i] = p[i].x;
+        points.values[3*i+1] = p[i].y;
+        points.values[3*i+2] = p[i].z;
+    }
+}
+
+/**
+ * Sets the (poly)lines
+ *
+ * @param c     point indices of all lines
+ * @param o     end offset of each line in @param c
+ */
+void VTPWriter::setLines(const std::vector<int>& c, const std::vector<int>& o)
+{
+    connectivity.indices = c;
+    offsets.indices = o;
+}
+
+/**
+ * Writes the VTP file
+ *
+ * @param os    typically a file out stream
+ */
+void VTPWriter::write(std::ostream& os) const
+{
+    std::string appended; // raw binary data of all arrays, for format vtk_appended
+    os << "<?xml version=\"1.0\"?>";
+    os << "<VTKFile type=\"PolyData\" version=\"0.1\" byte_order=\"LittleEndian\"";
+    if (compress && (format!=vtk_ascii)) {
+        os << " compressor=\"vtkZLibDataCompressor\"";
+    }
+    os << ">\n";
+    os << "<PolyData>\n";
+    os << "<Piece NumberOfLines=\""<< offsets.indices.size() << "\" NumberOfPoints=\""<< points.values.size()/3 << "\">\n";
+    if (!pointData.empty()) {
+        os << "<PointData Scalars=\"" << pointScalars << "\">\n";
+        for (const auto& a : pointData) {
+            writeDataArray(os, a, appended);
+        }
+        os << "\n</PointData>\n";
+    }
+    os << "<CellData Scalars=\"" << cellScalars << "\">\n";
+    for (const auto& a : cellData) {
+        writeDataArray(os, a, appended);
+    }
+    os << "\n</CellData>\n";
+    os << "<Points>\n";
+    writeDataArray(os, points, appended);
+    os << "</Points>\n";
+    os << "<Lines>\n";
+    writeDataArray(os, connectivity, appended);
+    writeDataArray(os, offsets, appended);
+    os << "\n</Lines>\n";
+    os << "</Piece>\n";
+    os << "</PolyData>\n";
+    if (format==vtk_appended) {
+        os << "<AppendedData encoding=\"raw\">\n_";
+        os.write(appended.data(), appended.size());
+        os << "\n</AppendedData>\n";
+    }
+    os << "</VTKFile>\n";
+}
+
+/**
+ * Writes a single data array, for the appended format the data are added to @param appended
+ */
+void VTPWriter::writeDataArray(std::ostream& os, const DataArray& a, std::string& appended) const
+{
+    bool isInt = (&a==&connectivity) || (&a==&offsets);
+    std::string type = isInt ? "Int32" : ((format==vtk_ascii) ? "Float32" : "Float64");
+    std::string fmt[3] = { "ascii", "binary", "appended" };
+    os << "<DataArray type=\"" << type << "\" Name=\"" << a.name << "\" NumberOfComponents=\"" << a.components << "\" format=\"" << fmt[format] << "\"";
+    if (format==vtk_appended) {
+        os << " offset=\"" << appended.size() << "\"";
+    }
+    os << " >\n";
+    const char* data = isInt ? reinterpret_cast<const char*>(a.indices.data()) : reinterpret_cast<const char*>(a.values.data());
+    size_t n = isInt ? a.indices.size()*sizeof(int32_t) : a.values.size()*sizeof(double);
+    switch (format) {
+    case vtk_ascii:
+        if (isInt) {
+            for (int i : a.indices) {
+                os << i << " ";
+            }
+        } else {
+            auto p = os.precision(precision);
+            for (double v : a.values) {
+                os << v << " ";
+            }
+            os.precision(p);
+        }
+        break;
+    case vtk_binary:
+        os << encode(data, n);
+        break;
+    case vtk_appended:
+        appended += encode(data, n);
+        break;
+    }
+    os << "\n</DataArray>\n";
+}
+
+/**
+ * Binary representation of a data array: a header containing the number of bytes, followed by the data,
+ * or for compressed data a header containing the block sizes, followed by the compressed blocks.
+ * For inline binary data, both are base64 encoded.
+ */
+std::string VTPWriter::encode(const char* data, size_t n) const
+{
+    std::vector<uint32_t> header;
+    std::string body;
+    if (compress) {
+#ifdef USE_ZLIB
+        const size_t blockSize = 1<<15;
+        size_t nb = (n+blockSize-1)/blockSize;
+        header = { uint32_t(nb), uint32_t(blockSize), uint32_t((nb>0) ? n-(nb-1)*blockSize : 0) };
+        std::vector<Bytef> buffer(compressBound(blockSize));
+        for (size_t b=0; b<nb; b++) {
+            uLong len = std::min(blockSize, n-b*blockSize);
+            uLongf clen = buffer.size();
+            if (compress2(buffer.data(), &clen, reinterpret_cast<const Bytef*>(data+b*blockSize), len, Z_DEFAULT_COMPRESSION)!=Z_OK) {
+                throw std::runtime_error("VTPWriter::encode: zlib compression failed");
+            }
+            header.push_back(clen);
+            body.append(reinterpret_cast<const char*>(buffer.data()), clen);
+        }
+#endif
+    } else {
+        header = { uint32_t(n) };
+        body.assign(data, n);
+    }
+    std::string h(reinterpret_cast<const char*>(header.data()), header.size()*sizeof(uint32_t));
+    if (format==vtk_binary) {
+        return compress ? base64(h.data(), h.size())+base64(body.data(), body.size()) : base64((h+body).data(), h.size()+body.size());
+    } else {
+        return h+body;
+    }
+}
+
+/**
+ * Base64 encoding of @param n bytes of @param data
+ */
+std::string VTPWriter::base64(const char* data, size_t n)
+{
+    static const char table[] = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+    const unsigned char* d = reinterpret_cast<const unsigned char*>(data);
+    std::string s;
+    s.reserve(4*((n+2)/3));
+    size_t i = 0;
+    for (; i+2<n; i+=3) {
+        uint32_t v = (d[i]<<16) | (d[i+1]<<8) | d[i+2];
+        s += table[(v>>18) & 63];
+        s += table[(v>>12) & 63];
+        s += table[(v>>6) & 63];
+        s += table[v & 63];
+    }
+    if (i+1==n) {
+        uint32_t v = d[i]<<16;
+        s += table[(v>>18) & 63];
+        s += table[(v>>12) & 63];
+        s += "==";
+    } else if (i+2==n) {
+        uint32_t v = (d[i]<<16) | (d[i+1]<<8);
+        s += table[(v>>18) & 63];
+        s += table[(v>>12) & 63];
+        s += table[(v>>6) & 63];
+        s += '=';
+    }
+    return s;
+}
+
+} // namespace
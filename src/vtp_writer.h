@@ -0,0 +1,64 @@
+// -*- mode: C++; tab-width: 4; indent-tabs-mode: nil; c-basic-offset: 4 -*-
+#ifndef VTP_WRITER_H
+#define VTP_WRITER_H
+
+#include "mymath.h"
+
+#include <ostream>
+#include <string>
+#include <vector>
+
+namespace CPlantBox {
+
+/**
+ * Writes VTK polydata (VTP) files consisting of points, lines, point data, and cell data.
+ *
+ * The data arrays are written as ascii text (Float32, as before), inline binary (base64), or as appended raw binary data.
+ * Binary arrays are written as Float64 (lossless), and can be compressed if CPlantBox is compiled with zlib (USE_ZLIB).
+ */
+class VTPWriter
+{
+public:
+
+    enum VTKFormats { vtk_ascii = 0, vtk_binary = 1, vtk_appended = 2 }; ///< encodings of the data arrays
+
+    VTPWriter(int format = vtk_ascii, bool compress = false);
+
+    void addPointData(std::string name, const std::vector<double>& data); ///< adds a scalar per point
+    void addCellData(std::string name, const std::vector<double>& data); ///< adds a scalar per line
+    void setPoints(const std::vector<Vector3d>& points); ///< point coordinates [cm]
+    void setLines(const std::vector<int>& connectivity, const std::vector<int>& offsets); ///< polylines, given by point indices and end offsets
+
+    void write(std::ostream& os) const; ///< writes the VTP file
+
+    int format; ///< encoding of the data arrays, see VTKFormats
+    bool compress; ///< zlib compression of binary data arrays
+    int precision = 6; ///< significant digits of ascii floating point data
+    std::string pointScalars = " PointData"; ///< value of the Scalars attribute of the point data
+    std::string cellScalars = " CellData"; ///< value of the Scalars attribute of the cell data
+
+    static std::string base64(const char* data, size_t n); ///< base64 encoding
+
+protected:
+
+    struct DataArray {
+        std::string name;
+        int components;
+        std::vector<double> values; // Float64 (or Float32 for ascii)
+        std::vector<int> indices; // Int32
+    };
+
+    void writeDataArray(std::ostream& os, const DataArray& a, std::string& appended) const;
+    std::string encode(const char* data, size_t n) const; // header and (compressed) data
+
+    std::vector<DataArray> pointData;
+    std::vector<DataArray> cellData;
+    DataArray points = { "Coordinates", 3, {}, {} };
+    DataArray connectivity = { "connectivity", 1, {}, {} };
+    DataArray offsets = { "offsets", 1, {}, {} };
+
+};
+
+} // namespace
+
+#endif
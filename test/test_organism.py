@@ -4,6 +4,7 @@ sys.path.append("..")
 import plantbox as pb
 import matplotlib.pyplot as plt
 from rsml import *
+import xml.etree.ElementTree as ET
 
 
 class TestOrganism(unittest.TestCase):
@@ -115,6 +116,20 @@ class TestOrganism(unittest.TestCase):
         segs = np.array((list(map(np.array, self.human1.getSegments()))))
         self.assertEqual(np.sum(np.sum(segs.flat != np.array([[0, 1], [1, 2], [2, 3], [2, 4], [3, 5]]).flat)), 0, "geometry: segments ids are unexcpected")
 
+    def test_sequential_buffers(self):
+        """ sequential organs and segments follow changes of the organ tree """
+        self.hand_example()
+        self.assertEqual(len(self.human1.getOrgans()), 0, "buffers: no organ has nodes yet")
+        self.assertEqual(self.human1.getNumberOfSegments(), 0, "buffers: no segments expected")
+        self.add_nodes()
+        self.assertEqual(len(self.human1.getOrgans()), 3, "buffers: organs were not updated")
+        self.assertEqual(self.human1.getNumberOfSegments(), 5, "buffers: segments were not updated")
+        self.assertEqual([o.getId() for o in self.human1.getSegmentOrigins(0)], [0, 0, 0, 1, 2], "buffers: unexpected segment origins")
+        self.human1.simulate(1)
+        self.assertEqual(self.human1.getSegmentCTs(), [0, 0, 0, 4, 3], "buffers: unexpected segment creation times")
+        human2 = self.human1.copy()
+        self.assertIsNot(human2.getOrgans()[0], self.human1.getOrgans()[0], "buffers: copy points to the original organs")
+
     def test_parameter(self):
         """ test if getParameter works """
         self.hand_example()
@@ -137,6 +152,45 @@ class TestOrganism(unittest.TestCase):
         self.assertEqual(pl, pl2, "rsml: polylines are not equal")
         self.assertEqual(props["age"], [0, -4, -3] , "rsml: polylines are not equal")
 
+    def test_time_series(self):
+        """ time series output, each step equals the organism at that time """
+
+        def read_records(name, grid, tag):  # stable and tip records of a time step
+            records = []
+            for item in grid.find(tag).iter("DataItem"):
+                if item.get("ItemType") == "HyperSlab":
+                    items = item.findall("DataItem")
+                    start, _, _, _, count, _ = [int(x) for x in items[0].text.split()]
+                    data = np.fromfile(items[1].text, np.float64).reshape((-1, 9))
+                    records.append(data[start:start + count])
+            return np.vstack(records)
+
+        rs = pb.RootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+        rs.setSeed(1)
+        rs.initialize(False)
+        writer = pb.TimeSeriesWriter(rs, "test_time_series")
+        segments = []
+        for i in range(0, 10):
+            rs.simulate(1, False)
+            writer.write()
+            nodes = np.array([[n.x, n.y, n.z] for n in rs.getNodes()])
+            segs = np.hstack([nodes[[s.x for s in rs.getSegments()]], nodes[[s.y for s in rs.getSegments()]]])
+            segments.append(segs[np.lexsort(segs.T)])
+        self.assertEqual(writer.getNumberOfSteps(), 10, "TimeSeriesWriter: wrong number of steps")
+        self.assertLessEqual(writer.getNumberOfRecords(), rs.getNumberOfNodes(), "TimeSeriesWriter: nodes are written more than once")
+        root = ET.parse("test_time_series.xmf").getroot()
+        grids = root.find("Domain").find("Grid").findall("Grid")
+        self.assertEqual(len(grids), 10, "TimeSeriesWriter: wrong number of grids")
+        for i, grid in enumerate(grids):
+            r = read_records("test_time_series", grid, "Geometry")
+            r = r[r[:, 3] != r[:, 4]]  # nodes without segment
+            x, y = r[:, 3].astype(int), r[:, 4].astype(int)
+            all_ = read_records("test_time_series", grid, "Geometry")
+            segs = np.hstack([all_[x, 0:3], all_[y, 0:3]])
+            segs = segs[np.lexsort(segs.T)]
+            np.testing.assert_array_equal(segs, segments[i], err_msg = "TimeSeriesWriter: wrong segments in step {:g}".format(i))
+
 
 if __name__ == '__main__':
     # todo test XML ?
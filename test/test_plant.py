@@ -1,7 +1,10 @@
 import unittest
 import sys
+import os
+import subprocess
 sys.path.append("..")
 import plantbox as pb
+import pickle
 from rsml import *
 
 path = "../modelparameter/plant/"
@@ -62,6 +65,47 @@ class TestPlant(unittest.TestCase):
 #         node_connection_o = seg2a(p.getSegments(15)) # plant segments        
         pass
 
+    def test_pickle(self):
+        """ a restored plant continues the simulation identically """
+        p = pb.Plant()
+        p.openXML(path + "Heliantus_Pagès_2013.xml")
+        p.setSeed(1)
+        p.initialize(False)
+        p.simulate(20, False)
+        p2 = pickle.loads(pickle.dumps(p))
+        for p_ in [p, p2]:
+            p_.simulate(10, False)
+        np.testing.assert_array_equal(pb.SegmentAnalyser(p2).nodeArray, pb.SegmentAnalyser(p).nodeArray, "pickle: nodes differ")
+        np.testing.assert_array_equal(p2.getParameter("organType"), p.getParameter("organType"), "pickle: organs differ")
+
+    def test_ensemble_threads(self):
+        """ plant ensembles give the same results for any number of OpenMP threads, and equal single plants """
+        name = path + "Heliantus_Pagès_2013.xml"
+        script = "\n".join([
+            "import sys; sys.path.append('..')",
+            "import plantbox as pb",
+            "ensemble = pb.Ensemble('" + name + "', True)",
+            "ensemble.setMembers([1, 2, 3, 4])",
+            "ensemble.simulate(30, 3)",
+            "print([repr(l) for l in ensemble.getSummed('length')])",
+            "print([a.nodeArray.tobytes().hex() for a in ensemble.getAnalysers()])"])
+        results = []
+        for threads in ["1", "4"]:
+            env = dict(os.environ, OMP_NUM_THREADS = threads)
+            results.append(subprocess.check_output([sys.executable, "-c", script], env = env))
+        self.assertEqual(results[0], results[1], "Ensemble: plant results depend on the number of threads")
+        ensemble = pb.Ensemble(name, True)
+        ensemble.setMembers([1, 2])
+        ensemble.simulate(30, 3)
+        for i, s in enumerate([1, 2]):
+            p = pb.Plant()
+            p.readParameters(name)
+            p.setSeed(s)
+            p.initialize(False)
+            for j in range(0, 3):
+                p.simulate(10, False)
+            np.testing.assert_array_equal(ensemble.getAnalysers()[i].nodeArray, pb.SegmentAnalyser(p).nodeArray, "Ensemble: plant member differs from single simulation")
+
 
 if __name__ == '__main__':
     # MANY tests missing !!!
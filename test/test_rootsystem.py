@@ -2,6 +2,7 @@ import unittest
 import sys
 sys.path.append("..")
 import plantbox as pb
+import pickle
 from rsml import *
 
 
@@ -261,10 +262,107 @@ class TestRootSystem(unittest.TestCase):
         floats = [int(item) for item in check_str.split()]
         self.assertEqual(floats, [0, 10, 13, 16, 19, 22, 25, 28, 31, 34, 37, 40, 43, 46, 49, 52, 55, 58], "creation times are unexpected")
 
+    def test_exudation(self):
+        """ exudation model: progress callback, and superposition of the single root contributions """
+        rs = pb.RootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+        rs.setSeed(1)
+        rs.initialize(False)
+        rs.simulate(7, False)
+        model = pb.ExudationModel(6., 6., 10, rs)
+        model.observationRadius = 1.
+        model.thresh13 = 1.e-3
+        progress = []
+        model.progress = lambda i, n: progress.append((i, n))
+        c = np.array(model.calculate(14.))
+        n = len(progress)
+        self.assertEqual(progress, [(i + 1, n) for i in range(0, n)], "calculate: unexpected progress")
+        self.assertGreater(np.sum(c), 0., "calculate: no exudates")
+        model.progress = None
+        c2 = np.array(model.calculate(14., 0, n // 2)) + np.array(model.calculate(14., n // 2))
+        np.testing.assert_allclose(c2, c, rtol = 1.e-12, atol = 1.e-30, err_msg = "calculate: contributions of root ranges do not add up")
+
+    def test_ensemble(self):
+        """ ensemble members equal single simulations with the same seed and parameters """
+        name = "../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml"
+        ensemble = pb.Ensemble(name)
+        seeds = [1, 2, 3, 4]
+        theta = [0.2, 0.4, 0.6, 0.8]
+        ensemble.setMembers(seeds, [[(pb.OrganTypes.root, 2, "theta", t)] for t in theta])
+        ensemble.simulate(10)
+        lengths = ensemble.getSummed("length")
+        for i, s in enumerate(seeds):
+            rs = pb.RootSystem()
+            rs.readParameters(name)
+            rs.getRootRandomParameter(2).theta = theta[i]
+            rs.setSeed(s)
+            rs.initialize(False)
+            rs.simulate(10, False)
+            self.assertEqual(lengths[i], rs.getSummed("length"), "Ensemble: member differs from single simulation")
+            np.testing.assert_array_equal(ensemble.getAnalysers()[i].nodeArray, pb.SegmentAnalyser(rs).nodeArray, "Ensemble: member differs from single simulation")
+        with self.assertRaises(ValueError):
+            ensemble.setMembers(seeds, [[(pb.OrganTypes.root, 2, "unknown", 0.)]] * 4)
+
+    def test_pickle(self):
+        """ a restored root system continues the simulation identically """
+        rs = pb.RootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+        rs.setSeed(1)
+        rs.initialize(False)
+        rs.simulate(7, False)
+        rs2 = pickle.loads(pickle.dumps(rs))
+        rs.save("test_pickle.cpb")
+        rs3 = pb.RootSystem()
+        rs3.load("test_pickle.cpb")
+        for r in [rs, rs2, rs3]:
+            r.simulate(5, False)
+        for r in [rs2, rs3]:
+            self.assertEqual(r.getNumberOfRoots(True), rs.getNumberOfRoots(True), "pickle: wrong number of roots")
+            np.testing.assert_array_equal(pb.SegmentAnalyser(r).nodeArray, pb.SegmentAnalyser(rs).nodeArray, "pickle: nodes differ")
+            np.testing.assert_array_equal(r.getParameter("age"), rs.getParameter("age"), "pickle: ages differ")
+        with self.assertRaises(ValueError):
+            rs3.deserialize(rs.serialize()[:100])
+
     def test_stack(self):
         """ checks if push and pop are working """
-        pass
-        # TODO
+        name = "../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml"
+        rs, rs2 = pb.RootSystem(), pb.RootSystem()
+        for r in [rs, rs2]:
+            r.readParameters(name)
+            r.setSeed(1)
+            r.initialize(False)
+            r.simulate(7, False)
+        rs.push()
+        rs.simulate(3, False)
+        rs.push()
+        rs.simulate(5, False)
+        rs.pop()
+        rs.pop()
+        for r in [rs, rs2]:
+            r.simulate(4, False)
+        self.assertEqual(rs.getNumberOfNodes(), rs2.getNumberOfNodes(), "pop: wrong number of nodes")
+        self.assertEqual(rs.getNumberOfRoots(True), rs2.getNumberOfRoots(True), "pop: wrong number of roots")
+        np.testing.assert_array_equal(pb.SegmentAnalyser(rs).nodeArray, pb.SegmentAnalyser(rs2).nodeArray, "pop: nodes differ")
+        self.assertEqual([(x.x, x.y) for x in rs.getSegments()], [(x.x, x.y) for x in rs2.getSegments()], "pop: segments differ")
+
+    def test_maxinc(self):
+        """ elongation is limited by maxinc """
+        rs = pb.RootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Zea_mays_4_Leitner_2014.xml")
+        se = pb.ProportionalElongation()
+        for p in rs.getRootRandomParameter():
+            p.f_se = se
+        rs.setSeed(3)
+        rs.initialize(False)
+        ol = rs.getSummed("length")
+        for i in range(0, 25):
+            rs.simulate(1., 30., se, False)
+            l = rs.getSummed("length")
+            self.assertLessEqual(l - ol, 30. + 1.e-3, "simulate: elongation exceeds maxinc")
+            ol = l
+        rs.simulate(1., 30., se, False)
+        self.assertAlmostEqual(rs.getSummed("length") - l, 30., 2, "simulate: elongation is not limited to maxinc")
+        self.assertEqual(max([s.y for s in rs.getSegments()]) + 1, rs.getNumberOfNodes(), "simulate: node counter was not restored")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,60 @@
+import unittest
+import sys
+sys.path.append("..")
+import plantbox as pb
+import numpy as np
+
+
+class TestSDF(unittest.TestCase):
+
+    def geometries(self):
+        """ basic and composed geometries """
+        core = pb.SDF_PlantContainer(5., 4., 30., False)
+        box = pb.SDF_PlantBox(10., 12., 25.)
+        return [core, box, pb.SDF_PlantContainer(3., 3., 20., True),
+                pb.SDF_RotateTranslate(core, 30., pb.SDF_Axis.yaxis, pb.Vector3d(1., 2., -3.)),
+                pb.SDF_Union([core, box, pb.SDF_RotateTranslate(box, pb.Vector3d(3., 0., 0.))]),
+                pb.SDF_Intersection(box, core), pb.SDF_Difference(box, core), pb.SDF_Complement(core),
+                pb.SDF_HalfPlane(pb.Vector3d(0., 0., -5.), pb.Vector3d(0.3, 0., 1.))]
+
+    def test_batch(self):
+        """ batch evaluation equals point wise evaluation """
+        points = np.random.RandomState(1).uniform(-20., 20., (500, 3)) - np.array([0., 0., 20.])
+        for g in self.geometries():
+            d = g.getDist(points)
+            self.assertEqual(d.shape, (500,), "getDist: wrong shape")
+            np.testing.assert_array_equal(d, [g.getDist(pb.Vector3d(*p)) for p in points], str(g) + ": batch getDist differs")
+            grad = g.getGradient(points)
+            self.assertEqual(grad.shape, (500, 3), "getGradient: wrong shape")
+            grad_ = [g.getGradient(pb.Vector3d(*p)) for p in points]
+            np.testing.assert_array_equal(grad, [[v.x, v.y, v.z] for v in grad_], str(g) + ": batch getGradient differs")
+        with self.assertRaises(ValueError):
+            self.geometries()[0].getDist(np.zeros((4, 2)))
+
+    def test_bounding_box(self):
+        """ all points within the geometry are within its bounding box """
+        points = np.random.RandomState(2).uniform(-20., 20., (2000, 3)) - np.array([0., 0., 20.])
+        for g in self.geometries():
+            box = g.getBoundingBox()
+            if box is not None:
+                inside = points[g.getDist(points) <= 0]
+                self.assertTrue(np.all(inside >= np.array(box[0])) and np.all(inside <= np.array(box[1])), str(g) + ": wrong bounding box")
+
+    def test_root_system(self):
+        """ distance to a growing root system, updated tree equals rebuilt tree """
+        rs = pb.RootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+        rs.setSeed(1)
+        rs.initialize(False)
+        rs.simulate(5, False)
+        sdf = pb.SDF_RootSystem(rs, 1.)
+        points = np.random.RandomState(3).uniform(-5., 5., (1000, 3)) - np.array([0., 0., 5.])
+        np.testing.assert_array_equal(sdf.getDist(points), [sdf.getDist(pb.Vector3d(*p)) for p in points], "SDF_RootSystem: batch getDist differs")
+        for i in range(3):
+            rs.simulate(1, False)
+            sdf.update(rs)
+            np.testing.assert_array_equal(sdf.getDist(points), pb.SDF_RootSystem(rs, 1.).getDist(points), "SDF_RootSystem: update differs from rebuild")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+import unittest
+import sys
+sys.path.append("..")
+import plantbox as pb
+import numpy as np
+import base64
+import zlib
+import xml.etree.ElementTree as ET
+
+
+def read_vtp_arrays(name):
+    """ minimal reader of the vtp data arrays (ascii, binary, or appended, optionally zlib compressed) """
+    with open(name, "rb") as f:
+        content = f.read()
+    appended = b""
+    i = content.find(b"<AppendedData")
+    if i >= 0:
+        appended = content[content.find(b"_", i) + 1:content.rfind(b"\n</AppendedData>")]
+        content = content[:i] + b"</VTKFile>"
+    root = ET.fromstring(content)
+    compressed = root.get("compressor") is not None
+    arrays = {}
+    for a in root.iter("DataArray"):
+        dtype = {"Float32": np.float64, "Float64": np.float64, "Int32": np.int32}[a.get("type")]
+        if a.get("format") == "ascii":
+            arrays[a.get("Name")] = np.array(a.text.split(), dtype = dtype)
+            continue
+        if a.get("format") == "binary":
+            text = a.text.strip()
+            if compressed:
+                nb = np.frombuffer(base64.b64decode(text[:8])[:4], np.uint32)[0]
+                hl = 4 * ((4 * (3 + nb) + 2) // 3)
+                raw = base64.b64decode(text[:hl]) + base64.b64decode(text[hl:])
+            else:
+                raw = base64.b64decode(text)
+        else:
+            raw = appended[int(a.get("offset")):]
+        if compressed:
+            nb = np.frombuffer(raw[:4], np.uint32)[0]
+            sizes = np.frombuffer(raw[12:12 + 4 * nb], np.uint32)
+            start = 12 + 4 * nb
+            data = b""
+            for s in sizes:
+                data += zlib.decompress(raw[start:start + s])
+                start += s
+        else:
+            n = np.frombuffer(raw[:4], np.uint32)[0]
+            data = raw[4:4 + n]
+        arrays[a.get("Name")] = np.frombuffer(data, dtype)
+    return arrays
+
+
+class TestSegmentAnalyser(unittest.TestCase):
+
+    def line_example(self):
+        """ a straight line from (0,0,0) to (3,2,-10) with 4 segments """
+        x = np.array([[0., 0., 0.], [0.3, 0.2, -1.], [1.5, 1., -5.], [2.4, 1.6, -8.], [3., 2., -10.]])
+        nodes = [pb.Vector3d(p[0], p[1], p[2]) for p in x]
+        segs = [pb.Vector2i(i, i + 1) for i in range(0, 4)]
+        self.ana = pb.SegmentAnalyser(nodes, segs, [0., 1., 2., 3.], [0.1, 0.1, 0.2, 0.2])
+        self.length = np.linalg.norm(x[-1] - x[0])
+
+    def test_distribution(self):
+        """ exact and approximate vertical distributions """
+        self.line_example()
+        d = self.ana.distribution("length", 0., -10., 10, True)
+        self.assertEqual(d.shape, (10,), "distribution: wrong shape")
+        np.testing.assert_allclose(d, np.ones((10,)) * self.length / 10, rtol = 1.e-12, err_msg = "distribution: wrong exact length distribution")
+        d = self.ana.distribution("length", 0., -10., 10, False)
+        self.assertAlmostEqual(np.sum(d), self.length, 12, "distribution: length is not conserved")
+        self.assertEqual(np.count_nonzero(d), 4, "distribution: expected one layer per segment mid point")
+        d = self.ana.distribution("creationTime", 0., -10., 3, True)
+        np.testing.assert_allclose(d, [0. + 1., 1. + 2., 2. + 3.], err_msg = "distribution: each cut segment is counted in both layers")
+
+    def test_distribution2(self):
+        """ two and three dimensional distributions conserve the length """
+        self.line_example()
+        d2 = self.ana.distribution2("length", 0., -10., 0., 3., 10, 3, True)
+        self.assertEqual(d2.shape, (10, 3), "distribution2: wrong shape")
+        self.assertAlmostEqual(np.sum(d2), self.length, 12, "distribution2: length is not conserved")
+        np.testing.assert_allclose(np.sum(d2, axis = 1), self.ana.distribution("length", 0., -10., 10, True), rtol = 1.e-12)
+        self.assertAlmostEqual(np.sum(d2[:, 0]), self.length / 3, 12, "distribution2: wrong length in first column")
+        d3 = self.ana.distribution3("length", pb.Vector3d(0., 0., -10.), pb.Vector3d(3., 2., 0.), 10, 3, 2, True)
+        self.assertEqual(d3.shape, (10, 3, 2), "distribution3: wrong shape")
+        np.testing.assert_allclose(np.sum(d3, axis = 2), d2, rtol = 1.e-12, atol = 1.e-14, err_msg = "distribution3: does not agree with distribution2")
+        self.assertAlmostEqual(np.sum(d3[:, :, 1]), self.length / 2, 12, "distribution3: wrong length in second y-column")
+
+    def test_distribution_history(self):
+        """ time resolved distributions equal the distributions of the filtered segments """
+        rs = pb.RootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+        rs.setSeed(1)
+        rs.initialize(False)
+        rs.simulate(10, False)
+        ana = pb.SegmentAnalyser(rs)
+        times = [2.5, 5., 7.5, 10.]
+        d = ana.distributionHistory("length", times, 0., -10., 5, True)
+        self.assertEqual(d.shape, (4, 5), "distributionHistory: wrong shape")
+        d3 = ana.distributionHistory("length", times, pb.Vector3d(-5., -5., -10.), pb.Vector3d(5., 5., 0.), 5, 2, 2, True)
+        self.assertEqual(d3.shape, (4, 5, 2, 2), "distributionHistory: wrong shape")
+        for i, t in enumerate(times):
+            a = pb.SegmentAnalyser(ana)
+            a.filter("creationTime", 0, t)
+            np.testing.assert_allclose(d[i], a.distribution("length", 0., -10., 5, True), rtol = 1.e-12, err_msg = "distributionHistory: wrong distribution")
+            d3_ = a.distribution3("length", pb.Vector3d(-5., -5., -10.), pb.Vector3d(5., 5., 0.), 5, 2, 2, True)
+            np.testing.assert_allclose(d3[i], d3_, rtol = 1.e-12, err_msg = "distributionHistory: wrong 3d distribution")
+
+    def test_arrays(self):
+        """ read-only numpy views of nodes, segments, and data """
+        self.line_example()
+        nodes, segs = self.ana.nodeArray, self.ana.segmentArray
+        self.assertEqual(nodes.shape, (5, 3), "nodeArray: wrong shape")
+        self.assertEqual(segs.shape, (4, 2), "segmentArray: wrong shape")
+        self.assertEqual(segs.dtype, np.int32, "segmentArray: expected an int32 array")
+        np.testing.assert_array_equal(nodes, [[n.x, n.y, n.z] for n in self.ana.nodes])
+        np.testing.assert_array_equal(segs, [[s.x, s.y] for s in self.ana.segments])
+        np.testing.assert_array_equal(self.ana.dataArray("radius"), [0.1, 0.1, 0.2, 0.2])
+        with self.assertRaises(ValueError):
+            self.ana.dataArray("unknown")
+        ms = pb.MappedSegments(self.ana.nodes, [0., 1., 2., 3., 4.], self.ana.segments, [0.1, 0.1, 0.2, 0.2], [1, 1, 2, 2])
+        np.testing.assert_array_equal(ms.nodeArray, nodes)
+        np.testing.assert_array_equal(ms.segmentArray, segs)
+        np.testing.assert_array_equal(ms.subTypeArray, [1, 1, 2, 2])
+        np.testing.assert_array_equal(ms.nodeCTArray, [0., 1., 2., 3., 4.])
+        radii = self.ana.dataArray("radius")
+        self.assertTrue(np.shares_memory(self.ana.nodeArray, nodes), "nodeArray: expected a view without copying")
+        self.assertTrue(np.shares_memory(self.ana.dataArray("radius"), radii), "dataArray: expected a view without copying")
+        self.assertFalse(radii.flags.writeable, "dataArray: expected a read-only view")
+        self.ana.crop(pb.SDF_PlantBox(1., 1., 1.))  # views stay valid and unchanged if the analyser changes
+        self.ana.addSegments(pb.SegmentAnalyser(self.ana))
+        np.testing.assert_array_equal(nodes, [[n.x, n.y, n.z] for n in ms.nodes], err_msg = "nodeArray: array changed by the analyser")
+        np.testing.assert_array_equal(segs, [[s.x, s.y] for s in ms.segments], err_msg = "segmentArray: array changed by the analyser")
+        np.testing.assert_array_equal(radii, [0.1, 0.1, 0.2, 0.2], err_msg = "dataArray: array changed by the analyser")
+        self.assertEqual(self.ana.segmentArray.shape, (len(self.ana.segments), 2), "segmentArray: view does not follow the analyser")
+        radii = ms.radiusArray
+        ms.setRadius(0.5)
+        del ms
+        np.testing.assert_array_equal(radii, [0.1, 0.1, 0.2, 0.2], err_msg = "radiusArray: array changed by the mapped segments")
+
+    def test_parameter_cache(self):
+        """ cached organ parameters follow the simulation and changes of the segments """
+        rs = pb.RootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+        rs.setSeed(1)
+        rs.initialize(False)
+        rs.simulate(10, False)
+        ana = pb.SegmentAnalyser(rs)
+        age, order = np.array(ana.getParameter("age")), np.array(ana.getParameter("order"))
+        np.testing.assert_array_equal(ana.getParameter("age"), age, err_msg = "getParameter: cached values differ")
+        rs.simulate(1, False)
+        np.testing.assert_allclose(ana.getParameter("age"), age + 1, rtol = 1.e-12, err_msg = "getParameter: cache was not updated by simulate")
+        np.testing.assert_array_equal(ana.getParameter("order"), order, err_msg = "getParameter: wrong order after simulate")
+        ana.filter("order", 1, 1)
+        self.assertEqual(len(ana.getParameter("age")), np.sum(order == 1), "getParameter: cache was not cleared by filter")
+
+    def test_write_vtp(self):
+        """ vtp files in ascii, binary, and appended format """
+        rs = pb.RootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+        rs.setSeed(1)
+        rs.initialize(False)
+        rs.simulate(10, False)
+        ana = pb.SegmentAnalyser(rs)
+        ana.pack()
+        types = ["radius", "subType", "creationTime"]
+        nodes = np.array([[n.x, n.y, n.z] for n in ana.nodes])
+        ascii = None
+        for format_, compress in [(pb.ascii, False), (pb.binary, False), (pb.appended, False), (pb.binary, True), (pb.appended, True)]:
+            ana.write("test_vtp.vtp", types, format_, compress)
+            a = read_vtp_arrays("test_vtp.vtp")
+            np.testing.assert_array_equal(a["connectivity"], ana.segmentArray.flatten(), err_msg = "writeVTP: wrong connectivity")
+            if format_ == pb.ascii:
+                ascii = a
+                np.testing.assert_allclose(a["Coordinates"], nodes.flatten(), rtol = 1.e-5, atol = 1.e-5, err_msg = "writeVTP: wrong coordinates")
+            else:  # lossless
+                np.testing.assert_array_equal(a["Coordinates"], nodes.flatten(), err_msg = "writeVTP: wrong coordinates")
+                for t in types:
+                    np.testing.assert_array_equal(a[t], ana.getParameter(t), err_msg = "writeVTP: wrong data")
+                    np.testing.assert_allclose(a[t], ascii[t], rtol = 1.e-5, err_msg = "writeVTP: binary and ascii data differ")
+        for format_ in [pb.ascii, pb.binary, pb.appended]:
+            rs.write("test_vtp.vtp", format_, True)
+            a = read_vtp_arrays("test_vtp.vtp")
+            self.assertEqual(len(a["time"]), len(a["Coordinates"]) / 3, "RootSystem.write: wrong number of point data")
+            self.assertEqual(a["offsets"][-1], len(a["connectivity"]), "RootSystem.write: wrong offsets")
+        rs.write("test_vtp.vtp")
+        with open("test_vtp.vtp") as f:
+            self.assertIn('<CellData Scalars="CellData">', f.read(), "RootSystem.write: wrong cell data attribute")
+        p = pb.Plant()
+        p.readParameters("../modelparameter/plant/Heliantus_Pagès_2013.xml")
+        p.setSeed(1)
+        p.initialize(False)
+        p.simulate(10, False)
+        arrays = []
+        for format_ in [pb.ascii, pb.binary]:
+            p.write("test_vtp.vtp", format_)
+            arrays.append(read_vtp_arrays("test_vtp.vtp"))
+        for k in arrays[1]:  # plant ascii output is lossless
+            np.testing.assert_array_equal(arrays[0][k], arrays[1][k], err_msg = "Plant.write: ascii and binary data differ")
+
+    def test_tree(self):
+        """ queries with and without bounding volume hierarchy agree """
+        rs = pb.RootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+        rs.setSeed(1)
+        rs.initialize(False)
+        rs.simulate(20, False)
+        ana = pb.SegmentAnalyser(rs)
+        core = pb.SDF_PlantContainer(1., 1., 5., False)
+        geometries = [pb.SDF_RotateTranslate(core, 20., pb.SDF_Axis.xaxis, pb.Vector3d(x, 0., -3.)) for x in [-2., 0., 2.]]
+        geometries.append(pb.SDF_Union(geometries[0], geometries[2]))
+        geometries.append(pb.SDF_Difference(pb.SDF_PlantBox(6., 6., 10.), geometries[1]))
+        geometries.append(pb.SDF_HalfPlane(pb.Vector3d(0., 0., -5.), pb.Vector3d(0., 0., 1.)))  # unbounded
+        self.assertIsNone(geometries[-1].getBoundingBox(), "getBoundingBox: half plane is unbounded")
+        expected = [[ana.getSummed(name, g) for g in geometries] for name in ["length", "volume", "subType"]]
+        cropped = []
+        for g in geometries:
+            a = pb.SegmentAnalyser(ana)
+            a.crop(g)
+            cropped.append(a)
+        box = ana.getSegmentsInBox(pb.Vector3d(-1., -1., -6.), pb.Vector3d(1., 1., -2.))
+        ana.buildTree()
+        self.assertTrue(ana.hasTree(), "buildTree: no tree")
+        for i, name in enumerate(["length", "volume", "subType"]):
+            np.testing.assert_allclose([ana.getSummed(name, g) for g in geometries], expected[i], rtol = 1.e-14, err_msg = "getSummed: tree query differs")
+        for g, c in zip(geometries, cropped):
+            a = pb.SegmentAnalyser(ana)
+            self.assertTrue(a.hasTree(), "copies should share the tree")
+            a.crop(g)
+            self.assertFalse(a.hasTree(), "crop should delete the tree")
+            np.testing.assert_array_equal(a.nodeArray[a.segmentArray], c.nodeArray[c.segmentArray], "crop: tree query differs")
+        np.testing.assert_array_equal(ana.getSegmentsInBox(pb.Vector3d(-1., -1., -6.), pb.Vector3d(1., 1., -2.)), box, "getSegmentsInBox: tree query differs")
+        ana.nodes = ana.nodes
+        self.assertFalse(ana.hasTree(), "setting the nodes should delete the tree")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,282 @@
+import unittest
+import sys
+sys.path.append("..")
+sys.path.append("../src/python_modules")
+import plantbox as pb
+import pickle
+from xylem_flux import XylemFluxPython
+
+import numpy as np
+
+
+class TestXylemFlux(unittest.TestCase):
+
+    def root_example(self):
+        """ an example used in the tests below, a tap root with one lateral, node index = segment index + 1 """
+        nodes = [pb.Vector3d(0, 0, -i) for i in range(0, 21)]  # tap root, 20 segments
+        segs = [pb.Vector2i(i, i + 1) for i in range(0, 20)]
+        nodes.extend([pb.Vector3d(i, 0, -10) for i in range(1, 11)])  # lateral at node 10, 10 segments
+        segs.append(pb.Vector2i(10, 21))
+        segs.extend([pb.Vector2i(i, i + 1) for i in range(21, 30)])
+        cts = [0.] * len(nodes)
+        radii = [0.1] * 20 + [0.05] * 10
+        types = [0] * 20 + [1] * 10
+        self.ms = pb.MappedSegments(nodes, cts, segs, radii, types)
+        self.ms.setRectangularGrid(pb.Vector3d(-5, -5, -25), pb.Vector3d(15, 5, 0), pb.Vector3d(4, 2, 5), False)
+        self.r = XylemFluxPython(self.ms)
+        self.r.setKr([1.728e-4, 1.e-3])
+        self.r.setKx([4.32e-2, 1.e-3])
+        self.sx = np.linspace(-200., -500., 4 * 2 * 5)  # soil matric potential per cell
+
+    def test_solve_neumann(self):
+        """ native solver versus the scipy solver, Neumann boundary condition """
+        self.root_example()
+        rx = self.r.solve_neumann(0., -0.1, self.sx, True)
+        rx_scipy = self.r.solve_neumann_scipy(0., -0.1, self.sx, True)
+        self.assertIsInstance(rx, np.ndarray, "solve_neumann: expected a numpy array")
+        np.testing.assert_allclose(rx, rx_scipy, rtol = 1.e-8, err_msg = "solve_neumann: native and scipy solutions differ")
+
+    def test_solve_dirichlet(self):
+        """ native solver versus the scipy solver, Dirichlet boundary condition """
+        self.root_example()
+        rx = self.r.solve_dirichlet(0., -1000., 0., self.sx, True)
+        self.assertAlmostEqual(rx[0], -1000., 8, "solve_dirichlet: wrong collar pressure")
+        # Neumann with the resulting collar flux must reproduce the solution
+        q = self.r.collar_flux(0., rx, self.sx)
+        rx2 = self.r.solve_neumann(0., q, self.sx, True)
+        np.testing.assert_allclose(rx, rx2, rtol = 1.e-6, err_msg = "solve_dirichlet: solution does not match Neumann solution")
+
+    def test_solvers(self):
+        """ direct solver (cached symbolic factorization) versus iterative solver """
+        self.root_example()
+        self.r.solver = pb.ldlt
+        rx = self.r.solve_neumann(0., -0.1, self.sx, True)
+        rx2 = self.r.solveLinearSystem(pb.neumann, np.array([0], dtype = np.int64), [-0.1])  # reuses the assembled system
+        self.r.solver = pb.pcg
+        rx3 = self.r.solve_neumann(0., -0.1, self.sx, True)
+        np.testing.assert_allclose(rx, rx2, rtol = 1.e-12, err_msg = "solveLinearSystem: differs from solve")
+        np.testing.assert_allclose(rx, rx3, rtol = 1.e-8, err_msg = "solve: direct and iterative solutions differ")
+        self.r.solverMaxIter = 1
+        with self.assertRaises(RuntimeError):  # no silent unconverged result
+            self.r.solve_neumann(0., -0.1, self.sx, True)
+
+    def test_tree_solver(self):
+        """ tree elimination versus direct solver, Neumann and Dirichlet conditions at several nodes """
+        self.root_example()
+        tips = [20, 30]  # tap root tip, lateral tip
+        for bc, nodes, values in [(pb.neumann, [0] + tips, [-0.1, 0., 0.]), (pb.dirichlet, [0], [-1000.]), (pb.dirichlet, [0, 30], [-1000., -300.])]:
+            self.r.solver = pb.ldlt
+            rx = pb.XylemFlux.solve(self.r, 0., self.sx, bc, nodes, values, True)
+            self.r.solver = pb.tree
+            rx2 = pb.XylemFlux.solve(self.r, 0., self.sx, bc, nodes, values, True)
+            np.testing.assert_allclose(rx, rx2, rtol = 1.e-10, err_msg = "solve: tree and direct solutions differ")
+
+    def test_solve_batch(self):
+        """ batched solve versus single solves """
+        self.root_example()
+        sxx = np.array([self.sx + 10.*i for i in range(0, 5)])
+        trans = np.linspace(-0.05, -0.2, 5)
+        rx = self.r.solve_neumann_batch(0., trans, sxx, True)
+        self.assertEqual(rx.shape, (5, len(self.ms.nodes)), "solve_neumann_batch: wrong shape")
+        for i in range(0, 5):
+            rx_i = self.r.solve_neumann(0., trans[i], sxx[i], True)
+            np.testing.assert_allclose(rx[i], rx_i, rtol = 1.e-10, err_msg = "solve_neumann_batch: differs from solve_neumann")
+        rx = self.r.solveBatch(0., sxx, pb.dirichlet, [0], [-1000.] * 5, True)
+        for i in range(0, 5):
+            rx_i = self.r.solve_dirichlet(0., -1000., 0., sxx[i], True)
+            np.testing.assert_allclose(rx[i], rx_i, rtol = 1.e-10, err_msg = "solveBatch: differs from solve_dirichlet")
+
+    def test_coefficient_cache(self):
+        """ cached segment coefficients must follow age dependent and changed conductivities """
+        self.root_example()
+        self.ms.nodeCTs = list(np.linspace(0., 10., len(self.ms.nodes)))
+        self.r.setKrTables([[1.e-3, 1.e-4], [1.e-3, 1.e-4]], [[0., 10.], [0., 10.]])
+        for t in [5., 10., 20.]:
+            rx = self.r.solve_neumann(t, -0.1, self.sx, True)
+            fluxes = self.r.segFluxes(t, rx, self.sx, False, True)
+            r2 = XylemFluxPython(self.ms)  # without cache
+            r2.setKrTables([[1.e-3, 1.e-4], [1.e-3, 1.e-4]], [[0., 10.], [0., 10.]])
+            r2.setKx([4.32e-2, 1.e-3])
+            rx2 = r2.solve_neumann_scipy(t, -0.1, self.sx, True)
+            np.testing.assert_allclose(rx, rx2, rtol = 1.e-8, err_msg = "solve_neumann: cached coefficients are outdated")
+            np.testing.assert_allclose(fluxes, r2.segFluxes(t, rx, self.sx, False, True), rtol = 1.e-10, err_msg = "segFluxes: cached coefficients are outdated")
+        self.r.setKr([1.e-3, 1.e-3])
+        rx = self.r.solve_neumann(20., -0.1, self.sx, True)
+        r2.setKr([1.e-3, 1.e-3])
+        np.testing.assert_allclose(rx, r2.solve_neumann_scipy(20., -0.1, self.sx, True), rtol = 1.e-8, err_msg = "solve_neumann: cached coefficients are outdated")
+
+    def test_fluxes_into(self):
+        """ segment and cell fluxes written into numpy buffers versus the list and map based versions """
+        self.root_example()
+        rx = self.r.solve_neumann(0., -0.1, self.sx, True)
+        seg_fluxes = np.zeros((len(self.ms.segments),))
+        self.r.segFluxesInto(0., rx, self.sx, seg_fluxes, False, True)
+        np.testing.assert_allclose(seg_fluxes, self.r.segFluxes(0., rx, self.sx, False, True), rtol = 1.e-12, err_msg = "segFluxesInto: wrong fluxes")
+        cell_fluxes = np.ones((len(self.sx),))
+        self.r.soilFluxesInto(0., rx, self.sx, cell_fluxes, False)
+        cell_fluxes2 = np.zeros((len(self.sx),))
+        for k, v in self.r.soilFluxes(0., rx, self.sx, False).items():
+            cell_fluxes2[k] = v
+        np.testing.assert_allclose(cell_fluxes, cell_fluxes2, rtol = 1.e-12, atol = 1.e-16, err_msg = "soilFluxesInto: wrong fluxes")
+        self.assertAlmostEqual(np.sum(cell_fluxes), -0.1, 10, "soilFluxesInto: fluxes do not sum up to the collar flux")
+        self.r.sumSoilFluxesInto(seg_fluxes, cell_fluxes)
+        np.testing.assert_allclose(cell_fluxes, cell_fluxes2, rtol = 1.e-12, atol = 1.e-16, err_msg = "sumSoilFluxesInto: wrong fluxes")
+
+    def test_mapping(self):
+        """ compressed segment to cell mappers """
+        self.root_example()
+        seg2cell = self.ms.seg2cell
+        self.assertEqual(seg2cell.dtype, np.int32, "seg2cell: expected an int32 array")
+        self.assertEqual(len(seg2cell), len(self.ms.segments), "seg2cell: wrong length")
+        for i, s in enumerate(self.ms.segments):
+            mid = self.ms.nodes[s.x].plus(self.ms.nodes[s.y]).times(0.5)
+            self.assertEqual(seg2cell[s.y - 1], self.ms.soil_index(mid.x, mid.y, mid.z), "seg2cell: wrong cell index")
+        offsets, indices = self.ms.cell2segOffsets, self.ms.cell2segIndices
+        self.assertEqual(len(indices), len(self.ms.segments), "cell2segIndices: wrong length")
+        for c in range(0, self.ms.numberOfMappedCells()):
+            segs = self.ms.cellSegments(c)
+            np.testing.assert_array_equal(segs, indices[offsets[c]:offsets[c + 1]], err_msg = "cellSegments: wrong segments")
+            np.testing.assert_array_equal(seg2cell[segs], c, err_msg = "cell2seg: wrong segments")
+        cell_fluxes = np.linspace(1., 2., len(self.sx))
+        seg_fluxes = np.array(self.r.splitSoilFluxes(cell_fluxes))
+        cell_fluxes2 = np.zeros(cell_fluxes.shape)
+        self.r.sumSoilFluxesInto(seg_fluxes, cell_fluxes2)
+        np.testing.assert_allclose(cell_fluxes2[cell_fluxes2 != 0], cell_fluxes[cell_fluxes2 != 0], rtol = 1.e-12, err_msg = "splitSoilFluxes: fluxes are not conserved")
+
+    def test_incremental_mapping(self):
+        """ only new segments and segments of moved nodes are (re-)mapped during simulation """
+        rs = pb.MappedRootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+        rs.setRectangularGrid(pb.Vector3d(-10, -10, -20), pb.Vector3d(10, 10, 0), pb.Vector3d(4, 4, 8), False)
+        rs.initialize(False)
+        rs.simulate(5, False)
+        kept, kept_indices = rs.seg2cell, rs.cell2segIndices  # views stay valid and unchanged
+        self.assertTrue(np.shares_memory(rs.seg2cell, kept), "seg2cell: expected a view without copying")
+        self.assertTrue(np.shares_memory(rs.cell2segIndices, kept_indices), "cell2segIndices: expected a view without copying")
+        kept_, kept_indices_ = np.array(kept), np.array(kept_indices)
+        for i in range(0, 5):
+            old_seg2cell = np.array(rs.seg2cell)
+            rs.simulate(1, False)
+            seg2cell = rs.seg2cell
+            for s in rs.segments:
+                mid = rs.nodes[s.x].plus(rs.nodes[s.y]).times(0.5)
+                self.assertEqual(seg2cell[s.y - 1], rs.soil_index(mid.x, mid.y, mid.z), "simulate: wrong cell index")
+            n = len(old_seg2cell)
+            changed = np.nonzero(seg2cell[:n] != old_seg2cell)[0]
+            expected = np.union1d(changed, np.arange(n, len(seg2cell)))
+            np.testing.assert_array_equal(np.sort(rs.changedSegments), expected, err_msg = "simulate: wrong changed segments")
+            cells = np.union1d(old_seg2cell[changed], seg2cell[expected])
+            np.testing.assert_array_equal(rs.changedCells, cells[cells >= 0], err_msg = "simulate: wrong changed cells")
+            offsets, indices = rs.cell2segOffsets, rs.cell2segIndices
+            self.assertEqual(rs.numberOfMappedCells(), np.max(seg2cell) + 1, "simulate: wrong number of mapped cells")
+            self.assertEqual(len(indices), np.sum(seg2cell >= 0), "simulate: wrong number of mapped segments")
+            for c in range(0, rs.numberOfMappedCells()):
+                np.testing.assert_array_equal(seg2cell[indices[offsets[c]:offsets[c + 1]]], c, err_msg = "simulate: wrong cell2seg mapper")
+        np.testing.assert_array_equal(kept, kept_, err_msg = "seg2cell: array changed by simulate")
+        np.testing.assert_array_equal(kept_indices, kept_indices_, err_msg = "cell2segIndices: array changed by simulate")
+        with self.assertWarns(DeprecationWarning):
+            cell2seg = rs.cell2seg
+        for c in range(0, rs.numberOfMappedCells()):
+            np.testing.assert_array_equal(cell2seg.get(c, []), rs.cellSegments(c), err_msg = "cell2seg: wrong segments")
+
+    def test_pickle(self):
+        """ mappers and soil index of a restored mapped root system """
+        rs = pb.MappedRootSystem()
+        rs.readParameters("../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+        rs.setSeed(2)
+        rs.setRectilinearGrid([-10., -2., 0., 3., 10.], [-10., 0., 10.], [-20., -10., -5., 0.], False)
+        rs.initialize(False)
+        rs.simulate(5, False)
+        rs2 = pickle.loads(pickle.dumps(rs))
+        for r in [rs, rs2]:
+            r.simulate(3, False)
+        np.testing.assert_array_equal(rs2.seg2cell, rs.seg2cell, err_msg = "pickle: seg2cell differs")
+        np.testing.assert_array_equal(rs2.cell2segIndices, rs.cell2segIndices, err_msg = "pickle: cell2seg differs")
+        self.assertEqual(rs2.soil_index(1., 1., -7.), rs.soil_index(1., 1., -7.), "pickle: soil index differs")
+        ms = pickle.loads(pickle.dumps(rs.mappedSegments()))
+        np.testing.assert_array_equal(ms.seg2cell, rs.seg2cell, err_msg = "pickle: seg2cell differs")
+        self.assertEqual(len(ms.segments), len(rs.segments), "pickle: segments differ")
+        rs.setSoilGrid(lambda x, y, z: int(-z > 5.))  # call back functions are not stored
+        rs3 = pickle.loads(pickle.dumps(rs))
+        with self.assertRaises(ValueError):
+            rs3.simulate(1, False)
+        rs3.setSoilGrid(lambda x, y, z: int(-z > 5.))
+        rs3.simulate(1, False)
+
+    def test_cut_segments(self):
+        """ segments are cut at the faces of the rectangular grid """
+        nodes = [pb.Vector3d(0, 0, 0), pb.Vector3d(0.3, 0.2, -0.5), pb.Vector3d(3.7, 1.9, -7.3), pb.Vector3d(3.7, 1.9, -8.)]
+        segs = [pb.Vector2i(0, 1), pb.Vector2i(1, 2), pb.Vector2i(2, 3)]
+        ms = pb.MappedSegments(nodes, [0., 1., 2., 3.], segs, [0.1] * 3, [0] * 3)
+        ms.setRectangularGrid(pb.Vector3d(-1, -1, -10), pb.Vector3d(4, 4, 0), pb.Vector3d(5, 5, 10), True)
+        nodes, segs, cts = ms.nodes, ms.segments, ms.nodeCTs
+        self.assertEqual(len(segs), len(nodes) - 1, "cutSegments: wrong number of segments")
+        length = 0.
+        for i, s in enumerate(segs):
+            self.assertEqual(s.y - 1, i, "cutSegments: segments are not sorted")
+            n1, n2 = nodes[s.x], nodes[s.y]
+            length += n2.minus(n1).length()
+            cells = [ms.soil_index(p.x, p.y, p.z) for p in [n1.times(0.9).plus(n2.times(0.1)), n1.times(0.1).plus(n2.times(0.9))]]
+            self.assertEqual(cells[0], cells[1], "cutSegments: segment is not within a single cell")
+            self.assertEqual(ms.seg2cell[i], cells[0], "cutSegments: wrong cell index")
+        x = np.array([[0, 0, 0], [0.3, 0.2, -0.5], [3.7, 1.9, -7.3], [3.7, 1.9, -8.]])
+        self.assertAlmostEqual(length, np.sum(np.linalg.norm(x[1:] - x[:-1], axis = 1)), 10, "cutSegments: total length changed")
+        self.assertEqual(len(segs), 1 + 12 + 1, "cutSegments: wrong number of cuts")  # second segment crosses 3 faces in x, 1 in y, and 7 in z
+        new_cts = np.array(cts)[4:]
+        self.assertTrue(np.all(new_cts > 1.) and np.all(new_cts < 2.), "cutSegments: creation times are not interpolated")
+
+    def test_soil_index(self):
+        """ native soil index mappers versus the default equidistant mapper """
+        self.root_example()
+        self.ms.setRectangularGrid(pb.Vector3d(-5.1, -5.1, -25.1), pb.Vector3d(14.9, 4.9, -0.1), pb.Vector3d(4, 2, 5), False)  # no nodes on faces
+        seg2cell = np.array(self.ms.seg2cell)
+        self.ms.setSoilGrid(pb.EquidistantSoilIndex(pb.Vector3d(-5.1, -5.1, -25.1), pb.Vector3d(14.9, 4.9, -0.1), pb.Vector3d(4, 2, 5)))
+        np.testing.assert_array_equal(self.ms.seg2cell, seg2cell, err_msg = "EquidistantSoilIndex: wrong cell indices")
+        x, y, z = np.linspace(-5.1, 14.9, 5), np.linspace(-5.1, 4.9, 3), np.linspace(-25.1, -0.1, 6)
+        self.ms.setSoilGrid(pb.RectilinearSoilIndex(x, y, z))
+        np.testing.assert_array_equal(self.ms.seg2cell, seg2cell, err_msg = "RectilinearSoilIndex: wrong cell indices")
+        points, hexas, tets = [], [], []  # the same grid as unstructured mesh (vertices in DUNE ordering)
+        for k in range(0, 6):
+            for j in range(0, 3):
+                for i in range(0, 5):
+                    points.append(pb.Vector3d(x[i], y[j], z[k]))
+        for k in range(0, 5):
+            for j in range(0, 2):
+                for i in range(0, 4):
+                    v = [(k + dk) * 15 + (j + dj) * 5 + i + di for dk in [0, 1] for dj in [0, 1] for di in [0, 1]]
+                    hexas.append(v)
+                    tets.extend([[v[0], v[1], v[3], v[7]], [v[0], v[1], v[5], v[7]], [v[0], v[2], v[3], v[7]],
+                                 [v[0], v[2], v[6], v[7]], [v[0], v[4], v[5], v[7]], [v[0], v[4], v[6], v[7]]])
+        self.ms.setSoilGrid(pb.UnstructuredSoilIndex(points, hexas))
+        np.testing.assert_array_equal(self.ms.seg2cell, seg2cell, err_msg = "UnstructuredSoilIndex: wrong cell indices (hexahedra)")
+        soil_index = pb.UnstructuredSoilIndex(points, tets)
+        self.assertEqual(soil_index.getIndex(100., 0., -1.), -1, "UnstructuredSoilIndex: point outside is not -1")
+        self.ms.setSoilGrid(soil_index)
+        np.testing.assert_array_equal(self.ms.seg2cell // 6, seg2cell, err_msg = "UnstructuredSoilIndex: wrong cell indices (tetrahedra)")
+        x = np.array([-5.1, -4.1, 0.1, 10.1, 15.1])  # non equidistant
+        self.ms.setRectilinearGrid(x, y, z, False)
+        for i, s in enumerate(self.ms.segments):
+            mid = self.ms.nodes[s.x].plus(self.ms.nodes[s.y]).times(0.5)
+            c = (np.searchsorted(z, mid.z, side = "right") - 1) * 8 + (np.searchsorted(y, mid.y, side = "right") - 1) * 4 + np.searchsorted(x, mid.x, side = "right") - 1
+            self.assertEqual(self.ms.seg2cell[s.y - 1], c, "setRectilinearGrid: wrong cell index")
+
+    def test_pattern_update(self):
+        """ the cached sparsity pattern must be updated if segments are added """
+        self.root_example()
+        self.r.solve_neumann(0., -0.1, self.sx, True)
+        n = len(self.ms.nodes)
+        self.ms.nodes = list(self.ms.nodes) + [pb.Vector3d(0, 0, -21)]  # add a segment at the tap root tip
+        self.ms.nodeCTs = list(self.ms.nodeCTs) + [0.]
+        self.ms.segments = list(self.ms.segments) + [pb.Vector2i(20, n)]
+        self.ms.radii = list(self.ms.radii) + [0.1]
+        self.ms.subTypes = list(self.ms.subTypes) + [0]
+        self.ms.organTypes = list(self.ms.organTypes) + [2]
+        self.ms.mapSegments([pb.Vector2i(20, n)])
+        rx = self.r.solve_neumann(0., -0.1, self.sx, True)
+        rx_scipy = self.r.solve_neumann_scipy(0., -0.1, self.sx, True)
+        self.assertEqual(len(rx), n + 1, "solve_neumann: wrong number of nodes")
+        np.testing.assert_allclose(rx, rx_scipy, rtol = 1.e-8, err_msg = "solve_neumann: native and scipy solutions differ")
+
+
+if __name__ == '__main__':
+    unittest.main()
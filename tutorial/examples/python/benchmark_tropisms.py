@@ -0,0 +1,41 @@
+"""microbenchmark of the tropism functions: time per heading, i.e. per new root node"""
+import sys
+sys.path.append("../../..")
+sys.path.append("../../../src/python_modules")
+import plantbox as pb
+
+import math
+import timeit
+
+n, sigma = 200., 0.4  # number of trials per cm [1], flexibility [1/cm]
+dx = 1.  # distance to look ahead [cm]
+calls = 20000  # number of headings per tropism
+
+rs = pb.RootSystem()
+rs.readParameters("../../../modelparameter/rootsystem/Anagallis_femina_Leitner_2010.xml")
+rs.setSeed(1)
+rs.initialize(False)
+rs.simulate(10, False)
+organ = rs.getOrgans()[0]  # exotropism needs the initial heading of an organ
+
+layer = pb.SDF_RotateTranslate(pb.SDF_PlantBox(30, 30, 2), pb.Vector3d(0, 0, -16))
+soil = pb.SoilLookUpSDF(layer, 0.7, 0.1, 5)
+tropisms = {
+    "Gravi": pb.Gravitropism(rs, n, sigma),
+    "Plagio": pb.Plagiotropism(rs, n, sigma),
+    "Exo": pb.Exotropism(rs, n, sigma),
+    "Hydro": pb.Hydrotropism(rs, n, sigma, soil),
+    "Combined": pb.CombinedTropism(rs, n, sigma, pb.Hydrotropism(rs, n, sigma, soil), 10., pb.Gravitropism(rs, n, sigma), 1.),
+    "Twist": pb.TwistTropism(rs, n, sigma),
+}
+
+pos = pb.Vector3d(0., 0., -3.)
+old = pb.Matrix3d(pb.Vector3d(0., 0., -1.), pb.Vector3d(0., 1., 0.), pb.Vector3d(1., 0., 0.))  # heading downwards
+container = pb.SDF_PlantContainer(2., 2., 5., False)  # tight, to trigger the confinement
+
+print("{:10s}{:>22s}{:>22s}".format("tropism", "unconfined [us/call]", "confined [us/call]"))
+for name, t in tropisms.items():
+    t_uc = timeit.timeit(lambda: t.getUCHeading(pos, old, dx, organ), number = calls)
+    t.setGeometry(container)
+    t_c = timeit.timeit(lambda: t.getHeading(pos, old, dx, organ), number = calls)
+    print("{:10s}{:22.3f}{:22.3f}".format(name, 1.e6 * t_uc / calls, 1.e6 * t_c / calls))
@@ -5,7 +5,6 @@ sys.path.append("../../../src/python_modules")
 import plantbox as pb
 
 import math
-from multiprocessing import Pool
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -30,48 +29,33 @@ runs = 25  # iterations
 theta0_ = np.linspace(0, math.pi / 2, N)
 
 
-# One simulation
-def simulate(i):
-    rs = pb.RootSystem()
-    rs.readParameters(path + name + ".xml")
-    set_all_sd(rs, 0.)  # set all sd to zero
-    p1 = rs.getRootRandomParameter(1)  # tap and basal root type
-    # 1. vary parameter
-    p1.theta = theta0_[i]
-    # 2. simulate
-    rs.initializeLB(1, 1, False)
-    rs.simulate(simtime, False)
-    # 3. calculate target
+# Prototype, the parameter file is read only once
+rs = pb.RootSystem()
+rs.readParameters(path + name + ".xml")
+set_all_sd(rs, 0.)  # set all sd to zero
+ensemble = pb.Ensemble(rs)
+ensemble.basal, ensemble.shootborne = 1, 1  # see RootSystem.initializeLB
+
+# One member per run and parameter value, varying the insertion angle of the tap and basal root type
+seeds = list(range(0, runs * N))
+overrides = [[(2, 1, "theta", theta0_[k % N])] for k in seeds]  # (organ type root, sub type, name, value)
+ensemble.setMembers(seeds, overrides)
+
+# Parallel execution (all members in one process)
+ensemble.simulate(simtime)
+
+# Calculate targets
+depth_ = np.zeros(N)
+rad_dist_ = np.zeros(N)
+for k in seeds:
     depth = 0.  # mean depth
     rad_dist = 0.  # mean raidal distance
-    roots = rs.getPolylines()
+    roots = ensemble.getMember(k).getPolylines()
     for r in roots:
         depth += r[-1].z
         rad_dist += math.hypot(r[-1].x, r[-1].y)
-    depth /= len(roots)
-    rad_dist /= len(roots)
-    return depth, rad_dist
-
-
-depth_ = np.zeros(N)
-rad_dist_ = np.zeros(N)
-
-for r in range(0, runs):
-
-    print("run", r + 1)
-
-    # Parallel execution
-    param = []  # param is a list of tuples
-    for i in range(0, N):
-        param.append((i,))
-    pool = Pool()
-    output = pool.starmap(simulate, param)
-    pool.close()
-
-    # Copy results
-    for i, o in enumerate(output):
-        depth_[i] += (o[0] / runs)
-        rad_dist_[i] += (o[1] / runs)
+    depth_[k % N] += depth / len(roots) / runs
+    rad_dist_[k % N] += rad_dist / len(roots) / runs
 
 # Figure
 fig, axes = plt.subplots(nrows = 1, ncols = 2, figsize = (10, 8))
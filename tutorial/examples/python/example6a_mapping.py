@@ -19,21 +19,16 @@ res_ = np.array([3, 1, 5])
 rs.setRectangularGrid(pb.Vector3d(min_), pb.Vector3d(max_), pb.Vector3d(res_), True)  # cut and map segments
 
 """ add segment indices """
-segs = rs.segments
-x = np.zeros(len(segs))
-for i, s in enumerate(segs):
-    try:
-        x[i] = rs.seg2cell[i]
-    except:  # in case the segment is not within the domain
-        x[i] = -1
+x = np.array(rs.seg2cell, dtype = np.float64)  # cell index per segment, -1 in case the segment is not within the domain
 
 """ infos on a specific cell"""
 ci = rs.soil_index(0, 0, -7)
 print("Cell at [0,0,-7] has index", ci)
-try:
-    print(len(rs.cell2seg[ci]), "segments in this cell:")
-    print(rs.cell2seg[ci])
-except:
+cell_segs = rs.cellSegments(ci)
+if len(cell_segs) > 0:
+    print(len(cell_segs), "segments in this cell:")
+    print(cell_segs)
+else:
     print("There are no segments in this cell")
 
 """ vizualise roots """
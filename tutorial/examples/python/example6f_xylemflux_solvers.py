@@ -0,0 +1,49 @@
+""" benchmark of the linear solvers for the xylem flux (static soil) """
+import sys; sys.path.append("../../.."); sys.path.append("../../../src/python_modules")
+from xylem_flux import XylemFluxPython  # Python hybrid solver
+import plantbox as pb
+
+import numpy as np
+import timeit
+
+""" Parameters """
+kz = 4.32e-2  # axial conductivity [cm^3/day]
+kr = 1.728e-4  # radial conductivity [1/day]
+trans = -1.  # transpiration [cm3/day]
+simtime = 60  # [day]
+n = 10  # number of repetitions per solver
+
+""" root system """
+rs = pb.MappedRootSystem()
+path = "../../../modelparameter/rootsystem/"
+name = "Zea_mays_1_Leitner_2010"
+rs.readParameters(path + name + ".xml")
+rs.setSeed(1)
+min_b, max_b, cell_number = pb.Vector3d(-20, -20, -150), pb.Vector3d(20, 20, 0.), pb.Vector3d(20, 20, 75)
+rs.setRectangularGrid(min_b, max_b, cell_number, True)
+rs.initialize()
+rs.simulate(simtime, False)
+print("number of segments", len(rs.segments))
+
+""" root problem """
+r = XylemFluxPython(rs)
+r.setKr([kr])
+r.setKx([kz])
+z_ = np.linspace(0., -150., 75)
+sx = np.repeat(-200. + z_, 20 * 20)  # hydrostatic soil matric potential per cell [cm]
+
+""" scipy spsolve (umfpack) """
+start = timeit.default_timer()
+for i in range(0, n):
+    rx0 = r.solve_neumann_scipy(simtime, trans, sx, True)
+t = (timeit.default_timer() - start) / n
+print("scipy spsolve       {:g} s".format(t))
+
+""" native solvers """
+for solver, solver_name in [(pb.ldlt, "ldlt"), (pb.tree, "tree elimination"), (pb.pcg, "pcg")]:
+    r.solver = solver
+    start = timeit.default_timer()
+    for i in range(0, n):
+        rx = r.solve_neumann(simtime, trans, sx, True)
+    t = (timeit.default_timer() - start) / n
+    print("{:20s}{:g} s, maximal difference to scipy {:g} cm".format(solver_name, t, np.max(np.abs(rx - rx0))))
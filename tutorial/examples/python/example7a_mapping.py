@@ -43,13 +43,8 @@ for i in range(0, N):
     rs.simulate(dt, False)
 
     """ add segment indices """
-    segs = rs.segments
-    x = np.zeros(len(segs))
-    for i, s in enumerate(segs):
-        try:
-            x[i] = rs.seg2cell[i]
-        except:  # in case the segment is not within the domain
-            x[i] = -10
+    x = np.array(rs.seg2cell, dtype = np.float64)  # cell index per segment
+    x[x < 0] = -10  # in case the segment is not within the domain
 
     ana = pb.SegmentAnalyser(rs.mappedSegments())
     ana.addData("linear_index", x)